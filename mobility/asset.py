@@ -1,9 +1,8 @@
-import json
-import hashlib
 import pathlib
 
 from abc import ABC, abstractmethod
 from dataclasses import is_dataclass, fields
+from mobility.inputs_hashing import hash_json, get_data_hash
 
 class Asset(ABC):
     """
@@ -42,17 +41,27 @@ class Asset(ABC):
     def compute_inputs_hash(self) -> str:
         """
         Computes a hash based on the current inputs of the Asset.
+        
+        DataFrames, Series, Arrow tables and numpy arrays are hashed from 
+        their memory buffers (see inputs_hashing.get_data_hash), other values
+        are serialized to JSON, and the hash is computed while serializing.
     
         Returns:
             A hash string representing the current state of the inputs.
         """
+        
+        assets_hashes = {}
+        
         def serialize(value):
             """
             Recursively serializes a value, handling nested dataclasses and sets.
             """
 
             if isinstance(value, Asset):
-                return value.get_cached_hash()
+                # Assets can be used several times in the inputs
+                if id(value) not in assets_hashes:
+                    assets_hashes[id(value)] = value.get_cached_hash()
+                return assets_hashes[id(value)]
             
             elif isinstance(value, list) and all(isinstance(v, Asset) for v in value):
                 return {i: serialize(v) for i, v in enumerate(value)}
@@ -71,12 +80,12 @@ class Asset(ABC):
                 return str(value)
             
             else:
-                return value
+                data_hash = get_data_hash(value)
+                return value if data_hash is None else data_hash
     
         hashable_inputs = {k: serialize(v) for k, v in self.inputs.items()}
-        serialized_inputs = json.dumps(hashable_inputs, sort_keys=True).encode('utf-8')
         
-        return hashlib.md5(serialized_inputs).hexdigest()
+        return hash_json(hashable_inputs)
     
     
         
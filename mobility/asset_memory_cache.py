@@ -0,0 +1,147 @@
+import os
+import threading
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+from collections import OrderedDict
+
+
+class AssetMemoryCache:
+    """
+    Process wide, memory bounded LRU cache of the values returned by
+    FileAsset.get_cached_asset, so that files that are read many times (for
+    example the travel costs in the PopulationTrips iterations) are decoded
+    only once.
+
+    Values are stored by (cache path, inputs hash, modification time of the
+    cached files, get arguments) : rewriting a cached file invalidates its
+    entries.
+
+    The cache is disabled by default (assets then return whatever their
+    get_cached_asset method returns, as before), and has to be enabled
+    with the MOBILITY_ASSET_MEMORY_CACHE_SIZE environment variable.
+
+    Only DataFrames (and dicts of DataFrames) are cached. polars and Arrow
+    values are immutable and returned as is, pandas values are copied before
+    being returned, so that callers can modify them without changing the
+    cached value.
+
+    Parameters
+    ----------
+    max_size : float
+        Maximum size of the cached values, in GB (0 disables the cache).
+    """
+
+    def __init__(self, max_size: float):
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    def get(self, key):
+        """
+        Get a cached value (None if the key is not in the cache).
+        """
+
+        with self.lock:
+
+            if key not in self.values:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.values.move_to_end(key)
+            value, _ = self.values[key]
+
+        return copy_value(value)
+
+
+    def put(self, key, value) -> None:
+        """
+        Cache a value, evicting the least recently used values if the cache
+        gets bigger than its maximum size.
+        """
+
+        size = get_value_size(value)
+
+        if size is None or size > self.max_size*1e9:
+            return
+
+        with self.lock:
+
+            if key in self.values:
+                self.size -= self.values.pop(key)[1]
+
+            self.values[key] = (copy_value(value), size)
+            self.size += size
+
+            while self.size > self.max_size*1e9:
+                _, (_, evicted_size) = self.values.popitem(last=False)
+                self.size -= evicted_size
+
+
+    def clear(self) -> None:
+        with self.lock:
+            self.values = OrderedDict()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+
+asset_memory_cache = None
+
+
+def get_asset_memory_cache() -> AssetMemoryCache:
+    """
+    Get the process wide cache, with a maximum size set by the
+    MOBILITY_ASSET_MEMORY_CACHE_SIZE environment variable (in GB, 0 by
+    default : the cache is disabled).
+    """
+
+    global asset_memory_cache
+
+    max_size = float(os.environ.get("MOBILITY_ASSET_MEMORY_CACHE_SIZE", 0.0))
+
+    if asset_memory_cache is None:
+        asset_memory_cache = AssetMemoryCache(max_size)
+    elif asset_memory_cache.max_size != max_size:
+        asset_memory_cache.max_size = max_size
+        asset_memory_cache.clear()
+
+    return asset_memory_cache
+
+
+def get_value_size(value) -> int | None:
+    """
+    Estimate the memory size of a value in bytes (None if the value cannot
+    be cached).
+    """
+
+    if isinstance(value, pl.DataFrame):
+        return value.estimated_size()
+
+    if isinstance(value, pa.Table):
+        return value.nbytes
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+
+    if isinstance(value, dict) and len(value) > 0:
+        sizes = [get_value_size(v) for v in value.values()]
+        return None if None in sizes else sum(sizes)
+
+    return None
+
+
+def copy_value(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: copy_value(v) for k, v in value.items()}
+    return value
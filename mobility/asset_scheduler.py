@@ -0,0 +1,193 @@
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+class AssetScheduler:
+    """
+    Rebuilds the stale assets of a FileAsset update plan, running the assets
+    that do not depend on each other concurrently.
+
+    A thread pool is used by default : most long running assets spend their
+    time in RScript subprocesses or in polars / numpy code that releases the
+    GIL. A process pool can be used for pure Python assets, but the assets
+    are then pickled and built in the worker processes (only their output
+    files are available to the main process afterwards).
+
+    The start and end times of each rebuilt asset are recorded, to report the
+    critical path of the build (the chain of dependent assets that bounds its
+    total duration).
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Maximum number of assets built at the same time. Defaults to the
+        MOBILITY_ASSET_WORKERS environment variable, or 1 (assets are then
+        built one after the other, in the main thread).
+    executor : str, optional
+        "thread" or "process". Defaults to the MOBILITY_ASSET_EXECUTOR
+        environment variable, or "thread".
+    """
+
+    def __init__(self, n_workers: int = None, executor: str = None):
+
+        if n_workers is None:
+            n_workers = int(os.environ.get("MOBILITY_ASSET_WORKERS", 1))
+
+        if executor is None:
+            executor = os.environ.get("MOBILITY_ASSET_EXECUTOR", "thread")
+
+        if executor not in ["thread", "process"]:
+            raise ValueError("Unknown asset executor : " + str(executor) + " (should be 'thread' or 'process').")
+
+        self.n_workers = max(1, n_workers)
+        self.executor = executor
+        self.timings = {}
+        self.dependencies = {}
+        self.labels = {}
+
+
+    def run(self, update_plan: list) -> None:
+        """
+        Rebuild the assets of an update plan, each asset being started as
+        soon as all its upstream assets of the plan are rebuilt.
+
+        Parameters
+        ----------
+        update_plan : list
+            FileAssets to rebuild, in topological order (as returned by
+            FileAsset.get_update_plan).
+        """
+
+        assets = {asset.hash_path: asset for asset in update_plan}
+
+        for key, asset in assets.items():
+            self.labels[key] = get_asset_label(asset)
+            self.dependencies[key] = set(
+                inp.hash_path for inp in asset.inputs.values()
+                if hasattr(inp, "hash_path") and inp.hash_path in assets
+            )
+
+        if self.n_workers == 1 or len(assets) == 1:
+            for key, asset in assets.items():
+                self.timings[key] = build_asset(asset)
+                asset.update_hash(asset.inputs_hash)
+                asset.share_outputs()
+            return
+
+        if self.executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=self.n_workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.n_workers)
+
+        with pool:
+
+            remaining = dict(assets)
+            running = {}
+
+            while len(remaining) > 0 or len(running) > 0:
+
+                ready = [
+                    key for key in remaining
+                    if len(self.dependencies[key] & (remaining.keys() | running.values())) == 0
+                ]
+
+                for key in ready:
+                    running[pool.submit(build_asset, remaining.pop(key))] = key
+
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        self.timings[key] = future.result()
+                    except Exception:
+                        for f in running:
+                            f.cancel()
+                        raise
+                    assets[key].update_hash(assets[key].inputs_hash)
+                    assets[key].share_outputs()
+
+
+    def get_critical_path(self) -> list:
+        """
+        Get the chain of dependent assets with the longest total build time.
+
+        Returns
+        -------
+        list
+            (asset label, build duration in seconds) tuples, from the most
+            upstream asset to the most downstream one.
+        """
+
+        finish = {}
+        previous = {}
+
+        # Assets always end after their upstream assets, so sorting them
+        # by end time gives a topological order
+        for key in sorted(self.timings, key=lambda k: self.timings[k][1]):
+            upstream = [k for k in self.dependencies[key] if k in finish]
+            start = max([finish[k] for k in upstream], default=0.0)
+            previous[key] = max(upstream, key=lambda k: finish[k]) if len(upstream) > 0 else None
+            finish[key] = start + self.get_duration(key)
+
+        if len(finish) == 0:
+            return []
+
+        key = max(finish, key=lambda k: finish[k])
+        path = []
+
+        while key is not None:
+            path.append((self.labels[key], self.get_duration(key)))
+            key = previous[key]
+
+        return path[::-1]
+
+
+    def get_duration(self, key) -> float:
+        start, end = self.timings[key]
+        return end - start
+
+
+    def get_report(self) -> str:
+        """
+        Format the build duration of each rebuilt asset and the critical path
+        as a text report.
+        """
+
+        if len(self.timings) == 0:
+            return "No asset was rebuilt."
+
+        start = min(t[0] for t in self.timings.values())
+        end = max(t[1] for t in self.timings.values())
+
+        lines = ["Rebuilt " + str(len(self.timings)) + " assets in " + f"{end - start:.1f}" + " s :"]
+
+        for key in sorted(self.timings, key=lambda k: self.timings[k][0]):
+            lines.append(f"  {self.labels[key]} : {self.get_duration(key):.1f} s")
+
+        critical_path = self.get_critical_path()
+        critical_path_duration = sum(d for _, d in critical_path)
+
+        lines.append("Critical path (" + f"{critical_path_duration:.1f}" + " s) :")
+
+        for label, duration in critical_path:
+            lines.append(f"  {label} : {duration:.1f} s")
+
+        return "\n".join(lines)
+
+
+
+def build_asset(asset) -> tuple:
+    """
+    Build an asset and return its (start, end) wall clock times.
+    """
+    start = time.time()
+    asset.detach_outputs()
+    asset.create_and_get_asset()
+    return start, time.time()
+
+
+def get_asset_label(asset) -> str:
+    return asset.__class__.__name__ + " (" + asset.hash_path.stem + ")"
@@ -1,4 +1,5 @@
 import pandas as pd
+import polars as pl
 import numpy as np
 from pathlib import Path
 import os
@@ -58,7 +59,7 @@ def carbon_computation(trips, ademe_database="Base_Carbone_V22.0.csv"):
 
     Parameters
     ----------
-    trips : DataFrame
+    trips : DataFrame or polars LazyFrame
         Trips of one or several individuals (purpose, mode, distance)
     ademe_database : str, optional
         ADEME database file name.
@@ -67,8 +68,9 @@ def carbon_computation(trips, ademe_database="Base_Carbone_V22.0.csv"):
 
     Returns
     -------
-    emissions : DataFrame
-        trips with carbon emissions
+    emissions : DataFrame or polars LazyFrame
+        trips with carbon emissions (a LazyFrame if the trips are a LazyFrame,
+        like the trips of the Trips and LocalizedTrips assets in streaming mode)
 
     """
 
@@ -109,6 +111,9 @@ def carbon_computation(trips, ademe_database="Base_Carbone_V22.0.csv"):
     # COMPUTE CARBON EMISSIONS
     # ---------------------------------------------
 
+    if isinstance(trips, pl.LazyFrame):
+        return compute_emissions_lazy(trips, mode_ef)
+
     # Add carbon factors to each trip depending on transportation mode
     emissions = pd.merge(trips, mode_ef, on="mode_id", how="left")
 
@@ -126,3 +131,27 @@ def carbon_computation(trips, ademe_database="Base_Carbone_V22.0.csv"):
     # emissions.drop(["k_ef", "ef"], axis=1, inplace=True)
 
     return emissions
+
+
+def compute_emissions_lazy(trips, mode_ef):
+    """
+    Same computation as carbon_computation, for trips in a polars LazyFrame,
+    so the trips are only read when the result is collected.
+    """
+
+    mode_ef = pl.from_pandas(mode_ef).with_columns(pl.col("ef").cast(pl.Float64))
+
+    emissions = (
+        trips
+        .join(mode_ef.lazy(), on="mode_id", how="left")
+        .with_columns(
+            k_ef=pl.when(pl.col("mode_id").str.slice(0, 1) == "3")
+            .then(1.0 / (1.0 + pl.col("n_other_passengers")))
+            .otherwise(1.0)
+        )
+        .with_columns(
+            carbon_emissions=pl.col("ef") * pl.col("distance") * pl.col("k_ef")
+        )
+    )
+
+    return emissions
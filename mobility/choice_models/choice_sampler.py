@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ChoiceSampler:
+    """
+    Precomputed sampling structure of a choice probability table (the
+    destination probabilities by origin of a DestinationChoiceModel, or the
+    mode probabilities by OD of a TransportModeChoiceModel for example).
+
+    The choices of each group of key values (each origin, or each OD) are
+    stored contiguously with their cumulative probabilities, offset by the
+    position of the group : the cumulative probabilities of group g are in
+    ]g, g+1], so the draws of all groups are resolved by one searchsorted
+    on a single sorted array.
+
+    Attributes:
+        keys (list): The key columns of the groups.
+        groups (pd.Index): The key values of each group (a MultiIndex for several keys).
+        group_index (np.ndarray): The group of each choice.
+        choices (np.ndarray): The choices of all the groups.
+        cum_probs (np.ndarray): The cumulative probabilities of the choices,
+            normalized within each group and offset by the group position.
+        choice_col (str): The name of the choices column.
+    """
+
+    def __init__(self, keys, groups, group_index, choices, cum_probs, choice_col):
+        self.keys = keys
+        self.groups = groups
+        self.group_index = group_index
+        self.choices = choices
+        self.cum_probs = cum_probs
+        self.choice_col = choice_col
+
+
+    @classmethod
+    def build(cls, table: pd.DataFrame, keys: list, choice_col: str, prob_col: str = "prob"):
+        """
+        Builds the sampler of a probability table with one row per group and
+        choice (choices with a null probability are dropped).
+        """
+
+        table = table.loc[table[prob_col] > 0.0, keys + [choice_col, prob_col]]
+        table = table.sort_values(keys, kind="stable")
+
+        group_index = table.groupby(keys, sort=False).ngroup().to_numpy()
+        cum_probs = get_offset_cum_probs(table[prob_col].to_numpy(dtype=np.float64), group_index)
+
+        groups = table.loc[get_group_starts(group_index), keys]
+        groups = pd.MultiIndex.from_frame(groups) if len(keys) > 1 else pd.Index(groups[keys[0]])
+
+        return cls(keys, groups, group_index, table[choice_col].to_numpy(), cum_probs, choice_col)
+
+
+    def sample(self, origins, n: int = 1, seed: int = None) -> np.ndarray:
+        """
+        Samples n choices with replacement for each group of the origins,
+        with the probabilities of the table.
+
+        Args:
+            origins: The key values of the groups to sample from, as an array
+                of values for a single key, or as a dataframe with the key
+                columns (or a list of tuples) for several keys.
+            n (int): The number of choices to sample for each group.
+            seed (int): The random seed.
+
+        Returns:
+            np.ndarray: The sampled choices, with one row per origin and n columns.
+        """
+
+        if isinstance(origins, pd.DataFrame):
+            origins = pd.MultiIndex.from_frame(origins[self.keys]) if len(self.keys) > 1 else origins[self.keys[0]]
+        elif len(self.keys) > 1:
+            origins = pd.MultiIndex.from_tuples(list(origins), names=self.keys)
+
+        group_index = self.groups.get_indexer(origins)
+
+        if (group_index == -1).any():
+            unknown = pd.Index(origins)[group_index == -1].unique()
+            raise ValueError("No choice probabilities for the groups : " + str(list(unknown[:10])))
+
+        rng = np.random.default_rng(seed)
+        index = search_offset_cum_probs(self.cum_probs, group_index[:, None], rng.random((group_index.shape[0], n)))
+
+        return self.choices[index]
+
+
+    def save(self, path) -> None:
+        """
+        Writes the sampler to a parquet file, with one row per choice.
+        """
+
+        groups = self.groups.to_frame(index=False) if len(self.keys) > 1 else pd.DataFrame({self.keys[0]: self.groups})
+
+        table = groups.iloc[self.group_index].reset_index(drop=True)
+        table["group_index"] = self.group_index
+        table[self.choice_col] = self.choices
+        table["cum_prob"] = self.cum_probs
+
+        table = pa.Table.from_pandas(table, preserve_index=False)
+        metadata = {
+            b"keys": ",".join(self.keys).encode("utf-8"),
+            b"choice_col": self.choice_col.encode("utf-8")
+        }
+
+        pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+    @classmethod
+    def load(cls, path):
+        table = pq.read_table(path)
+        metadata = table.schema.metadata
+
+        keys = metadata[b"keys"].decode("utf-8").split(",")
+        choice_col = metadata[b"choice_col"].decode("utf-8")
+
+        table = table.to_pandas()
+
+        group_index = table["group_index"].to_numpy()
+        
+        groups = table.loc[get_group_starts(group_index), keys]
+        groups = pd.MultiIndex.from_frame(groups) if len(keys) > 1 else pd.Index(groups[keys[0]])
+
+        return cls(keys, groups, group_index, table[choice_col].to_numpy(), table["cum_prob"].to_numpy(), choice_col)
+
+
+def group_cumsum(values: np.ndarray, group_index: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sums of values within contiguous groups.
+    """
+    cumsum = np.cumsum(values)
+    group_starts = np.r_[0, np.flatnonzero(group_index[1:] != group_index[:-1]) + 1]
+    offsets = np.r_[0.0, cumsum][group_starts]
+    return cumsum - np.repeat(offsets, np.diff(np.r_[group_starts, values.shape[0]]))
+
+
+def get_offset_cum_probs(probs: np.ndarray, group_index: np.ndarray) -> np.ndarray:
+    """
+    Cumulative probabilities of choices stored contiguously by group, 
+    normalized within each group and offset by the group position (the 
+    cumulative probabilities of group g are in ]g, g+1]).
+    """
+    probs = probs/np.bincount(group_index, weights=probs)[group_index]
+    cum_probs = group_index + group_cumsum(probs, group_index)
+
+    # Rounding errors should not let the last choice of a group end
+    # before the next group starts
+    last_of_group = np.r_[group_index[1:] != group_index[:-1], True]
+    cum_probs[last_of_group] = group_index[last_of_group] + 1.0
+
+    return cum_probs
+
+
+def search_offset_cum_probs(cum_probs: np.ndarray, group_index: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+    """
+    Positions of the choices drawn with uniform numbers in [0, 1[ among the 
+    choices of the groups, in offset cumulative probabilities (see 
+    get_offset_cum_probs).
+    """
+    index = np.searchsorted(cum_probs, group_index + uniforms, side="right")
+    return np.minimum(index, cum_probs.shape[0] - 1)
+
+
+def get_group_starts(group_index: np.ndarray) -> np.ndarray:
+    """
+    Mask of the first element of each contiguous group.
+    """
+    return np.r_[True, group_index[1:] != group_index[:-1]]
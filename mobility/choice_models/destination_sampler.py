@@ -0,0 +1,75 @@
+import numpy as np
+import polars as pl
+
+from mobility.choice_models.choice_sampler import get_offset_cum_probs, get_group_starts, search_offset_cum_probs
+
+
+class DestinationSampler:
+    """
+    Sampler of the destinations of PopulationTrips, built once per iteration
+    from the destination probabilities by origin and motive.
+
+    The destinations of each (from, motive) group are stored contiguously
+    with their cumulative probabilities offset by the group position (with
+    the same helpers as ChoiceSampler), so the destinations of all the chain steps are drawn
+    with one searchsorted, without joining the steps with the probabilities
+    of all the candidate destinations.
+
+    Attributes:
+        groups (pl.DataFrame): The "from", "motive" and "group_index" of each group.
+        choices (pl.Series): The destinations of all the groups.
+        cum_probs (np.ndarray): The cumulative probabilities of the
+            destinations, normalized within each group and offset by the
+            group position.
+    """
+
+    def __init__(self, dest_prob: pl.DataFrame):
+        """
+        Args:
+            dest_prob (pl.DataFrame): "from", "motive", "to" and "p_ij" columns.
+        """
+
+        table = (
+            dest_prob
+            .filter(pl.col("p_ij") > 0.0)
+            .sort(["from", "motive"], maintain_order=True)
+            .with_columns(
+                group_index=pl.struct(["from", "motive"]).rle_id()
+            )
+        )
+
+        group_index = table["group_index"].to_numpy()
+
+        self.groups = table.filter(get_group_starts(group_index)).select(["from", "motive", "group_index"])
+        self.choices = table["to"]
+        self.cum_probs = get_offset_cum_probs(table["p_ij"].to_numpy(), group_index)
+
+
+    def sample(self, steps: pl.DataFrame, rng: np.random.Generator, from_col: str = "from") -> pl.DataFrame:
+        """
+        Draws one destination for each step, with the probabilities of its
+        origin and motive (the steps whose origin and motive have no
+        destination are dropped).
+
+        Args:
+            steps (pl.DataFrame): The steps, with an origin column and a "motive" column.
+            rng (np.random.Generator): The random generator.
+            from_col (str): The origin column of the steps.
+
+        Returns:
+            pl.DataFrame: The steps with a "to" column.
+        """
+
+        steps = steps.join(
+            self.groups.rename({"from": from_col}),
+            on=[from_col, "motive"],
+            maintain_order="left"
+        )
+
+        index = search_offset_cum_probs(self.cum_probs, steps["group_index"].to_numpy(), rng.random(steps.height))
+
+        return (
+            steps
+            .drop("group_index")
+            .with_columns(to=self.choices.gather(index))
+        )
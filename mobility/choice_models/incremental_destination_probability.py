@@ -0,0 +1,208 @@
+import logging
+
+import numpy as np
+import polars as pl
+
+
+class IncrementalDestinationProbability:
+    """
+    Destination probabilities of PopulationTrips, updated incrementally
+    between iterations when only the available sinks change.
+
+    The net cost bins of each origin, motive and destination (for each cost
+    offset) are computed once for given costs, and kept in memory sorted by
+    origin and motive, with their available sinks. When the sinks change,
+    only the rows of the changed destinations are patched, and the radiation
+    model is recomputed only for the origins and motives that reach one of
+    them. The cost bins are rebuilt when the costs change.
+
+    Without destination truncation the probabilities are the same as the
+    ones recomputed from scratch with PopulationTrips.get_utilities and
+    get_destination_probability. With a truncation, the destinations are
+    truncated with the initial sinks, when the cost bins are built.
+
+    Attributes:
+        cost_bins (pl.DataFrame): The resident cost bins ("from", "motive",
+            "to", "cost_bin", "prob" and "group_id" columns, sorted by origin
+            and motive).
+        sink_available (np.ndarray): The available sinks of each cost bins
+            row (weighted by the cost offset probability).
+        dest_prob (pl.DataFrame): The current destination probabilities.
+    """
+
+    def __init__(
+            self,
+            population_trips,
+            motives: list,
+            transport_zones,
+            sinks: pl.DataFrame,
+            cost_uncertainty_sd: float,
+            dest_prob_cutoff: float,
+            dest_top_n: int = None,
+            dest_cost_horizon: float = None
+        ):
+        """
+        Args:
+            population_trips (PopulationTrips): The model that computes the
+                cost bins and the radiation model.
+            motives (list): The motives.
+            transport_zones (TransportZones): The transport zones, for the motives utilities.
+            sinks (pl.DataFrame): The initial sinks of all destinations (the
+                destinations without sinks are never reachable).
+            cost_uncertainty_sd (float): Standard deviation of the cost offsets.
+            dest_prob_cutoff (float): Share of the destinations probability to keep.
+            dest_top_n (int): Maximum number of destinations by origin and motive (or None).
+            dest_cost_horizon (float): Maximum generalized cost to a destination (or None).
+        """
+
+        self.population_trips = population_trips
+        self.motives = motives
+        self.transport_zones = transport_zones
+        self.sinks = sinks
+        self.cost_uncertainty_sd = cost_uncertainty_sd
+        self.dest_prob_cutoff = dest_prob_cutoff
+        self.dest_top_n = dest_top_n
+        self.dest_cost_horizon = dest_cost_horizon
+
+        self.costs = None
+        self.cost_bins = None
+        self.sink_available = None
+        self.current_sinks = None
+        self.dest_prob = None
+
+
+    def get(self, sinks: pl.DataFrame, costs: pl.DataFrame) -> pl.DataFrame:
+        """
+        Gets the destination probabilities for the current sinks and costs.
+
+        Args:
+            sinks (pl.DataFrame): The remaining sinks ("to", "motive" and "sink_available" columns).
+            costs (pl.DataFrame): The current costs (the cost bins are rebuilt
+                if it is not the same DataFrame as in the previous call).
+
+        Returns:
+            pl.DataFrame: "motive", "from", "to" and "p_ij" columns.
+        """
+
+        if costs is not self.costs:
+            self.build(sinks, costs)
+        else:
+            self.update(sinks)
+
+        return self.dest_prob
+
+
+    def build(self, sinks, costs):
+
+        logging.info("Building the resident destination cost bins...")
+
+        cost_bins = (
+            self.population_trips.get_cost_bins(
+                self.motives,
+                self.transport_zones,
+                self.sinks,
+                costs,
+                self.cost_uncertainty_sd,
+                self.dest_top_n,
+                self.dest_cost_horizon
+            )
+            .sort(["from", "motive", "cost_bin"])
+            .collect(engine="streaming")
+            .with_columns(
+                group_id=pl.struct(["from", "motive"]).rle_id()
+            )
+        )
+
+        current_sinks = sinks.select(["to", "motive", "sink_available"])
+
+        sink_available = (
+            cost_bins
+            .select(["to", "motive", "prob"])
+            .join(current_sinks, on=["to", "motive"], how="left", maintain_order="left")
+            .select(pl.col("sink_available").fill_null(0.0)*pl.col("prob"))
+            .to_series()
+            .to_numpy()
+            .copy()
+        )
+
+        self.costs = costs
+        self.cost_bins = cost_bins
+        self.sink_available = sink_available
+        self.current_sinks = current_sinks
+        self.dest_prob = self.compute(np.ones(cost_bins.height, dtype=bool))
+
+
+    def update(self, sinks):
+
+        current_sinks = sinks.select(["to", "motive", "sink_available"])
+
+        changed = (
+            self.current_sinks
+            .rename({"sink_available": "previous_sink_available"})
+            .join(current_sinks, on=["to", "motive"], how="full", coalesce=True)
+            .with_columns(
+                pl.col("previous_sink_available").fill_null(0.0),
+                pl.col("sink_available").fill_null(0.0)
+            )
+            .filter(pl.col("previous_sink_available") != pl.col("sink_available"))
+            .select(["to", "motive", "sink_available"])
+        )
+
+        self.current_sinks = current_sinks
+
+        if changed.height == 0:
+            logging.info("Sinks unchanged, reusing the destination probabilities.")
+            return None
+
+        # Patch the sinks of the rows of the changed destinations only
+        changed_rows = (
+            self.cost_bins
+            .select(["to", "motive"])
+            .with_row_index("row")
+            .join(changed, on=["to", "motive"])
+        )
+
+        if changed_rows.height == 0:
+            return None
+
+        rows = changed_rows["row"].to_numpy()
+        prob = self.cost_bins["prob"].to_numpy()
+        self.sink_available[rows] = changed_rows["sink_available"].to_numpy()*prob[rows]
+
+        # Recompute the radiation model for the affected origins and motives
+        group_id = self.cost_bins["group_id"].to_numpy()
+        affected_groups = np.unique(group_id[rows])
+        affected = np.isin(group_id, affected_groups)
+
+        logging.info(
+            "Updating the destination probabilities of " + str(affected_groups.shape[0])
+            + " origins x motives (out of " + str(group_id[-1] + 1) + ")."
+        )
+
+        affected_keys = self.cost_bins.filter(affected).select(["from", "motive"]).unique()
+
+        self.dest_prob = pl.concat([
+            self.dest_prob.join(affected_keys, on=["from", "motive"], how="anti"),
+            self.compute(affected)
+        ])
+
+        return None
+
+
+    def compute(self, mask):
+
+        costs = (
+            self.cost_bins
+            .filter(mask)
+            .with_columns(sink_available=pl.Series(self.sink_available[mask]))
+            .filter(pl.col("sink_available") > 0.0)
+            .select(["from", "motive", "to", "cost_bin", "sink_available"])
+        )
+
+        utilities = self.population_trips.aggregate_cost_bins(costs.lazy())
+
+        return self.population_trips.get_destination_probability(
+            utilities,
+            self.motives,
+            self.dest_prob_cutoff
+        )
@@ -2,9 +2,6 @@ import os
 import pathlib
 import logging
 import shutil
-import subprocess
-import pickle
-import json
 import random
 
 import geopandas as gpd
@@ -14,8 +11,6 @@ import numpy as np
 
 from scipy.stats import norm
 from typing import List
-from importlib import resources
-from collections import defaultdict
 
 from rich.spinner import Spinner
 from rich.live import Live
@@ -23,10 +18,12 @@ from rich.live import Live
 from mobility.file_asset import FileAsset
 from mobility.population import Population
 from mobility.choice_models.travel_costs_aggregator import TravelCostsAggregator
+from mobility.choice_models.incremental_destination_probability import IncrementalDestinationProbability
+from mobility.choice_models.destination_sampler import DestinationSampler
 from mobility.motives import Motive
 from mobility.transport_modes.transport_mode import TransportMode
 from mobility.parsers.mobility_survey import MobilitySurvey
-from mobility.transport_modes.compute_subtour_mode_probabilities import modes_list_to_dict
+from mobility.transport_modes.compute_subtour_mode_probabilities import SubtourModeProbabilities, modes_list_to_dict
 
 class PopulationTrips(FileAsset):
     
@@ -43,7 +40,12 @@ class PopulationTrips(FileAsset):
             activity_utility_coeff: float = 2.0,
             stay_home_utility_coeff: float = 1.0,
             n_iter_per_cost_update: int = 3,
-            cost_uncertainty_sd: float = 1.0
+            cost_uncertainty_sd: float = 1.0,
+            mode_sequence_search_engine: str = "heap",
+            dest_top_n: int = None,
+            dest_cost_horizon: float = None,
+            dest_prob_update: str = "full",
+            spatialize_engine: str = "hash"
         ):
         
         modes = [] if modes is None else modes
@@ -67,6 +69,46 @@ class PopulationTrips(FileAsset):
             "cost_uncertainty_sd": cost_uncertainty_sd
         }
         
+        # The destinations truncation options are only hashed when they are 
+        # set, so that the flows computed before they existed stay valid
+        options = {"dest_top_n": dest_top_n, "dest_cost_horizon": dest_cost_horizon}
+        inputs.update({k: v for k, v in options.items() if v is not None})
+        
+        if dest_prob_update not in ["full", "incremental"]:
+            raise ValueError("Unknown destination probability update : " + str(dest_prob_update) + " (should be 'full' or 'incremental').")
+        
+        # The "full" and "incremental" updates give the same probabilities 
+        # unless the destinations are truncated (the incremental update 
+        # truncates them with the initial sinks), so the update is only part
+        # of the inputs hash in that case
+        if dest_prob_update == "incremental" and (dest_top_n is not None or dest_cost_horizon is not None):
+            inputs["dest_prob_update"] = dest_prob_update
+        
+        self.dest_prob_update = dest_prob_update
+        
+        if mode_sequence_search_engine not in ["heap", "vectorized"]:
+            raise ValueError("Unknown mode sequence search engine : " + str(mode_sequence_search_engine) + " (should be 'heap' or 'vectorized').")
+        
+        # The "vectorized" engine can keep the mode sequences of exactly the
+        # same cost in another order than the "heap" engine, so it is part of
+        # the inputs hash (the default engine is not, so that the flows 
+        # computed before it existed stay valid)
+        if mode_sequence_search_engine != "heap":
+            inputs["mode_sequence_search_engine"] = mode_sequence_search_engine
+        
+        self.mode_sequence_search_engine = mode_sequence_search_engine
+        
+        if spatialize_engine not in ["hash", "sampler"]:
+            raise ValueError("Unknown spatialize engine : " + str(spatialize_engine) + " (should be 'hash' or 'sampler').")
+        
+        # The "sampler" engine draws other destinations than the "hash" 
+        # engine (with the same probabilities), so it is part of the inputs
+        # hash (the default engine is not)
+        if spatialize_engine != "hash":
+            inputs["spatialize_engine"] = spatialize_engine
+        
+        self.spatialize_engine = spatialize_engine
+        
         project_folder = pathlib.Path(os.environ["MOBILITY_PROJECT_DATA_FOLDER"])
         cache_path = {
             "weekday_flows": project_folder / "population_trips" / "weekday" / "weekday_flows.parquet",
@@ -104,6 +146,9 @@ class PopulationTrips(FileAsset):
         stay_home_utility_coeff = self.inputs["stay_home_utility_coeff"]
         n_iter_per_cost_update = self.inputs["n_iter_per_cost_update"]
         cost_uncertainty_sd = self.inputs["cost_uncertainty_sd"]
+        dest_top_n = self.inputs.get("dest_top_n")
+        dest_cost_horizon = self.inputs.get("dest_cost_horizon")
+        dest_prob_update = self.dest_prob_update
         
         cache_path = self.cache_path["weekday_flows"] if is_weekday is True else self.cache_path["weekend_flows"]
         tmp_folders = self.prepare_tmp_folders(cache_path)
@@ -116,37 +161,69 @@ class PopulationTrips(FileAsset):
         
         remaining_sinks = sinks.clone()
         
-        for iteration in range(1, n_iterations+1):
-            
-            logging.info(f"Iteration n°{iteration}")
-            
-            utilities = self.get_utilities(
+        # The cost bins are kept between iterations and only patched for the
+        # destinations whose sinks changed
+        if dest_prob_update == "incremental":
+            incremental_dest_prob = IncrementalDestinationProbability(
+                self,
                 motives,
                 population.transport_zones,
-                remaining_sinks,
-                costs,
-                cost_uncertainty_sd
-            )
-            
-            dest_prob = self.get_destination_probability(
-                utilities,
-                motives,
-                dest_prob_cutoff
-            )
-            
-            self.spatialize_trip_chains(iteration, chains, demand_groups, dest_prob, motives, costs, alpha, tmp_folders)
-            self.search_top_k_mode_sequences(iteration, costs_aggregator, k_mode_sequences, tmp_folders)
-            
-            possible_states_steps = self.get_possible_states_steps(current_states, demand_groups, chains, costs_aggregator, remaining_sinks, motive_dur, iteration, activity_utility_coeff, tmp_folders)
-            possible_states_utility = self.get_possible_states_utility(possible_states_steps, home_night_dur, stay_home_utility_coeff, stay_home_state)
-            
-            transition_prob = self.get_transition_probabilities(current_states, possible_states_utility)
-            current_states = self.apply_transitions(current_states, transition_prob)
-            current_states_steps = self.get_current_states_steps(current_states, possible_states_steps)
-            
-            costs = self.update_costs(costs, iteration, n_iter_per_cost_update, current_states_steps, costs_aggregator)
-            
-            remaining_sinks = self.get_remaining_sinks(current_states_steps, sinks)
+                sinks,
+                cost_uncertainty_sd,
+                dest_prob_cutoff,
+                dest_top_n,
+                dest_cost_horizon
+            )
+        
+        # The mode sequence search workers are kept alive for all iterations
+        mode_sequences_search = SubtourModeProbabilities(
+            k_mode_sequences,
+            modes_list_to_dict(costs_aggregator.modes),
+            tmp_folders["costs-store"],
+            engine=self.mode_sequence_search_engine
+        )
+        
+        with mode_sequences_search:
+        
+            for iteration in range(1, n_iterations+1):
+                
+                logging.info(f"Iteration n°{iteration}")
+                
+                if dest_prob_update == "incremental":
+                    
+                    dest_prob = incremental_dest_prob.get(remaining_sinks, costs)
+                    
+                else:
+                
+                    utilities = self.get_utilities(
+                        motives,
+                        population.transport_zones,
+                        remaining_sinks,
+                        costs,
+                        cost_uncertainty_sd,
+                        dest_top_n,
+                        dest_cost_horizon
+                    )
+                    
+                    dest_prob = self.get_destination_probability(
+                        utilities,
+                        motives,
+                        dest_prob_cutoff
+                    )
+                
+                self.spatialize_trip_chains(iteration, chains, demand_groups, dest_prob, motives, costs, alpha, tmp_folders)
+                self.search_top_k_mode_sequences(iteration, costs_aggregator, mode_sequences_search, tmp_folders)
+                
+                possible_states_steps = self.get_possible_states_steps(current_states, demand_groups, chains, costs_aggregator, remaining_sinks, motive_dur, iteration, activity_utility_coeff, tmp_folders)
+                possible_states_utility = self.get_possible_states_utility(possible_states_steps, home_night_dur, stay_home_utility_coeff, stay_home_state)
+                
+                transition_prob = self.get_transition_probabilities(current_states, possible_states_utility)
+                current_states = self.apply_transitions(current_states, transition_prob)
+                current_states_steps = self.get_current_states_steps(current_states, possible_states_steps)
+                
+                costs = self.update_costs(costs, iteration, n_iter_per_cost_update, current_states_steps, costs_aggregator)
+                
+                remaining_sinks = self.get_remaining_sinks(current_states_steps, sinks)
             
     
         current_states_steps = (
@@ -175,7 +252,7 @@ class PopulationTrips(FileAsset):
             os.makedirs(path)
             return path
         
-        folders = ["spatialized-chains", "modes", "flows", "sequences-index"]
+        folders = ["spatialized-chains", "modes", "flows", "sequences-index", "costs-store"]
         folders = {f: rm_then_mkdirs(f) for f in folders}
         
         return folders
@@ -234,17 +311,21 @@ class PopulationTrips(FileAsset):
         # Get the chain probabilities from the mobility surveys
         surveys = [s for s in surveys if s.country in countries]
         
+        chains_probabilities = [
+            (survey.inputs["country"], survey.get_chains_probability(motives))
+            for survey in surveys
+        ]
+        
         p_chain = (
             pl.concat(
                 [
                     (
-                        survey
-                        .get_chains_probability(motives)
+                        chains_probability["chains"]
                         .with_columns(
-                            country=pl.lit(survey.inputs["country"])
+                            country=pl.lit(country)
                         )
                     )
-                    for survey in surveys
+                    for country, chains_probability in chains_probabilities
                 ]
             )
             .with_columns(
@@ -252,32 +333,32 @@ class PopulationTrips(FileAsset):
             )
         )
         
-        # Create an index for motive sequences to avoid moving giant strings around
+        # Replace the motive sequences ids (which are large integers encoding 
+        # the motives of the sequences, shared by all surveys) by consecutive ids
         motive_seqs = ( 
-            p_chain
-            .select(["motive_seq", "seq_step_index", "motive"])
+            pl.concat([chains_probability["motive_seqs"] for _, chains_probability in chains_probabilities])
             .unique()
         )
         
         motive_seq_index = (
-            motive_seqs.select("motive_seq")
+            motive_seqs.select("motive_seq_id")
             .unique()
-            .with_row_index("motive_seq_id")
+            .sort("motive_seq_id")
+            .with_row_index("index_motive_seq_id")
         )
         
         motive_seqs = (
             motive_seqs
-            .join(motive_seq_index, on="motive_seq")
+            .join(motive_seq_index, on="motive_seq_id")
+            .drop("motive_seq_id")
+            .rename({"index_motive_seq_id": "motive_seq_id"})
         )
         
-        
         p_chain = (
             p_chain
-            .join(
-                motive_seqs.select(["motive_seq", "motive_seq_id", "seq_step_index"]),
-                on=["motive_seq", "seq_step_index"]
-            )
-            .drop("motive_seq")
+            .join(motive_seq_index, on="motive_seq_id")
+            .drop("motive_seq_id")
+            .rename({"index_motive_seq_id": "motive_seq_id"})
         )
         
         motive_seqs = motive_seqs.select(["motive_seq_id", "seq_step_index", "motive"])
@@ -580,8 +661,12 @@ class PopulationTrips(FileAsset):
         )
         
         
-        chains = self.spatialize_anchor_motives(chains, dest_prob)
-        chains = self.spatialize_other_motives(chains, dest_prob, costs, alpha)
+        # The sampler precomputes the cumulative probabilities of the 
+        # destinations of each origin and motive once per iteration
+        dest_sampler = DestinationSampler(dest_prob) if self.spatialize_engine == "sampler" else None
+        
+        chains = self.spatialize_anchor_motives(chains, dest_prob, dest_sampler)
+        chains = self.spatialize_other_motives(chains, dest_prob, costs, alpha, dest_sampler)
         
         dest_sequences = ( 
             chains
@@ -617,18 +702,63 @@ class PopulationTrips(FileAsset):
         )
         
         
-    def spatialize_anchor_motives(self, chains, dest_prob):
+    def spatialize_anchor_motives(self, chains, dest_prob, dest_sampler=None):
         
         logging.info("Spatializing anchor motives...")
         
         seed = random.getrandbits(64)
         
-        spatialized_anchors = ( 
-            
+        anchors = ( 
             chains
             .filter((pl.col("is_anchor")) & (pl.col("motive") != "home"))
             .select(["demand_group_id", "home_zone_id", "motive_seq_id", "motive"])
             .unique()
+        )
+        
+        if dest_sampler is not None:
+            
+            spatialized_anchors = (
+                dest_sampler
+                .sample(anchors, np.random.default_rng(seed), from_col="home_zone_id")
+                .select(["demand_group_id", "motive_seq_id", "motive", "to"])
+            )
+            
+        else:
+        
+            spatialized_anchors = self.sample_anchors_with_hash_noise(anchors, dest_prob, seed)
+        
+        chains = (
+            
+            chains
+            .join(
+                spatialized_anchors.rename({"to": "anchor_to"}),
+                on=["demand_group_id", "motive_seq_id", "motive"],
+                how="left"
+            )
+            .with_columns(
+                anchor_to=pl.when(
+                    pl.col("motive") == "home"
+                ).then(
+                    pl.col("home_zone_id")
+                ).otherwise(
+                    pl.col("anchor_to")
+                )
+            )
+            .sort(["demand_group_id", "motive_seq_id", "seq_step_index"])
+            .with_columns(
+                anchor_to=pl.col("anchor_to").backward_fill()
+            )
+            
+        ) 
+                    
+        return chains
+    
+    
+    def sample_anchors_with_hash_noise(self, anchors, dest_prob, seed):
+        
+        spatialized_anchors = ( 
+            
+            anchors
             
             .join(
                 dest_prob,
@@ -659,34 +789,10 @@ class PopulationTrips(FileAsset):
             
         )
         
-        chains = (
-            
-            chains
-            .join(
-                spatialized_anchors.rename({"to": "anchor_to"}),
-                on=["demand_group_id", "motive_seq_id", "motive"],
-                how="left"
-            )
-            .with_columns(
-                anchor_to=pl.when(
-                    pl.col("motive") == "home"
-                ).then(
-                    pl.col("home_zone_id")
-                ).otherwise(
-                    pl.col("anchor_to")
-                )
-            )
-            .sort(["demand_group_id", "motive_seq_id", "seq_step_index"])
-            .with_columns(
-                anchor_to=pl.col("anchor_to").backward_fill()
-            )
-            
-        ) 
-                    
-        return chains
+        return spatialized_anchors
     
     
-    def spatialize_other_motives(self, chains, dest_prob, costs, alpha):
+    def spatialize_other_motives(self, chains, dest_prob, costs, alpha, dest_sampler=None):
         
         logging.info("Spatializing other motives...")
         
@@ -704,7 +810,7 @@ class PopulationTrips(FileAsset):
             logging.info(f"Spatializing step {seq_step_index}...")
             
             spatialized_step = ( 
-                self.spatialize_trip_chains_step(seq_step_index, chains_step, dest_prob, costs, alpha)
+                self.spatialize_trip_chains_step(seq_step_index, chains_step, dest_prob, costs, alpha, dest_sampler)
                 .with_columns(
                     seq_step_index=pl.lit(seq_step_index).cast(pl.UInt32)
                 )
@@ -733,7 +839,32 @@ class PopulationTrips(FileAsset):
         return pl.concat(spatialized_chains)
         
         
-    def spatialize_trip_chains_step(self, seq_step_index, chains_step, dest_prob, costs, alpha):
+    def spatialize_trip_chains_step(self, seq_step_index, chains_step, dest_prob, costs, alpha, dest_sampler=None):
+        
+        steps = chains_step.filter(pl.col("is_anchor").not_())
+        
+        if dest_sampler is not None:
+            steps = self.sample_steps(steps, dest_prob, costs, alpha, dest_sampler)
+        else:
+            steps = self.sample_steps_with_hash_noise(steps, dest_prob, costs, alpha)
+        
+        # Add the steps that end end up at anchor destinations
+        steps_anchor = (
+            chains_step
+            .filter(pl.col("is_anchor"))
+            .with_columns(
+                to=pl.col("anchor_to")
+            )
+            .select(["demand_group_id", "home_zone_id", "motive_seq_id", "motive", "anchor_to", "from", "to"])
+        )
+        
+        steps = pl.concat([steps, steps_anchor])
+            
+        
+        return steps
+    
+    
+    def sample_steps_with_hash_noise(self, steps, dest_prob, costs, alpha):
         
         # Tweak the destination probabilities so that the sampling takes into
         # account the cost of travel to the next anchor (so we avoid drifting
@@ -747,8 +878,7 @@ class PopulationTrips(FileAsset):
         
         steps = (
         
-            chains_step
-            .filter(pl.col("is_anchor").not_())
+            steps
             
             .join(dest_prob, on=["from", "motive"])
             
@@ -783,75 +913,77 @@ class PopulationTrips(FileAsset):
             
         )
         
-        
-        # Add the steps that end end up at anchor destinations
-        steps_anchor = (
-            chains_step
-            .filter(pl.col("is_anchor"))
-            .with_columns(
-                to=pl.col("anchor_to")
-            )
-            .select(["demand_group_id", "home_zone_id", "motive_seq_id", "motive", "anchor_to", "from", "to"])
-        )
-        
-        steps = pl.concat([steps, steps_anchor])
-            
-        
         return steps
     
     
-    def search_top_k_mode_sequences(self, iteration, costs_aggregator, k_mode_sequences, tmp_folders):
+    def sample_steps(self, steps, dest_prob, costs, alpha, dest_sampler, max_rounds=10):
+        """
+        Draws the destinations of the steps with the destination sampler, and
+        corrects the draws for the cost of travel to the next anchor by 
+        rejection : a destination is accepted with a probability of 
+        exp(-alpha*(cost to the anchor - lowest cost to the anchor)), so the 
+        accepted destinations follow the p_ij*exp(-alpha*cost) probabilities
+        of sample_steps_with_hash_noise. Only the drawn destinations are 
+        joined with the costs, and only the rejected steps are drawn again.
+        The steps still rejected after max_rounds draws are sampled with
+        sample_steps_with_hash_noise.
+        """
         
-        parent_folder_path = tmp_folders["spatialized-chains"].parent
+        columns = ["demand_group_id", "home_zone_id", "motive_seq_id", "motive", "anchor_to", "from", "to"]
         
-        chains_path = tmp_folders["spatialized-chains"] / f"spatialized_chains_{iteration}.parquet"
-        costs_path = parent_folder_path / "tmp-costs.pkl"
-        leg_modes_path = parent_folder_path / "tmp-leg-modes.pkl"
-        modes_path = parent_folder_path / "modes-props.json"
-        location_chains_path = parent_folder_path / "tmp-location-chains.parquet"
-        tmp_path = parent_folder_path / "tmp_results"
-        output_path = tmp_folders["modes"] / f"mode_sequences_{iteration}.parquet"
+        rng = np.random.default_rng(random.getrandbits(64))
         
-        shutil.rmtree(tmp_path, ignore_errors=True)
-        os.makedirs(tmp_path)
+        anchor_costs = costs.select(
+            pl.col("from").alias("to"),
+            pl.col("to").alias("anchor_to"),
+            pl.col("cost")
+        )
         
-        # Format the modes info as a dict and save the result in a temp file
-        modes = modes_list_to_dict(costs_aggregator.modes)
+        min_anchor_costs = anchor_costs.group_by("anchor_to").agg(min_cost=pl.col("cost").min())
         
-        with open(modes_path, "w") as f:
-            f.write(json.dumps(modes))
+        sampled_steps = []
         
-        # Format the costs as dict and save it as pickle to be ready for the parallel workers
-        mode_id = {n: i for i, n in enumerate(modes)}
-        id_to_mode = {i: n for i, n in enumerate(modes)}
-    
-        costs = ( 
-            costs_aggregator.get_costs_by_od_and_mode(
-                ["cost"],
-                congestion=True,
-                detail_distances=False
-            )
-            .with_columns(
-                mode_id=pl.col("mode").replace_strict(mode_id, return_dtype=pl.UInt8())
+        for _ in range(max_rounds):
+            
+            if steps.height == 0:
+                break
+            
+            drawn = (
+                dest_sampler.sample(steps, rng)
+                .join(anchor_costs, on=["to", "anchor_to"], how="left")
+                .join(min_anchor_costs, on="anchor_to", how="left")
+                .with_columns(
+                    p_accept=(-alpha*(pl.col("cost") - pl.col("min_cost"))).exp().fill_null(0.0)
+                )
             )
-        )
-
-        costs = {(row["from"], row["to"], row["mode_id"]): row["cost"] for row in costs.to_dicts()}
+            
+            accepted = pl.Series(rng.random(drawn.height) < drawn["p_accept"].to_numpy())
+            
+            sampled_steps.append(drawn.filter(accepted).select(columns))
+            steps = drawn.filter(~accepted).drop(["to", "cost", "min_cost", "p_accept"])
         
-        with open(costs_path, "wb") as f:
-            pickle.dump(costs, f, protocol=pickle.HIGHEST_PROTOCOL)  
+        if steps.height > 0:
+            sampled_steps.append(self.sample_steps_with_hash_noise(steps, dest_prob, costs, alpha))
         
-        # Format the available modes list for each OD as dict and save it as pickle to be ready for the parallel workers
-        is_return_mode = {mode_id[k]: v["is_return_mode"] for  k, v in modes.items()}
+        return pl.concat(sampled_steps)
+    
+    
+    def search_top_k_mode_sequences(self, iteration, costs_aggregator, mode_sequences_search, tmp_folders):
         
-        leg_modes = defaultdict(list)
-        for (from_, to_, mode) in costs.keys():
-            if not is_return_mode[mode]:
-                leg_modes[(from_, to_)].append(mode)
+        chains_path = tmp_folders["spatialized-chains"] / f"spatialized_chains_{iteration}.parquet"
+        output_path = tmp_folders["modes"] / f"mode_sequences_{iteration}.parquet"
         
-        with open(leg_modes_path, "wb") as f:
-            pickle.dump(leg_modes, f, protocol=pickle.HIGHEST_PROTOCOL)
-            
+        id_to_mode = mode_sequences_search.id_to_mode
+        
+        # Send the current costs to the workers (only the costs that changed
+        # since the last iteration are written to the shared costs store)
+        costs = costs_aggregator.get_costs_by_od_and_mode(
+            ["cost"],
+            congestion=True,
+            detail_distances=False
+        )
+        
+        mode_sequences_search.update_costs(costs)
         
         # Prepare a list of location chains
         spat_chains = ( 
@@ -871,33 +1003,14 @@ class PopulationTrips(FileAsset):
             )
         )
         
-        unique_location_chains.write_parquet(location_chains_path)
-        
         # Launch the mode sequence probability calculation
         with Live(Spinner("dots", text="Finding probable mode sequences for the spatialized trip chains..."), refresh_per_second=10):
-        
-            process = subprocess.Popen(
-                [
-                    "python",
-                    "-u",
-                    str(resources.files('mobility') / "transport_modes" / "compute_subtour_mode_probabilities.py"),
-                    "--k_sequences", str(k_mode_sequences),
-                    "--location_chains_path", str(location_chains_path),
-                    "--costs_path", str(costs_path),
-                    "--leg_modes_path", str(leg_modes_path),
-                    "--modes_path", str(modes_path),
-                    "--output_path", str(output_path),
-                    "--tmp_path", str(tmp_path)
-                ]
-            )
-            
-            process.wait()
-
+            mode_sequences_results = mode_sequences_search.run(unique_location_chains)
         
         # Agregate all mode sequences chunks
         all_results = (
             spat_chains.select(["demand_group_id", "motive_seq_id", "dest_seq_id"])
-            .join(pl.read_parquet(tmp_path), on="dest_seq_id")
+            .join(mode_sequences_results, on="dest_seq_id")
             .with_columns(
                 mode=pl.col("mode_index").replace_strict(id_to_mode)
             )
@@ -1406,7 +1519,31 @@ class PopulationTrips(FileAsset):
         
         
         
-    def get_utilities(self, motives, transport_zones, sinks, costs, cost_uncertainty_sd):
+    def get_utilities(self, motives, transport_zones, sinks, costs, cost_uncertainty_sd, dest_top_n=None, dest_cost_horizon=None):
+        
+        cost_bins = self.get_cost_bins(motives, transport_zones, sinks, costs, cost_uncertainty_sd, dest_top_n, dest_cost_horizon)
+        
+        costs = (
+            cost_bins
+            .join(sinks.lazy(), on=["to", "motive"])
+            .with_columns(
+                sink_available=pl.col("sink_available")*pl.col("prob")
+            )
+            .drop("prob")
+        )
+        
+        return self.aggregate_cost_bins(costs)
+    
+    
+    def get_cost_bins(self, motives, transport_zones, sinks, costs, cost_uncertainty_sd, dest_top_n=None, dest_cost_horizon=None):
+        """
+        Computes the net cost bin (cost - utility, floored) of each origin, 
+        motive and destination of the sinks, for each cost offset (with the 
+        probability of the offset), independently of the sinks volumes.
+        
+        Returns:
+            pl.LazyFrame: "from", "motive", "to", "cost_bin" and "prob" columns.
+        """
         
         motive_names = [m.name for m in motives]
         
@@ -1433,25 +1570,49 @@ class PopulationTrips(FileAsset):
                 ])
             )
         
+        # Costs to the destinations of each motive (truncated before the cost
+        # offsets if a top N or a cost horizon is set)
+        costs = (
+            costs.lazy()
+            .join(sinks.lazy().select(["to", "motive"]), on="to")
+        )
+        
+        if dest_top_n is not None or dest_cost_horizon is not None:
+            costs = self.truncate_destinations(costs, sinks, utilities, motives, dest_top_n, dest_cost_horizon)
+        
         x = [-2.0, -1.0, 0.0, 1.0, 2.0]
         p = norm.pdf(x, loc=0.0, scale=cost_uncertainty_sd)
         p /= p.sum()
         
         costs = pl.concat([offset_costs(costs, x[i], p[i]) for i in range(len(p))])
 
-        costs = (
-            costs.lazy()
-            .join(sinks.lazy(), on="to")
+        cost_bins = (
+            costs
             .join(utilities.lazy(), on=["motive", "to"], how="left")
             .with_columns(
-                utility=pl.col("utility").fill_null(0.0),
-                sink_available=pl.col("sink_available")*pl.col("prob")
+                utility=pl.col("utility").fill_null(0.0)
             )
-            .drop("prob")
             .with_columns(
                 cost_bin=(pl.col("cost") - pl.col("utility")).floor()
             )
+            .select(["from", "motive", "to", "cost_bin", "prob"])
         )
+        
+        return cost_bins
+    
+    
+    def aggregate_cost_bins(self, costs):
+        """
+        Aggregates the available sinks by origin, motive and net cost bin, and
+        computes the share of each destination in its bin.
+        
+        Args:
+            costs (pl.LazyFrame): "from", "motive", "to", "cost_bin" and 
+                "sink_available" (weighted by the cost offset probability) columns.
+        
+        Returns:
+            tuple: The sorted cost bins and the bins to destinations table.
+        """
 
         cost_bin_to_dest = (
             costs
@@ -1469,6 +1630,82 @@ class PopulationTrips(FileAsset):
         return costs_bin, cost_bin_to_dest
     
     
+    def truncate_destinations(self, costs, sinks, utilities, motives, dest_top_n, dest_cost_horizon):
+        """
+        Keeps, for each origin and motive, only the destinations within the 
+        cost horizon and among the top N by their probability in the radiation
+        model without cost uncertainty (the opportunities of the destination, 
+        weighted by the opportunities of the closer destinations in net 
+        utility). The most probable destination is always kept.
+        
+        The destinations are ranked within each origin and motive group, so 
+        only the kept destinations are collected (the full OD x motive table 
+        is never sorted as a whole).
+        
+        The probability mass of the dropped destinations is logged.
+
+        Args:
+            costs (pl.LazyFrame): "from", "to", "motive" and "cost" columns.
+            sinks (pl.DataFrame): Available opportunities by destination and motive.
+            utilities (pl.DataFrame): Utilities by destination and motive.
+            motives (list): Motives, for their radiation lambda.
+            dest_top_n (int): Maximum number of destinations by origin and motive (or None).
+            dest_cost_horizon (float): Maximum generalized cost to a destination (or None).
+
+        Returns:
+            pl.LazyFrame: The costs to the kept destinations.
+        """
+        
+        motives_lambda = {motive.name: motive.radiation_lambda for motive in motives}
+        
+        # Destinations of each origin and motive, by increasing net cost
+        cost = pl.col("cost").sort_by("net_cost")
+        s_ij = pl.col("sink_available").sort_by("net_cost").cum_sum()
+        selection_lambda = pl.col("selection_lambda").first()
+        
+        p_a = (1 - selection_lambda**(1+s_ij)) / (1+s_ij) / (1-selection_lambda)
+        p_ij = p_a.shift(fill_value=1.0) - p_a
+        p_ij = p_ij/p_ij.sum()
+        p_rank = p_ij.rank("ordinal", descending=True)
+        
+        keep = p_rank == 1
+        
+        if dest_top_n is not None and dest_cost_horizon is not None:
+            keep = keep | ((p_rank <= dest_top_n) & (cost <= dest_cost_horizon))
+        elif dest_top_n is not None:
+            keep = keep | (p_rank <= dest_top_n)
+        else:
+            keep = keep | (cost <= dest_cost_horizon)
+        
+        truncated = (
+            costs
+            .join(sinks.lazy().select(["to", "motive", "sink_available"]), on=["to", "motive"])
+            .join(utilities.lazy(), on=["motive", "to"], how="left")
+            .with_columns(
+                net_cost=pl.col("cost") - pl.col("utility").fill_null(0.0),
+                selection_lambda=pl.col("motive").cast(pl.String).replace_strict(motives_lambda)
+            )
+            .group_by(["from", "motive"])
+            .agg(
+                to=pl.col("to").sort_by("net_cost").filter(keep),
+                cost=cost.filter(keep),
+                p_dropped=p_ij.filter(~keep).sum()
+            )
+            .collect(engine="streaming")
+        )
+        
+        kept_costs = truncated.explode(["to", "cost"]).select(["from", "to", "motive", "cost"])
+        dropped = truncated.select("p_dropped")
+        
+        logging.info(
+            "Destinations truncation : kept " + str(kept_costs.height) + " OD x motive costs, " 
+            + "dropped probability mass of " + f"{dropped['p_dropped'].mean():.2%}" + " on average "
+            + "(max " + f"{dropped['p_dropped'].max():.2%}" + ")."
+        )
+        
+        return kept_costs.lazy()
+    
+    
 
     
     
@@ -7,6 +7,7 @@ import polars as pl
 from mobility.file_asset import FileAsset
 from mobility.parsers import JobsActivePopulationFlows
 from mobility.choice_models.destination_choice_model import DestinationChoiceModel
+from mobility.choice_models.choice_sampler import ChoiceSampler
 
 class TransportModeChoiceModel(FileAsset):
     
@@ -64,6 +65,32 @@ class TransportModeChoiceModel(FileAsset):
         return prob
     
     
+    def get_sampler(self) -> ChoiceSampler:
+        """
+        Gets the sampler of the modes by OD of the model, that draws modes 
+        with a searchsorted on precomputed cumulative probabilities instead 
+        of a join and a weighted shuffle.
+        
+        The sampler is built the first time and cached next to the model 
+        file (it is rebuilt when the model file is newer than the sampler).
+        
+        Returns:
+            ChoiceSampler: The modes sampler, keyed by the "from" and "to" columns.
+        """
+        
+        prob = self.get()
+        
+        path = self.cache_path.parent / (self.cache_path.stem + "_sampler.parquet")
+        
+        if path.exists() and path.stat().st_mtime >= self.cache_path.stat().st_mtime:
+            return ChoiceSampler.load(path)
+        
+        sampler = ChoiceSampler.build(prob, keys=["from", "to"], choice_col="mode", prob_col="prob")
+        sampler.save(path)
+        
+        return sampler
+    
+    
     def get_comparison_by_origin(self, flows):
     
         flows = flows.groupby(["local_admin_unit_id_from", "mode"], as_index=False)["flow_volume"].sum()
@@ -62,10 +62,17 @@ class TravelCostsAggregator(InMemoryAsset):
         
         for mode in modes:
             
+            # Generalized costs that can be computed directly in polars
+            # (PathGeneralizedCost) are not converted from pandas
+            if hasattr(mode.generalized_cost, "get_pl"):
+                get_generalized_cost = mode.generalized_cost.get_pl
+            else:
+                get_generalized_cost = mode.generalized_cost.get
+            
             if mode.congestion:
-                gc = pl.DataFrame(mode.generalized_cost.get(metrics, congestion, detail_distances=detail_distances))
+                gc = pl.DataFrame(get_generalized_cost(metrics, congestion, detail_distances=detail_distances))
             else:
-                gc = pl.DataFrame(mode.generalized_cost.get(metrics, detail_distances=detail_distances))
+                gc = pl.DataFrame(get_generalized_cost(metrics, detail_distances=detail_distances))
                 
             costs.append(
                 pl.DataFrame(gc)
@@ -102,6 +102,9 @@ class WorkDestinationChoiceModel(DestinationChoiceModel):
         Reference home-work flows to compare the model flows with. Should be provided if active_population is also provided
     ssi_min_flow_volume : float, optional
         Minimum reference volume to consider for similarity index. The default is 200 per INSEE recommendation.
+    radiation_engine : str, optional
+        Engine of the radiation model, "polars" (default, on the OD table in long format) or "numpy" 
+        (on origins x destinations matrices, faster for large territories).
     """
     
     def __init__(
@@ -113,7 +116,8 @@ class WorkDestinationChoiceModel(DestinationChoiceModel):
             jobs: pd.DataFrame = None,
             reference_flows: pd.DataFrame = None,
             ssi_min_flow_volume: float = 200.0,
-            n_possible_destinations: int = 1
+            n_possible_destinations: int = 1,
+            radiation_engine: str = "polars"
         ):
 
         
@@ -142,6 +146,13 @@ class WorkDestinationChoiceModel(DestinationChoiceModel):
             if "beta" not in parameters.model.keys():
                 raise ValueError("Beta parameter missing in model_parameters.")
         
+        # Both engines compute the same flows (within floating point 
+        # tolerance), so the engine is not part of the inputs hash
+        if radiation_engine not in ["polars", "numpy"]:
+            raise ValueError("Unknown radiation model engine : " + str(radiation_engine) + " (should be 'polars' or 'numpy').")
+        
+        self.radiation_engine = radiation_engine
+        
         super().__init__(
             "work",
             transport_zones,
@@ -379,7 +390,8 @@ class WorkDestinationChoiceModel(DestinationChoiceModel):
                     sinks,
                     costs_values,
                     utilities_values,
-                    selection_lambda=selection_lambda
+                    selection_lambda=selection_lambda,
+                    engine=self.radiation_engine
                 )
                 
                 if previous_od_flows is None:
@@ -470,7 +482,8 @@ class WorkDestinationChoiceModel(DestinationChoiceModel):
                 sinks,
                 costs_values,
                 utilities_values,
-                selection_lambda=selection_lambda
+                selection_lambda=selection_lambda,
+                engine=self.radiation_engine
             )
             
             od_flows = (
@@ -520,7 +533,8 @@ class WorkDestinationChoiceModel(DestinationChoiceModel):
                 sinks,
                 costs_values,
                 utilities_values,
-                selection_lambda=selection_lambda
+                selection_lambda=selection_lambda,
+                engine=self.radiation_engine
             )
             
             od_flows = (
@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from typing import List
 
 import numpy as np
+import polars as pl
 from numpy.typing import NDArray
 
 @dataclass
@@ -48,4 +49,38 @@ class CostOfTimeParameters():
         cost = np.where(country == "ch", cost*self.country_coeff_ch, cost)
         
         return cost
-                   
\ No newline at end of file
+    
+    
+    def compute_pl(self, distance: pl.Expr, country: pl.Expr) -> pl.Expr:
+        """
+        Polars expression equivalent of compute.
+        """
+        
+        cost = pl.lit(self.intercept)
+        
+        if len(self.slopes) > 0:
+            
+            base = self.intercept
+            
+            for i, slope in enumerate(self.slopes):
+                
+                left_break = self.breaks[i]
+                right_break = self.breaks[i+1]
+                
+                cost = (
+                    pl.when(distance > left_break)
+                    .then(base + slope*(distance - left_break))
+                    .otherwise(cost)
+                )
+                
+                base = base + slope*(right_break - left_break)
+                
+        cost = pl.when(cost > self.max_value).then(pl.lit(self.max_value)).otherwise(cost)
+        
+        cost = (
+            pl.when(country == "fr").then(cost*self.country_coeff_fr)
+            .when(country == "ch").then(cost*self.country_coeff_ch)
+            .otherwise(cost)
+        )
+        
+        return cost
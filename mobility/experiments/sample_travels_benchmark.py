@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from mobility.sample_travels import sample_travels
+
+# Compares the swap-move Metropolis-Hastings travels sampler (as called by
+# Trips.get_individual_trips, one chain per individual) with the exact sampler
+# (as called by the grouped engine, all individuals of a group at once) :
+#   - runtime for a group of individuals,
+#   - acceptance rate of the MCMC swap moves,
+#   - total variation distance between the inclusion frequencies of each
+#     travel and reference frequencies (from a large exact sample).
+
+def make_travels(n_travels, seed=0):
+    """
+    Synthetic travels table, with the shape of the travels merged with the
+    days of the year in Trips (one row per possible departure day).
+    """
+    rng = np.random.default_rng(seed)
+
+    travels = pd.DataFrame({
+        "travel_id": np.arange(n_travels),
+        "month": rng.integers(1, 13, n_travels),
+        "weekday": rng.integers(0, 7, n_travels),
+        "n_nights": rng.choice([0, 1, 2, 3, 5, 7, 14, np.nan], n_travels),
+        "pondki": rng.lognormal(0.0, 1.0, n_travels)
+    })
+
+    dates = pd.date_range(start="2025-01-01", end="2025-12-31", freq="D")
+    days = pd.DataFrame({"date": dates, "month": dates.month, "weekday": dates.weekday, "day_of_year": dates.dayofyear})
+
+    return pd.merge(travels, days, on=["month", "weekday"])
+
+
+def get_inclusion_frequencies(samples, n):
+    counts = np.zeros(n)
+    for sample in samples:
+        counts[sample] += 1
+    return counts / len(samples)
+
+
+def get_mcmc_acceptance_rate(travels, k, n_steps, seed=0):
+    """
+    Share of accepted swap moves, from a chain recorded at every step (each
+    accepted move changes the sample).
+    """
+    states = sample_travels(
+        travels, "day_of_year", "n_nights", "pondki", k=k,
+        burnin=0, thinning=1, num_samples=n_steps, random_seed=seed
+    )
+    changes = [set(a) != set(b) for a, b in zip(states[:-1], states[1:])]
+    return np.mean(changes)
+
+
+def run_benchmark(n_travels=200, k=5, n_individuals=200, n_reference_samples=200000):
+
+    travels = make_travels(n_travels)
+    n = travels.shape[0]
+
+    reference = get_inclusion_frequencies(
+        sample_travels(travels, "day_of_year", "n_nights", "pondki", k=k, num_samples=n_reference_samples, random_seed=1, method="exact"),
+        n
+    )
+
+    start = time.time()
+    mcmc_samples = [
+        sample_travels(travels, "day_of_year", "n_nights", "pondki", k=k, burnin=100, random_seed=i)[0]
+        for i in range(n_individuals)
+    ]
+    mcmc_duration = time.time() - start
+
+    start = time.time()
+    exact_samples = sample_travels(
+        travels, "day_of_year", "n_nights", "pondki", k=k,
+        num_samples=n_individuals, random_seed=2, method="exact"
+    )
+    exact_duration = time.time() - start
+
+    mcmc_tv = 0.5*np.abs(get_inclusion_frequencies(mcmc_samples, n) - reference).sum()/k
+    exact_tv = 0.5*np.abs(get_inclusion_frequencies(exact_samples, n) - reference).sum()/k
+
+    print(f"{n} candidate travels, k = {k}, {n_individuals} individuals")
+    print(f"  MCMC  : {mcmc_duration:.3f} s, acceptance rate {get_mcmc_acceptance_rate(travels, k, 5000):.3f}, inclusion TV distance {mcmc_tv:.3f}")
+    print(f"  exact : {exact_duration:.3f} s, inclusion TV distance {exact_tv:.3f}")
+
+
+if __name__ == "__main__":
+    for n_travels, k in [(50, 2), (200, 5), (1000, 10)]:
+        run_benchmark(n_travels, k)
@@ -1,8 +1,11 @@
 import pathlib
 import os
-import networkx as nx
+import logging
 
 from mobility.asset import Asset
+from mobility.asset_scheduler import AssetScheduler
+from mobility.shared_asset_store import get_shared_asset_store, unlink_hard_links
+from mobility.asset_memory_cache import get_asset_memory_cache
 from typing import Any
 from abc import abstractmethod
 
@@ -16,17 +19,26 @@ class FileAsset(Asset):
         cache_path (pathlib.Path): The file path for storing the Asset.
         hash_path (pathlib.Path): The file path for storing the hash of the inputs.
         inputs_hash (str): The hash of the inputs.
+        is_shareable (bool): Whether the output files can be shared with
+            other projects through the shared asset store (False for assets
+            that rewrite their output files in place, because the shared
+            files are hard links).
 
     Methods:
         get_cached_asset: Abstract method to retrieve a cached Asset.
         create_and_get_asset: Abstract method to create and retrieve an Asset.
         get: Retrieves the cached Asset or creates a new one if needed.
+        get_cached_asset_from_memory: Retrieves the cached Asset, reading the files only once.
+        detach_outputs: Removes the output files shared with the shared asset store before a rebuild.
         compute_inputs_hash: Computes a hash based on the inputs.
         is_update_needed: Checks if an update is needed based on the input hash.
+        get_update_plan: Lists the assets to rebuild, upstream assets first.
         get_cached_hash: Retrieves the cached hash from the file system.
         update_hash: Updates the cached hash with a new hash value.
     """
     
+    is_shareable = True
+    
     def __init__(self, inputs: dict, cache_path: pathlib.Path | dict[str, pathlib.Path]):
         """
         Initializes the Asset instance with given inputs and cache path.
@@ -36,7 +48,7 @@ class FileAsset(Asset):
             cache_path (pathlib.Path): The path where the Asset is cached.
         """
         
-        super().__init__(inputs, cache_path)
+        super().__init__(inputs)
         
         if isinstance(cache_path, dict):
             
@@ -83,68 +95,174 @@ class FileAsset(Asset):
         Retrieves the Asset, either from the cache or by creating a new one if the
         cache is outdated or non-existent.
 
+        Upstream assets that are outdated are rebuilt first, following the
+        plan returned by get_update_plan (independent upstream assets can be
+        rebuilt concurrently, see AssetScheduler). The scheduler is kept in
+        the last_update_schedule attribute, to get the build timings.
+
         Returns:
             The retrieved or newly created Asset.
         """
-        if self.is_update_needed():
+        update_plan = self.get_update_plan()
+        upstream_plan = [asset for asset in update_plan if asset is not self]
+        
+        self.last_update_schedule = AssetScheduler()
+        
+        if len(upstream_plan) > 0:
+            self.last_update_schedule.run(upstream_plan)
+            logging.info(self.last_update_schedule.get_report())
+        
+        if len(update_plan) > 0 and update_plan[-1] is self:
+            self.detach_outputs()
             asset = self.create_and_get_asset(*args, **kwargs)
             self.update_hash(self.inputs_hash)
+            self.share_outputs()
             return asset
-        return self.get_cached_asset(*args, **kwargs)
+        
+        return self.get_cached_asset_from_memory(*args, **kwargs)
+    
+    
+    def get_cached_asset_from_memory(self, *args, **kwargs) -> Any:
+        """
+        Retrieves the cached Asset from the process wide memory cache if it
+        was already read, or with get_cached_asset otherwise.
+
+        Returns:
+            The cached Asset.
+        """
+        
+        cache = get_asset_memory_cache()
+        
+        if cache.max_size == 0:
+            return self.get_cached_asset(*args, **kwargs)
+        
+        if isinstance(self.cache_path, dict):
+            cache_paths = list(self.cache_path.values())
+        else:
+            cache_paths = [self.cache_path]
+        
+        try:
+            mtimes = tuple(os.stat(cp).st_mtime_ns for cp in cache_paths)
+        except OSError:
+            return self.get_cached_asset(*args, **kwargs)
+        
+        key = (str(self.hash_path), self.inputs_hash, mtimes, repr(args), repr(sorted(kwargs.items())))
+        
+        asset = cache.get(key)
+        
+        if asset is None:
+            asset = self.get_cached_asset(*args, **kwargs)
+            cache.put(key, asset)
+        
+        return asset
         
 
     def is_update_needed(self) -> bool:
         """
-        Checks if an update to the Asset is needed based on the current inputs hash,
-        or the non existence of the output file.
+        Checks if an update to the Asset is needed, because its inputs hash
+        changed, its output file does not exist, or one of its upstream
+        assets needs an update.
 
         Returns:
             True if an update is needed, False otherwise.
         """
+        update_plan = self.get_update_plan()
+        return len(update_plan) > 0 and update_plan[-1] is self
+    
+    
+    def is_outdated(self) -> bool:
+        """
+        Checks if the cached Asset is outdated, without looking at upstream
+        assets : the cached hash differs from the current inputs hash, or an
+        output file does not exist (and cannot be materialized from the
+        shared asset store, if the project uses one).
+
+        Returns:
+            True if the cached Asset is outdated, False otherwise.
+        """
         
-        same_hashes = self.get_cached_hash() == self.inputs_hash
+        if self.get_cached_hash() != self.inputs_hash:
+            return True
         
         if isinstance(self.cache_path, dict):
-            file_exists = all([cp.exists() for cp in self.cache_path.values()])
+            files_exist = all([cp.exists() for cp in self.cache_path.values()])
         else:
-            file_exists = self.cache_path.exists()
+            files_exist = self.cache_path.exists()
             
-        # Build a graph of input assets
-        graph = nx.DiGraph()
-        
-        def add_upstream_deps(asset):
-            graph.add_node(asset)
-            for inp in asset.inputs.values():
-                if isinstance(inp, FileAsset):
-                    graph.add_node(inp)
-                    graph.add_edge(inp, asset)
-                    add_upstream_deps(inp)
+        if files_exist:
+            return False
         
-        for inp in self.inputs.values():
-            if isinstance(inp, FileAsset):
-                add_upstream_deps(inp)
+        store = get_shared_asset_store()
         
-        # Find out which ones need to be updated and recompute them, as well
-        # as all their descendants
-        update_needed_assets = set()
-
-        for asset in graph.nodes:
-            if asset.is_update_needed():
-                update_needed_assets.add(asset)
-                for descendant in nx.descendants(graph, asset):
-                    update_needed_assets.add(descendant)
+        return store is None or not store.materialize(self)
+    
+    
+    def detach_outputs(self) -> None:
+        """
+        Removes the output files that are hard links (materialized from or
+        published to the shared asset store), so that create_and_get_asset
+        writes new files instead of rewriting the store entry and the files
+        of the other projects through the links.
+        """
+        if isinstance(self.cache_path, dict):
+            cache_paths = list(self.cache_path.values())
+        else:
+            cache_paths = [self.cache_path]
+        for cp in cache_paths:
+            unlink_hard_links(cp)
+    
+    
+    def share_outputs(self) -> None:
+        """
+        Adds the output files of the Asset to the shared asset store, if the
+        project uses one (see set_params).
+        """
+        store = get_shared_asset_store()
+        if store is not None:
+            store.publish(self)
     
-        topo_order = list(nx.topological_sort(graph))
+    
+    def get_update_plan(self) -> list["FileAsset"]:
+        """
+        Resolves which assets have to be rebuilt before the Asset can be
+        retrieved, in a single pass over the graph of upstream FileAsset inputs.
+
+        The staleness of each asset is checked once (reading its hash file
+        and checking its output files once), even if it is an input of several
+        assets of the graph. Assets with the same hash path are the same
+        cached asset, so they are only rebuilt once.
+
+        Returns:
+            The assets to rebuild, upstream assets first (topological order).
+            The Asset itself is the last element if it has to be rebuilt.
+        """
         
-        assets = [asset for asset in topo_order if asset in update_needed_assets]
+        update_needed = {}
+        update_plan = []
         
-        for asset in assets:
-            asset.get()
+        def resolve(asset):
+            
+            if asset.hash_path in update_needed:
+                return update_needed[asset.hash_path]
             
-        upstream_updates = len(assets) > 0
+            upstream_updates = False
+            
+            for inp in asset.inputs.values():
+                if isinstance(inp, FileAsset) and resolve(inp):
+                    upstream_updates = True
+            
+            is_needed = upstream_updates or asset.is_outdated()
+            update_needed[asset.hash_path] = is_needed
+            
+            if is_needed:
+                update_plan.append(asset)
+                
+            return is_needed
         
-        return same_hashes is False or file_exists is False or upstream_updates is True
+        resolve(self)
         
+        return update_plan
+    
     def get_cached_hash(self) -> str:
         """
         Retrieves the cached hash of the Asset's inputs from the file system.
@@ -0,0 +1,106 @@
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+
+def hash_json(value) -> str:
+    """
+    MD5 hash of the JSON serialization of a value (with sorted keys),
+    computed while the value is serialized, without building the full JSON
+    string. Gives the same hash as hashing json.dumps(value, sort_keys=True).
+    """
+
+    h = hashlib.md5()
+
+    for chunk in json.JSONEncoder(sort_keys=True).iterencode(value):
+        h.update(chunk.encode("utf-8"))
+
+    return h.hexdigest()
+
+
+def get_data_hash(value) -> str | None:
+    """
+    Hash a data table or array from its memory buffers, instead of
+    serializing it value by value.
+
+    Returns:
+        A string identifying the type and content of the value, or None if
+        the value is not a DataFrame, Series, Arrow table or numpy array.
+    """
+
+    for data_type, hasher in DATA_HASHERS:
+        if isinstance(value, data_type):
+            h = hashlib.md5()
+            hasher(value, h)
+            return data_type.__module__.split(".")[0] + "." + data_type.__name__ + ":" + h.hexdigest()
+
+    return None
+
+
+def hash_numpy_array(array: np.ndarray, h) -> None:
+    h.update((str(array.dtype) + str(array.shape)).encode("utf-8"))
+    if array.dtype == object:
+        h.update(json.dumps(array.tolist()).encode("utf-8"))
+    else:
+        h.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+
+
+def hash_arrow_table(table: pa.Table, h) -> None:
+    """
+    Hash an Arrow table through its IPC serialization, written in a single
+    record batch so that the hash does not depend on the chunking of the table.
+    """
+    sink = pa.PythonFile(HashWriter(h), mode="w")
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table.combine_chunks())
+
+
+def hash_polars_frame(df: pl.DataFrame, h) -> None:
+    hash_arrow_table(df.to_arrow(), h)
+
+
+def hash_polars_series(series: pl.Series, h) -> None:
+    hash_arrow_table(series.to_frame().to_arrow(), h)
+
+
+def hash_pandas_frame(df: pd.DataFrame, h) -> None:
+    h.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    h.update(json.dumps([str(d) for d in df.dtypes]).encode("utf-8"))
+    h.update(memoryview(pd.util.hash_pandas_object(df, index=True).to_numpy()).cast("B"))
+
+
+def hash_pandas_series(series: pd.Series, h) -> None:
+    h.update((str(series.name) + str(series.dtype)).encode("utf-8"))
+    h.update(memoryview(pd.util.hash_pandas_object(series, index=True).to_numpy()).cast("B"))
+
+
+class HashWriter:
+    """
+    Minimal writable file object that feeds the bytes it receives to a hash.
+    """
+
+    closed = False
+
+    def __init__(self, h):
+        self.h = h
+
+    def write(self, data):
+        self.h.update(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+DATA_HASHERS = [
+    (np.ndarray, hash_numpy_array),
+    (pa.Table, hash_arrow_table),
+    (pl.DataFrame, hash_polars_frame),
+    (pl.Series, hash_polars_series),
+    (pd.DataFrame, hash_pandas_frame),
+    (pd.Series, hash_pandas_series)
+]
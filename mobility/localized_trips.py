@@ -1,7 +1,9 @@
 import os
 import pathlib
 import logging
+import shutil
 import pandas as pd
+import polars as pl
 import numpy as np
 import random
 
@@ -29,6 +31,27 @@ class LocalizedTrips(FileAsset):
     trips : FileAsset
         File containing the base trips to localize (must include individual_id, 
         trip_id, motive, previous_motive).
+    keep_survey_cols : bool, optional
+        Keep the survey modes and distances in survey_mode_id and distance_survey 
+        columns.
+    streaming : bool, optional
+        Localize the trips by chunks of individuals (the chunks of the trips 
+        asset if it is in streaming mode, chunks of chunk_size individuals 
+        otherwise), writing each chunk to its own parquet file, and return a 
+        polars LazyFrame scanning these files.
+    chunk_size : int, optional
+        Number of individuals of each chunk, when the trips asset is not in 
+        streaming mode.
+    engine : str, optional
+        "pandas" to sample the origins, destinations and modes with weighted 
+        shuffles of the individuals x destinations table (default), or 
+        "polars" to sample them with exponential races on integer coded 
+        zones, motives and models, by blocks of individuals.
+    seed : int, optional
+        Random seed of the "polars" engine.
+    max_race_rows : int, optional
+        Maximum number of (individual, destination) rows of each block of 
+        individuals of the "polars" engine.
 
     Returns
     -------
@@ -42,9 +65,17 @@ class LocalizedTrips(FileAsset):
             dest_cm_list: List[TransportModeChoiceModel], 
             mode_cm_list: List[DestinationChoiceModel], 
             trips: FileAsset,
-            keep_survey_cols: bool = False
+            keep_survey_cols: bool = False,
+            streaming: bool = False,
+            chunk_size: int = 100000,
+            engine: str = "pandas",
+            seed: int = None,
+            max_race_rows: int = 10000000
         ):
         
+        if engine not in ["pandas", "polars"]:
+            raise ValueError("Unknown trips localization engine : " + str(engine) + " (should be 'pandas' or 'polars').")
+        
         inputs = {
             "dest_cm_list": dest_cm_list,
             "mode_cm_list": mode_cm_list,
@@ -52,22 +83,40 @@ class LocalizedTrips(FileAsset):
             "keep_survey_cols": keep_survey_cols
         }
         
+        # The streaming and sampling options are only hashed when they are not
+        # the default ones, so that the trips localized before they existed 
+        # stay valid
+        options = {"streaming": streaming, "chunk_size": chunk_size, "engine": engine, "seed": seed}
+        defaults = {"streaming": False, "chunk_size": 100000, "engine": "pandas", "seed": None}
+        inputs.update({k: v for k, v in options.items() if v != defaults[k]})
+        
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.engine = engine
+        self.seed = seed
+        self.max_race_rows = max_race_rows
+        
         file_name = "trips_localized.parquet"
         cache_path = pathlib.Path(os.environ["MOBILITY_PROJECT_DATA_FOLDER"]) / file_name
         
         super().__init__(inputs, cache_path)
         
 
-    def get_cached_asset(self) -> pd.DataFrame:
+    def get_cached_asset(self) -> pd.DataFrame | pl.LazyFrame:
         """
         Load cached localized trips.
 
         Returns
         -------
-        pd.DataFrame
-            Cached localized trips.
+        pd.DataFrame or pl.LazyFrame
+            Cached localized trips (a LazyFrame scanning the chunk files in 
+            streaming mode).
         """
         logging.info(f"Trips already localized. Reusing the file: {self.cache_path}")
+        
+        if self.streaming is True:
+            return pl.scan_parquet(self.cache_path / "*.parquet")
+        
         return pd.read_parquet(self.cache_path)
 
     def create_and_get_asset(self) -> pd.DataFrame:
@@ -83,14 +132,51 @@ class LocalizedTrips(FileAsset):
         logging.info("Localizing each trip...")
         
         trips = self.inputs["trips"].get()
-        population = self.inputs["trips"].inputs["population"].get()
+        population = pd.read_parquet(self.inputs["trips"].inputs["population"].get()["individuals"])
         dest_cm_list = self.inputs["dest_cm_list"]
         mode_cm_list = self.inputs["mode_cm_list"]
         keep_survey_cols = self.inputs["keep_survey_cols"]
+        
+        if self.streaming is True:
+            
+            if self.cache_path.exists():
+                shutil.rmtree(self.cache_path)
+            self.cache_path.mkdir(parents=True)
+            
+            for i, chunk in enumerate(self.get_trips_chunks(trips)):
+                logging.info("Localizing the trips of the chunk " + str(i + 1) + "...")
+                chunk_population = population[population["individual_id"].isin(chunk["individual_id"].unique())]
+                chunk = self.localize_trips(chunk, chunk_population, dest_cm_list, mode_cm_list, keep_survey_cols, chunk_index=i)
+                chunk.to_parquet(self.cache_path / f"part-{i:05d}.parquet")
+                
+            return pl.scan_parquet(self.cache_path / "*.parquet")
 
         trips = self.localize_trips(trips, population, dest_cm_list, mode_cm_list, keep_survey_cols)
         trips.to_parquet(self.cache_path)
         return trips
+    
+    def get_trips_chunks(self, trips: pd.DataFrame | pl.LazyFrame):
+        """
+        Iterate over chunks of trips that each contain all the trips of their
+        individuals : the chunk files of the trips asset if it is in streaming 
+        mode, or the trips of chunk_size individuals otherwise.
+
+        Yields
+        ------
+        pd.DataFrame
+            Trips of a chunk of individuals.
+        """
+        
+        if isinstance(trips, pl.LazyFrame):
+            for path in sorted(self.inputs["trips"].cache_path.glob("*.parquet")):
+                yield pd.read_parquet(path)
+            return
+        
+        individual_ids = trips["individual_id"].unique()
+        chunk_size = self.chunk_size
+        
+        for start in range(0, individual_ids.shape[0], chunk_size):
+            yield trips[trips["individual_id"].isin(individual_ids[start:start + chunk_size])]
 
     def localize_trips(
             self, 
@@ -98,7 +184,8 @@ class LocalizedTrips(FileAsset):
             population: pd.DataFrame,
             dest_cm_list: List[DestinationChoiceModel], 
             mode_cm_list: List[TransportModeChoiceModel],
-            keep_survey_cols: bool
+            keep_survey_cols: bool,
+            chunk_index: int = None
         ) -> pd.DataFrame:
         """
         Apply all localization steps:
@@ -116,6 +203,8 @@ class LocalizedTrips(FileAsset):
             List of destination choice models.
         mode_cm_list : list of TransportModeChoiceModel
             List of transport mode choice models.
+        chunk_index : int, optional
+            Index of the chunk of trips, in streaming mode.
 
         Returns
         -------
@@ -123,11 +212,379 @@ class LocalizedTrips(FileAsset):
             Fully localized trips.
         """
 
+        if self.engine == "polars":
+            return self.localize_trips_polars(trips, population, dest_cm_list, mode_cm_list, keep_survey_cols, chunk_index)
+
         trips = self.sample_origins_destinations(trips, population, dest_cm_list)
         trips = self.sample_modes(trips, mode_cm_list, dest_cm_list, keep_survey_cols)
         trips = self.compute_new_distances(trips, dest_cm_list, keep_survey_cols)
         
         return trips
+    
+    def localize_trips_polars(
+            self, 
+            trips: pd.DataFrame, 
+            population: pd.DataFrame,
+            dest_cm_list: List[DestinationChoiceModel], 
+            mode_cm_list: List[TransportModeChoiceModel],
+            keep_survey_cols: bool,
+            chunk_index: int = None
+        ) -> pd.DataFrame:
+        """
+        Apply the localization steps with the "polars" engine, which gives the
+        same columns as the "pandas" engine.
+        
+        The draws are derived from the hash of row codes (individuals, trips 
+        and zones are numbered within the trips to localize), so each chunk 
+        of trips gets its own seed, spawned from the seed of the asset : with
+        the same seed, the n-th individual or trip of each chunk would get
+        the same draws.
+
+        Returns
+        -------
+        pd.DataFrame
+            Fully localized trips.
+        """
+        
+        seed = self.seed if self.seed is not None else random.getrandbits(32)
+        seed_sequence = np.random.SeedSequence(seed)
+        
+        if chunk_index is not None:
+            seed_sequence = np.random.SeedSequence(seed, spawn_key=(chunk_index, ))
+        
+        potential_dests_seed, origins_seed, destinations_seed, modes_seed = [
+            int(s) for s in seed_sequence.generate_state(4, np.uint64)
+        ]
+        
+        trips = pl.from_pandas(trips)
+        population = pl.from_pandas(population[["individual_id", "transport_zone_id"]])
+        
+        trips = self.sample_origins_destinations_polars(
+            trips,
+            population,
+            dest_cm_list,
+            potential_dests_seed,
+            origins_seed,
+            destinations_seed
+        )
+        trips = self.sample_modes_polars(trips, mode_cm_list, dest_cm_list, keep_survey_cols, modes_seed)
+        trips = self.compute_new_distances_polars(trips, dest_cm_list, keep_survey_cols)
+        
+        return trips.to_pandas()
+    
+    def sample_origins_destinations_polars(
+            self, 
+            trips: pl.DataFrame, 
+            population: pl.DataFrame,
+            dest_cm_list: List[DestinationChoiceModel],
+            potential_dests_seed: int,
+            origins_seed: int,
+            destinations_seed: int
+            ) -> pl.DataFrame:
+        """
+        Assign origin and destination zones to each trip, with the same 
+        sampling process as sample_origins_destinations :
+        - n_possible_destinations potential destinations are drawn without
+          replacement for each individual and model, from the home of the 
+          individual,
+        - the origin and the destination of each trip are drawn among the
+          potential destinations of the models of its previous motive and 
+          its motive.
+        
+        Each draw is an exponential race : every candidate gets the score 
+        -log(U)/p, and the candidates with the lowest scores win (which 
+        gives a weighted sampling without replacement). The potential 
+        destinations are drawn by blocks of individuals of at most 
+        max_race_rows (individual, destination) rows, so the full individuals
+        x destinations table is never built.
+        
+        Zones, individuals and models are replaced by integer codes during
+        the sampling (model 0 being the home).
+
+        Returns
+        -------
+        pl.DataFrame
+            Trips with added 'from_transport_zone_id' and 'to_transport_zone_id'.
+        """
+        logging.info("Assigning origins and destinations to transport zones...")
+        
+        motive_id_to_model_code = {"1.1": 0}
+        
+        for i, dest_cm in enumerate(dest_cm_list):
+            for motive_id in dest_cm.inputs["parameters"].motive_ids:
+                motive_id_to_model_code[motive_id] = i + 1
+        
+        dest_probs = pl.concat([
+            ( 
+                pl.from_pandas(dest_cm.get()[["from", "to", "prob"]])
+                .with_columns(
+                    model_code=pl.lit(i + 1, pl.UInt16),
+                    n_possible_destinations=pl.lit(dest_cm.n_possible_destinations, pl.UInt32)
+                )
+            )
+            for i, dest_cm in enumerate(dest_cm_list)
+        ], how="vertical_relaxed")
+        
+        # Integer codes of the transport zones
+        zone_ids = pl.concat(
+            [
+                population.select(pl.col("transport_zone_id")),
+                dest_probs.select(pl.col("from").alias("transport_zone_id")),
+                dest_probs.select(pl.col("to").alias("transport_zone_id"))
+            ],
+            how="vertical_relaxed"
+        )
+        zone_dtype = zone_ids.schema["transport_zone_id"]
+        
+        zones = ( 
+            zone_ids
+            .unique()
+            .sort("transport_zone_id")
+            .with_row_index("zone_code")
+        )
+        
+        dest_probs = ( 
+            dest_probs
+            .with_columns(pl.col("from").cast(zone_dtype), pl.col("to").cast(zone_dtype))
+            .join(zones.rename({"transport_zone_id": "from", "zone_code": "from_code"}), on="from")
+            .join(zones.rename({"transport_zone_id": "to", "zone_code": "to_code"}), on="to")
+            .filter(pl.col("prob") > 0.0)
+            .select(["model_code", "from_code", "to_code", "prob", "n_possible_destinations"])
+        )
+        
+        individuals = ( 
+            population
+            .with_columns(pl.col("transport_zone_id").cast(zone_dtype))
+            .with_row_index("individual_code")
+            .join(zones, on="transport_zone_id")
+            .select(["individual_id", "individual_code", pl.col("zone_code").alias("home_code")])
+        )
+        
+        potential_dests = self.sample_potential_destinations(individuals, dest_probs, potential_dests_seed)
+        
+        # Map motives to models in the trips dataframe
+        loc_trips = ( 
+            trips
+            .with_row_index("trip_index")
+            .select(["trip_index", "individual_id", "previous_motive", "motive"])
+            .join(individuals.select(["individual_id", "individual_code"]), on="individual_id")
+            .with_columns(
+                from_model_code=pl.col("previous_motive").replace_strict(motive_id_to_model_code, default=None, return_dtype=pl.UInt16),
+                to_model_code=pl.col("motive").replace_strict(motive_id_to_model_code, default=None, return_dtype=pl.UInt16)
+            )
+            .drop_nulls(["from_model_code", "to_model_code"])
+            .select(["trip_index", "individual_code", "from_model_code", "to_model_code"])
+        )
+        
+        # Sample origins, then destinations, among the potential destinations
+        # of the models of each trip
+        origins = race_among_potential_destinations(loc_trips, potential_dests, "from_model_code", origins_seed)
+        destinations = race_among_potential_destinations(loc_trips, potential_dests, "to_model_code", destinations_seed)
+        
+        loc_trips = ( 
+            origins.rename({"to_code": "from_code"})
+            .join(destinations, on="trip_index")
+            .join(zones.rename({"transport_zone_id": "from_transport_zone_id", "zone_code": "from_code"}), on="from_code")
+            .join(zones.rename({"transport_zone_id": "to_transport_zone_id", "zone_code": "to_code"}), on="to_code")
+            .select(["trip_index", "from_transport_zone_id", "to_transport_zone_id"])
+        )
+        
+        trips = (
+            trips
+            .with_row_index("trip_index")
+            .join(loc_trips, on="trip_index", how="left", maintain_order="left")
+            .drop("trip_index")
+        )
+        
+        return trips
+    
+    def sample_potential_destinations(
+            self,
+            individuals: pl.DataFrame,
+            dest_probs: pl.DataFrame,
+            seed: int
+        ) -> pl.DataFrame:
+        """
+        Draw n_possible_destinations destinations without replacement for each
+        individual and model, from the home of the individual, by blocks of
+        individuals of at most max_race_rows candidate rows. The home of each
+        individual is its only potential destination of the home model (0).
+
+        Returns
+        -------
+        pl.DataFrame
+            Potential destinations, with individual_code, model_code, to_code 
+            and prob columns.
+        """
+        
+        # Number of candidate rows of each individual, to split them in blocks
+        n_rows_by_origin = dest_probs.group_by("from_code").agg(pl.len().alias("n_rows"))
+        
+        individuals = ( 
+            individuals
+            .join(n_rows_by_origin, left_on="home_code", right_on="from_code", how="left")
+            .with_columns(pl.col("n_rows").fill_null(0))
+            .with_columns(
+                block=(pl.col("n_rows").cum_sum() // max(self.max_race_rows, 1))
+            )
+        )
+        
+        potential_dests = [
+            individuals.select([
+                "individual_code",
+                pl.lit(0, pl.UInt16).alias("model_code"),
+                pl.col("home_code").alias("to_code"),
+                pl.lit(1.0).alias("prob")
+            ])
+        ]
+        
+        for _, block in individuals.group_by("block"):
+            
+            block_dests = ( 
+                block
+                .select(["individual_code", "home_code"])
+                .join(dest_probs, left_on="home_code", right_on="from_code")
+                .with_columns(
+                    sample_score=get_race_noise(["individual_code", "model_code", "to_code"], seed)/pl.col("prob")
+                )
+                .filter(
+                    pl.col("sample_score").rank("ordinal").over(["individual_code", "model_code"])
+                    <= pl.col("n_possible_destinations")
+                )
+                .select(["individual_code", "model_code", "to_code", "prob"])
+            )
+            
+            potential_dests.append(block_dests)
+            
+        return pl.concat(potential_dests)
+    
+    def sample_modes_polars(
+            self,
+            trips: pl.DataFrame,
+            mode_cm_list: List[TransportModeChoiceModel],
+            dest_cm_list: List[DestinationChoiceModel],
+            keep_survey_cols: bool,
+            seed: int
+        ) -> pl.DataFrame:
+        """
+        Assign transport modes to trips with an exponential race among the 
+        modes of each (individual, motive, origin, destination), with the 
+        same models and survey mode fallback as sample_modes.
+
+        Returns
+        -------
+        pl.DataFrame
+            Trips with the column 'mode_id' replaced by the selected mode.
+        """
+        logging.info("Assigning transport modes for localized trips...")
+        
+        motive_id_to_model_code = {"1.1": 0}
+        
+        for i, (mode_cm, dest_cm) in enumerate(zip(mode_cm_list, dest_cm_list)):
+            for motive_id in dest_cm.inputs["parameters"].motive_ids:
+                motive_id_to_model_code[motive_id] = i
+        
+        od_cols = ["individual_id", "motive", "from_transport_zone_id", "to_transport_zone_id"]
+        zone_dtype = trips.schema["from_transport_zone_id"]
+        
+        mode_probs = pl.concat([
+            ( 
+                pl.from_pandas(mode_cm.get()[["from", "to", "mode", "prob"]])
+                .with_columns(model_code=pl.lit(i, pl.UInt16))
+            )
+            for i, mode_cm in enumerate(mode_cm_list)
+        ], how="vertical_relaxed")
+        
+        mode_probs = mode_probs.select([
+            "model_code",
+            pl.col("from").cast(zone_dtype).alias("from_transport_zone_id"),
+            pl.col("to").cast(zone_dtype).alias("to_transport_zone_id"),
+            "mode",
+            "prob"
+        ])
+        
+        ods = ( 
+            trips
+            .select(od_cols)
+            .unique()
+            .drop_nulls()
+            .with_columns(
+                model_code=pl.col("motive").replace_strict(motive_id_to_model_code, default=None, return_dtype=pl.UInt16)
+            )
+            .join(mode_probs, on=["model_code", "from_transport_zone_id", "to_transport_zone_id"])
+            .with_columns(
+                sample_score=get_race_noise(od_cols + ["mode"], seed)/pl.col("prob")
+            )
+            .filter(pl.col("sample_score") == pl.col("sample_score").min().over(od_cols))
+            .unique(od_cols)
+            .select(od_cols + ["mode"])
+        )
+        
+        trips = ( 
+            trips
+            .join(ods, on=od_cols, how="left", maintain_order="left")
+            .with_columns(pl.coalesce(["mode", "mode_id"]).alias("mode"))
+        )
+        
+        if keep_survey_cols is True:
+            trips = trips.with_columns(pl.col("mode_id").alias("survey_mode_id"))
+            
+        trips = trips.drop("mode_id").rename({"mode": "mode_id"})
+        
+        return trips
+    
+    def compute_new_distances_polars(
+            self,
+            trips: pl.DataFrame,
+            dest_cm_list: List[DestinationChoiceModel],
+            keep_survey_cols: bool
+        ) -> pl.DataFrame:
+        """
+        Replace travel distances with the OD distances of the modes, as 
+        compute_new_distances does.
+
+        Returns
+        -------
+        pl.DataFrame
+            Trips with the column 'distance' updated where new values are available.
+        """
+        logging.info("Replacing distances for localized trips...")
+        
+        zone_dtype = trips.schema["from_transport_zone_id"]
+        
+        mode_dists = ( 
+            pl.DataFrame(
+                dest_cm_list[0].inputs["costs"]
+                .get(
+                    metrics=["distance"],
+                    congestion=True,
+                    aggregate_by_od=False,
+                    detail_distances=True
+                )
+            )
+            .rename({"from": "from_transport_zone_id", "to": "to_transport_zone_id", "mode": "mode_id"})
+            .with_columns(
+                pl.col("from_transport_zone_id").cast(zone_dtype),
+                pl.col("to_transport_zone_id").cast(zone_dtype)
+            )
+        )
+        
+        trips = ( 
+            trips
+            .rename({"distance": "distance_survey"})
+            .join(
+                mode_dists,
+                on=["from_transport_zone_id", "to_transport_zone_id", "mode_id"],
+                how="left",
+                maintain_order="left"
+            )
+            .with_columns(pl.coalesce(["distance", "distance_survey"]).alias("distance"))
+        )
+        
+        if keep_survey_cols is False:
+            trips = trips.drop("distance_survey")
+    
+        return trips
 
     def sample_origins_destinations(
             self, 
@@ -256,26 +713,13 @@ class LocalizedTrips(FileAsset):
         """
         logging.info("Assigning transport modes for localized trips...")
         
-        # Assign motive ids to models and assemble a dataframe with mode 
-        # probabilities for all models
+        # Assign motive ids to models
         motive_id_to_model_id = {"1.1": mode_cm_list[0].inputs_hash}
         
         for mode_cm, dest_cm in zip(mode_cm_list, dest_cm_list):
             for motive_id in dest_cm.inputs["parameters"].motive_ids:
                 motive_id_to_model_id[motive_id] = mode_cm.inputs_hash
         
-        mode_probs = [
-            ( 
-                mode_cm
-                .get()
-                .assign(model_id=mode_cm.inputs_hash)
-                .rename({"from": "from_transport_zone_id", "to": "to_transport_zone_id"}, axis=1)
-            )
-            for mode_cm in mode_cm_list
-        ]
-        
-        mode_probs = pd.concat(mode_probs)
-        
         # Find the unique OD pairs that each individual travels
         ods = ( 
             trips
@@ -285,34 +729,32 @@ class LocalizedTrips(FileAsset):
             .dropna()
         )
         
-        # Map them to the available models and mode probabilities
+        # Map them to the available models
         ods["model_id"] = ods["motive"].map(motive_id_to_model_id)
+        ods["mode"] = None
         
-        # !!! BUG :
-        # A small number of ODs (like 5 out of 100 000) have no mode_probs,
-        # which makes the next sampling step crash.
-        # This should not happen because ODs are sampled based on destination 
-        # probabilities, which are based on mode costs (so there should be at
-        # least one mode available).
-        ods = pd.merge(
-            ods,
-            mode_probs,
-            on=["model_id", "from_transport_zone_id", "to_transport_zone_id"]
-        )
+        # Sample one mode for each OD pair with the sampler of its model
+        seeds = np.random.SeedSequence(42).spawn(len(mode_cm_list))
         
-        # Sample one mode for each OD pair
-        ods = (
-            ods
-            .sample(frac=1.0, weights="prob", random_state=42)
-            .groupby(
-                [
-                    "individual_id", "motive",
-                    "from_transport_zone_id", "to_transport_zone_id"
-                ],
-                as_index=False
-            )
-            .first()
-        )
+        for mode_cm, seed in zip(mode_cm_list, seeds):
+            
+            sampler = mode_cm.get_sampler()
+            
+            model_ods = ods.loc[ods["model_id"] == mode_cm.inputs_hash, ["from_transport_zone_id", "to_transport_zone_id"]]
+            model_ods.columns = ["from", "to"]
+            
+            # !!! BUG :
+            # A small number of ODs (like 5 out of 100 000) have no mode_probs,
+            # so they cannot be sampled.
+            # This should not happen because ODs are sampled based on destination 
+            # probabilities, which are based on mode costs (so there should be at
+            # least one mode available).
+            has_probs = sampler.groups.get_indexer(pd.MultiIndex.from_frame(model_ods)) != -1
+            model_ods = model_ods[has_probs]
+            
+            ods.loc[model_ods.index, "mode"] = sampler.sample(model_ods, n=1, seed=seed)[:, 0]
+        
+        ods = ods[ods["mode"].notnull()]
         
         # Assign the modes to each of the OD pairs that could be sampled,
         # and use the survey modes otherwise
@@ -331,7 +773,7 @@ class LocalizedTrips(FileAsset):
             trips["mode"]
         )
         
-        trips.drop(["model_id", "prob"], axis=1, inplace=True)
+        trips.drop("model_id", axis=1, inplace=True)
         
         # If the user wants to keep the original mode (the one from the survey),
         # create a new survey_mode_id column, otherwise replace the survey mode
@@ -410,3 +852,47 @@ class LocalizedTrips(FileAsset):
             trips.drop("distance_survey", axis=1, inplace=True)    
     
         return trips
+
+
+
+def get_race_noise(columns: List[str], seed: int) -> pl.Expr:
+    """
+    Exponential noise -log(U) of the exponential races, with U derived from 
+    the hash of the columns (so the draws do not depend on the row order).
+    """
+    return ( 
+        pl.struct(columns)
+        .hash(seed=seed)
+        .cast(pl.Float64) 
+        .truediv(pl.lit(18446744073709551616.0))
+        .log()
+        .neg()
+    )
+
+
+def race_among_potential_destinations(
+        trips: pl.DataFrame,
+        potential_dests: pl.DataFrame,
+        model_col: str,
+        seed: int
+    ) -> pl.DataFrame:
+    """
+    Draw one zone for each trip among the potential destinations of its 
+    individual for the model of the model_col column, weighted by their 
+    probabilities.
+    """
+    return ( 
+        trips
+        .select(["trip_index", "individual_code", model_col])
+        .join(
+            potential_dests,
+            left_on=["individual_code", model_col],
+            right_on=["individual_code", "model_code"]
+        )
+        .with_columns(
+            sample_score=get_race_noise(["trip_index", "to_code"], seed)/pl.col("prob")
+        )
+        .filter(pl.col("sample_score") == pl.col("sample_score").min().over("trip_index"))
+        .unique("trip_index")
+        .select(["trip_index", "to_code"])
+    )
@@ -1,2 +1,4 @@
+from .survey_index import SurveyIndex
+from .chains_probability import ChainsProbability
 from .mobility_survey import MobilitySurvey
-from .aggregator import MobilitySurveyAggregator
\ No newline at end of file
+from .aggregator import MobilitySurveyAggregator
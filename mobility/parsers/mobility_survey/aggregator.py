@@ -1,4 +1,6 @@
 import pandas as pd
+import polars as pl
+import pyarrow.parquet as pq
 from collections import defaultdict
 from mobility.in_memory_asset import InMemoryAsset
 
@@ -10,11 +12,11 @@ class MobilitySurveyAggregator(InMemoryAsset):
             "surveys": surveys
         }
         super().__init__(inputs)
+        self.countries = None
         
     def get(self):
         
-        population = pd.read_parquet(self.inputs["population"].get()["individuals"])
-        countries = list(population["country"].unique())
+        countries = self.get_countries()
         
         survey_data = {
             country: self.get_survey_data(country) 
@@ -54,14 +56,115 @@ class MobilitySurveyAggregator(InMemoryAsset):
         return survey_data
             
 
-    def get_survey_data(self, country):
+    def get_days_trip_index(self):
+        """
+        Gets the days sampling index of the survey of each country of the 
+        population (see MobilitySurvey.get_days_trip_index).
+        """
+        
+        return {
+            country: self.inputs["surveys"][country].get_days_trip_index()
+            for country in self.get_countries()
+        }
+    
+    
+    def get_lazy(self):
+        """
+        Gets the survey data of the countries of the population as polars 
+        scans (see MobilitySurvey.get_lazy), with a country column, so that 
+        queries only read the columns, rows and countries they need.
+        """
+        
+        countries = self.get_countries()
+        
+        survey_data = {
+            country: self.get_survey(country).get_lazy()
+            for country in countries
+        }
+        
+        return {
+            k: pl.concat(
+                [survey_data[country][k].with_columns(country=pl.lit(country)) for country in countries],
+                how="diagonal_relaxed"
+            )
+            for k in survey_data[countries[0]].keys()
+        }
+    
+    
+    def get_tables(self, columns: dict) -> dict:
+        """
+        Gets survey tables indexed like the tables of get, but collected from
+        the scans of get_lazy, so that only the given tables and columns are
+        read from the survey files.
+        
+        Args:
+            columns (dict): The columns to read, by table name (None to read 
+                all the columns of a table). The index levels of the tables
+                are always read.
+        
+        Returns:
+            dict: A dictionary of pandas DataFrames, with a country index level.
+        """
+        
+        survey_data = self.get_lazy()
+        first_survey = self.get_survey(self.get_countries()[0])
+        
+        tables = {}
+        
+        for k, table_columns in columns.items():
+            
+            index = get_parquet_index(first_survey.cache_path[k])
+            table = survey_data[k]
+            
+            if table_columns is not None:
+                table = table.select(list(index.keys()) + table_columns + ["country"])
+                
+            tables[k] = (
+                table
+                .collect()
+                .to_pandas()
+                .set_index(list(index.keys()) + ["country"])
+                .rename_axis(list(index.values()) + ["country"])
+            )
+            
+        return tables
+    
+    
+    def get_countries(self):
+        """
+        Gets the countries of the population, reading only the country column
+        of the individuals file (once per aggregator instance).
+        """
+        
+        if self.countries is None:
+            population = pd.read_parquet(self.inputs["population"].get()["individuals"], columns=["country"])
+            self.countries = list(population["country"].unique())
+            
+        return self.countries
+    
+
+    def get_survey(self, country):
         
         surveys = self.inputs["surveys"]
             
-        if country in surveys:
-            survey = surveys[country].get()
-        else:
+        if country not in surveys:
             raise ValueError(f"No mobility survey was provided for country {country}")
         
-        return survey
-        
\ No newline at end of file
+        return surveys[country]
+    
+
+    def get_survey_data(self, country):
+        return self.get_survey(country).get()
+        
+
+
+def get_parquet_index(path) -> dict:
+    """
+    Gets the index levels of a dataframe written to parquet by pandas, as 
+    a {column name in the file: index level name} dictionary.
+    """
+    
+    metadata = pq.read_schema(path).pandas_metadata
+    names = {c["field_name"]: c["name"] for c in metadata["columns"]}
+    
+    return {c: names[c] for c in metadata["index_columns"] if isinstance(c, str)}
@@ -0,0 +1,109 @@
+import os
+import pathlib
+import logging
+import polars as pl
+
+from mobility.file_asset import FileAsset
+
+# Sequences longer than this are filtered out by MobilitySurvey.compute_chains_probability
+MAX_SEQ_STEPS = 10
+
+class ChainsProbability(FileAsset):
+    """
+    Probabilities of the motive sequences (trip chains) of a mobility survey,
+    by day status, urban unit category, CSP and number of cars, computed
+    once for a motive mapping and a seq_prob_cutoff (see
+    MobilitySurvey.compute_chains_probability).
+
+    The motive sequences are stored as integers instead of "-" joined
+    strings : the id of a sequence is the base (number of motives + 1)
+    number whose digits are the motive codes of its steps, so a given
+    sequence has the same id in all the surveys that use the same motives.
+
+    Attributes:
+        cache_path (dict): The paths of the "chains" table (probabilities,
+            durations and distances of each step of each sequence, by
+            population group) and of the "motive_seqs" table (the motive of
+            each step of each sequence).
+    """
+
+    def __init__(self, survey, motive_mapping: dict[str, list], seq_prob_cutoff: float):
+        """
+        Args:
+            survey (MobilitySurvey): The mobility survey.
+            motive_mapping (dict): The survey motive ids of each motive name.
+            seq_prob_cutoff (float): The share of the average distance
+                that the most contributing sequences of each group should
+                cover (see MobilitySurvey.compute_chains_probability).
+        """
+
+        inputs = {
+            "survey": survey,
+            "motive_mapping": motive_mapping,
+            "seq_prob_cutoff": seq_prob_cutoff
+        }
+
+        project_folder = pathlib.Path(os.environ["MOBILITY_PROJECT_DATA_FOLDER"])
+
+        cache_path = {
+            "chains": project_folder / "chains_probability.parquet",
+            "motive_seqs": project_folder / "chains_probability_motive_seqs.parquet"
+        }
+
+        super().__init__(inputs, cache_path)
+
+
+    def get_cached_asset(self) -> dict[str, pl.DataFrame]:
+
+        logging.info("Chains probability already computed. Reusing the files : " + str(self.cache_path["chains"]))
+
+        return {k: pl.read_parquet(path) for k, path in self.cache_path.items()}
+
+
+    def create_and_get_asset(self) -> dict[str, pl.DataFrame]:
+
+        logging.info("Computing chains probability...")
+
+        motive_mapping = self.inputs["motive_mapping"]
+
+        sequences = self.inputs["survey"].compute_chains_probability(
+            motive_mapping,
+            self.inputs["seq_prob_cutoff"]
+        )
+
+        base = len(motive_mapping) + 1
+
+        if base**MAX_SEQ_STEPS >= 2**64:
+            raise ValueError("Too many motives to encode the motive sequences as 64 bit integers.")
+
+        motive_seqs = (
+            sequences
+            .select(["motive_seq", "seq_step_index", "motive"])
+            .unique()
+            .with_columns(
+                motive_seq_id=(
+                    (pl.col("motive").to_physical().cast(pl.UInt64) + 1)
+                    * pl.lit(base, pl.UInt64).pow(pl.col("seq_step_index") - 1).cast(pl.UInt64)
+                ).sum().over("motive_seq")
+            )
+        )
+
+        chains = (
+            sequences
+            .join(
+                motive_seqs.select(["motive_seq", "seq_step_index", "motive_seq_id"]),
+                on=["motive_seq", "seq_step_index"]
+            )
+            .drop("motive_seq")
+        )
+
+        motive_seqs = (
+            motive_seqs
+            .select(["motive_seq_id", "seq_step_index", "motive"])
+            .sort(["motive_seq_id", "seq_step_index"])
+        )
+
+        chains.write_parquet(self.cache_path["chains"])
+        motive_seqs.write_parquet(self.cache_path["motive_seqs"])
+
+        return {"chains": chains, "motive_seqs": motive_seqs}
@@ -3,11 +3,39 @@ import pathlib
 import logging
 import zipfile
 import pandas as pd
+import polars as pl
 import numpy as np
 
 from mobility.parsers.mobility_survey import MobilitySurvey
+from mobility.parsers.mobility_survey.survey_csv import read_survey_csv, read_survey_csv_polars, write_survey_tables
 from mobility.parsers.download_file import download_file
 
+# Numbers of the month and day of week names of the EMP survey files
+MONTHS = {
+    'janvier': "1",
+    'février': "2",
+    'mars': "3",
+    'avril': "4",
+    'mai': "5",
+    'juin': "6",
+    'juillet': "7",
+    'août': "8",
+    'septembre': "9",
+    'octobre': "10",
+    'novembre': "11",
+    'décembre': "12"
+}
+
+DAYS_OF_WEEK = {
+    'lundi': "0",
+    'mardi': "1",
+    'mercredi': "2",
+    'jeudi': "3",
+    'vendredi': "4",
+    'samedi': "5",
+    'dimanche': "6"
+}
+
 class EMPMobilitySurvey(MobilitySurvey):
     """
     A class for managing and processing mobility survey data for the EMP-2019 and ENTD-2008 surveys.
@@ -15,6 +43,7 @@ class EMPMobilitySurvey(MobilitySurvey):
     Attributes:
         source (str): The source of the mobility survey data (e.g., "EMP-2019" or "ENTD-2008").
         cache_path (dict): A dictionary mapping data identifiers to their file paths in the cache.
+        parse_engine (str): "pandas" (default) or "polars", the engine used to read the raw CSV files.
 
     Methods:
         get_cached_asset: Returns the cached asset data as a dictionary of pandas DataFrames.
@@ -23,13 +52,27 @@ class EMPMobilitySurvey(MobilitySurvey):
         prepare_survey_data: Prepares survey data by calling specific methods based on the source.
         prepare_survey_data_ENTD_2008: Processes and formats ENTD-2008 survey data.
         prepare_survey_data_EMP_2019: Processes and formats EMP-2019 survey data.
+        prepare_short_trips: Prepares the short trips and days trip tables with pandas.
+        prepare_short_trips_polars: Prepares the short trips and days trip tables with polars ("polars" parse engine).
     """
 
-    def __init__(self, seq_prob_cutoff: float = 0.95):
+    def __init__(self, seq_prob_cutoff: float = 0.95, parse_engine: str = "pandas"):
         inputs = {
             "survey_name": "fr-EMP-2019",
             "country": "fr"
         }
+
+        if parse_engine not in ["pandas", "polars"]:
+            raise ValueError("Unknown survey parsing engine : " + str(parse_engine) + " (should be 'pandas' or 'polars').")
+
+        # The "polars" parsing engine can parse some floats one ulp away from
+        # the "pandas" engine, so it is hashed (only when it is not the
+        # default engine, so that the surveys parsed before stay valid)
+        if parse_engine != "pandas":
+            inputs["parse_engine"] = parse_engine
+
+        self.parse_engine = parse_engine
+
         super().__init__(inputs, seq_prob_cutoff)
 
 
@@ -93,10 +136,9 @@ class EMPMobilitySurvey(MobilitySurvey):
         data_folder_path = dataset_path.parent
 
         # Info about the individuals (CSP, city category...)
-        indiv = pd.read_csv(
+        indiv = read_survey_csv(
             data_folder_path / "tcm_ind_kish_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={
                 "ident_men": int,
                 "ident_ind": int,
@@ -113,10 +155,9 @@ class EMPMobilitySurvey(MobilitySurvey):
         indiv.loc[indiv["csp"] == "0", "csp"] = "no_csp"
 
         # Info about households
-        hh = pd.read_csv(
+        hh = read_survey_csv(
             data_folder_path / "tcm_men_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={
                 "ident_men": int,
                 "STATUTCOM_UU_RES": str,
@@ -135,10 +176,9 @@ class EMPMobilitySurvey(MobilitySurvey):
         hh["n_pers"] = hh["n_pers"].astype(int)
 
         # Number of cars in each household
-        cars = pd.read_csv(
+        cars = read_survey_csv(
             data_folder_path / "q_menage_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={
                 "IDENTMEN": int,
                 "JNBVEH": str,
@@ -154,10 +194,9 @@ class EMPMobilitySurvey(MobilitySurvey):
         cars = cars[["IDENT_MEN", "n_cars", "BLOGDIST"]]
 
         # Infos about the individuals (weights, immobility)
-        k_indiv = pd.read_csv(
+        k_indiv = read_survey_csv(
             data_folder_path / "k_individu_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={"IDENT_IND": int, "pond_indC": float},
             usecols=[
                 "IDENT_IND",
@@ -176,90 +215,7 @@ class EMPMobilitySurvey(MobilitySurvey):
 
         # ------------------------------------------
         # Trips dataset
-        df = pd.read_csv(
-            data_folder_path / "k_deploc_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
-            dtype={
-                "IDENT_DEP": int,
-                "IDENT_IND": int,
-                "mobloc": str,
-                "TYPEJOUR": str,
-                "MMOTIFDES": str,
-                "MOTPREC": str,
-                "mtp": str,
-                "MDATE_jour": str,
-                "MDATE_mois": str,
-                "MORIHDEP": str,
-                "MDESHARR": str
-            },
-            usecols=[
-                "IDENT_DEP",
-                "IDENT_IND",
-                "POND_JOUR",
-                "TYPEJOUR",
-                "mobloc",
-                "MMOTIFDES",
-                "MOTPREC",
-                "MDISTTOT_fin",
-                "mtp",
-                "MACCOMPM",
-                "MACCOMPHM",
-                "MDATE_jour",
-                "MDATE_mois",
-                "MORIHDEP",
-                "MDESHARR"
-            ]
-        )
-
-        df["daily_trip_index"] = df.groupby("IDENT_IND").cumcount() + 1
-
-        df["POND_JOUR"] = df["POND_JOUR"].astype(float)
-        df["MDISTTOT_fin"] = df["MDISTTOT_fin"].astype(float)
-        df.loc[df["MACCOMPM"].isnull(), "MACCOMPM"] = 0
-        df.loc[df["MACCOMPHM"].isnull(), "MACCOMPHM"] = 0
-        df["n_other_passengers"] = df["MACCOMPM"].astype(int) + df["MACCOMPHM"].astype(int)
-        df["weekday"] = np.where(df["TYPEJOUR"] == "1", True, False)
-
-        df["departure_time"] = pd.to_timedelta(df["MORIHDEP"]).astype('timedelta64[s]').astype(int)
-        df["arrival_time"] = pd.to_timedelta(df["MDESHARR"]).astype('timedelta64[s]').astype(int)
-
-        # the day weight is divided by 5 if it's a weekday and 2 otherwise in order to be consistent with the ENTD
-        df["POND_JOUR"] = np.where(df["weekday"], df["POND_JOUR"] / 5, df["POND_JOUR"] / 2)
-
-        # Remove long distance trips (> 80 km from home)
-        df = df[df["mobloc"] == "1"]
-
-        # Remove trips with an unknown or zero distance
-        df = df[(df["MDISTTOT_fin"] > 0.0) | (~df["MDISTTOT_fin"].isnull())]
-
-        # Map months and day of week to integers
-        df["MDATE_mois"] = df["MDATE_mois"].replace({
-            'janvier': "1",
-            'février': "2",
-            'mars': "3",
-            'avril': "4",
-            'mai': "5",
-            'juin': "6",
-            'juillet': "7",
-            'août': "8",
-            'septembre': "9",
-            'octobre': "10",
-            'novembre': "11",
-            'décembre': "12"
-        }).astype(int)
-
-        df["MDATE_jour"] = df["MDATE_jour"].replace({
-            'lundi': "0",
-            'mardi': "1",
-            'mercredi': "2",
-            'jeudi': "3",
-            'vendredi': "4",
-            'samedi': "5",
-            'dimanche': "6"
-        }).astype(int)
-
-        # Convert the mode id from the EMP terminology to the ENTD one
+        # Mapping of the mode ids from the EMP terminology to the ENTD one
         data = np.array(
             [
                 ["1.1", "1.10"],
@@ -304,15 +260,10 @@ class EMPMobilitySurvey(MobilitySurvey):
             ]
         )
         emp_modes_to_entd_modes = pd.DataFrame(
-            data, columns=["emp_mode_id", "entd_mode_id"]
+            data, columns=["mtp", "entd_mode_id"]
         )
 
-        emp_modes_to_entd_modes.columns = ["mtp", "entd_mode_id"]
-        df = pd.merge(df, emp_modes_to_entd_modes, on="mtp")
-        df.drop(columns="mtp", inplace=True)
-        df.rename(columns={"entd_mode_id": "mtp"}, inplace=True)
-
-        # Convert the motive id from the EMP terminology to the ENTD one
+        # Mapping of the motive ids from the EMP terminology to the ENTD one
         data = np.array(
             [
                 ["1.1", "1.1"],
@@ -354,107 +305,23 @@ class EMPMobilitySurvey(MobilitySurvey):
             data, columns=["emp_motive_id", "entd_motive_id"]
         )
 
-        emp_motives_to_entd_motives.columns = ["MOTPREC", "entd_motive_id_ori"]
-        df = pd.merge(df, emp_motives_to_entd_motives, on="MOTPREC")
-
-        emp_motives_to_entd_motives.columns = ["MMOTIFDES", "entd_motive_id_des"]
-        df = pd.merge(df, emp_motives_to_entd_motives, on="MMOTIFDES")
-
-        df.drop(columns=["MOTPREC", "MMOTIFDES"], inplace=True)
-        df.rename(
-            columns={"entd_motive_id_ori": "MOTPREC", "entd_motive_id_des": "MMOTIFDES"},
-            inplace=True,
-        )
-
-        # Merge the trips dataframe with the data about individuals and household cars
-        df = pd.merge(df, indiv, on="IDENT_IND")
-        # df = pd.merge(df, k_indiv[["IDENT_IND", "pond_indC"]], on="IDENT_IND")
-        df = pd.merge(
-            df, hh[["city_category", "IDENT_MEN", "csp_household"]], on="IDENT_MEN"
-        )
-        df = pd.merge(df, cars, on="IDENT_MEN")
-
-        # Transform the deplacement id into a day id
-        df["IDENT_DEP"] = df["IDENT_DEP"].astype(str).str.slice(0, 14).astype(int)
-
-        # Data base of days trip : group the trips by days
-        days_trip = df[
-            [
-                "IDENT_DEP",
-                "weekday",
-                "city_category",
-                "csp",
-                "n_cars",
-                "POND_JOUR",
-                "MDATE_mois",
-                "MDATE_jour"
-            ]
-        ].copy()
-
-        days_trip.columns = [
-            "day_id",
-            "weekday",
-            "city_category",
-            "csp",
-            "n_cars",
-            "pondki",
-            "month",
-            "day_of_week"
-        ]
-
-        # Keep only the first trip of each day to have one row per day
-        days_trip = days_trip.groupby("day_id").first()
-        days_trip.reset_index(inplace=True)
-        days_trip.set_index(["csp", "n_cars", "weekday", "city_category"], inplace=True)
-
-        # Filter and format the columns
-        df = df[
-            [
-                "IDENT_IND",
-                "IDENT_DEP",
-                "daily_trip_index",
-                "weekday",
-                "departure_time",
-                "arrival_time",
-                "city_category",
-                "csp",
-                "n_cars",
-                "BLOGDIST",
-                "MOTPREC",
-                "MMOTIFDES",
-                "mtp",
-                "MDISTTOT_fin",
-                "n_other_passengers",
-                "POND_JOUR"
-            ]
-        ]
-        df.columns = [
-            "individual_id",
-            "day_id",
-            "daily_trip_index",
-            "weekday",
-            "departure_time",
-            "arrival_time",
-            "city_category",
-            "csp",
-            "n_cars",
-            "BLOGDIST",
-            "previous_motive",
-            "motive",
-            "mode_id",
-            "distance",
-            "n_other_passengers",
-            "pondki"
-        ]
-        df.set_index(["day_id"], inplace=True)
+        if self.parse_engine == "polars":
+            df, days_trip = self.prepare_short_trips_polars(
+                data_folder_path, indiv, hh, cars,
+                emp_modes_to_entd_modes, emp_motives_to_entd_motives
+            )
+        else:
+            df, days_trip = self.prepare_short_trips(
+                data_folder_path, indiv, hh, cars,
+                emp_modes_to_entd_modes, emp_motives_to_entd_motives
+            )
 
 
         # ------------------------------------------
         # Long distance trips dataset
-        df_long = pd.read_csv(
+        df_long = read_survey_csv(
             data_folder_path / "k_voy_depdet_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={
                 "IDENTIND": int,
                 "IDENT_VOY": str,
@@ -562,10 +429,9 @@ class EMPMobilitySurvey(MobilitySurvey):
 
         # ------------------------------------------
         # Travels dataset
-        travels = pd.read_csv(
+        travels = read_survey_csv(
             data_folder_path / "k_voyage_public_V2.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={
                 "IDENT_IND": int,
                 "IDENT_VOY": str,
@@ -622,30 +488,9 @@ class EMPMobilitySurvey(MobilitySurvey):
         ] = travels.loc[travels["STATUTCOM_UU_VOY_DES"].isna(), "city_category"]
 
         # Map months and day of week to integers
-        travels["OLDDEBJ_mois"] = travels["OLDDEBJ_mois"].replace({
-            'janvier': "1",
-            'février': "2",
-            'mars': "3",
-            'avril': "4",
-            'mai': "5",
-            'juin': "6",
-            'juillet': "7",
-            'août': "8",
-            'septembre': "9",
-            'octobre': "10",
-            'novembre': "11",
-            'décembre': "12"
-        }).astype(int)
-
-        travels["OLDDEBJ_jour"] = travels["OLDDEBJ_jour"].replace({
-            'lundi': "0",
-            'mardi': "1",
-            'mercredi': "2",
-            'jeudi': "3",
-            'vendredi': "4",
-            'samedi': "5",
-            'dimanche': "6"
-        }).astype(int)
+        travels["OLDDEBJ_mois"] = travels["OLDDEBJ_mois"].replace(MONTHS).astype(int)
+
+        travels["OLDDEBJ_jour"] = travels["OLDDEBJ_jour"].replace(DAYS_OF_WEEK).astype(int)
 
         travels = travels.loc[
             :,
@@ -971,7 +816,342 @@ class EMPMobilitySurvey(MobilitySurvey):
             "p_det_mode": p_det_mode.to_frame()
         }
 
-        for name, df in files.items():
-            df.to_parquet(self.cache_path[name])
+        write_survey_tables(files, self.cache_path, self.parse_engine)
 
         return None
+
+
+    def prepare_short_trips(
+            self,
+            data_folder_path: pathlib.Path,
+            indiv: pd.DataFrame,
+            hh: pd.DataFrame,
+            cars: pd.DataFrame,
+            emp_modes_to_entd_modes: pd.DataFrame,
+            emp_motives_to_entd_motives: pd.DataFrame
+        ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Prepares the short trips and the days trip tables from the trips file
+        of the survey, with pandas.
+
+        Returns:
+            tuple: The short trips (indexed by day id) and the days trip tables.
+        """
+
+        df = read_survey_csv(
+            data_folder_path / "k_deploc_public_V2.csv",
+            dtype={
+                "IDENT_DEP": int,
+                "IDENT_IND": int,
+                "mobloc": str,
+                "TYPEJOUR": str,
+                "MMOTIFDES": str,
+                "MOTPREC": str,
+                "mtp": str,
+                "MDATE_jour": str,
+                "MDATE_mois": str,
+                "MORIHDEP": str,
+                "MDESHARR": str
+            },
+            usecols=[
+                "IDENT_DEP",
+                "IDENT_IND",
+                "POND_JOUR",
+                "TYPEJOUR",
+                "mobloc",
+                "MMOTIFDES",
+                "MOTPREC",
+                "MDISTTOT_fin",
+                "mtp",
+                "MACCOMPM",
+                "MACCOMPHM",
+                "MDATE_jour",
+                "MDATE_mois",
+                "MORIHDEP",
+                "MDESHARR"
+            ]
+        )
+
+        df["daily_trip_index"] = df.groupby("IDENT_IND").cumcount() + 1
+
+        df["POND_JOUR"] = df["POND_JOUR"].astype(float)
+        df["MDISTTOT_fin"] = df["MDISTTOT_fin"].astype(float)
+        df.loc[df["MACCOMPM"].isnull(), "MACCOMPM"] = 0
+        df.loc[df["MACCOMPHM"].isnull(), "MACCOMPHM"] = 0
+        df["n_other_passengers"] = df["MACCOMPM"].astype(int) + df["MACCOMPHM"].astype(int)
+        df["weekday"] = np.where(df["TYPEJOUR"] == "1", True, False)
+
+        df["departure_time"] = pd.to_timedelta(df["MORIHDEP"]).astype('timedelta64[s]').astype(int)
+        df["arrival_time"] = pd.to_timedelta(df["MDESHARR"]).astype('timedelta64[s]').astype(int)
+
+        # the day weight is divided by 5 if it's a weekday and 2 otherwise in order to be consistent with the ENTD
+        df["POND_JOUR"] = np.where(df["weekday"], df["POND_JOUR"] / 5, df["POND_JOUR"] / 2)
+
+        # Remove long distance trips (> 80 km from home)
+        df = df[df["mobloc"] == "1"]
+
+        # Remove trips with an unknown or zero distance
+        df = df[(df["MDISTTOT_fin"] > 0.0) | (~df["MDISTTOT_fin"].isnull())]
+
+        # Map months and day of week to integers
+        df["MDATE_mois"] = df["MDATE_mois"].replace(MONTHS).astype(int)
+
+        df["MDATE_jour"] = df["MDATE_jour"].replace(DAYS_OF_WEEK).astype(int)
+
+        # Convert the mode id from the EMP terminology to the ENTD one
+        df = pd.merge(df, emp_modes_to_entd_modes, on="mtp")
+        df.drop(columns="mtp", inplace=True)
+        df.rename(columns={"entd_mode_id": "mtp"}, inplace=True)
+
+        # Convert the motive id from the EMP terminology to the ENTD one
+        df = pd.merge(df, emp_motives_to_entd_motives.set_axis(["MOTPREC", "entd_motive_id_ori"], axis=1), on="MOTPREC")
+        df = pd.merge(df, emp_motives_to_entd_motives.set_axis(["MMOTIFDES", "entd_motive_id_des"], axis=1), on="MMOTIFDES")
+
+        df.drop(columns=["MOTPREC", "MMOTIFDES"], inplace=True)
+        df.rename(
+            columns={"entd_motive_id_ori": "MOTPREC", "entd_motive_id_des": "MMOTIFDES"},
+            inplace=True,
+        )
+
+        # Merge the trips dataframe with the data about individuals and household cars
+        df = pd.merge(df, indiv, on="IDENT_IND")
+        # df = pd.merge(df, k_indiv[["IDENT_IND", "pond_indC"]], on="IDENT_IND")
+        df = pd.merge(
+            df, hh[["city_category", "IDENT_MEN", "csp_household"]], on="IDENT_MEN"
+        )
+        df = pd.merge(df, cars, on="IDENT_MEN")
+
+        # Transform the deplacement id into a day id
+        df["IDENT_DEP"] = df["IDENT_DEP"].astype(str).str.slice(0, 14).astype(int)
+
+        # Data base of days trip : group the trips by days
+        days_trip = df[
+            [
+                "IDENT_DEP",
+                "weekday",
+                "city_category",
+                "csp",
+                "n_cars",
+                "POND_JOUR",
+                "MDATE_mois",
+                "MDATE_jour"
+            ]
+        ].copy()
+
+        days_trip.columns = [
+            "day_id",
+            "weekday",
+            "city_category",
+            "csp",
+            "n_cars",
+            "pondki",
+            "month",
+            "day_of_week"
+        ]
+
+        # Keep only the first trip of each day to have one row per day
+        days_trip = days_trip.groupby("day_id").first()
+        days_trip.reset_index(inplace=True)
+        days_trip.set_index(["csp", "n_cars", "weekday", "city_category"], inplace=True)
+
+        # Filter and format the columns
+        df = df[
+            [
+                "IDENT_IND",
+                "IDENT_DEP",
+                "daily_trip_index",
+                "weekday",
+                "departure_time",
+                "arrival_time",
+                "city_category",
+                "csp",
+                "n_cars",
+                "BLOGDIST",
+                "MOTPREC",
+                "MMOTIFDES",
+                "mtp",
+                "MDISTTOT_fin",
+                "n_other_passengers",
+                "POND_JOUR"
+            ]
+        ]
+        df.columns = [
+            "individual_id",
+            "day_id",
+            "daily_trip_index",
+            "weekday",
+            "departure_time",
+            "arrival_time",
+            "city_category",
+            "csp",
+            "n_cars",
+            "BLOGDIST",
+            "previous_motive",
+            "motive",
+            "mode_id",
+            "distance",
+            "n_other_passengers",
+            "pondki"
+        ]
+        df.set_index(["day_id"], inplace=True)
+
+        return df, days_trip
+
+
+    def prepare_short_trips_polars(
+            self,
+            data_folder_path: pathlib.Path,
+            indiv: pd.DataFrame,
+            hh: pd.DataFrame,
+            cars: pd.DataFrame,
+            emp_modes_to_entd_modes: pd.DataFrame,
+            emp_motives_to_entd_motives: pd.DataFrame
+        ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Prepares the same tables as prepare_short_trips, with polars : the 
+        trips file is parsed, filtered and merged with the individuals and 
+        households data in polars, and only the resulting tables are 
+        converted to pandas.
+
+        Returns:
+            tuple: The short trips (indexed by day id) and the days trip tables.
+        """
+
+        df = read_survey_csv_polars(
+            data_folder_path / "k_deploc_public_V2.csv",
+            dtype={
+                "IDENT_DEP": int,
+                "IDENT_IND": int,
+                "mobloc": str,
+                "TYPEJOUR": str,
+                "MMOTIFDES": str,
+                "MOTPREC": str,
+                "mtp": str,
+                "MDATE_jour": str,
+                "MDATE_mois": str,
+                "MORIHDEP": str,
+                "MDESHARR": str
+            },
+            usecols=[
+                "IDENT_DEP",
+                "IDENT_IND",
+                "POND_JOUR",
+                "TYPEJOUR",
+                "mobloc",
+                "MMOTIFDES",
+                "MOTPREC",
+                "MDISTTOT_fin",
+                "mtp",
+                "MACCOMPM",
+                "MACCOMPHM",
+                "MDATE_jour",
+                "MDATE_mois",
+                "MORIHDEP",
+                "MDESHARR"
+            ]
+        )
+
+        motives = pl.from_pandas(emp_motives_to_entd_motives)
+
+        df = (
+            df
+            .with_columns(
+                daily_trip_index=pl.int_range(pl.len()).over("IDENT_IND") + 1,
+                POND_JOUR=pl.col("POND_JOUR").cast(pl.Float64),
+                MDISTTOT_fin=pl.col("MDISTTOT_fin").cast(pl.Float64),
+                n_other_passengers=(
+                    pl.col("MACCOMPM").fill_null(0).cast(pl.Int64) +
+                    pl.col("MACCOMPHM").fill_null(0).cast(pl.Int64)
+                ),
+                weekday=pl.col("TYPEJOUR").eq_missing("1"),
+                departure_time=get_seconds(pl.col("MORIHDEP")),
+                arrival_time=get_seconds(pl.col("MDESHARR"))
+            )
+            # the day weight is divided by 5 if it's a weekday and 2 otherwise in order to be consistent with the ENTD
+            .with_columns(
+                POND_JOUR=pl.when(pl.col("weekday")).then(pl.col("POND_JOUR") / 5).otherwise(pl.col("POND_JOUR") / 2)
+            )
+            # Remove long distance trips (> 80 km from home), and trips with 
+            # an unknown or zero distance
+            .filter(pl.col("mobloc") == "1")
+            .filter((pl.col("MDISTTOT_fin") > 0.0) | pl.col("MDISTTOT_fin").is_not_null())
+            # Map months and day of week to integers
+            .with_columns(
+                MDATE_mois=pl.col("MDATE_mois").replace(MONTHS).cast(pl.Int64),
+                MDATE_jour=pl.col("MDATE_jour").replace(DAYS_OF_WEEK).cast(pl.Int64)
+            )
+            # Convert the mode and motive ids from the EMP terminology to the ENTD one
+            .join(pl.from_pandas(emp_modes_to_entd_modes), on="mtp", maintain_order="left")
+            .join(motives.rename({"emp_motive_id": "MOTPREC", "entd_motive_id": "entd_motive_id_ori"}), on="MOTPREC", maintain_order="left")
+            .join(motives.rename({"emp_motive_id": "MMOTIFDES", "entd_motive_id": "entd_motive_id_des"}), on="MMOTIFDES", maintain_order="left")
+            .drop(["mtp", "MOTPREC", "MMOTIFDES"])
+            .rename({"entd_mode_id": "mtp", "entd_motive_id_ori": "MOTPREC", "entd_motive_id_des": "MMOTIFDES"})
+            # Merge the trips dataframe with the data about individuals and household cars
+            .join(pl.from_pandas(indiv), on="IDENT_IND", maintain_order="left")
+            .join(pl.from_pandas(hh[["city_category", "IDENT_MEN", "csp_household"]]), on="IDENT_MEN", maintain_order="left")
+            .join(pl.from_pandas(cars), on="IDENT_MEN", maintain_order="left")
+            # Transform the deplacement id into a day id
+            .with_columns(
+                IDENT_DEP=pl.col("IDENT_DEP").cast(pl.String).str.slice(0, 14).cast(pl.Int64)
+            )
+        )
+
+        # Data base of days trip : keep only the first trip of each day to 
+        # have one row per day
+        days_trip = (
+            df
+            .select(
+                day_id=pl.col("IDENT_DEP"),
+                weekday=pl.col("weekday"),
+                city_category=pl.col("city_category"),
+                csp=pl.col("csp"),
+                n_cars=pl.col("n_cars"),
+                pondki=pl.col("POND_JOUR"),
+                month=pl.col("MDATE_mois"),
+                day_of_week=pl.col("MDATE_jour")
+            )
+            .group_by("day_id")
+            .agg(pl.all().drop_nulls().first())
+            .sort("day_id")
+            .to_pandas()
+            .set_index(["csp", "n_cars", "weekday", "city_category"])
+        )
+
+        # Filter and format the columns
+        df = (
+            df
+            .select(
+                individual_id=pl.col("IDENT_IND"),
+                day_id=pl.col("IDENT_DEP"),
+                daily_trip_index=pl.col("daily_trip_index"),
+                weekday=pl.col("weekday"),
+                departure_time=pl.col("departure_time"),
+                arrival_time=pl.col("arrival_time"),
+                city_category=pl.col("city_category"),
+                csp=pl.col("csp"),
+                n_cars=pl.col("n_cars"),
+                BLOGDIST=pl.col("BLOGDIST"),
+                previous_motive=pl.col("MOTPREC"),
+                motive=pl.col("MMOTIFDES"),
+                mode_id=pl.col("mtp"),
+                distance=pl.col("MDISTTOT_fin"),
+                n_other_passengers=pl.col("n_other_passengers"),
+                pondki=pl.col("POND_JOUR")
+            )
+            .to_pandas()
+            .set_index("day_id")
+        )
+
+        return df, days_trip
+
+
+def get_seconds(times: pl.Expr) -> pl.Expr:
+    """
+    Converts "HH:MM:SS" times to a number of seconds.
+    """
+    times = times.str.split(":")
+    return (
+        times.list.get(0).cast(pl.Int64)*3600 +
+        times.list.get(1).cast(pl.Int64)*60 +
+        times.list.get(2).cast(pl.Int64)
+    )
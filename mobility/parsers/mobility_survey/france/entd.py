@@ -3,9 +3,11 @@ import pathlib
 import logging
 import zipfile
 import pandas as pd
+import polars as pl
 import numpy as np
 
 from mobility.parsers.mobility_survey import MobilitySurvey
+from mobility.parsers.mobility_survey.survey_csv import read_survey_csv, read_survey_csv_polars, write_survey_tables
 from mobility.parsers.download_file import download_file
 
 class ENTDMobilitySurvey(MobilitySurvey):
@@ -15,6 +17,7 @@ class ENTDMobilitySurvey(MobilitySurvey):
     Attributes:
         source (str): The source of the mobility survey data (e.g., "EMP-2019" or "ENTD-2008").
         cache_path (dict): A dictionary mapping data identifiers to their file paths in the cache.
+        parse_engine (str): "pandas" (default) or "polars", the engine used to read the raw CSV files.
 
     Methods:
         get_cached_asset: Returns the cached asset data as a dictionary of pandas DataFrames.
@@ -23,13 +26,27 @@ class ENTDMobilitySurvey(MobilitySurvey):
         prepare_survey_data: Prepares survey data by calling specific methods based on the source.
         prepare_survey_data_ENTD_2008: Processes and formats ENTD-2008 survey data.
         prepare_survey_data_EMP_2019: Processes and formats EMP-2019 survey data.
+        prepare_short_trips: Prepares the short trips and days trip tables with pandas.
+        prepare_short_trips_polars: Prepares the short trips and days trip tables with polars ("polars" parse engine).
     """
 
-    def __init__(self, seq_prob_cutoff: float = 0.95):
+    def __init__(self, seq_prob_cutoff: float = 0.95, parse_engine: str = "pandas"):
         inputs = {
             "survey_name": "fr-ENTD-2008",
             "country": "fr"
         }
+
+        if parse_engine not in ["pandas", "polars"]:
+            raise ValueError("Unknown survey parsing engine : " + str(parse_engine) + " (should be 'pandas' or 'polars').")
+
+        # The "polars" parsing engine can parse some floats one ulp away from
+        # the "pandas" engine, so it is hashed (only when it is not the
+        # default engine, so that the surveys parsed before stay valid)
+        if parse_engine != "pandas":
+            inputs["parse_engine"] = parse_engine
+
+        self.parse_engine = parse_engine
+
         super().__init__(inputs, seq_prob_cutoff)
 
 
@@ -93,10 +110,9 @@ class ENTDMobilitySurvey(MobilitySurvey):
         data_folder_path = dataset_path.parent
 
         # Info about the individuals (CSP, city category...)
-        indiv = pd.read_csv(
+        indiv = read_survey_csv(
             data_folder_path / "Q_tcm_individu.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype=str,
             usecols=["IDENT_MEN", "IDENT_IND", "CS24"],
         )
@@ -104,10 +120,9 @@ class ENTDMobilitySurvey(MobilitySurvey):
         indiv.loc[indiv["csp"].isnull(), "csp"] = "no_csp"
 
         # Info about households
-        hh = pd.read_csv(
+        hh = read_survey_csv(
             data_folder_path / "Q_tcm_menage_0.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype=str,
             usecols=["idENT_MEN", "numcom_UU2010", "NPERS", "CS24PR"],
         )
@@ -117,10 +132,9 @@ class ENTDMobilitySurvey(MobilitySurvey):
         hh["n_pers"] = hh["n_pers"].astype(int)
 
         # Number of cars in each household
-        cars = pd.read_csv(
+        cars = read_survey_csv(
             data_folder_path / "Q_menage.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype=str,
             usecols=["idENT_MEN", "V1_JNBVEH"],
         )
@@ -132,103 +146,17 @@ class ENTDMobilitySurvey(MobilitySurvey):
 
         # ------------------------------------------
         # Trips dataset
-        df = pd.read_csv(
-            data_folder_path / "K_deploc.csv",
-            encoding="latin-1",
-            sep=";",
-            dtype=str,
-            usecols=[
-                "IDENT_IND",
-                "IDENT_JOUR",
-                "PONDKI",
-                "V2_TYPJOUR",
-                "V2_DLOCAL",
-                "V2_MMOTIFDES",
-                "V2_MMOTIFORI",
-                "V2_MDISTTOT",
-                "V2_MTP",
-                "V2_MACCOMPM",
-                "V2_MACCOMPHM",
-            ],
-        )
-        df["V2_MDISTTOT"] = df["V2_MDISTTOT"].astype(float)
-        df["PONDKI"] = df["PONDKI"].astype(float)
-        df["n_other_passengers"] = df["V2_MACCOMPM"].astype(int) + df[
-            "V2_MACCOMPHM"
-        ].astype(int)
-        df["weekday"] = np.where(df["V2_TYPJOUR"] == "1", True, False)
+        if self.parse_engine == "polars":
+            df, days_trip = self.prepare_short_trips_polars(data_folder_path, indiv, hh, cars)
+        else:
+            df, days_trip = self.prepare_short_trips(data_folder_path, indiv, hh, cars)
 
-        # Remove long distance trips (> 80 km from home)
-        df = df[df["V2_DLOCAL"] == "1"]
-
-        # Remove trips with an unknown or zero distance
-        df = df[(df["V2_MDISTTOT"] > 0.0) | (~df["V2_MDISTTOT"].isnull())]
-
-        # Merge the trips dataframe with the data about individuals and household cars
-        df = pd.merge(df, indiv, on="IDENT_IND")
-        df = pd.merge(
-            df, hh[["city_category", "IDENT_MEN", "csp_household"]], on="IDENT_MEN"
-        )
-        df = pd.merge(df, cars, on="IDENT_MEN")
-
-        # Data base of days trip : group the trips by days
-        days_trip = df[
-            ["IDENT_JOUR", "weekday", "city_category", "csp", "n_cars", "PONDKI"]
-        ].copy()
-        days_trip.columns = [
-            "day_id",
-            "weekday",
-            "city_category",
-            "csp",
-            "n_cars",
-            "pondki",
-        ]
-        # Keep only the first trip of each day to have one row per day
-        days_trip = days_trip.groupby("day_id").first()
-        days_trip.reset_index(inplace=True)
-        days_trip.set_index(["csp", "n_cars", "weekday",
-                            "city_category"], inplace=True)
-
-        # Filter and format the columns
-        df = df[
-            [
-                "IDENT_IND",
-                "IDENT_JOUR",
-                "weekday",
-                "city_category",
-                "csp",
-                "n_cars",
-                "V2_MMOTIFORI",
-                "V2_MMOTIFDES",
-                "V2_MTP",
-                "V2_MDISTTOT",
-                "n_other_passengers",
-                "PONDKI",
-            ]
-        ]
-        df.columns = [
-            "individual_id",
-            "day_id",
-            "weekday",
-            "city_category",
-            "csp",
-            "n_cars",
-            "previous_motive",
-            "motive",
-            "mode_id",
-            "distance",
-            "n_other_passengers",
-            "pondki",
-        ]
-        #setting the index to "day_id"
-        df.set_index(["day_id"], inplace=True)
 
         # ------------------------------------------
         # Long distance trips dataset
-        df_long = pd.read_csv(
+        df_long = read_survey_csv(
             data_folder_path / "K_voydepdet.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype=str,
             usecols=[
                 "IDENT_IND",
@@ -344,10 +272,9 @@ class ENTDMobilitySurvey(MobilitySurvey):
 
         # ------------------------------------------
         # Travels dataset
-        travels = pd.read_csv(
+        travels = read_survey_csv(
             data_folder_path / "K_voyage.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype=str,
             usecols=[
                 "IDENT_IND",
@@ -412,10 +339,9 @@ class ENTDMobilitySurvey(MobilitySurvey):
         # ------------------------------------------
         # Population by csp in 2008 from the weigths in the data base k_mobilite
         # These weights have been computed to be representative of the french population (>=6 years old) = 56.173e6 individuals
-        indiv_mob = pd.read_csv(
+        indiv_mob = read_survey_csv(
             data_folder_path / "K_mobilite.csv",
-            encoding="latin-1",
-            sep=";",
+            engine=self.parse_engine,
             dtype={
                 "IDENT_IND": str,
                 "V2_IMMODEP_A": bool,
@@ -668,7 +594,209 @@ class ENTDMobilitySurvey(MobilitySurvey):
             "p_det_mode": p_det_mode.to_frame()
         }
 
-        for name, df in files.items():
-            df.to_parquet(self.cache_path[name])
+        write_survey_tables(files, self.cache_path, self.parse_engine)
 
         return None
+
+
+    def prepare_short_trips(
+            self,
+            data_folder_path: pathlib.Path,
+            indiv: pd.DataFrame,
+            hh: pd.DataFrame,
+            cars: pd.DataFrame
+        ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Prepares the short trips and the days trip tables from the trips file
+        of the survey, with pandas.
+
+        Returns:
+            tuple: The short trips (indexed by day id) and the days trip tables.
+        """
+
+        df = read_survey_csv(
+            data_folder_path / "K_deploc.csv",
+            dtype=str,
+            usecols=[
+                "IDENT_IND",
+                "IDENT_JOUR",
+                "PONDKI",
+                "V2_TYPJOUR",
+                "V2_DLOCAL",
+                "V2_MMOTIFDES",
+                "V2_MMOTIFORI",
+                "V2_MDISTTOT",
+                "V2_MTP",
+                "V2_MACCOMPM",
+                "V2_MACCOMPHM",
+            ],
+        )
+        df["V2_MDISTTOT"] = df["V2_MDISTTOT"].astype(float)
+        df["PONDKI"] = df["PONDKI"].astype(float)
+        df["n_other_passengers"] = df["V2_MACCOMPM"].astype(int) + df[
+            "V2_MACCOMPHM"
+        ].astype(int)
+        df["weekday"] = np.where(df["V2_TYPJOUR"] == "1", True, False)
+
+        # Remove long distance trips (> 80 km from home)
+        df = df[df["V2_DLOCAL"] == "1"]
+
+        # Remove trips with an unknown or zero distance
+        df = df[(df["V2_MDISTTOT"] > 0.0) | (~df["V2_MDISTTOT"].isnull())]
+
+        # Merge the trips dataframe with the data about individuals and household cars
+        df = pd.merge(df, indiv, on="IDENT_IND")
+        df = pd.merge(
+            df, hh[["city_category", "IDENT_MEN", "csp_household"]], on="IDENT_MEN"
+        )
+        df = pd.merge(df, cars, on="IDENT_MEN")
+
+        # Data base of days trip : group the trips by days
+        days_trip = df[
+            ["IDENT_JOUR", "weekday", "city_category", "csp", "n_cars", "PONDKI"]
+        ].copy()
+        days_trip.columns = [
+            "day_id",
+            "weekday",
+            "city_category",
+            "csp",
+            "n_cars",
+            "pondki",
+        ]
+        # Keep only the first trip of each day to have one row per day
+        days_trip = days_trip.groupby("day_id").first()
+        days_trip.reset_index(inplace=True)
+        days_trip.set_index(["csp", "n_cars", "weekday",
+                            "city_category"], inplace=True)
+
+        # Filter and format the columns
+        df = df[
+            [
+                "IDENT_IND",
+                "IDENT_JOUR",
+                "weekday",
+                "city_category",
+                "csp",
+                "n_cars",
+                "V2_MMOTIFORI",
+                "V2_MMOTIFDES",
+                "V2_MTP",
+                "V2_MDISTTOT",
+                "n_other_passengers",
+                "PONDKI",
+            ]
+        ]
+        df.columns = [
+            "individual_id",
+            "day_id",
+            "weekday",
+            "city_category",
+            "csp",
+            "n_cars",
+            "previous_motive",
+            "motive",
+            "mode_id",
+            "distance",
+            "n_other_passengers",
+            "pondki",
+        ]
+        #setting the index to "day_id"
+        df.set_index(["day_id"], inplace=True)
+
+        return df, days_trip
+
+
+    def prepare_short_trips_polars(
+            self,
+            data_folder_path: pathlib.Path,
+            indiv: pd.DataFrame,
+            hh: pd.DataFrame,
+            cars: pd.DataFrame
+        ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Prepares the same tables as prepare_short_trips, with polars : the 
+        trips file is parsed, filtered and merged with the individuals and 
+        households data in polars, and only the resulting tables are 
+        converted to pandas.
+
+        Returns:
+            tuple: The short trips (indexed by day id) and the days trip tables.
+        """
+
+        df = read_survey_csv_polars(
+            data_folder_path / "K_deploc.csv",
+            dtype=str,
+            usecols=[
+                "IDENT_IND",
+                "IDENT_JOUR",
+                "PONDKI",
+                "V2_TYPJOUR",
+                "V2_DLOCAL",
+                "V2_MMOTIFDES",
+                "V2_MMOTIFORI",
+                "V2_MDISTTOT",
+                "V2_MTP",
+                "V2_MACCOMPM",
+                "V2_MACCOMPHM",
+            ],
+        )
+
+        df = (
+            df
+            .with_columns(
+                V2_MDISTTOT=pl.col("V2_MDISTTOT").cast(pl.Float64),
+                PONDKI=pl.col("PONDKI").cast(pl.Float64),
+                n_other_passengers=pl.col("V2_MACCOMPM").cast(pl.Int64) + pl.col("V2_MACCOMPHM").cast(pl.Int64),
+                weekday=pl.col("V2_TYPJOUR").eq_missing("1")
+            )
+            # Remove long distance trips (> 80 km from home), and trips with 
+            # an unknown or zero distance
+            .filter(pl.col("V2_DLOCAL") == "1")
+            .filter((pl.col("V2_MDISTTOT") > 0.0) | pl.col("V2_MDISTTOT").is_not_null())
+            # Merge the trips dataframe with the data about individuals and household cars
+            .join(pl.from_pandas(indiv), on="IDENT_IND", maintain_order="left")
+            .join(pl.from_pandas(hh[["city_category", "IDENT_MEN", "csp_household"]]), on="IDENT_MEN", maintain_order="left")
+            .join(pl.from_pandas(cars), on="IDENT_MEN", maintain_order="left")
+        )
+
+        # Data base of days trip : keep only the first trip of each day to 
+        # have one row per day
+        days_trip = (
+            df
+            .select(
+                day_id=pl.col("IDENT_JOUR"),
+                weekday=pl.col("weekday"),
+                city_category=pl.col("city_category"),
+                csp=pl.col("csp"),
+                n_cars=pl.col("n_cars"),
+                pondki=pl.col("PONDKI")
+            )
+            .group_by("day_id")
+            .agg(pl.all().drop_nulls().first())
+            .sort("day_id")
+            .to_pandas()
+            .set_index(["csp", "n_cars", "weekday", "city_category"])
+        )
+
+        # Filter and format the columns
+        df = (
+            df
+            .select(
+                individual_id=pl.col("IDENT_IND"),
+                day_id=pl.col("IDENT_JOUR"),
+                weekday=pl.col("weekday"),
+                city_category=pl.col("city_category"),
+                csp=pl.col("csp"),
+                n_cars=pl.col("n_cars"),
+                previous_motive=pl.col("V2_MMOTIFORI"),
+                motive=pl.col("V2_MMOTIFDES"),
+                mode_id=pl.col("V2_MTP"),
+                distance=pl.col("V2_MDISTTOT"),
+                n_other_passengers=pl.col("n_other_passengers"),
+                pondki=pl.col("PONDKI")
+            )
+            .to_pandas()
+            .set_index("day_id")
+        )
+
+        return df, days_trip
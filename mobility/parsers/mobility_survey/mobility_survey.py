@@ -4,6 +4,12 @@ import polars as pl
 import pandas as pd
 
 from mobility.file_asset import FileAsset
+from mobility.inputs_hashing import hash_json
+from mobility.parsers.mobility_survey.survey_index import SurveyIndex
+from mobility.parsers.mobility_survey.chains_probability import ChainsProbability
+
+# Profile filters of the days sampling index, in the order used by safe_sample
+DAYS_TRIP_INDEX_KEYS = ["csp", "n_cars", "weekday", "city_category"]
 
 class MobilitySurvey(FileAsset):
     """
@@ -15,6 +21,8 @@ class MobilitySurvey(FileAsset):
     
     Methods:
         get_cached_asset: Returns the cached asset data as a dictionary of pandas DataFrames.
+        get_lazy: Returns polars scans of the cached asset data, created once per survey instance.
+        get_days_trip_index: Returns the days sampling index by profile, cached with the survey data.
     """
     
     def __init__(self, inputs, seq_prob_cutoff: float = 0.95):
@@ -35,6 +43,7 @@ class MobilitySurvey(FileAsset):
         cache_path = {k: folder_path / file for k, file in files.items()}
         
         self.seq_prob_cutoff = seq_prob_cutoff
+        self.lazy_asset = None
 
         super().__init__(inputs, cache_path)
         
@@ -47,18 +56,117 @@ class MobilitySurvey(FileAsset):
         """
         return {k: pd.read_parquet(path) for k, path in self.cache_path.items()}
     
+    
+    def get_lazy(self) -> dict[str, pl.LazyFrame]:
+        """
+        Gets the survey data as polars scans of the survey files, so that 
+        queries only read the columns and rows they select (the pandas index
+        levels of the tables are regular columns of the scans). The survey 
+        files are created first if needed, and the scans are created once 
+        per survey instance.
+        
+        Returns:
+            dict: A dictionary where keys are data identifiers and values are polars LazyFrames.
+        """
+        
+        if self.lazy_asset is None:
+            
+            if self.is_update_needed():
+                self.get()
+                
+            self.lazy_asset = {k: pl.scan_parquet(path) for k, path in self.cache_path.items()}
+            
+        return self.lazy_asset
+    
 
-    def get_chains_probability(self, motives):
+    def get_days_trip_index(self, minimum_sample_size: int = 10) -> SurveyIndex:
+        """
+        Gets the weighted sampling index of the survey days by profile (CSP,
+        number of cars, weekday, urban unit category), that resolves the 
+        relaxed filters of safe_sample once for all the profiles.
+
+        The index is built the first time and cached next to the survey files,
+        in a file named after the hash of the index keys and minimum sample 
+        size (it is rebuilt when the days_trip file is newer than the index). 
+        The survey files are only read when the index has to be built.
+        
+        Args:
+            minimum_sample_size (int): The minimum number of days below which
+                safe_sample relaxes a filter.
+        
+        Returns:
+            SurveyIndex: The days sampling index.
+        """
+        
+        days_trip_path = self.cache_path["days_trip"]
+        
+        index_hash = hash_json({"keys": DAYS_TRIP_INDEX_KEYS, "minimum_sample_size": minimum_sample_size})
+        path = days_trip_path.parent / (index_hash + "-days_trip_index.parquet")
         
-        motive_mapping = [{"group": m.name, "motive": m.survey_ids} for m in motives]
-        motive_mapping = pd.DataFrame(motive_mapping)
-        motive_mapping = motive_mapping.explode("motive")
-        motive_mapping = motive_mapping.set_index("motive").to_dict()["group"]
+        if path.exists() and days_trip_path.exists() and path.stat().st_mtime >= days_trip_path.stat().st_mtime:
+            return SurveyIndex.load(path)
         
-        motive_names = [m.name for m in motives]
+        days_trip = self.get()["days_trip"]
+        
+        index = SurveyIndex.build(
+            days_trip,
+            keys=DAYS_TRIP_INDEX_KEYS,
+            id_col="day_id",
+            weight_col="pondki",
+            minimum_sample_size=minimum_sample_size
+        )
+        index.save(path)
+        
+        return index
+    
+
+    def get_chains_probability(self, motives) -> dict[str, pl.DataFrame]:
+        """
+        Gets the probabilities of the motive sequences of the survey for these
+        motives, computed once for each motive mapping and seq_prob_cutoff 
+        (see ChainsProbability).
+        
+        Args:
+            motives (list): The motives, with their name and survey_ids.
+        
+        Returns:
+            dict: The "chains" and "motive_seqs" tables of ChainsProbability.
+        """
+        
+        motive_mapping = {m.name: list(m.survey_ids) if m.survey_ids is not None else [] for m in motives}
+        
+        return ChainsProbability(self, motive_mapping, self.seq_prob_cutoff).get()
+    
+
+    def compute_chains_probability(self, motive_mapping: dict[str, list], seq_prob_cutoff: float) -> pl.DataFrame:
+        """
+        Computes the probabilities of the motive sequences of the survey, by
+        day status, urban unit category, CSP and number of cars.
+        
+        Args:
+            motive_mapping (dict): The survey motive ids of each motive name.
+            seq_prob_cutoff (float): The share of the average distance that 
+                the most contributing sequences of each group should cover.
+        
+        Returns:
+            pl.DataFrame: The steps of each sequence, with their "-" joined motive_seq.
+        """
+        
+        motive_names = list(motive_mapping.keys())
+        motive_mapping = {
+            survey_id: name
+            for name, survey_ids in motive_mapping.items()
+            for survey_id in survey_ids
+        }
 
-        days_trips = pl.from_pandas(self.get()["days_trip"].reset_index())
-        short_trips = pl.from_pandas(self.get()["short_trips"].reset_index())
+        survey = self.get_lazy()
+        
+        days_trips = survey["days_trip"].select(["day_id", "day_of_week", "pondki"])
+        short_trips = survey["short_trips"].select([
+            "individual_id", "day_id", "daily_trip_index", "motive",
+            "city_category", "csp", "n_cars",
+            "departure_time", "arrival_time", "distance"
+        ])
         
         # About 3 % of the sequences for the swiss MRMT survey are incomplete 
         # (missing steps). For now they are filtered out to avoid bugs in 
@@ -82,7 +190,7 @@ class MobilitySurvey(FileAsset):
 
         sequences = (
             
-            days_trips.select(["day_id", "day_of_week", "pondki"])
+            days_trips
             .join(short_trips, on="day_id")
             .join(incomplete_sequences, on=["individual_id","day_id"], how="anti")
             .rename({"daily_trip_index": "seq_step_index"})
@@ -127,7 +235,7 @@ class MobilitySurvey(FileAsset):
                     (pl.col("seq_step_index") == pl.col("max_seq_step_index")) & 
                     (pl.col("motive") != "home")
                 ).then(
-                    pl.lit("home")
+                    pl.lit("home", dtype=pl.Enum(motive_names))
                 ).otherwise(
                     pl.col("motive")
                 )
@@ -296,7 +404,7 @@ class MobilitySurvey(FileAsset):
         # Compute the probability of each subsequence, keeping only the first 
         # x % of the contribution to the average distance for each population 
         # group
-        cutoff = self.seq_prob_cutoff
+        cutoff = seq_prob_cutoff
 
         p_seq = (
             
@@ -333,7 +441,7 @@ class MobilitySurvey(FileAsset):
             
             # Filter subsequences
             .with_columns(
-                group_count=pl.count().over(["is_weekday", "city_category", "csp", "n_cars"]),
+                group_count=pl.len().over(["is_weekday", "city_category", "csp", "n_cars"]),
                 cross_threshold=(
                     (pl.col("distance_p_cum_share") >= cutoff) & 
                     (pl.col("distance_p_cum_share").shift(1).over(["is_weekday", "city_category", "csp", "n_cars"]) < cutoff)
@@ -361,6 +469,7 @@ class MobilitySurvey(FileAsset):
         sequences = (
             sequences.drop("pondki")
             .join(p_seq, on=["is_weekday", "city_category", "csp", "n_cars", "motive_seq"])    
+            .collect()
         )
         
         return sequences
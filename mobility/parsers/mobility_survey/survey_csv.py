@@ -0,0 +1,98 @@
+import pathlib
+import pandas as pd
+import polars as pl
+
+from concurrent.futures import ThreadPoolExecutor
+from pandas._libs.parsers import STR_NA_VALUES
+
+# Types of the columns read with an explicit dtype, for the "polars" engine
+POLARS_DTYPES = {
+    str: pl.String,
+    int: pl.Int64,
+    float: pl.Float64,
+    bool: pl.Boolean
+}
+
+
+def read_survey_csv(path: pathlib.Path, usecols: list, dtype=None, engine: str = "pandas") -> pd.DataFrame:
+    """
+    Reads the columns of a raw survey CSV file (latin-1 encoded, ";"
+    separated), as pd.read_csv(path, encoding="latin-1", sep=";",
+    dtype=dtype, usecols=usecols) would.
+
+    The "polars" engine reads the file with read_survey_csv_polars.
+
+    Args:
+        path (pathlib.Path): The path of the CSV file.
+        usecols (list): The columns to read (returned in the order of the file).
+        dtype: A type for all the columns, or a dict of types by column (str, int, float or bool).
+        engine (str): "pandas" or "polars".
+
+    Returns:
+        pd.DataFrame: The columns of the file.
+    """
+
+    if engine == "pandas":
+        return pd.read_csv(path, encoding="latin-1", sep=";", dtype=dtype, usecols=usecols)
+
+    if engine != "polars":
+        raise ValueError("Unknown survey parsing engine : " + str(engine) + " (should be 'pandas' or 'polars').")
+
+    return read_survey_csv_polars(path, usecols, dtype).to_pandas()
+
+
+def read_survey_csv_polars(path: pathlib.Path, usecols: list, dtype=None) -> pl.DataFrame:
+    """
+    Reads the columns of a raw survey CSV file with polars, with an explicit
+    schema for the columns that have a dtype, the pandas missing values
+    markers, and a type inference on all the rows for the other columns (so
+    the columns have the types pd.read_csv would give them). The file is 
+    decoded from latin-1 in memory by polars.
+
+    Args:
+        path (pathlib.Path): The path of the CSV file.
+        usecols (list): The columns to read (returned in the order of the file).
+        dtype: A type for all the columns, or a dict of types by column (str, int, float or bool).
+
+    Returns:
+        pl.DataFrame: The columns of the file.
+    """
+
+    header = pl.read_csv(path, separator=";", encoding="latin1", n_rows=0).columns
+    columns = [c for c in header if c in usecols]
+
+    if dtype is None:
+        dtype = {}
+    elif not isinstance(dtype, dict):
+        dtype = {c: dtype for c in columns}
+
+    survey = pl.read_csv(
+        path,
+        separator=";",
+        encoding="latin1",
+        columns=columns,
+        schema_overrides={c: POLARS_DTYPES[t] for c, t in dtype.items() if c in columns},
+        infer_schema_length=None,
+        null_values=list(STR_NA_VALUES)
+    )
+
+    return survey.select(columns)
+
+
+def write_survey_tables(tables: dict[str, pd.DataFrame], cache_path: dict[str, pathlib.Path], engine: str = "pandas") -> None:
+    """
+    Writes the parsed survey tables to their parquet files, one after the
+    other with the "pandas" engine, or concurrently with the "polars" engine.
+    """
+
+    if engine == "pandas":
+        for name, table in tables.items():
+            table.to_parquet(cache_path[name])
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        futures = [executor.submit(table.to_parquet, cache_path[name]) for name, table in tables.items()]
+        for future in futures:
+            future.result()
+
+    return None
@@ -0,0 +1,151 @@
+import io
+import itertools
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from mobility import safe_sample
+
+ROW_POSITION_COL = "_survey_index_row"
+
+
+class SurveyIndex:
+    """
+    Precomputed weighted sampling index of a survey table (the days of the
+    days_trip table for example), that gives for each combination of profile
+    values the rows that filter_database would return, and their cumulative
+    weights.
+
+    filter_database applies the filters one after the other, and relaxes a
+    filter when fewer than minimum_sample_size rows match it. The relaxed
+    filter level of each combination is resolved once when the index is
+    built, so sampling is then a lookup and a searchsorted draw. Combinations
+    that end up with the same rows share them in the index.
+
+    Values that are not in the table (or are missing) never match any row,
+    so their filter is always relaxed : they are stored as None in the index.
+
+    Attributes:
+        keys (list): The filtered columns, in the order of the filters.
+        lookup (pd.DataFrame): The segment of rows of each combination of key values.
+        ids (np.ndarray): The ids of the rows of all the segments.
+        cum_weights (np.ndarray): The cumulative weights of the rows, within each segment.
+        segment_starts (np.ndarray): The start of each segment in ids and cum_weights
+            (with the end of the last segment as last value).
+    """
+
+    def __init__(self, keys, lookup, ids, cum_weights, segment_starts):
+        self.keys = keys
+        self.lookup = lookup
+        self.ids = ids
+        self.cum_weights = cum_weights
+        self.segment_starts = segment_starts
+
+        self.key_values = [set(lookup[k].dropna()) for k in keys]
+        self.segments = {
+            tuple(None if pd.isna(v) else v for v in values): int(segment)
+            for values, segment in zip(
+                lookup[keys].itertuples(index=False, name=None),
+                lookup["segment"].to_numpy()
+            )
+        }
+
+
+    @classmethod
+    def build(cls, table: pd.DataFrame, keys: list, id_col: str, weight_col: str, minimum_sample_size: int = 10):
+        """
+        Builds the index of a table indexed by the keys, calling filter_database
+        once for each combination of key values.
+        """
+
+        table = table.assign(**{ROW_POSITION_COL: np.arange(table.shape[0])})
+        
+        columns = table.reset_index()
+
+        key_values = [
+            sorted(columns[k].dropna().unique().tolist()) if k in columns.columns else []
+            for k in keys
+        ]
+
+        weights = table[weight_col].to_numpy()
+        ids = table[id_col].to_numpy()
+
+        segments = {}
+        lookup = []
+
+        for combination in itertools.product(*[values + [None] for values in key_values]):
+
+            # filter_database modifies the index of the table it filters
+            rows = safe_sample.filter_database(
+                table.copy(),
+                minimum_sample_size=minimum_sample_size,
+                **dict(zip(keys, combination))
+            )
+            
+            rows = rows[ROW_POSITION_COL].to_numpy()
+            rows_key = rows.tobytes()
+
+            if rows_key not in segments:
+                segments[rows_key] = (len(segments), rows)
+
+            lookup.append(combination + (segments[rows_key][0], ))
+
+        rows = [r for _, r in sorted(segments.values(), key=lambda s: s[0])]
+
+        lookup = pd.DataFrame(lookup, columns=keys + ["segment"])
+        segment_starts = np.concatenate([[0], np.cumsum([r.shape[0] for r in rows])])
+        cum_weights = np.concatenate([np.cumsum(weights[r]) for r in rows])
+
+        return cls(keys, lookup, ids[np.concatenate(rows)], cum_weights, segment_starts)
+
+
+    def sample(self, values: tuple, n: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Samples n ids with replacement, weighted, among the rows that
+        filter_database would return for these key values.
+        """
+
+        values = tuple(v if v in kv else None for v, kv in zip(values, self.key_values))
+        segment = self.segments[values]
+
+        start, end = self.segment_starts[segment], self.segment_starts[segment + 1]
+        ids = self.ids[start:end]
+        cum_weights = self.cum_weights[start:end]
+
+        if n == 0:
+            return ids[:0]
+
+        index = np.searchsorted(cum_weights, rng.random(n)*cum_weights[-1], side="right")
+
+        return ids[np.minimum(index, ids.shape[0] - 1)]
+
+
+    def save(self, path) -> None:
+        """
+        Writes the index to a parquet file, with the lookup table in the
+        file metadata.
+        """
+
+        table = pa.table({"id": self.ids, "cum_weight": self.cum_weights})
+
+        metadata = {
+            b"keys": ",".join(self.keys).encode("utf-8"),
+            b"lookup": self.lookup.to_json(orient="split").encode("utf-8"),
+            b"segment_starts": ",".join(str(s) for s in self.segment_starts).encode("utf-8")
+        }
+
+        pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+    @classmethod
+    def load(cls, path):
+        table = pq.read_table(path)
+        metadata = table.schema.metadata
+
+        keys = metadata[b"keys"].decode("utf-8").split(",")
+        lookup = pd.read_json(io.StringIO(metadata[b"lookup"].decode("utf-8")), orient="split", dtype=False)
+        segment_starts = np.array([int(s) for s in metadata[b"segment_starts"].decode("utf-8").split(",")])
+
+        return cls(keys, lookup, table["id"].to_numpy(), table["cum_weight"].to_numpy(), segment_starts)
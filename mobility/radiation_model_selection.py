@@ -38,13 +38,46 @@ from mobility.r_utils.r_script import RScript
 
 
 
-def apply_radiation_model(sources, sinks, costs, utilities, selection_lambda):
+# Cost deltas (and their probabilities) used to smooth the opportunities
+# locations and costs to account for uncertainty (for now with a constant cost
+# delta and a gaussian distribution, but could be estimated from the cost
+# uncertainty specific to each OD)
+COST_UNCERTAINTY_DELTAS = [-2.0, -1.0, 0.0, 1.0, 2.0]
+COST_UNCERTAINTY_PROBS = [0.07, 0.24, 0.38, 0.24, 0.07]
+
+
+def apply_radiation_model(sources, sinks, costs, utilities, selection_lambda, engine="polars"):
+    """
+    Computes the flows from sources to sinks with the radiation model with
+    selection, where the opportunities of each origin are ranked by net
+    utility (utility - 2 x cost, binned to the unit, the costs being smoothed
+    with COST_UNCERTAINTY_DELTAS).
+    
+    The "polars" engine works on the OD table in long format, replicated for
+    each cost delta. The "numpy" engine works on origins x destinations
+    matrices (see apply_radiation_model_numpy) and gives the same flows,
+    within floating point tolerance.
+
+    Args:
+        sources (pl.DataFrame): "from" and "source_volume" columns.
+        sinks (pl.DataFrame): "to" and "sink_volume" columns.
+        costs (pl.DataFrame): "from", "to" and "cost" columns.
+        utilities (pl.DataFrame): "to" and "utility" columns.
+        selection_lambda (float): Parameter of the radiation model with selection.
+        engine (str): "polars" (default) or "numpy".
+
+    Returns:
+        pl.DataFrame: "from", "to" and "flow_volume" columns.
+    """
+    
+    if engine == "numpy":
+        return apply_radiation_model_numpy(sources, sinks, costs, utilities, selection_lambda)
+    
+    if engine != "polars":
+        raise ValueError("Unknown radiation model engine : " + str(engine) + " (should be 'polars' or 'numpy').")
 
     eps = 1e-6
     
-    # Smooth the opportunities locations and costs to account for uncertainty
-    # (for now with a constant cost delta and a gaussian distribution, but 
-    # could be estimated from the cost uncertainty specific to each OD)
     def offset_costs(costs, delta, prob):
         return (
             costs
@@ -55,11 +88,8 @@ def apply_radiation_model(sources, sinks, costs, utilities, selection_lambda):
         )
     
     costs = pl.concat([
-        offset_costs(costs, -2.0, 0.07),
-        offset_costs(costs, -1.0, 0.24),
-        offset_costs(costs, +0.0, 0.38),
-        offset_costs(costs, +1.0, 0.24),
-        offset_costs(costs, +2.0, 0.07)
+        offset_costs(costs, delta, prob)
+        for delta, prob in zip(COST_UNCERTAINTY_DELTAS, COST_UNCERTAINTY_PROBS)
     ])
     
     # Remove zero sources / sinks transport zones
@@ -156,6 +186,143 @@ def apply_radiation_model(sources, sinks, costs, utilities, selection_lambda):
 
 
 
+def apply_radiation_model_numpy(sources, sinks, costs, utilities, selection_lambda, max_block_cells=2000000):
+    """
+    Radiation model with selection on zone indexed matrices (origins x
+    destinations), giving the same flows as the polars engine of
+    apply_radiation_model without replicating the OD table for each cost delta.
+    
+    The net utility bins are integers, so the destinations of each origin are
+    ranked by bin with a counting sort (a per row histogram of the sinks 
+    volumes by bin). The cost deltas shift the bins by even integers, so the 
+    smoothed opportunities are the convolution of this histogram with the 
+    cost uncertainty kernel, and the radiation probabilities are computed 
+    once per bin with cumulative sums, for blocks of origins of at most 
+    max_block_cells cells.
+
+    Args:
+        sources (pl.DataFrame): "from" and "source_volume" columns.
+        sinks (pl.DataFrame): "to" and "sink_volume" columns.
+        costs (pl.DataFrame): "from", "to" and "cost" columns.
+        utilities (pl.DataFrame): "to" and "utility" columns.
+        selection_lambda (float): Parameter of the radiation model with selection.
+        max_block_cells (int): Maximum number of OD cells (or origin x bin 
+            cells) processed at once.
+
+    Returns:
+        pl.DataFrame: "from", "to" and "flow_volume" columns.
+    """
+    
+    sources = sources.filter(pl.col("source_volume") > 0.0)
+    sinks = sinks.filter(pl.col("sink_volume") > 0.0)
+    
+    od = (
+        sources.select(["from", "source_volume"])
+        .join(costs.select(["from", "to", "cost"]), on="from")
+        .join(sinks.select(["to", "sink_volume"]), on="to")
+        .join(utilities.select(["to", "utility"]), on="to")
+    )
+    
+    if od.height == 0:
+        return pl.DataFrame(schema={"from": sources.schema["from"], "to": sinks.schema["to"], "flow_volume": pl.Float64})
+    
+    origins = od.select(["from", "source_volume"]).unique("from").sort("from")
+    destinations = od.select(["to", "sink_volume"]).unique("to").sort("to")
+    
+    n_origins = origins.height
+    n_destinations = destinations.height
+    
+    i = origins["from"].search_sorted(od["from"]).to_numpy()
+    j = destinations["to"].search_sorted(od["to"]).to_numpy()
+    
+    # Rank of the net utility bin of each OD, from the top bin (the cells of
+    # the ODs without costs get the rank 0 of the top bin, with a zero sink
+    # volume so they add no opportunities). The net utility is rounded by 
+    # polars, to break the .5 ties as the polars engine does.
+    net_utility_bin = od.select((pl.col("utility") - 2*pl.col("cost")).round())
+    net_utility_bin = net_utility_bin.to_series().to_numpy()
+    
+    rank = np.zeros((n_origins, n_destinations), dtype=np.int64)
+    rank[i, j] = (net_utility_bin.max() - net_utility_bin).astype(np.int64)
+    
+    volume = np.zeros((n_origins, n_destinations))
+    volume[i, j] = od["sink_volume"].to_numpy()
+    
+    source_volume = origins["source_volume"].to_numpy()
+    
+    # Rank shifts of the cost deltas (even integers, so binning the shifted 
+    # net utility is the same as shifting the base bin)
+    shifts = [int(2*delta) for delta in COST_UNCERTAINTY_DELTAS]
+    probs = COST_UNCERTAINTY_PROBS
+    pad = max(abs(shift) for shift in shifts)
+    
+    n_bins = int(rank.max()) + 1 + 2*pad
+    
+    def p_a(s):
+        return (1 - selection_lambda**(1+s)) / (1+s) / (1-selection_lambda)
+    
+    block_rows = max(1, max_block_cells // max(n_destinations, n_bins))
+    flows = []
+    
+    for start in range(0, n_origins, block_rows):
+        
+        rows = slice(start, min(start + block_rows, n_origins))
+        
+        block_rank = rank[rows]
+        block_volume = volume[rows]
+        n_rows = block_rank.shape[0]
+        
+        # Sinks volume by origin and base bin rank (offset by 2 x pad to 
+        # convolve with the kernel without bound checks)
+        row_index = np.arange(n_rows, dtype=np.int64)[:, None]
+        hist = np.bincount(
+            (row_index*(n_bins + 2*pad) + block_rank + 2*pad).ravel(),
+            weights=block_volume.ravel(),
+            minlength=n_rows*(n_bins + 2*pad)
+        )
+        hist = hist.reshape(n_rows, n_bins + 2*pad)
+        
+        # Smoothed sinks volume in each bin (the copy of a destination for a
+        # given shift is in the bin of rank base rank + shift)
+        bin_volume = sum(p*hist[:, pad-shift:pad-shift+n_bins] for shift, p in zip(shifts, probs))
+        
+        # Radiation probabilities of the bins, from the volume of the bins 
+        # above and the volume of the bins above + the bin itself
+        s_in = np.cumsum(bin_volume, axis=1)
+        s_above = s_in - bin_volume
+        
+        p_norm = 1.0 - p_a(s_in[:, -1:])
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_to_bin = np.where(bin_volume > 0.0, (p_a(s_above) - p_a(s_in))/bin_volume, 0.0)
+        
+        # Disagregate the flows from the bins to the destinations
+        block_flows = sum(
+            p*np.take_along_axis(p_to_bin, block_rank + pad + shift, axis=1)
+            for shift, p in zip(shifts, probs)
+        )
+        block_flows *= block_volume * source_volume[rows, None] / p_norm
+        
+        # Remove small flows and rescale the remaining flows so that the 
+        # source volumes stay the same
+        block_flows = np.where(block_flows > 0.1, block_flows, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block_flows *= source_volume[rows, None] / block_flows.sum(axis=1, keepdims=True)
+        
+        flow_i, flow_j = np.nonzero(block_flows > 0.0)
+        
+        flows.append(
+            pl.DataFrame({
+                "from": origins["from"].gather(flow_i + start),
+                "to": destinations["to"].gather(flow_j),
+                "flow_volume": block_flows[flow_i, flow_j]
+            })
+        )
+    
+    return pl.concat(flows)
+
+
+
 
 
 def plot_volume(volume_location, coordinates, n_locations=10, title=""):
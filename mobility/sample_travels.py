@@ -29,11 +29,17 @@ def sample_travels(
     burnin=10000,
     thinning=1000,
     num_samples=1,
-    random_seed=None
+    random_seed=None,
+    method="mcmc"
 ):
     """
     Weighted MCMC sampling of k non-overlapping travels via swap-move Metropolis-Hastings.
 
+    The chain targets the distribution of the sets of k non-overlapping travels
+    with probabilities proportional to the product of their weights. The "exact" 
+    method draws independent samples from this distribution directly (see 
+    _sample_exact), and is much faster when many samples are needed.
+
     Parameters:
     - df: pandas DataFrame with travel records.
     - start_col: column name for integer start index (e.g., day-of-year).
@@ -44,10 +50,17 @@ def sample_travels(
     - thinning: number of steps between recorded samples.
     - num_samples: how many independent samples to collect.
     - random_seed: for reproducibility.
+    - method: "mcmc" (default) or "exact" (burnin and thinning are then ignored).
 
     Returns:
     - List of `num_samples` lists of DataFrame indices.
     """
+    if method == "exact":
+        return _sample_exact(df, start_col, length_col, weight_col, k, num_samples, random_seed)
+
+    if method != "mcmc":
+        raise ValueError("Unknown travels sampling method : " + str(method) + " (should be 'mcmc' or 'exact').")
+
     # 0) Optional: set random seeds for reproducibility
     if random_seed is not None:
         random.seed(random_seed)
@@ -118,3 +131,73 @@ def sample_travels(
     # 6) Map back from integer positions to DataFrame indices
     df_index = df.index.to_list()
     return [[df_index[i] for i in sample] for sample in samples]
+
+
+def _sample_exact(df, start_col, length_col, weight_col, k, num_samples=1, random_seed=None):
+    """
+    Exact sampling of k non-overlapping travels, with probabilities 
+    proportional to the product of the travel weights.
+
+    The travels are sorted by end day. Z[i][c] is the total weight of the sets 
+    of c non-overlapping travels among the first i travels, and p(i) the number 
+    of travels ending before travel i starts, so that:
+        Z[i][c] = Z[i-1][c] + w_i * Z[p(i)][c-1]
+    Each column of Z is then a cumulative sum over the previous column, 
+    computed in log space to avoid overflows.
+
+    A sample is drawn from the last travel to the first one : given c travels
+    left to pick among the first i, the last picked travel j is drawn with 
+    probability w_j * Z[p(j)][c-1] / Z[i][c], which is a search in the 
+    cumulative column Z[:, c]. All samples are drawn at once, in k steps.
+
+    Missing lengths are considered as zero nights, and k is capped to the 
+    maximum number of non-overlapping travels, like in the MCMC sampler.
+
+    Returns:
+    - List of `num_samples` lists of DataFrame indices.
+    """
+    rng = np.random.default_rng(random_seed)
+
+    starts = df[start_col].to_numpy().astype(float)
+    ends = starts + np.nan_to_num(df[length_col].to_numpy().astype(float))
+
+    # 1) Sort the travels by end day (then start day, so that zero night 
+    #    travels come after the other travels ending on the same day)
+    order = np.lexsort((starts, ends))
+    starts, ends = starts[order], ends[order]
+    n = order.shape[0]
+
+    with np.errstate(divide="ignore"):
+        log_weights = np.log(df[weight_col].to_numpy().astype(float)[order])
+
+    # p[i] : number of travels before travel i (in the sorted order) that end
+    # before it starts (these are exactly the travels compatible with it)
+    p = np.minimum(np.searchsorted(ends, starts, side="right"), np.arange(n))
+
+    # 2) Total weights of the sets of c travels among the first i travels
+    log_z = np.full((n + 1, k + 1), -np.inf)
+    log_z[:, 0] = 0.0
+
+    for c in range(1, k + 1):
+        log_z[1:, c] = np.logaddexp.accumulate(log_weights + log_z[p, c - 1])
+
+    # 3) Cap k to the maximum number of non-overlapping travels
+    possible = np.nonzero(np.isfinite(log_z[n]))[0]
+    k = int(possible.max()) if n > 0 else 0
+
+    if k == 0:
+        return [[]]
+
+    # 4) Draw the samples, from their last travel to their first one
+    position = np.full(num_samples, n)
+    chosen = np.empty((num_samples, k), dtype=np.int64)
+
+    for c in range(k, 0, -1):
+        target = np.log(1.0 - rng.random(num_samples)) + log_z[position, c]
+        j = np.clip(np.searchsorted(log_z[:, c], target, side="left"), 1, n)
+        chosen[:, c - 1] = j - 1
+        position = p[j - 1]
+
+    # 5) Map back from sorted positions to DataFrame indices
+    df_index = df.index.to_numpy()
+    return [df_index[order[sample]].tolist() for sample in chosen]
@@ -18,7 +18,11 @@ def set_params(
     r_packages=True,
     r_packages_force_reinstall=False,
     r_packages_download_method="auto",
-    debug=False
+    debug=False,
+    asset_workers=1,
+    asset_executor="thread",
+    shared_asset_store_folder_path=None,
+    shared_asset_store_max_size=None
 ):
     """
     Sets up the necessary environment for the Mobility package.
@@ -36,6 +40,10 @@ def set_params(
     r_packages_force_reinstall (bool, optional)
     r_packages_download_method (str, optional): set this parameter to "wininet" to be able to install packages on some proxies. See the installation.md page for details.
     debug (bool, optional): set debug to True to see the R logs, including error messages
+    asset_workers (int, optional): maximum number of independent outdated assets rebuilt at the same time
+    asset_executor (str, optional): "thread" or "process", the kind of pool used to rebuild assets concurrently
+    shared_asset_store_folder_path (str, optional): folder of a store of asset outputs shared by several projects (not used if None)
+    shared_asset_store_max_size (float, optional): maximum size of the shared asset store in GB, above which the least recently used assets are evicted
     """
 
     setup_logging()
@@ -46,6 +54,11 @@ def set_params(
     set_env_variable("HTTPS_PROXY", https_proxy_url)
     
     os.environ["MOBILITY_DEBUG"] = "1" if debug else "0"
+    os.environ["MOBILITY_ASSET_WORKERS"] = str(asset_workers)
+    os.environ["MOBILITY_ASSET_EXECUTOR"] = asset_executor
+    
+    set_env_variable("MOBILITY_SHARED_ASSET_STORE_FOLDER", shared_asset_store_folder_path)
+    set_env_variable("MOBILITY_SHARED_ASSET_STORE_MAX_SIZE", None if shared_asset_store_max_size is None else str(shared_asset_store_max_size))
 
     setup_package_data_folder_path(package_data_folder_path)
     setup_project_data_folder_path(project_data_folder_path)
@@ -0,0 +1,358 @@
+import os
+import time
+import contextlib
+import shutil
+import logging
+import pathlib
+import argparse
+
+
+class SharedAssetStore:
+    """
+    Content addressed store of FileAsset outputs, that can be shared by
+    several projects (for example two studies with overlapping regions, that
+    use the same OSM extracts and path graphs).
+
+    Outputs are stored in {folder}/{asset class name}/{inputs hash}/, and are
+    materialized in the project folders with hard links (or copies when the
+    store and the project are not on the same file system), so a shared asset
+    takes space only once on disk.
+
+    Because the project files and the store entries are the same files, they
+    must never be written through the links : FileAsset.detach_outputs 
+    unlinks the hard linked output files of an asset before it is rebuilt,
+    and assets that rewrite their output files in place after they are built
+    (the travel costs and graphs updated with the congestion) set the 
+    FileAsset.is_shareable class attribute to False and are never published
+    or materialized.
+
+    The last access time of an entry is the modification time of its folder.
+    The total size of the store is kept in the {folder}/store-size file,
+    updated at each publication (under the {folder}/store-size.lock lock
+    file, so that concurrent projects do not lose updates). When the store gets bigger than max_size,
+    the least recently used entries are evicted (project files that were
+    materialized from them are hard links, so they stay available in the
+    projects).
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        Folder of the store.
+    max_size : float, optional
+        Maximum size of the store, in GB (no limit if None).
+    """
+
+    def __init__(self, folder: pathlib.Path, max_size: float = None):
+        self.folder = pathlib.Path(folder)
+        self.max_size = max_size
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.size_path = self.folder / "store-size"
+        self.lock_path = self.folder / "store-size.lock"
+
+
+    def get_entry_path(self, asset) -> pathlib.Path:
+        return self.folder / asset.__class__.__name__ / asset.inputs_hash
+
+
+    def get_cache_paths(self, asset) -> list:
+        if isinstance(asset.cache_path, dict):
+            return [pathlib.Path(cp) for cp in asset.cache_path.values()]
+        return [pathlib.Path(asset.cache_path)]
+
+
+    def publish(self, asset) -> None:
+        """
+        Add the outputs of an asset to the store (nothing is done if they
+        are already in the store).
+        """
+
+        if not getattr(asset, "is_shareable", True):
+            return
+
+        entry_path = self.get_entry_path(asset)
+
+        if entry_path.exists():
+            self.touch(entry_path)
+            return
+
+        cache_paths = self.get_cache_paths(asset)
+
+        if not all(cp.exists() for cp in cache_paths):
+            return
+
+        # Write the entry in a temporary folder first, so other processes
+        # never see an incomplete entry
+        tmp_path = entry_path.with_name(entry_path.name + ".tmp-" + str(os.getpid()))
+        tmp_path.mkdir(parents=True, exist_ok=True)
+
+        for cp in cache_paths:
+            link_or_copy(cp, tmp_path / cp.name)
+
+        with self.lock():
+
+            # Read (or compute) the size of the store before adding the entry
+            self.get_size()
+
+            try:
+                tmp_path.rename(entry_path)
+            except OSError:
+                # Another process published the same entry in the meantime
+                shutil.rmtree(tmp_path)
+                return
+
+            size = self.add_to_size(get_size(entry_path))
+
+        if self.max_size is not None and size > self.max_size*1e9:
+            self.evict(self.max_size)
+
+
+    def materialize(self, asset) -> bool:
+        """
+        Create the missing output files of an asset from the store.
+
+        Returns
+        -------
+        bool
+            True if the outputs of the asset are available in the store (they
+            are then available in the project folder), False otherwise.
+        """
+
+        if not getattr(asset, "is_shareable", True):
+            return False
+
+        entry_path = self.get_entry_path(asset)
+
+        if not entry_path.exists():
+            return False
+
+        for cp in self.get_cache_paths(asset):
+            if not cp.exists():
+                cp.parent.mkdir(parents=True, exist_ok=True)
+                link_or_copy(entry_path / cp.name, cp)
+
+        self.touch(entry_path)
+
+        logging.info("Materialized " + asset.__class__.__name__ + " " + asset.inputs_hash + " from the shared asset store.")
+
+        return True
+
+
+    def touch(self, entry_path: pathlib.Path) -> None:
+        now = time.time()
+        os.utime(entry_path, (now, now))
+
+
+    @contextlib.contextmanager
+    def lock(self, timeout: float = 60.0):
+        """
+        Hold the lock of the store size file (created exclusively, so only 
+        one process at a time can hold it). A lock older than timeout seconds
+        was left by an interrupted process, and is broken.
+        """
+
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime > timeout:
+                        self.lock_path.unlink(missing_ok=True)
+                except OSError:
+                    pass
+                time.sleep(0.01)
+
+        try:
+            yield
+        finally:
+            os.close(fd)
+            self.lock_path.unlink(missing_ok=True)
+
+
+    def get_size(self) -> int:
+        """
+        Get the total size of the store entries in bytes, from the store-size
+        file (computed from the entries if the file does not exist).
+        """
+
+        try:
+            return int(self.size_path.read_text())
+        except (OSError, ValueError):
+            size = sum(e[1] for e in self.get_entries())
+            self.write_size(size)
+            return size
+
+
+    def add_to_size(self, entry_size: int) -> int:
+        size = self.get_size() + entry_size
+        self.write_size(size)
+        return size
+
+
+    def write_size(self, size: int) -> None:
+        tmp_path = self.size_path.with_name(self.size_path.name + ".tmp-" + str(os.getpid()))
+        tmp_path.write_text(str(size))
+        os.replace(tmp_path, self.size_path)
+
+
+    def get_entries(self) -> list:
+        """
+        List the entries of the store.
+
+        Returns
+        -------
+        list
+            (entry path, size in bytes, last access time) tuples, from the
+            least recently used entry to the most recently used one.
+        """
+
+        entries = [
+            (entry_path, get_size(entry_path), entry_path.stat().st_mtime)
+            for class_path in self.folder.iterdir() if class_path.is_dir()
+            for entry_path in class_path.iterdir() if entry_path.is_dir() and ".tmp-" not in entry_path.name
+        ]
+
+        return sorted(entries, key=lambda e: e[2])
+
+
+    def evict(self, max_size: float) -> list:
+        """
+        Remove the least recently used entries until the store is smaller
+        than max_size (in GB).
+
+        Returns
+        -------
+        list
+            Paths of the removed entries.
+        """
+
+        with self.lock():
+
+            entries = self.get_entries()
+            size = sum(e[1] for e in entries)
+            removed = []
+
+            for entry_path, entry_size, _ in entries:
+                if size <= max_size*1e9:
+                    break
+                shutil.rmtree(entry_path)
+                size -= entry_size
+                removed.append(entry_path)
+
+            self.write_size(size)
+
+        return removed
+
+
+    def collect_garbage(self, project_folders: list) -> list:
+        """
+        Remove the entries that are not used by any of the given projects
+        (no file of the project folders starts with the inputs hash of the
+        entry), and the temporary folders left by interrupted publications.
+
+        Parameters
+        ----------
+        project_folders : list
+            Data folders of all the projects that use the store.
+
+        Returns
+        -------
+        list
+            Paths of the removed entries.
+        """
+
+        used_hashes = set(
+            path.name.split("-")[0]
+            for folder in project_folders
+            for path in pathlib.Path(folder).rglob("*")
+        )
+
+        removed = []
+
+        for class_path in self.folder.iterdir():
+            if not class_path.is_dir():
+                continue
+            for entry_path in class_path.iterdir():
+                if ".tmp-" in entry_path.name or entry_path.name not in used_hashes:
+                    shutil.rmtree(entry_path)
+                    removed.append(entry_path)
+
+        with self.lock():
+            self.size_path.unlink(missing_ok=True)
+
+        return removed
+
+
+
+def get_shared_asset_store() -> SharedAssetStore | None:
+    """
+    Get the shared asset store set up with set_params (None if the projects
+    do not use a shared store).
+    """
+
+    folder = os.environ.get("MOBILITY_SHARED_ASSET_STORE_FOLDER")
+
+    if folder is None:
+        return None
+
+    max_size = os.environ.get("MOBILITY_SHARED_ASSET_STORE_MAX_SIZE")
+    max_size = float(max_size) if max_size is not None else None
+
+    return SharedAssetStore(folder, max_size)
+
+
+def link_or_copy(src: pathlib.Path, dst: pathlib.Path) -> None:
+    """
+    Hard link a file (or all the files of a folder), or copy it if it cannot
+    be linked (different file systems).
+    """
+
+    if src.is_dir():
+        shutil.copytree(src, dst, copy_function=link_or_copy, dirs_exist_ok=True)
+        return
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def unlink_hard_links(path: pathlib.Path) -> None:
+    """
+    Remove a file (or the files of a folder) if it is a hard link, that is
+    if the same file has other names (in the shared asset store or in other
+    projects).
+    """
+
+    if path.is_dir():
+        for p in path.rglob("*"):
+            if p.is_file() and p.stat().st_nlink > 1:
+                p.unlink()
+    elif path.is_file() and path.stat().st_nlink > 1:
+        path.unlink()
+
+
+def get_size(path: pathlib.Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Clean up a shared asset store.")
+    parser.add_argument("store_folder", help="Folder of the shared asset store.")
+    parser.add_argument("project_folders", nargs="*", help="Data folders of the projects that use the store.")
+    parser.add_argument("--max-size", type=float, default=None, help="Evict the least recently used entries above this size (GB).")
+    args = parser.parse_args()
+
+    store = SharedAssetStore(args.store_folder)
+
+    if len(args.project_folders) > 0:
+        removed = store.collect_garbage(args.project_folders)
+        print("Removed " + str(len(removed)) + " orphaned entries.")
+
+    if args.max_size is not None:
+        removed = store.evict(args.max_size)
+        print("Evicted " + str(len(removed)) + " entries.")
@@ -1,8 +1,15 @@
+import os
+import dataclasses
+
+import numpy as np
 import pandas as pd
+import polars as pl
+
 from mobility.in_memory_asset import InMemoryAsset
+from mobility.inputs_hashing import hash_json
 
 class PathGeneralizedCost(InMemoryAsset):
-    
+
     def __init__(self, travel_costs, parameters, mode_name):
         inputs = {
             "travel_costs": travel_costs,
@@ -10,48 +17,135 @@ class PathGeneralizedCost(InMemoryAsset):
             "mode_name": mode_name
         }
         super().__init__(inputs)
-        
-        
+
+        # Country of each transport zone, and generalized costs by get_pl
+        # arguments (with the version of the travel costs they were computed
+        # from), computed once
+        self.zones_countries = None
+        self.costs_by_args = {}
+
+
     def get(self, metrics=["cost"], congestion: bool = False, detail_distances: bool = False) -> pd.DataFrame:
-        
+        return self.get_pl(metrics, congestion, detail_distances).to_pandas()
+
+
+    def get_pl(self, metrics=["cost"], congestion: bool = False, detail_distances: bool = False) -> pl.DataFrame:
+        """
+        Compute the generalized cost of the mode for all OD pairs, as a polars
+        DataFrame.
+
+        The result is memoized by arguments, for the current generalized cost
+        parameters and version of the travel costs file (the congested travel
+        costs file is rewritten each time the congestion is updated) : only
+        the last version is kept for each set of arguments.
+
+        Parameters
+        ----------
+        metrics : list, optional
+            Metrics to return, in addition to the from, to and mode columns.
+        congestion : bool, optional
+            Use the congested travel costs.
+        detail_distances : bool, optional
+            Add a {mode_name}_distance column.
+
+        Returns
+        -------
+        pl.DataFrame
+            Generalized costs by OD.
+        """
+
+        path = self.travel_costs.cache_path["congested" if congestion else "freeflow"]
+
+        key = (tuple(metrics), congestion, detail_distances)
+        parameters_hash = hash_json(dataclasses.asdict(self.parameters))
+
+        version = (parameters_hash, os.stat(path).st_mtime_ns if path.exists() else None)
+
+        if key in self.costs_by_args and self.costs_by_args[key][0] == version:
+            return self.costs_by_args[key][1]
+
+        costs = pl.from_pandas(self.travel_costs.get(congestion))
+
+        # The travel costs file may have been (re)created by the get call
+        version = (parameters_hash, os.stat(path).st_mtime_ns if path.exists() else None)
+
         metrics = list(metrics)
-        costs = self.travel_costs.get(congestion)
-        
-        # study_area = self.travel_costs.transport_zones.study_area.get()
-        transport_zones_df = self.travel_costs.transport_zones.get().drop(columns="geometry")
-        
-        
-        # transport_zones = pd.merge(transport_zones, study_area[["local_admin_unit_id", "country"]], on="local_admin_unit_id")
-        transport_zones_df["country"] = transport_zones_df["local_admin_unit_id"].astype(str).str[:2]
-        transport_zones_df["country"] = transport_zones_df["country"].astype(str)
-        
-        costs = pd.merge(
-            costs,
-            transport_zones_df[["transport_zone_id", "country"]].rename({"transport_zone_id": "from"}, axis=1).set_index("from"),
-            on="from"
+
+        zone_country_index, countries = self.get_zones_countries()
+
+        from_index = get_zone_country_index(zone_country_index, costs["from"].to_numpy())
+        to_index = get_zone_country_index(zone_country_index, costs["to"].to_numpy())
+
+        # OD pairs with zones that are not in the transport zones are dropped
+        known = (from_index > -1) & (to_index > -1)
+
+        costs = (
+            costs
+            .filter(pl.Series(known))
+            .with_columns(
+                country_from=countries.gather(from_index[known]),
+                country_to=countries.gather(to_index[known])
+            )
         )
-        
-        costs = pd.merge(
-            costs,
-            transport_zones_df[["transport_zone_id", "country"]].rename({"transport_zone_id": "to"}, axis=1).set_index("to"),
-            on="to",
-            suffixes=["_from", "_to"]
+
+        cost_of_time = self.parameters.cost_of_time.compute_pl(pl.col("distance"), pl.col("country_from"))
+
+        costs = costs.with_columns(
+            cost=(
+                self.parameters.cost_constant
+                + self.parameters.cost_of_distance*pl.col("distance")
+                + cost_of_time*pl.col("time")
+            )
         )
-        
-        gen_cost = self.parameters.cost_constant
-        gen_cost += self.parameters.cost_of_distance*costs["distance"]
-        gen_cost += self.parameters.cost_of_time.compute(costs["distance"], costs["country_from"])*costs["time"]
-        
-        costs["cost"] = gen_cost
-        
+
         if detail_distances is True:
             col = self.inputs["mode_name"] + "_distance"
-            costs[col] = costs["distance"]
+            costs = costs.with_columns(pl.col("distance").alias(col))
             metrics.append(col)
-        
+
         metrics = ["from", "to"] + metrics
-        costs = costs[metrics]
 
-        costs["mode"] = self.inputs["mode_name"]
-        
+        costs = costs.select(metrics).with_columns(mode=pl.lit(self.inputs["mode_name"]))
+
+        self.costs_by_args[key] = (version, costs)
+
         return costs
+
+
+    def get_zones_countries(self) -> tuple[np.ndarray, pl.Series]:
+        """
+        Get the country of the transport zones, as an array giving the index
+        of the country of each transport zone id (-1 if there is no transport
+        zone with this id) and the Series of country codes.
+        """
+
+        transport_zones = self.travel_costs.transport_zones
+
+        if self.zones_countries is None or self.zones_countries[0] != transport_zones.inputs_hash:
+
+            transport_zones_df = pl.DataFrame(
+                transport_zones.get()[["transport_zone_id", "local_admin_unit_id"]]
+            )
+
+            transport_zones_df = transport_zones_df.with_columns(
+                country=pl.col("local_admin_unit_id").cast(pl.String).str.slice(0, 2)
+            )
+
+            countries = transport_zones_df["country"].unique().sort()
+
+            zone_ids = transport_zones_df["transport_zone_id"].to_numpy().astype(np.int64)
+            zone_country_index = np.full(zone_ids.max() + 1, -1, dtype=np.int64)
+            zone_country_index[zone_ids] = np.searchsorted(countries.to_numpy(), transport_zones_df["country"].to_numpy())
+
+            self.zones_countries = (transport_zones.inputs_hash, zone_country_index, countries)
+
+        return self.zones_countries[1], self.zones_countries[2]
+
+
+def get_zone_country_index(zone_country_index: np.ndarray, zone_ids: np.ndarray) -> np.ndarray:
+    """
+    Look up the country index of transport zone ids (-1 for unknown ids).
+    """
+    zone_ids = zone_ids.astype(np.int64)
+    in_range = (zone_ids >= 0) & (zone_ids < zone_country_index.shape[0])
+    return np.where(in_range, zone_country_index[np.where(in_range, zone_ids, 0)], -1)
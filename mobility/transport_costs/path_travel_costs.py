@@ -4,10 +4,12 @@ import logging
 import shutil
 import shortuuid
 import pandas as pd
+import polars as pl
 import geopandas as gpd
 
 from importlib import resources
 from mobility.transport_graphs.path_graph import PathGraph
+from mobility.transport_graphs.congested_path_graph import CongestedPathGraph
 from mobility.file_asset import FileAsset
 from mobility.r_utils.r_script import RScript
 from mobility.transport_zones import TransportZones
@@ -37,6 +39,9 @@ class PathTravelCosts(FileAsset):
         dodgr_costs: Calculate travel costs using the generated graph.
     """
 
+    # The outputs are rewritten in place by update
+    is_shareable = False
+
     def __init__(
             self,
             mode_name: str,
@@ -45,7 +50,8 @@ class PathTravelCosts(FileAsset):
             osm_capacity_parameters: OSMCapacityParameters,
             congestion: bool = False,
             congestion_flows_scaling_factor: float = 1.0,
-            speed_modifiers: List[SpeedModifier] = []
+            speed_modifiers: List[SpeedModifier] = [],
+            congestion_assignment_engine: str = "r"
         ):
         """
         Initializes a TravelCosts object with the given transport zones and travel mode.
@@ -53,6 +59,8 @@ class PathTravelCosts(FileAsset):
         Args:
             transport_zones (gpd.GeoDataFrame): GeoDataFrame defining the transport zones.
             mode (str): Mode of transportation for calculating travel costs.
+            congestion_assignment_engine (str): "r" or "python", engine used
+                to assign the OD flows on the graph (see CongestedPathGraph).
         """
 
         path_graph = PathGraph(
@@ -61,7 +69,8 @@ class PathTravelCosts(FileAsset):
             osm_capacity_parameters,
             congestion,
             congestion_flows_scaling_factor,
-            speed_modifiers
+            speed_modifiers,
+            congestion_assignment_engine
         )
         
         inputs = {
@@ -112,14 +121,18 @@ class PathTravelCosts(FileAsset):
         logging.info("Preparing travel costs for mode " + mode)
         
         self.transport_zones.get()
-        self.contracted_path_graph.get()
         
         if congestion is False:
             output_path = self.cache_path["freeflow"]
         else:
             output_path = self.cache_path["congested"]
         
-        costs = self.compute_costs_by_OD(self.transport_zones, self.contracted_path_graph, output_path)
+        if self.congested_path_graph.assignment_engine == "python":
+            self.congested_path_graph.get()
+            costs = self.compute_costs_by_OD_python(self.transport_zones, self.congested_path_graph, output_path)
+        else:
+            self.contracted_path_graph.get()
+            costs = self.compute_costs_by_OD(self.transport_zones, self.contracted_path_graph, output_path)
         
         if congestion is False:
             shutil.copy(self.cache_path["freeflow"], self.cache_path["congested"])
@@ -163,9 +176,59 @@ class PathTravelCosts(FileAsset):
         return costs
     
     
+    def compute_costs_by_OD_python(
+            self,
+            transport_zones: TransportZones,
+            path_graph: CongestedPathGraph,
+            output_path: pathlib.Path
+        ) -> pd.DataFrame:
+        """
+        Same as compute_costs_by_OD, without launching an R process : the 
+        travel times and distances are computed in process on the congested
+        graph (see CongestedPathGraph.get_od_costs).
+
+        Args:
+            transport_zones (TransportZones): The transport zones.
+            path_graph (CongestedPathGraph): The graph with the current link times.
+            output_path (pathlib.Path): Path of the output parquet file.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing calculated travel costs.
+        """
+
+        logging.info("Computing travel times and distances by OD...")
+        
+        max_speed = self.routing_parameters.filter_max_speed
+        max_time = self.routing_parameters.filter_max_time
+        
+        # Only the pairs of transport zones closer than max_time at 
+        # max_speed (as the crow flies) are routed
+        tz = pl.from_pandas(transport_zones.get().drop(columns="geometry")).select(["transport_zone_id", "x", "y"])
+        
+        tz_pairs = (
+            tz.rename({"transport_zone_id": "from"})
+            .join(tz.rename({"transport_zone_id": "to"}), how="cross", suffix="_to")
+            .filter(
+                ((pl.col("x") - pl.col("x_to")).pow(2) + (pl.col("y") - pl.col("y_to")).pow(2)).sqrt()/1000.0/max_speed < max_time
+            )
+            .select(["from", "to"])
+        )
+        
+        costs = path_graph.get_od_costs(tz_pairs)
+        costs.write_parquet(output_path)
+        
+        return costs.to_pandas()
+    
+    
     def update(self, od_flows):
         
-        self.contracted_path_graph.update(od_flows)
+        if self.congested_path_graph.assignment_engine == "python":
+            # The costs are computed on the congested graph, so it is not 
+            # contracted again (unless another graph uses the contracted one)
+            self.contracted_path_graph.defer_update(od_flows)
+        else:
+            self.contracted_path_graph.update(od_flows)
+            
         self.create_and_get_asset(congestion=True)
         
     def clone(self):
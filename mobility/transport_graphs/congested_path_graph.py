@@ -3,24 +3,45 @@ import pathlib
 import logging
 import dataclasses
 import json
+import shutil
+import polars as pl
 
 from importlib import resources
 from mobility.file_asset import FileAsset
 from mobility.r_utils.r_script import RScript
 from mobility.transport_graphs.modified_path_graph import ModifiedPathGraph
+from mobility.transport_graphs.traffic_assignment import FrankWolfeAssignment, get_buildings_nearest_vertex_id, tz_pairs_to_vertex_pairs
 from mobility.transport_zones import TransportZones
 
 from typing import List
 
 class CongestedPathGraph(FileAsset):
 
+    # The outputs are rewritten in place by update
+    is_shareable = False
+
     def __init__(
             self,
             modified_graph: ModifiedPathGraph,
             transport_zones: TransportZones,
             handles_congestion: bool = False,
-            congestion_flows_scaling_factor: float = 1.0
+            congestion_flows_scaling_factor: float = 1.0,
+            assignment_engine: str = "r"
         ):
+        """
+        Args:
+            modified_graph (ModifiedPathGraph): The graph with the free flow travel times.
+            transport_zones (TransportZones): The transport zones.
+            handles_congestion (bool): Whether the OD flows are assigned on the graph.
+            congestion_flows_scaling_factor (float): Scaling factor of the OD flows.
+            assignment_engine (str): "r" to assign the flows with cppRouting
+                in an R process, or "python" to assign them in process with
+                FrankWolfeAssignment, warm started from the link flows of the
+                previous update.
+        """
+
+        if assignment_engine not in ["r", "python"]:
+            raise ValueError("Unknown assignment engine : " + str(assignment_engine) + " (should be 'r' or 'python').")
         
         inputs = {
             "mode_name": modified_graph.mode_name,
@@ -30,6 +51,13 @@ class CongestedPathGraph(FileAsset):
             "congestion_flows_scaling_factor": congestion_flows_scaling_factor
         }
         
+        # The engine is only hashed when it is not the default one, so that 
+        # the graphs congested before it existed stay valid
+        if assignment_engine != "r":
+            inputs["assignment_engine"] = assignment_engine
+        
+        self.assignment_engine = assignment_engine
+        
         mode_name = modified_graph.mode_name
         folder_path = pathlib.Path(os.environ["MOBILITY_PROJECT_DATA_FOLDER"])
         file_name = pathlib.Path("path_graph_" + mode_name) / "congested" / (mode_name + "-congested-path-graph")
@@ -39,6 +67,10 @@ class CongestedPathGraph(FileAsset):
 
         super().__init__(inputs, cache_path)
 
+        hash = self.cache_path.name.split("-")[0]
+        self.link_flows_file_path = self.cache_path.parent / (hash + "-link-flows.parquet")
+        self.vertex_flows_file_path = self.cache_path.parent / (hash + "-vertex-flows.parquet")
+
     def get_cached_asset(self) -> pathlib.Path:
         
         logging.info("Congested graph already prepared. Reusing the files in : " + str(self.cache_path.parent))
@@ -49,13 +81,21 @@ class CongestedPathGraph(FileAsset):
         
         logging.info("Loading graph with traffic...")
 
-        self.load_graph(
-            self.modified_graph.get(),
-            self.transport_zones.cache_path,
-            enable_congestion,
-            self.flows_file_path,
-            self.congestion_flows_scaling_factor,
-        )
+        if self.assignment_engine == "python":
+            self.load_graph_python(
+                self.modified_graph.get(),
+                enable_congestion,
+                self.flows_file_path,
+                self.congestion_flows_scaling_factor
+            )
+        else:
+            self.load_graph(
+                self.modified_graph.get(),
+                self.transport_zones.cache_path,
+                enable_congestion,
+                self.flows_file_path,
+                self.congestion_flows_scaling_factor,
+            )
 
         return self.cache_path
 
@@ -82,6 +122,192 @@ class CongestedPathGraph(FileAsset):
         )
 
         return None
+
+
+    def load_graph_python(
+            self,
+            simplified_graph_path: pathlib.Path,
+            enable_congestion: bool,
+            flows_file_path: pathlib.Path,
+            congestion_flows_scaling_factor: float
+        ) -> None:
+        """
+        Same as the load_path_graph.R script, without launching an R process :
+        reads the cppRouting graph files, assigns the OD flows with
+        FrankWolfeAssignment (warm started from the link flows of the
+        previous update) and saves the graph with the congested times.
+        """
+
+        folder = simplified_graph_path.parent
+        hash = simplified_graph_path.name.split("-")[0]
+
+        data = pl.read_parquet(folder / (hash + "data.parquet"))
+        vertices_path = folder.parent / (hash + "-vertices.parquet")
+
+        if enable_congestion is True and flows_file_path.exists():
+
+            logging.info("Loading OD flows...")
+
+            od_flows = pl.read_parquet(flows_file_path)
+
+            if od_flows["vehicle_volume"].is_null().any() or od_flows["vehicle_volume"].is_nan().any():
+                raise ValueError("Cannot assign traffic, some OD flows volumes are NA.")
+
+            dictionary = pl.read_parquet(folder / (hash + "dict.parquet"))
+            attrib = pl.read_parquet(folder / (hash + "attrib.parquet"))
+
+            od = self.get_vertex_flows(
+                od_flows,
+                pl.read_parquet(vertices_path),
+                dictionary,
+                congestion_flows_scaling_factor
+            )
+
+            assignment = FrankWolfeAssignment.from_cppr_graph(data, attrib, dictionary.height)
+
+            previous_flows, previous_od = None, None
+
+            if self.link_flows_file_path.exists() and self.vertex_flows_file_path.exists():
+                previous_flows = pl.read_parquet(self.link_flows_file_path)["flow"].to_numpy()
+                previous_od = pl.read_parquet(self.vertex_flows_file_path)
+                if previous_flows.shape[0] != data.height:
+                    previous_flows, previous_od = None, None
+
+            logging.info("Assigning traffic...")
+
+            flows, times, n_iterations, gap = assignment.assign(od, previous_flows, previous_od)
+
+            pl.DataFrame({"flow": flows}).write_parquet(self.link_flows_file_path)
+            od.write_parquet(self.vertex_flows_file_path)
+
+            # Update travel times
+            data = data.with_columns(dist=pl.Series(times))
+            data.write_parquet(folder / (hash + "-updated-times.parquet"))
+
+        # Save the graph
+        logging.info("Saving congested graph...")
+
+        output_folder = self.cache_path.parent
+        output_hash = self.cache_path.name.split("-")[0]
+
+        data.write_parquet(output_folder / (output_hash + "data.parquet"))
+        shutil.copy(folder / (hash + "dict.parquet"), output_folder / (output_hash + "dict.parquet"))
+        shutil.copy(folder / (hash + "attrib.parquet"), output_folder / (output_hash + "attrib.parquet"))
+        shutil.copy(vertices_path, output_folder.parent / (output_hash + "-vertices.parquet"))
+
+        self.cache_path.touch()
+
+        return None
+
+
+    def get_vertex_flows(self, od_flows, vertices, dictionary, congestion_flows_scaling_factor):
+        """
+        Disaggregates the OD flows between transport zones into flows between
+        graph vertices (indices of the cppRouting graph), keeping only the
+        largest flows accounting for 95 % of the total volume, as in the
+        load_path_graph.R script.
+        """
+
+        od = (
+            od_flows
+            .select(["from", "to", "vehicle_volume"])
+            .join(self.get_vertex_pairs(od_flows, vertices, dictionary), on=["from", "to"])
+            .with_columns(demand=pl.col("vehicle_volume")*pl.col("weight"))
+            .group_by(["vertex_from", "vertex_to"])
+            .agg(pl.col("demand").sum())
+        )
+
+        # Retain only the largest flows accounting for 95 % of the total volume
+        # and upscale them to match the total volume
+        od = (
+            od
+            .sort(["demand", "vertex_from", "vertex_to"], descending=[True, False, False])
+            .filter(pl.col("demand").cum_sum()/pl.col("demand").sum() < 0.95)
+            .select(
+                pl.col("vertex_from").alias("from"),
+                pl.col("vertex_to").alias("to"),
+                demand=pl.col("demand")/0.95*congestion_flows_scaling_factor
+            )
+        )
+
+        return od
+    
+
+    def get_vertex_pairs(self, tz_pairs, vertices, dictionary):
+        """
+        Disaggregates the transport zones pairs into pairs of graph vertices
+        (indices of the cppRouting graph) with their weights, see 
+        tz_pairs_to_vertex_pairs.
+        """
+
+        transport_zones = pl.from_pandas(self.transport_zones.get().drop(columns="geometry"))
+
+        tz_path = self.transport_zones.cache_path
+        buildings = pl.read_parquet(tz_path.parent / tz_path.name.replace("-transport_zones.gpkg", "-transport_zones_buildings.parquet"))
+        buildings = buildings.with_columns(vertex_id=get_buildings_nearest_vertex_id(buildings, vertices))
+
+        vertex_pairs = tz_pairs_to_vertex_pairs(tz_pairs, transport_zones, buildings)
+
+        index = dictionary.select(vertex_id=pl.col("ref").cast(vertices["vertex_id"].dtype), index=pl.col("id"))
+
+        vertex_pairs = (
+            vertex_pairs
+            .join(index.rename({"vertex_id": "vertex_id_from", "index": "vertex_from"}), on="vertex_id_from")
+            .join(index.rename({"vertex_id": "vertex_id_to", "index": "vertex_to"}), on="vertex_id_to")
+            .select(["from", "to", "vertex_from", "vertex_to", "weight"])
+        )
+
+        return vertex_pairs
+
+
+    def get_od_costs(self, tz_pairs: pl.DataFrame) -> pl.DataFrame:
+        """
+        Same as the prepare_dodgr_costs.R script, without launching an R
+        process : computes the travel times and distances between the 
+        transport zones pairs on the graph, with the current (congested)
+        link times.
+
+        Args:
+            tz_pairs (pl.DataFrame): "from" and "to" transport zones columns.
+
+        Returns:
+            pl.DataFrame: "from", "to", "distance" (km) and "time" (h) columns.
+        """
+
+        folder = self.cache_path.parent
+        hash = self.cache_path.name.split("-")[0]
+
+        data = pl.read_parquet(folder / (hash + "data.parquet"))
+        attrib = pl.read_parquet(folder / (hash + "attrib.parquet"))
+        dictionary = pl.read_parquet(folder / (hash + "dict.parquet"))
+        vertices = pl.read_parquet(folder.parent / (hash + "-vertices.parquet"))
+
+        vertex_pairs = self.get_vertex_pairs(tz_pairs, vertices, dictionary)
+
+        assignment = FrankWolfeAssignment.from_cppr_graph(data, attrib, dictionary.height)
+
+        times, distances = assignment.get_od_costs(
+            assignment.free_flow_times,
+            attrib["aux"].cast(pl.Float64).to_numpy(),
+            vertex_pairs["vertex_from"].to_numpy(),
+            vertex_pairs["vertex_to"].to_numpy()
+        )
+
+        # The weights of the pairs of vertices with no path are dropped, as
+        # the R script does before computing the weighted means
+        costs = (
+            vertex_pairs
+            .with_columns(time=pl.Series(times), distance=pl.Series(distances))
+            .filter(pl.col("time").is_not_nan() & pl.col("distance").is_not_nan())
+            .group_by(["from", "to"])
+            .agg(
+                distance=(pl.col("distance")*pl.col("weight")).sum()/pl.col("weight").sum()/1000.0,
+                time=(pl.col("time")*pl.col("weight")).sum()/pl.col("weight").sum()/3600.0
+            )
+            .sort(["from", "to"])
+        )
+
+        return costs
     
 
     def update(self, od_flows):
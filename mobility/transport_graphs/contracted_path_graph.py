@@ -10,6 +10,9 @@ from mobility.transport_zones import TransportZones
 
 class ContractedPathGraph(FileAsset):
 
+    # The outputs are rewritten in place by update
+    is_shareable = False
+
     def __init__(
             self,
             congested_graph: CongestedPathGraph
@@ -26,6 +29,18 @@ class ContractedPathGraph(FileAsset):
 
         super().__init__(inputs, cache_path)
 
+        # Set by defer_update when the congested graph was updated without
+        # contracting it again
+        self.is_contraction_outdated = False
+
+    def get(self, *args, **kwargs) -> pathlib.Path:
+        
+        if self.is_contraction_outdated is True:
+            logging.info("Rebuilding contracted graph given the updated congested graph...")
+            self.create_and_get_asset()
+        
+        return super().get(*args, **kwargs)
+
     def get_cached_asset(self) -> pathlib.Path:
         
         logging.info("Contracted graph already prepared. Reusing the files in : " + str(self.cache_path.parent))
@@ -40,6 +55,8 @@ class ContractedPathGraph(FileAsset):
             self.congested_graph.get(),
             self.cache_path
         )
+        
+        self.is_contraction_outdated = False
 
         return self.cache_path
 
@@ -70,3 +87,15 @@ class ContractedPathGraph(FileAsset):
             self.create_and_get_asset()
 
 
+    def defer_update(self, od_flows):
+        """
+        Updates the congested graph given the OD flows, and contracts it 
+        again only the next time the contracted graph is used (the travel
+        costs computed in process with the python assignment engine do not
+        need it).
+        """
+        
+        if self.congested_graph.handles_congestion is True:
+            
+            self.congested_graph.update(od_flows)
+            self.is_contraction_outdated = True
@@ -20,7 +20,8 @@ class PathGraph:
         osm_capacity_parameters: OSMCapacityParameters,
         congestion: bool = False,
         congestion_flows_scaling_factor: float = 1.0,
-        speed_modifiers: List[SpeedModifier] = []
+        speed_modifiers: List[SpeedModifier] = [],
+        congestion_assignment_engine: str = "r"
     ):
         
         self.simplified = SimplifiedPathGraph(
@@ -38,7 +39,8 @@ class PathGraph:
             self.modified,
             transport_zones,
             congestion,
-            congestion_flows_scaling_factor
+            congestion_flows_scaling_factor,
+            congestion_assignment_engine
         )
         
         self.contracted = ContractedPathGraph(
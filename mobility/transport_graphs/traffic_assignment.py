@@ -0,0 +1,490 @@
+import logging
+
+import numpy as np
+import polars as pl
+
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from mobility.transport_modes.osm_capacity_parameters import OSMEdgeCapacity
+
+# Lower bound of the link times used for the shortest paths (scipy would not
+# see links with a zero time in the sparse graph)
+MIN_LINK_TIME = 1e-9
+
+
+def bpr_link_times(
+        free_flow_times: np.ndarray,
+        flows: np.ndarray,
+        capacity: np.ndarray,
+        alpha: np.ndarray,
+        beta: np.ndarray
+    ) -> np.ndarray:
+    """
+    Computes the congested link times with the BPR volume decay function :
+    t = t0*(1 + alpha*(v/capacity)^beta), as cppRouting does.
+
+    Args:
+        free_flow_times (np.ndarray): The free flow times of the links.
+        flows (np.ndarray): The flows on the links.
+        capacity (np.ndarray): The capacities of the links.
+        alpha (np.ndarray): The BPR alpha parameters of the links.
+        beta (np.ndarray): The BPR beta parameters of the links.
+
+    Returns:
+        np.ndarray: The congested link times.
+    """
+    return free_flow_times*(1.0 + alpha*np.power(flows/capacity, beta))
+
+
+def get_buildings_nearest_vertex_id(buildings: pl.DataFrame, vertices: pl.DataFrame) -> pl.Series:
+    """
+    Finds the closest graph vertex of each building (same as the
+    get_buildings_nearest_vertex_id R function).
+
+    Args:
+        buildings (pl.DataFrame): "x" and "y" columns.
+        vertices (pl.DataFrame): "vertex_id", "x" and "y" columns.
+
+    Returns:
+        pl.Series: The vertex_id of the closest vertex of each building.
+    """
+    tree = cKDTree(vertices.select(["x", "y"]).to_numpy())
+    _, index = tree.query(buildings.select(["x", "y"]).to_numpy(), k=1)
+    return vertices["vertex_id"].gather(index)
+
+
+def tz_pairs_to_vertex_pairs(
+        od_flows: pl.DataFrame,
+        transport_zones: pl.DataFrame,
+        buildings: pl.DataFrame
+    ) -> pl.DataFrame:
+    """
+    Disaggregates the transport zones pairs into pairs of representative
+    buildings vertices, with the same number of clusters by pair and the same
+    weights as the tz_pairs_to_vertex_pairs R function.
+
+    Args:
+        od_flows (pl.DataFrame): "from" and "to" transport zones columns.
+        transport_zones (pl.DataFrame): "transport_zone_id", "x" and "y" columns.
+        buildings (pl.DataFrame): "transport_zone_id", "n_clusters", "vertex_id"
+            and "weight" columns.
+
+    Returns:
+        pl.DataFrame: "from", "to", "vertex_id_from", "vertex_id_to" and
+            "weight" columns (the weights sum to one for each transport zones pair).
+    """
+
+    tz_dtype = od_flows["from"].dtype
+    tz = transport_zones.select(pl.col("transport_zone_id").cast(tz_dtype), "x", "y")
+    buildings = buildings.select(pl.col("transport_zone_id").cast(tz_dtype), "n_clusters", "vertex_id", "weight")
+
+    pairs = (
+        od_flows
+        .select(["from", "to"])
+        .join(tz.rename({"transport_zone_id": "from"}), on="from")
+        .join(tz.rename({"transport_zone_id": "to"}), on="to", suffix="_to")
+        .with_columns(
+            n_clusters=(
+                1.0 + 4.0*(
+                    -((pl.col("x") - pl.col("x_to")).pow(2) + (pl.col("y") - pl.col("y_to")).pow(2)).sqrt()/1000.0/2.0
+                ).exp()
+            ).round()
+        )
+        .select(["from", "to", pl.col("n_clusters").cast(buildings["n_clusters"].dtype)])
+    )
+
+    pairs = (
+        pairs
+        .join(
+            buildings.rename({"transport_zone_id": "from"}),
+            on=["from", "n_clusters"]
+        )
+        .join(
+            buildings.rename({"transport_zone_id": "to"}),
+            on=["to", "n_clusters"],
+            suffix="_to"
+        )
+        .rename({"vertex_id": "vertex_id_from", "weight": "weight_from"})
+        .filter(pl.col("vertex_id_from") != pl.col("vertex_id_to"))
+        .with_columns(weight=pl.col("weight_from")*pl.col("weight_to"))
+        .with_columns(weight=pl.col("weight")/pl.col("weight").sum().over(["from", "to"]))
+        .group_by(["from", "to", "vertex_id_from", "vertex_id_to"])
+        .agg(pl.col("weight").sum())
+    )
+
+    return pairs
+
+
+class FrankWolfeAssignment:
+    """
+    Static traffic assignment on a cppRouting graph, with the Frank-Wolfe
+    algorithm (BPR link costs, all-or-nothing assignments on the shortest
+    paths computed with scipy).
+
+    The graph is stored as arrays of links (the "data" and "attrib" tables
+    of the graphs saved by cpprouting_io.R), and converted to a CSR matrix
+    for each all-or-nothing assignment, keeping the fastest link between two
+    vertices.
+
+    The assignment can be warm started from the link flows and the OD demand
+    of a previous assignment : the demand change is loaded on the shortest
+    paths at the previous congested times and added to the previous flows,
+    which gives a starting point that satisfies the new demand and is close
+    to the new equilibrium when the demand changes a little (the assignment
+    starts from the all-or-nothing flows at the previous congested times if
+    the demand decrease does not fit in the previous flows).
+
+    Attributes:
+        link_from (np.ndarray): The origin vertex index of each link.
+        link_to (np.ndarray): The destination vertex index of each link.
+        free_flow_times (np.ndarray): The free flow time of each link.
+        capacity (np.ndarray): The capacity of each link.
+        alpha (np.ndarray): The BPR alpha parameter of each link.
+        beta (np.ndarray): The BPR beta parameter of each link.
+        n_vertices (int): The number of vertices of the graph.
+        max_gap (float): The relative gap under which the assignment stops.
+        max_iterations (int): The maximum number of Frank-Wolfe iterations.
+        max_block_cells (int): The maximum number of cells of the shortest
+            path predecessors matrix computed at once.
+    """
+
+    def __init__(
+            self,
+            link_from: np.ndarray,
+            link_to: np.ndarray,
+            free_flow_times: np.ndarray,
+            capacity: np.ndarray,
+            alpha: np.ndarray,
+            beta: np.ndarray,
+            n_vertices: int,
+            max_gap: float = 0.05,
+            max_iterations: int = 10,
+            max_block_cells: int = 50000000
+        ):
+        """
+        Args:
+            link_from (np.ndarray): The origin vertex index of each link.
+            link_to (np.ndarray): The destination vertex index of each link.
+            free_flow_times (np.ndarray): The free flow time of each link.
+            capacity (np.ndarray): The capacity of each link (NaN for the default capacity).
+            alpha (np.ndarray): The BPR alpha parameter of each link (NaN for the default value).
+            beta (np.ndarray): The BPR beta parameter of each link (NaN for the default value).
+            n_vertices (int): The number of vertices of the graph.
+            max_gap (float): The relative gap under which the assignment stops.
+            max_iterations (int): The maximum number of Frank-Wolfe iterations.
+            max_block_cells (int): The maximum number of cells of the shortest
+                path predecessors matrix computed at once.
+        """
+
+        defaults = OSMEdgeCapacity()
+
+        self.link_from = np.asarray(link_from, dtype=np.int64)
+        self.link_to = np.asarray(link_to, dtype=np.int64)
+        self.free_flow_times = np.asarray(free_flow_times, dtype=np.float64)
+        self.capacity = np.nan_to_num(np.asarray(capacity, dtype=np.float64), nan=defaults.capacity)
+        self.alpha = np.nan_to_num(np.asarray(alpha, dtype=np.float64), nan=defaults.alpha)
+        self.beta = np.nan_to_num(np.asarray(beta, dtype=np.float64), nan=defaults.beta)
+        self.n_vertices = n_vertices
+        self.max_gap = max_gap
+        self.max_iterations = max_iterations
+        self.max_block_cells = max_block_cells
+
+
+    @classmethod
+    def from_cppr_graph(cls, data: pl.DataFrame, attrib: pl.DataFrame, n_vertices: int, **kwargs):
+        """
+        Creates the assignment from the tables of a cppRouting graph.
+
+        Args:
+            data (pl.DataFrame): "from", "to" and "dist" columns (free flow times).
+            attrib (pl.DataFrame): "cap", "alpha" and "beta" columns.
+            n_vertices (int): The number of vertices of the graph.
+            **kwargs: The other FrankWolfeAssignment arguments.
+        """
+        attrib = attrib.select(pl.col(["cap", "alpha", "beta"]).cast(pl.Float64).fill_null(np.nan))
+        return cls(
+            data["from"].to_numpy(),
+            data["to"].to_numpy(),
+            data["dist"].to_numpy(),
+            attrib["cap"].to_numpy(),
+            attrib["alpha"].to_numpy(),
+            attrib["beta"].to_numpy(),
+            n_vertices,
+            **kwargs
+        )
+
+
+    def get_link_times(self, flows: np.ndarray) -> np.ndarray:
+        return bpr_link_times(self.free_flow_times, flows, self.capacity, self.alpha, self.beta)
+
+
+    def assign(
+            self,
+            od: pl.DataFrame,
+            previous_flows: np.ndarray = None,
+            previous_od: pl.DataFrame = None
+        ) -> tuple[np.ndarray, np.ndarray, int, float]:
+        """
+        Assigns the OD demand on the graph.
+
+        Args:
+            od (pl.DataFrame): "from", "to" (vertex indices) and "demand" columns.
+            previous_flows (np.ndarray): The link flows of the previous assignment (or None).
+            previous_od (pl.DataFrame): The OD demand of the previous assignment (or None).
+
+        Returns:
+            tuple: The link flows, the congested link times, the number of
+                Frank-Wolfe iterations and the final relative gap.
+        """
+
+        od = od.filter(pl.col("from") != pl.col("to"))
+
+        if previous_flows is not None and previous_od is not None:
+            flows = self.get_warm_start_flows(od, previous_flows, previous_od)
+        else:
+            flows = self.all_or_nothing(self.free_flow_times, od)
+
+        gap = np.inf
+        iteration = 0
+
+        while True:
+
+            times = self.get_link_times(flows)
+            aon_flows = self.all_or_nothing(times, od)
+
+            total_time = np.dot(times, flows)
+            gap = (total_time - np.dot(times, aon_flows))/total_time if total_time > 0.0 else 0.0
+
+            logging.info("Traffic assignment iteration " + str(iteration) + ", relative gap : " + str(round(gap, 5)))
+
+            if gap <= self.max_gap or iteration == self.max_iterations:
+                break
+
+            step = self.line_search(flows, aon_flows - flows)
+            flows = flows + step*(aon_flows - flows)
+            iteration += 1
+
+        return flows, times, iteration, gap
+
+
+    def get_warm_start_flows(self, od, previous_flows, previous_od):
+
+        delta = (
+            od.select(["from", "to", "demand"])
+            .join(
+                previous_od.select(["from", "to", pl.col("demand").alias("previous_demand")]),
+                on=["from", "to"],
+                how="full",
+                coalesce=True
+            )
+            .select(
+                "from", "to",
+                demand=pl.col("demand").fill_null(0.0) - pl.col("previous_demand").fill_null(0.0)
+            )
+            .filter(pl.col("demand") != 0.0)
+        )
+
+        if delta.height == 0:
+            logging.info("OD demand unchanged, starting the assignment from the previous link flows.")
+            return previous_flows
+
+        previous_times = self.get_link_times(previous_flows)
+        flows = previous_flows + self.all_or_nothing(previous_times, delta)
+
+        tolerance = 1e-9*max(previous_flows.max(initial=0.0), 1.0)
+
+        if flows.min(initial=0.0) < -tolerance:
+            logging.info("Demand decrease larger than the previous link flows, starting the assignment from the previous congested times.")
+            return self.all_or_nothing(previous_times, od)
+
+        logging.info("Starting the assignment from the previous link flows.")
+
+        return np.maximum(flows, 0.0)
+
+
+    def line_search(self, flows, direction, n_steps=30):
+
+        # The derivative of the Beckmann objective along the direction is
+        # increasing, find where it is zero by bisection
+        def derivative(step):
+            return np.dot(self.get_link_times(flows + step*direction), direction)
+
+        if derivative(1.0) <= 0.0:
+            return 1.0
+
+        low, high = 0.0, 1.0
+
+        for _ in range(n_steps):
+            mid = 0.5*(low + high)
+            if derivative(mid) > 0.0:
+                high = mid
+            else:
+                low = mid
+
+        return 0.5*(low + high)
+
+
+    def get_graph(self, times: np.ndarray) -> tuple[csr_matrix, np.ndarray, np.ndarray]:
+        """
+        Converts the links to a CSR matrix for the given link times, keeping
+        the fastest link between two vertices.
+
+        Returns:
+            tuple: The CSR matrix, the indices of the kept links and their
+                from*n_vertices + to keys (sorted).
+        """
+
+        n = self.n_vertices
+
+        order = np.lexsort((times, self.link_to, self.link_from))
+        keys = self.link_from[order]*n + self.link_to[order]
+        first = np.r_[True, keys[1:] != keys[:-1]]
+        links, keys = order[first], keys[first]
+
+        graph = csr_matrix(
+            (np.maximum(times[links], MIN_LINK_TIME), (self.link_from[links], self.link_to[links])),
+            shape=(n, n)
+        )
+
+        return graph, links, keys
+
+
+    def get_od_costs(
+            self,
+            times: np.ndarray,
+            lengths: np.ndarray,
+            od_from: np.ndarray,
+            od_to: np.ndarray
+        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the times and the lengths of the shortest paths (for the
+        given link times) between pairs of vertices, as the get_distance_pair
+        cppRouting function does with aggregate_aux = FALSE and TRUE.
+
+        Args:
+            times (np.ndarray): The link times.
+            lengths (np.ndarray): The link lengths (summed along the fastest paths).
+            od_from (np.ndarray): The origin vertex indices.
+            od_to (np.ndarray): The destination vertex indices.
+
+        Returns:
+            tuple: The times and the lengths of the paths (NaN for the pairs
+                with no path between their vertices).
+        """
+
+        n = self.n_vertices
+        od_from = np.asarray(od_from, dtype=np.int64)
+        od_to = np.asarray(od_to, dtype=np.int64)
+
+        graph, links, keys = self.get_graph(times)
+
+        od_times = np.full(od_from.shape[0], np.nan)
+        od_lengths = np.full(od_from.shape[0], np.nan)
+
+        origins, origin_index = np.unique(od_from, return_inverse=True)
+        block_size = max(1, self.max_block_cells//n)
+
+        for start in range(0, origins.shape[0], block_size):
+
+            block_origins = origins[start:start + block_size]
+            rows = np.flatnonzero((origin_index >= start) & (origin_index < start + block_size))
+
+            _, predecessors = dijkstra(graph, directed=True, indices=block_origins, return_predecessors=True)
+
+            block = origin_index[rows] - start
+            vertex = od_to[rows]
+
+            # The times are summed on the kept links (and not read from the
+            # dijkstra distances) so they do not include the MIN_LINK_TIME bounds
+            reachable = (predecessors[block, vertex] >= 0) | (vertex == block_origins[block])
+            rows, block, vertex = rows[reachable], block[reachable], vertex[reachable]
+            od_times[rows] = 0.0
+            od_lengths[rows] = 0.0
+
+            # Walk back from the destinations to the origins
+            active = vertex != block_origins[block]
+            rows, block, vertex = rows[active], block[active], vertex[active]
+
+            while rows.shape[0] > 0:
+
+                previous = predecessors[block, vertex].astype(np.int64)
+                path_links = links[np.searchsorted(keys, previous*n + vertex)]
+                od_times[rows] += times[path_links]
+                od_lengths[rows] += lengths[path_links]
+
+                active = previous != block_origins[block]
+                rows, block, vertex = rows[active], block[active], previous[active]
+
+        return od_times, od_lengths
+
+
+    def all_or_nothing(self, times: np.ndarray, od: pl.DataFrame) -> np.ndarray:
+        """
+        Loads the OD demand on the shortest paths for the given link times.
+
+        Args:
+            times (np.ndarray): The link times.
+            od (pl.DataFrame): "from", "to" (vertex indices) and "demand"
+                columns (the demand can be negative).
+
+        Returns:
+            np.ndarray: The link flows.
+        """
+
+        n = self.n_vertices
+        flows = np.zeros(self.link_from.shape[0])
+
+        graph, links, keys = self.get_graph(times)
+
+        od = od.group_by(["from", "to"]).agg(pl.col("demand").sum()).sort("from")
+        od_from = od["from"].to_numpy().astype(np.int64)
+        od_to = od["to"].to_numpy().astype(np.int64)
+        demand = od["demand"].to_numpy().astype(np.float64)
+
+        origins, origin_index = np.unique(od_from, return_inverse=True)
+        block_size = max(1, self.max_block_cells//n)
+        unreachable_demand = 0.0
+
+        for start in range(0, origins.shape[0], block_size):
+
+            block_origins = origins[start:start + block_size]
+            rows = (origin_index >= start) & (origin_index < start + block_size)
+
+            _, predecessors = dijkstra(graph, directed=True, indices=block_origins, return_predecessors=True)
+
+            block = origin_index[rows] - start
+            vertex = od_to[rows]
+            block_demand = demand[rows]
+
+            reachable = predecessors[block, vertex] >= 0
+            unreachable_demand += np.abs(block_demand[~reachable]).sum()
+            block, vertex, block_demand = block[reachable], vertex[reachable], block_demand[reachable]
+
+            # Walk back from the destinations to the origins, merging the
+            # demands that reach the same vertex of a shortest path tree
+            path_links, path_demands = [], []
+
+            while block.shape[0] > 0:
+
+                previous = predecessors[block, vertex].astype(np.int64)
+                path_links.append(links[np.searchsorted(keys, previous*n + vertex)])
+                path_demands.append(block_demand)
+
+                keep = previous != block_origins[block]
+                tree_keys, inverse = np.unique(block[keep]*n + previous[keep], return_inverse=True)
+                block_demand = np.bincount(inverse, weights=block_demand[keep], minlength=tree_keys.shape[0])
+                block, vertex = tree_keys//n, tree_keys % n
+
+            if len(path_links) > 0:
+                flows += np.bincount(
+                    np.concatenate(path_links),
+                    weights=np.concatenate(path_demands),
+                    minlength=flows.shape[0]
+                )
+
+        if unreachable_demand > 0.0:
+            logging.info("Could not assign " + str(round(unreachable_demand, 1)) + " vehicles with no path between their origin and destination.")
+
+        return flows
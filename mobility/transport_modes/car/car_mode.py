@@ -27,7 +27,8 @@ class CarMode(TransportMode):
         generalized_cost_parameters: GeneralizedCostParameters = None,
         congestion: bool = False,
         congestion_flows_scaling_factor: float = 0.1,
-        speed_modifiers: List[SpeedModifier] = []
+        speed_modifiers: List[SpeedModifier] = [],
+        congestion_assignment_engine: str = "r"
     ):
         
         mode_name = "car"
@@ -56,7 +57,8 @@ class CarMode(TransportMode):
             osm_capacity_parameters,
             congestion,
             congestion_flows_scaling_factor,
-            speed_modifiers
+            speed_modifiers,
+            congestion_assignment_engine
         )
         
         generalized_cost = PathGeneralizedCost(
@@ -17,6 +17,9 @@ from mobility.transport_costs.path_travel_costs import PathTravelCosts
 
 class DetailedCarpoolTravelCosts(FileAsset):
 
+    # The outputs are rewritten in place by update
+    is_shareable = False
+
     def __init__(
             self,
             car_travel_costs: PathTravelCosts,
@@ -1,68 +1,262 @@
-import argparse
 import os
+import logging
+import pathlib
+import multiprocessing
+
 import polars as pl
+import pyarrow as pa
 
 from concurrent.futures import ProcessPoolExecutor
 from mobility.transport_modes.compute_subtour_mode_probs_parallel_utilities import process_batch, worker_init, chunked
+from mobility.transport_modes.compute_subtour_mode_probs_vectorized import process_batch_vectorized, worker_init_vectorized
+from mobility.transport_modes.od_mode_costs_store import ODModeCostsStore
+
+
+class SubtourModeProbabilities:
+    """
+    Top-k mode sequence search for location chains, run by a pool of worker
+    processes that lives as long as the instance (typically for a whole
+    PopulationTrips.compute_flows run).
+
+    Costs are shared with the workers through a memory mapped ODModeCostsStore :
+    between iterations, only the costs that changed are written to the store,
+    and the workers see them without being restarted. Results are sent back
+    to the main process as Arrow tables.
+
+    Results are cached by dest_seq_id for the current version of the costs
+    (identified by the hash of the costs store), so only the location chains
+    that were not searched since the last cost update are sent to the workers.
+    dest_seq_id values are expected to always identify the same location chain
+    (as the ids created by PopulationTrips.add_index). The cache is cleared
+    when it holds more than max_cached_chains location chains.
+
+    Can be used as a context manager to make sure the workers are shut down.
+
+    Parameters
+    ----------
+    k_sequences : int
+        Maximum number of mode sequences to keep for each location chain.
+    modes : dict
+        Mode properties, as returned by modes_list_to_dict.
+    costs_store_path : pathlib.Path
+        Folder of the memory mapped costs store.
+    n_workers : int, optional
+        Number of worker processes. Defaults to half the CPU count.
+    batch_size : int, optional
+        Number of location chains sent to a worker at once.
+    engine : str, optional
+        "heap" for the best first search of run_top_k_search (one location
+        chain at a time), or "vectorized" for the batched numpy enumeration
+        of process_batch_vectorized. Both engines give the same results
+        (as long as the costs are not negative, which the best first search
+        assumes), except between sequences of exactly the same cost, which
+        they can keep in a different order.
+    max_cached_chains : int, optional
+        Maximum number of location chains whose results are cached.
+    """
+
+    def __init__(
+            self,
+            k_sequences: int,
+            modes: dict,
+            costs_store_path: pathlib.Path,
+            n_workers: int = None,
+            batch_size: int = 50000,
+            engine: str = "heap",
+            max_cached_chains: int = 1000000
+        ):
+        
+        if engine not in ["heap", "vectorized"]:
+            raise ValueError("Unknown mode sequence search engine : " + str(engine) + " (should be 'heap' or 'vectorized').")
+
+        self.k_sequences = k_sequences
+        self.modes = modes
+        self.mode_id = {n: i for i, n in enumerate(modes)}
+        self.id_to_mode = {i: n for i, n in enumerate(modes)}
+        self.is_return_mode = {self.mode_id[k]: v["is_return_mode"] for k, v in modes.items()}
+        self.costs_store = ODModeCostsStore(costs_store_path)
+        self.n_workers = max(1, int(os.cpu_count()/2)) if n_workers is None else n_workers
+        self.batch_size = batch_size
+        self.engine = engine
+        self.max_cached_chains = max_cached_chains
+        self.executor = None
+        
+        self.cache_costs_hash = None
+        self.cached_dest_seq_ids = set()
+        self.cached_results = []
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+    def update_costs(self, costs: pl.DataFrame):
+        """
+        Write the costs to the shared store, updating only the values that
+        changed since the last call.
+
+        Parameters
+        ----------
+        costs : pl.DataFrame
+            Costs with columns from, to, mode and cost.
+        """
+
+        costs = costs.with_columns(
+            mode_id=pl.col("mode").replace_strict(self.mode_id, return_dtype=pl.UInt8())
+        )
+
+        n_changed = self.costs_store.update(costs, len(self.modes), self.is_return_mode)
+
+        if n_changed is None:
+
+            # The store files are rewritten, so the workers that mapped the
+            # previous ones have to be restarted
+            self.close()
+            self.costs_store.write(costs, len(self.modes), self.is_return_mode)
+
+        else:
+
+            logging.info(f"Updated {n_changed} OD x mode costs in the shared costs store.")
+
+        # Results computed with other costs cannot be reused
+        if self.costs_store.costs_hash != self.cache_costs_hash:
+            self.cache_costs_hash = self.costs_store.costs_hash
+            self.cached_dest_seq_ids = set()
+            self.cached_results = []
+
 
-def compute_subtour_mode_probabilities(
-        k_sequences,
-        location_chains_path,
-        costs_path,
-        leg_modes_path,
-        modes_path,
-        tmp_path,
-        output_path
- ):
-    
-    unique_location_chains = pl.read_parquet(location_chains_path)
+    def run(self, location_chains: pl.DataFrame) -> pl.DataFrame:
+        """
+        Find the top-k mode sequences of each location chain.
+
+        Parameters
+        ----------
+        location_chains : pl.DataFrame
+            Location chains with columns dest_seq_id and locations (list of
+            transport zone ids, not including the return to the first location).
+
+        Returns
+        -------
+        pl.DataFrame
+            Mode sequences with columns mode_seq_index, location,
+            seq_step_index, mode_index and dest_seq_id.
+        """
+
+        dest_seq_ids = location_chains["dest_seq_id"].unique()
         
-    location_chains = [
-        (l[0], l[1] + [l[1][0]])
-        for l in zip(
-            unique_location_chains["dest_seq_id"].to_list(),
-            unique_location_chains["locations"].to_list()
+        new_location_chains = location_chains.filter(
+            pl.col("dest_seq_id").is_in(list(self.cached_dest_seq_ids)).not_()
         )
-    ]
-    
-    batch_size = 50000
-    batches = list(chunked(location_chains, batch_size))
-    n_workers = max(1, int(os.cpu_count()/2))
-    
-    # To debug without parallel processing that masks errors
-    # worker_init(
-    #     k_sequences,
-    #     costs_path,
-    #     leg_modes_path,
-    #     modes_path,
-    #     tmp_path
-    # )
-    # process_batch(batches[0], debug=True)
-    # process_batch([(0, [585, 554, 472, 455, 585])], debug=True)
-    
-    ppe = ProcessPoolExecutor(
-        max_workers=n_workers,
-        initializer=worker_init,
-        initargs=(
-            k_sequences,
-            costs_path,
-            leg_modes_path,
-            modes_path,
-            tmp_path
+
+        if len(self.cached_dest_seq_ids) + new_location_chains.height > self.max_cached_chains:
+            logging.info("Mode sequences cache full, clearing it.")
+            self.cached_dest_seq_ids = set()
+            self.cached_results = []
+            new_location_chains = location_chains
+        
+        logging.info(
+            f"Searching mode sequences for {new_location_chains.height} location chains "
+            f"({location_chains.height - new_location_chains.height} already searched with the current costs)."
         )
-    )
-    
-    with ppe as executor:
-        for batch_results in executor.map(process_batch, batches):
-            pass
         
+        if new_location_chains.height > 0:
+            self.cached_results.extend(self.search(new_location_chains))
+            self.cached_dest_seq_ids.update(new_location_chains["dest_seq_id"].to_list())
+        
+        if len(self.cached_results) == 0:
+            return pl.DataFrame(
+                schema={
+                    "mode_seq_index": pl.Int64(),
+                    "location": pl.Int64(),
+                    "seq_step_index": pl.Int64(),
+                    "mode_index": pl.Int64(),
+                    "dest_seq_id": pl.UInt64()
+                }
+            )
+        
+        results = (
+            pl.from_arrow(pa.concat_tables(self.cached_results))
+            .filter(pl.col("dest_seq_id").is_in(dest_seq_ids.cast(pl.UInt64()).implode()))
+        )
         
-    return None
+        return results
+
+
+    def search(self, location_chains: pl.DataFrame) -> list:
+        """
+        Send the location chains to the workers and collect their results, as
+        a list of Arrow tables.
+        """
+
+        # Convert the locations to zone indices in the costs store (chains
+        # going through zones without costs cannot have any mode sequence)
+        location_chains = (
+            location_chains
+            .explode("locations")
+            .with_columns(
+                locations=pl.col("locations").map_batches(
+                    lambda s: pl.Series(self.costs_store.zone_index(s.to_numpy())),
+                    return_dtype=pl.Int64()
+                )
+            )
+            .group_by("dest_seq_id", maintain_order=True)
+            .agg(pl.col("locations"))
+            .filter(pl.col("locations").list.min() > -1)
+        )
+
+        location_chains = [
+            (l[0], l[1] + [l[1][0]])
+            for l in zip(
+                location_chains["dest_seq_id"].to_list(),
+                location_chains["locations"].to_list()
+            )
+        ]
+
+        batches = list(chunked(location_chains, self.batch_size))
+
+        if self.engine == "heap":
+            initializer, process = worker_init, process_batch
+        else:
+            initializer, process = worker_init_vectorized, process_batch_vectorized
+
+        # To debug without parallel processing that masks errors
+        # initializer(self.k_sequences, self.costs_store.folder, self.modes)
+        # process(batches[0], debug=True)
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=(
+                    self.k_sequences,
+                    self.costs_store.folder,
+                    self.modes
+                )
+            )
+
+        results = [r for r in self.executor.map(process, batches) if r is not None]
+
+        return results
+
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
 
 
 
 def modes_list_to_dict(modes_list):
-    
+
     modes = {
         mode.name: {
             "vehicle": mode.vehicle,
@@ -72,7 +266,7 @@ def modes_list_to_dict(modes_list):
         }
         for mode in modes_list
     }
-    
+
     for mode in modes_list:
         if not mode.return_mode is None:
             modes[mode.return_mode] = {
@@ -81,30 +275,5 @@ def modes_list_to_dict(modes_list):
                 "is_return_mode": True,
                 "return_mode": None
             }
-            
-    return modes
-        
-
 
-if __name__ == "__main__":
-    
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--k_sequences")
-    parser.add_argument("--location_chains_path")
-    parser.add_argument("--costs_path")
-    parser.add_argument("--leg_modes_path")
-    parser.add_argument("--modes_path")
-    parser.add_argument("--tmp_path")
-    parser.add_argument("--output_path")
-    args = parser.parse_args()
-
-    compute_subtour_mode_probabilities(
-        args.k_sequences,
-        args.location_chains_path,
-        args.costs_path,
-        args.leg_modes_path,
-        args.modes_path,
-        args.tmp_path,
-        args.output_path
-    )
-    
\ No newline at end of file
+    return modes
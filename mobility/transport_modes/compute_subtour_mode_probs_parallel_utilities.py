@@ -1,13 +1,11 @@
 import heapq
-import json
-import pathlib
-import shortuuid
+import math
 import logging
-import pickle
 
 import polars as pl
 import numpy as np
 
+from mobility.transport_modes.od_mode_costs_store import ODModeCostsStore
 
 
 def chunked(seq, batch_size):
@@ -15,22 +13,17 @@ def chunked(seq, batch_size):
         yield seq[i:i+batch_size]
         
         
-def worker_init(k_sequences_, costs_path, leg_modes_path, modes_path, tmp_path_):
+def worker_init(k_sequences_, costs_store_path, modes):
     
     logging.info("Initializing worker...")
     
     global k_sequences
-    global costs, leg_modes, n_vehicles, leg_modes, needs_vehicle, vehicle_for_mode
+    global costs, leg_modes, zone_ids, n_vehicles, needs_vehicle, vehicle_for_mode
     global multimodal, is_return_mode, return_mode
-    global tmp_path
     
     k_sequences = int(k_sequences_)
-    tmp_path = pathlib.Path(tmp_path_)
     
     # Prepare mode properties
-    with open(modes_path, "r") as f:
-        modes = json.load(f)
-    
     mode_id = {n:i for i, n in enumerate(modes)}
 
     needs_vehicle = {mode_id[k]: not v["vehicle"] is None for  k, v in modes.items()}
@@ -43,11 +36,11 @@ def worker_init(k_sequences_, costs_path, leg_modes_path, modes_path, tmp_path_)
     vehicle_for_mode = {mode_id[k]: vehicles[v["vehicle"]] for k, v in modes.items() if not v["vehicle"] is None}
     n_vehicles = len(vehicles)
     
-    with open(costs_path, "rb") as f:
-        costs = pickle.load(f)
-        
-    with open(leg_modes_path, "rb") as f:
-        leg_modes = pickle.load(f)
+    # Attach the memory mapped costs (zone index x zone index x mode id)
+    costs_store = ODModeCostsStore(costs_store_path).attach()
+    costs = costs_store.costs
+    leg_modes = costs_store.leg_modes
+    zone_ids = costs_store.zone_ids
             
 
 
@@ -109,13 +102,24 @@ def process_batch(batch_of_locations, debug=False):
         
         mode_sequences = [ms for ms in mode_sequences if ms is not None]
         
-        ( 
+        if len(mode_sequences) == 0:
+            return None
+        
+        # Convert the zone indices back to transport zone ids and send the 
+        # results back to the main process as an Arrow table
+        results = ( 
             pl.concat(mode_sequences)
-            .write_parquet(
-                tmp_path / (shortuuid.uuid() + ".parquet")
+            .with_columns(
+                location=pl.col("location").map_batches(
+                    lambda s: pl.Series(zone_ids[s.to_numpy()]),
+                    return_dtype=pl.Int64()
+                )
             )
+            .to_arrow()
         )
         
+        return results
+        
     except Exception:
         logging.exception("Error when running run_top_k_search.")
         raise
@@ -137,6 +141,9 @@ def run_top_k_search(
         debug=False
     ):
     
+    # locations_full is a sequence of zone indices (see ODModeCostsStore),
+    # costs and leg_modes are indexed with them
+    
     if debug:
         print("---")
         print(locations_full)
@@ -150,79 +157,23 @@ def run_top_k_search(
     
         if len(locations) == 2:
             
-            available_mode_ids = leg_modes[(locations[0], locations[1])]
-            results = [(costs[(locations[0], locations[1], m_id)], [m_id]) for m_id in available_mode_ids]
+            available_mode_ids = leg_modes[locations[0], locations[1]]
+            results = [(float(costs[locations[0], locations[1], m_id]), [m_id]) for m_id in available_mode_ids]
             
         else:
-        
-            subtours = get_possible_subtours_from_locations(locations)
-                
-            n_legs = len(locations) - 1
-            vehicle_locations = [locations[0]] * n_vehicles
-            mode_sequence = []
-            return_mode_constraints = {}
-            state = (0, vehicle_locations, mode_sequence, return_mode_constraints)
-            heap = [(0.0, state)]
-            results = []
-                
-            # Create a map between start and end destinations of subtours, when they 
-            # have a length > 2 and that their first and last leg are symetrical 
-            # (ie a->b and b->a)
-            subtour_first_leg_eq_last_leg = {s[0]: (locations[s[0]] == locations[s[-1]] and locations[s[1]] == locations[s[-2]], s[-1]) for s in subtours if len(s) > 2}
-            subtour_first_leg_eq_last_leg = {k: v[1] for k, v in subtour_first_leg_eq_last_leg.items() if v[0] is True}
             
-            while heap and len(results) < k:
-                
-                cost, (leg_idx, vehicle_locations, mode_sequence, return_mode_constraints) = heapq.heappop(heap)
-                
-                # If we reached the end of the tour and all vehicle are at home,
-                # push the result and go to the next value on the heap
-                if leg_idx == n_legs:
-                    if all(vl == locations[0] for vl in vehicle_locations):
-                        results.append((cost, mode_sequence))
-                    continue
-                
-                current_location = locations[leg_idx]
-                next_location = locations[leg_idx+1]
-                
-                enforced_mode = return_mode_constraints.get(leg_idx, None)
-                available_mode_ids = leg_modes[(current_location, next_location)] if enforced_mode is None else [enforced_mode]
-                    
-                for m_id in available_mode_ids:
-                        
-                    mode_cost = costs[(current_location, next_location, m_id)]
-                    
-                    next_vehicle_locations = list(vehicle_locations)
-                    next_return_mode_constraints = dict(return_mode_constraints)
-                    
-                    if needs_vehicle[m_id]:
-                        
-                        v_id = vehicle_for_mode[m_id]
-            
-                        # Check if the vehicle needed is available for the trip,
-                        # if not go to the next value on the heap
-                        if vehicle_locations[v_id] != current_location:# and enforced_mode is None:
-                            continue
-                        
-                        # Move the vehicle to next location
-                        next_vehicle_locations[v_id] = next_location
-                        
-                        # Special case for multimodal modes
-                        if multimodal[m_id] and not is_return_mode[m_id]:
-                            
-                            # Check if the leg is the start of a subtour that is compatible
-                            # with a multimodal mode with vehicle (ie the vehicle has to 
-                            # be retrieved at the end of the subtour)
-                            if leg_idx not in subtour_first_leg_eq_last_leg:
-                                continue
-                            
-                            # Force the return mode on the last leg of the subtour
-                            subtour_last_leg_index = subtour_first_leg_eq_last_leg[leg_idx]-1
-                            next_return_mode_constraints[subtour_last_leg_index] = return_mode[m_id]
-                                
-                    # Push the new state to the heap
-                    state = (leg_idx+1, next_vehicle_locations, mode_sequence + [m_id], next_return_mode_constraints)
-                    heapq.heappush(heap, (cost+mode_cost, state))
+            results = search_top_k_part(
+                locations,
+                n_vehicles,
+                leg_modes,
+                costs,
+                needs_vehicle,
+                vehicle_for_mode,
+                multimodal,
+                is_return_mode,
+                return_mode,
+                k
+            )
                     
         all_results.append(results)       
             
@@ -263,6 +214,106 @@ def run_top_k_search(
     return results
     
 
+def search_top_k_part(
+        locations,
+        n_vehicles,
+        leg_modes,
+        costs,
+        needs_vehicle,
+        vehicle_for_mode,
+        multimodal,
+        is_return_mode,
+        return_mode,
+        k
+    ):
+    """
+    Best first search of the k cheapest feasible mode sequences for a part of
+    a location chain (that starts and ends at home, with at least two legs).
+    """
+    
+    n_legs = len(locations) - 1
+    vehicle_locations = [locations[0]] * n_vehicles
+    mode_sequence = []
+    return_mode_constraints = {}
+    state = (0, vehicle_locations, mode_sequence, return_mode_constraints)
+    heap = [(0.0, state)]
+    results = []
+        
+    subtour_first_leg_eq_last_leg = get_subtour_first_leg_eq_last_leg(locations)
+    
+    while heap and len(results) < k:
+        
+        cost, (leg_idx, vehicle_locations, mode_sequence, return_mode_constraints) = heapq.heappop(heap)
+        
+        # If we reached the end of the tour and all vehicle are at home,
+        # push the result and go to the next value on the heap
+        if leg_idx == n_legs:
+            if all(vl == locations[0] for vl in vehicle_locations):
+                results.append((cost, mode_sequence))
+            continue
+        
+        current_location = locations[leg_idx]
+        next_location = locations[leg_idx+1]
+        
+        enforced_mode = return_mode_constraints.get(leg_idx, None)
+        available_mode_ids = leg_modes[current_location, next_location] if enforced_mode is None else [enforced_mode]
+            
+        for m_id in available_mode_ids:
+                
+            mode_cost = float(costs[current_location, next_location, m_id])
+            
+            # Enforced return modes might not be available for the OD pair
+            if math.isnan(mode_cost):
+                continue
+            
+            next_vehicle_locations = list(vehicle_locations)
+            next_return_mode_constraints = dict(return_mode_constraints)
+            
+            if needs_vehicle[m_id]:
+                
+                v_id = vehicle_for_mode[m_id]
+    
+                # Check if the vehicle needed is available for the trip,
+                # if not go to the next value on the heap
+                if vehicle_locations[v_id] != current_location:# and enforced_mode is None:
+                    continue
+                
+                # Move the vehicle to next location
+                next_vehicle_locations[v_id] = next_location
+                
+                # Special case for multimodal modes
+                if multimodal[m_id] and not is_return_mode[m_id]:
+                    
+                    # Check if the leg is the start of a subtour that is compatible
+                    # with a multimodal mode with vehicle (ie the vehicle has to 
+                    # be retrieved at the end of the subtour)
+                    if leg_idx not in subtour_first_leg_eq_last_leg:
+                        continue
+                    
+                    # Force the return mode on the last leg of the subtour
+                    subtour_last_leg_index = subtour_first_leg_eq_last_leg[leg_idx]-1
+                    next_return_mode_constraints[subtour_last_leg_index] = return_mode[m_id]
+                        
+            # Push the new state to the heap
+            state = (leg_idx+1, next_vehicle_locations, mode_sequence + [m_id], next_return_mode_constraints)
+            heapq.heappush(heap, (cost+mode_cost, state))
+
+    return results
+
+
+def get_subtour_first_leg_eq_last_leg(locations):
+    
+    subtours = get_possible_subtours_from_locations(locations)
+    
+    # Create a map between start and end destinations of subtours, when they 
+    # have a length > 2 and that their first and last leg are symetrical 
+    # (ie a->b and b->a)
+    subtour_first_leg_eq_last_leg = {s[0]: (locations[s[0]] == locations[s[-1]] and locations[s[1]] == locations[s[-2]], s[-1]) for s in subtours if len(s) > 2}
+    subtour_first_leg_eq_last_leg = {k: v[1] for k, v in subtour_first_leg_eq_last_leg.items() if v[0] is True}
+    
+    return subtour_first_leg_eq_last_leg
+    
+
 def get_possible_subtours_from_locations(locations):
     
     last_seen = {}
@@ -0,0 +1,324 @@
+import logging
+
+import numpy as np
+import polars as pl
+
+from collections import defaultdict
+
+from mobility.transport_modes import compute_subtour_mode_probs_parallel_utilities as utilities
+from mobility.transport_modes.compute_subtour_mode_probs_parallel_utilities import (
+    split_at_home,
+    merge_mode_sequences_list,
+    search_top_k_part,
+    get_subtour_first_leg_eq_last_leg
+)
+
+# Location chain parts with more feasible mode sequences than this are sent
+# to the best first search instead of being enumerated
+MAX_ENUMERATED_SEQUENCES = 200000
+
+# Maximum number of (part, mode sequence) costs evaluated at once
+MAX_COST_CELLS = 5000000
+
+# Feasible mode sequences by part structure, cached for the worker lifetime
+feasible_sequences_cache = {}
+
+
+def worker_init_vectorized(k_sequences_, costs_store_path, modes):
+    
+    utilities.worker_init(k_sequences_, costs_store_path, modes)
+    feasible_sequences_cache.clear()
+
+
+def process_batch_vectorized(batch_of_locations, debug=False):
+    """
+    Vectorized equivalent of process_batch : finds the top k mode sequences
+    of a batch of location chains, with the same results as run_top_k_search
+    (except between sequences of exactly the same cost, see 
+    get_top_k_sequences).
+
+    Chains are split at home like in run_top_k_search, then the parts are
+    grouped by structure (the pattern of repeated locations in the part). The
+    feasibility of a mode sequence (vehicle availability, return modes of
+    multimodal modes) only depends on this structure, so the feasible
+    sequences are enumerated once per structure as a numpy array, and the
+    costs of all the parts of a group are evaluated at once, before keeping
+    the k cheapest sequences of each part with a partial sort.
+    """
+
+    try:
+
+        k = utilities.k_sequences
+        costs = utilities.costs
+
+        # Split the chains and group their parts by structure
+        chains_parts = []
+        parts_by_structure = defaultdict(list)
+
+        for chain_index, (dest_seq_id, locations_full) in enumerate(batch_of_locations):
+            parts = split_at_home(locations_full)
+            chains_parts.append(len(parts))
+            for part_index, locations in enumerate(parts):
+                parts_by_structure[get_part_structure(locations)].append((chain_index, part_index, locations))
+
+        parts_results = {}
+
+        for structure, parts in parts_by_structure.items():
+
+            sequences = get_feasible_sequences(structure)
+
+            if sequences is None:
+
+                for chain_index, part_index, locations in parts:
+                    parts_results[(chain_index, part_index)] = search_top_k_part(
+                        locations,
+                        utilities.n_vehicles,
+                        utilities.leg_modes,
+                        costs,
+                        utilities.needs_vehicle,
+                        utilities.vehicle_for_mode,
+                        utilities.multimodal,
+                        utilities.is_return_mode,
+                        utilities.return_mode,
+                        k
+                    )
+
+            else:
+
+                locations = np.array([p[2] for p in parts], dtype=np.int64)
+                top_k = get_top_k_sequences(locations, sequences, costs, k)
+
+                for (chain_index, part_index, _), results in zip(parts, top_k):
+                    parts_results[(chain_index, part_index)] = results
+
+        # Merge the results of the parts of each chain and format them
+        mode_seq_index, location, seq_step_index, mode_index, dest_seq_ids = [], [], [], [], []
+
+        for chain_index, (dest_seq_id, locations_full) in enumerate(batch_of_locations):
+
+            results = merge_mode_sequences_list(
+                [parts_results[(chain_index, part_index)] for part_index in range(chains_parts[chain_index])],
+                k=k
+            )
+
+            if len(results) == 0:
+                continue
+
+            c = np.array([r[0] for r in results])
+            p = np.exp(-c)
+            p /= p.sum()
+            i_max = np.argmax(p.cumsum() > 0.98)
+
+            for i, (total_cost, mode_seq) in enumerate(results[:i_max+1]):
+                n_legs = len(mode_seq)
+                mode_seq_index.extend([i]*n_legs)
+                location.extend(locations_full[1:n_legs+1])
+                seq_step_index.extend(range(1, n_legs+1))
+                mode_index.extend(mode_seq)
+                dest_seq_ids.extend([dest_seq_id]*n_legs)
+
+        if len(mode_seq_index) == 0:
+            return None
+
+        results = pl.DataFrame(
+            {
+                "mode_seq_index": mode_seq_index,
+                "location": utilities.zone_ids[np.array(location, dtype=np.int64)],
+                "seq_step_index": seq_step_index,
+                "mode_index": mode_index,
+                "dest_seq_id": dest_seq_ids
+            },
+            schema={
+                "mode_seq_index": pl.Int64(),
+                "location": pl.Int64(),
+                "seq_step_index": pl.Int64(),
+                "mode_index": pl.Int64(),
+                "dest_seq_id": pl.UInt64()
+            }
+        )
+
+        if debug:
+            print(results)
+
+        return results.to_arrow()
+
+    except Exception:
+        logging.exception("Error when running process_batch_vectorized.")
+        raise
+
+
+def get_part_structure(locations):
+    """
+    Relabel the locations of a chain part by order of first appearance
+    (5 -> 8 -> 3 -> 8 -> 5 becomes (0, 1, 2, 1, 0)). Parts with only one
+    leg have a specific structure, because run_top_k_search does not apply
+    any vehicle constraint to them.
+    """
+
+    if len(locations) == 2:
+        return ("direct",)
+
+    labels = {}
+    return tuple(labels.setdefault(loc, len(labels)) for loc in locations)
+
+
+def get_feasible_sequences(structure):
+    """
+    Get the feasible mode sequences for a part structure, as an array of
+    shape (n_sequences, n_legs), sorted in lexicographic order (None if there
+    are more than MAX_ENUMERATED_SEQUENCES of them).
+    """
+
+    if structure not in feasible_sequences_cache:
+        feasible_sequences_cache[structure] = enumerate_feasible_sequences(structure)
+
+    return feasible_sequences_cache[structure]
+
+
+def enumerate_feasible_sequences(structure):
+    """
+    Enumerate all mode sequences that respect the vehicle and return mode
+    constraints of run_top_k_search for a part structure, leg by leg, and
+    dropping the infeasible prefixes as soon as possible.
+
+    The availability of modes between locations is not checked here (it is
+    handled by the NaN costs when evaluating the sequences).
+    """
+
+    n_modes = utilities.costs.shape[2]
+    mode_ids = np.arange(n_modes)
+
+    is_return_mode = np.array([utilities.is_return_mode[m] for m in mode_ids])
+
+    if structure == ("direct",):
+        return mode_ids[~is_return_mode].reshape(-1, 1)
+
+    needs_vehicle = np.array([utilities.needs_vehicle[m] for m in mode_ids])
+    multimodal = np.array([utilities.multimodal[m] for m in mode_ids])
+    vehicle_for_mode = np.array([utilities.vehicle_for_mode.get(m, 0) for m in mode_ids])
+    return_mode = np.array([utilities.return_mode.get(m, -1) for m in mode_ids])
+
+    locations = np.array(structure)
+    n_legs = len(structure) - 1
+    subtour_first_leg_eq_last_leg = get_subtour_first_leg_eq_last_leg(structure)
+
+    # State of each prefix : modes used, vehicles locations, enforced modes
+    sequences = np.zeros((1, 0), dtype=np.int64)
+    vehicle_locations = np.zeros((1, max(utilities.n_vehicles, 1)), dtype=np.int64)
+    constraints = np.full((1, n_legs), -1, dtype=np.int64)
+
+    for leg_idx in range(n_legs):
+
+        n_prefixes = sequences.shape[0]
+        prefix = np.repeat(np.arange(n_prefixes), n_modes)
+        m = np.tile(mode_ids, n_prefixes)
+
+        enforced_mode = constraints[prefix, leg_idx]
+        feasible = np.where(enforced_mode > -1, m == enforced_mode, ~is_return_mode[m])
+
+        # The vehicle has to be at the current location
+        v_id = vehicle_for_mode[m]
+        uses_vehicle = needs_vehicle[m]
+        feasible &= ~uses_vehicle | (vehicle_locations[prefix, v_id] == locations[leg_idx])
+
+        # Multimodal modes with vehicles can only start subtours with
+        # symetrical first and last legs
+        starts_subtour = uses_vehicle & multimodal[m] & ~is_return_mode[m]
+        if leg_idx not in subtour_first_leg_eq_last_leg:
+            feasible &= ~starts_subtour
+
+        prefix, m, v_id = prefix[feasible], m[feasible], v_id[feasible]
+        uses_vehicle, starts_subtour = uses_vehicle[feasible], starts_subtour[feasible]
+
+        if prefix.shape[0] > MAX_ENUMERATED_SEQUENCES:
+            return None
+
+        sequences = np.hstack([sequences[prefix], m.reshape(-1, 1)])
+
+        vehicle_locations = vehicle_locations[prefix]
+        moved = np.flatnonzero(uses_vehicle)
+        vehicle_locations[moved, v_id[moved]] = locations[leg_idx+1]
+
+        constraints = constraints[prefix]
+        if leg_idx in subtour_first_leg_eq_last_leg:
+            enforced = np.flatnonzero(starts_subtour)
+            constraints[enforced, subtour_first_leg_eq_last_leg[leg_idx]-1] = return_mode[m[enforced]]
+
+    # All vehicles have to be back home at the end of the part
+    at_home = (vehicle_locations == locations[0]).all(axis=1)
+
+    return sequences[at_home]
+
+
+def get_top_k_sequences(locations, sequences, costs, k):
+    """
+    Evaluate the costs of all feasible sequences for parts with the same
+    structure, and keep the k cheapest sequences of each part (ties are
+    broken by the order of the sequences in the sequences array. The heap
+    in search_top_k_part compares the vehicle locations of tied states
+    first, so the two engines can keep different sequences among the ones
+    that have exactly the same cost).
+
+    Parameters
+    ----------
+    locations : np.ndarray
+        Zone indices of the parts, of shape (n_parts, n_legs+1).
+    sequences : np.ndarray
+        Feasible mode sequences, of shape (n_sequences, n_legs).
+    costs : np.ndarray
+        Costs by zone index, zone index and mode id.
+    k : int
+        Number of sequences to keep.
+
+    Returns
+    -------
+    list
+        For each part, a list of (cost, mode sequence) tuples sorted by cost.
+    """
+
+    n_parts = locations.shape[0]
+    n_sequences, n_legs = sequences.shape
+
+    results = [[] for _ in range(n_parts)]
+
+    if n_sequences == 0:
+        return results
+
+    k_max = min(k, n_sequences)
+    chunk_size = max(1, MAX_COST_CELLS // n_sequences)
+
+    for start in range(0, n_parts, chunk_size):
+
+        chunk = locations[start:start+chunk_size]
+
+        # Sum the leg costs in the same order as the best first search, to
+        # get exactly the same floating point values
+        total_costs = np.zeros((chunk.shape[0], n_sequences))
+        for leg_idx in range(n_legs):
+            total_costs = total_costs + costs[
+                chunk[:, leg_idx].reshape(-1, 1),
+                chunk[:, leg_idx+1].reshape(-1, 1),
+                sequences[:, leg_idx].reshape(1, -1)
+            ]
+
+        total_costs[np.isnan(total_costs)] = np.inf
+
+        # Keep all sequences with a cost lower than the k-th lowest cost,
+        # then sort them by cost and sequence index
+        kth_cost = np.partition(total_costs, k_max-1, axis=1)[:, k_max-1]
+        candidates = (total_costs <= kth_cost.reshape(-1, 1)) & np.isfinite(total_costs)
+
+        part_idx, seq_idx = np.nonzero(candidates)
+        candidate_costs = total_costs[part_idx, seq_idx]
+
+        order = np.lexsort((seq_idx, candidate_costs, part_idx))
+        part_idx, seq_idx, candidate_costs = part_idx[order], seq_idx[order], candidate_costs[order]
+
+        rank = np.arange(part_idx.shape[0]) - np.searchsorted(part_idx, part_idx)
+        keep = rank < k
+        part_idx, seq_idx, candidate_costs = part_idx[keep], seq_idx[keep], candidate_costs[keep]
+
+        for p, s, c in zip(part_idx.tolist(), seq_idx.tolist(), candidate_costs.tolist()):
+            results[start+p].append((c, sequences[s].tolist()))
+
+    return results
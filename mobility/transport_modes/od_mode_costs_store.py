@@ -0,0 +1,263 @@
+import hashlib
+import pathlib
+
+import numpy as np
+import polars as pl
+
+
+class ODModeCostsStore:
+    """
+    Dense, array backed store of the generalized costs by origin, destination
+    and mode, used by the top-k mode sequence search.
+
+    Costs are written once to memory mapped .npy files, indexed as
+    zone index x zone index x mode id (missing OD / mode pairs are NaN), so
+    that all the workers of the mode sequence search can attach them without
+    copying or unpickling anything.
+
+    Files in the store folder:
+        - zone_ids.npy : sorted transport zone ids (the position of an id in
+          this array is its zone index).
+        - costs.npy : float64 array of shape (n_zones, n_zones, n_modes).
+        - leg_modes_mask.npy : uint32 array of shape (n_zones, n_zones), bit m
+          is set if the (non return) mode m is available for the OD pair.
+
+    The costs_hash attribute identifies the current version of the costs
+    (it is updated by write and update in the process that writes the store) :
+    write hashes the whole costs array, update chains the previous hash with
+    the indices and values of the costs that changed, so that an update does
+    not have to read the whole array.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        Folder where the store files are written.
+    """
+
+    def __init__(self, folder: pathlib.Path):
+        self.folder = pathlib.Path(folder)
+        self.zone_ids_path = self.folder / "zone_ids.npy"
+        self.costs_path = self.folder / "costs.npy"
+        self.leg_modes_mask_path = self.folder / "leg_modes_mask.npy"
+        self.costs_hash = None
+        self.n_costs = None
+
+    def write(self, costs: pl.DataFrame, n_modes: int, is_return_mode: dict) -> "ODModeCostsStore":
+        """
+        Write the costs to the store files.
+
+        Parameters
+        ----------
+        costs : pl.DataFrame
+            Costs with columns from, to, mode_id and cost.
+        n_modes : int
+            Number of modes (mode ids are expected to be in [0, n_modes)).
+        is_return_mode : dict
+            Mode id -> True if the mode is a return mode (return modes can
+            only be used when enforced by a multimodal mode on the way out).
+
+        Returns
+        -------
+        ODModeCostsStore
+            The store itself, attached to the newly written files.
+        """
+
+        if n_modes > 32:
+            raise ValueError("The costs store can only handle up to 32 modes (found " + str(n_modes) + ").")
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        zone_ids = np.unique(np.concatenate([costs["from"].to_numpy(), costs["to"].to_numpy()])).astype(np.int64)
+        np.save(self.zone_ids_path, zone_ids)
+
+        i = np.searchsorted(zone_ids, costs["from"].to_numpy())
+        j = np.searchsorted(zone_ids, costs["to"].to_numpy())
+        m = costs["mode_id"].to_numpy().astype(np.int64)
+
+        n_zones = zone_ids.shape[0]
+
+        costs_array = np.lib.format.open_memmap(
+            self.costs_path,
+            mode="w+",
+            dtype=np.float64,
+            shape=(n_zones, n_zones, n_modes)
+        )
+        costs_array[:] = np.nan
+        costs_array[i, j, m] = costs["cost"].to_numpy()
+        costs_array.flush()
+
+        leg_modes_mask = self.compute_leg_modes_mask(costs_array, is_return_mode)
+        np.save(self.leg_modes_mask_path, leg_modes_mask)
+
+        self.costs_hash = self.compute_costs_hash(costs_array)
+        self.n_costs = int(np.count_nonzero(~np.isnan(costs_array)))
+
+        del costs_array
+
+        return self.attach()
+
+    def update(self, costs: pl.DataFrame, n_modes: int, is_return_mode: dict) -> int | None:
+        """
+        Update the store files in place, writing only the costs that changed.
+
+        Processes that attached the store see the new values directly, 
+        because the files are memory mapped in shared mode.
+
+        Parameters
+        ----------
+        costs : pl.DataFrame
+            Costs with columns from, to, mode_id and cost.
+        n_modes : int
+            Number of modes.
+        is_return_mode : dict
+            Mode id -> True if the mode is a return mode.
+
+        Returns
+        -------
+        int | None
+            The number of costs that changed, or None if the store could not
+            be updated in place (no store yet, or different zones or modes)
+            and has to be written again with ODModeCostsStore.write.
+        """
+
+        if not self.costs_path.exists() or not self.zone_ids_path.exists():
+            return None
+
+        zone_ids = np.unique(np.concatenate([costs["from"].to_numpy(), costs["to"].to_numpy()])).astype(np.int64)
+        current_zone_ids = np.load(self.zone_ids_path)
+
+        if not np.array_equal(zone_ids, current_zone_ids):
+            return None
+
+        costs_array = np.load(self.costs_path, mmap_mode="r+")
+
+        if costs_array.shape[2] != n_modes:
+            return None
+
+        i = np.searchsorted(zone_ids, costs["from"].to_numpy())
+        j = np.searchsorted(zone_ids, costs["to"].to_numpy())
+        m = costs["mode_id"].to_numpy().astype(np.int64)
+        new_values = costs["cost"].to_numpy()
+
+        current_values = costs_array[i, j, m]
+        changed = ~((current_values == new_values) | (np.isnan(current_values) & np.isnan(new_values)))
+
+        if self.costs_hash is None:
+            self.costs_hash = self.compute_costs_hash(costs_array)
+            self.n_costs = int(np.count_nonzero(~np.isnan(costs_array)))
+
+        n_new_costs = int(np.count_nonzero(~np.isnan(new_values)))
+
+        ci, cj, cm = i[changed], j[changed], m[changed]
+        changed_values, current_values = new_values[changed], current_values[changed]
+
+        costs_array[ci, cj, cm] = changed_values
+
+        self.n_costs += int((np.isnan(current_values) & ~np.isnan(changed_values)).sum())
+        self.n_costs -= int((~np.isnan(current_values) & np.isnan(changed_values)).sum())
+
+        # Costs that are not in the new table anymore (the whole array is
+        # only scanned when the number of costs shows that some are missing)
+        if self.n_costs != n_new_costs:
+            present = np.zeros(costs_array.shape, dtype=bool)
+            present[i, j, m] = True
+            ri, rj, rm = np.nonzero(~present & ~np.isnan(costs_array))
+            del present
+            costs_array[ri, rj, rm] = np.nan
+            ci, cj, cm = np.concatenate([ci, ri]), np.concatenate([cj, rj]), np.concatenate([cm, rm])
+            changed_values = np.concatenate([changed_values, np.full(ri.shape[0], np.nan)])
+            self.n_costs = n_new_costs
+
+        n_changed = int(ci.shape[0])
+
+        if n_changed > 0:
+
+            costs_array.flush()
+
+            # Only the available modes of the changed OD pairs can change
+            od = np.unique(np.stack([ci, cj], axis=1), axis=0)
+            leg_modes_mask = np.load(self.leg_modes_mask_path, mmap_mode="r+")
+            leg_modes_mask[od[:, 0], od[:, 1]] = self.compute_leg_modes_mask(costs_array[od[:, 0], od[:, 1]], is_return_mode)
+            leg_modes_mask.flush()
+            del leg_modes_mask
+
+            self.costs_hash = self.compute_update_hash(self.costs_hash, ci, cj, cm, changed_values)
+
+        del costs_array
+
+        self.attach()
+
+        return n_changed
+
+    def compute_costs_hash(self, costs_array: np.ndarray) -> str:
+        """
+        Hash the content of the costs array (the available modes are derived
+        from it, so it identifies the whole store).
+        """
+        return hashlib.md5(memoryview(np.ascontiguousarray(costs_array)).cast("B")).hexdigest()
+
+    def compute_update_hash(self, costs_hash: str, i: np.ndarray, j: np.ndarray, m: np.ndarray, values: np.ndarray) -> str:
+        """
+        Hash the previous version of the costs with the indices and the new
+        values of the costs that changed.
+        """
+        md5 = hashlib.md5(costs_hash.encode())
+        for a in [i, j, m]:
+            md5.update(np.ascontiguousarray(a, dtype=np.int64).tobytes())
+        md5.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        return md5.hexdigest()
+
+    def compute_leg_modes_mask(self, costs_array: np.ndarray, is_return_mode: dict) -> np.ndarray:
+        """
+        Encode the available non return modes of each OD pair as a bitmask
+        (the modes are on the last axis of the costs array).
+        """
+
+        n_modes = costs_array.shape[-1]
+        leg_modes_mask = np.zeros(costs_array.shape[:-1], dtype=np.uint32)
+
+        for m in range(n_modes):
+            if not is_return_mode[m]:
+                available = ~np.isnan(costs_array[..., m])
+                leg_modes_mask |= available.astype(np.uint32) << np.uint32(m)
+
+        return leg_modes_mask
+
+    def attach(self) -> "ODModeCostsStore":
+        """
+        Map the store files in memory (read only, without copying them).
+        """
+        self.zone_ids = np.load(self.zone_ids_path)
+        self.costs = np.asarray(np.load(self.costs_path, mmap_mode="r"))
+        self.leg_modes = LegModes(np.asarray(np.load(self.leg_modes_mask_path, mmap_mode="r")))
+        return self
+
+    def zone_index(self, zone_ids: np.ndarray) -> np.ndarray:
+        """
+        Convert transport zone ids to zone indices (-1 for zones that are
+        not in the store).
+        """
+        zone_ids = np.asarray(zone_ids)
+        index = np.searchsorted(self.zone_ids, zone_ids)
+        index = np.clip(index, 0, self.zone_ids.shape[0] - 1)
+        return np.where(self.zone_ids[index] == zone_ids, index, -1)
+
+
+class LegModes:
+    """
+    Integer indexed view of the available non return modes by OD pair :
+    leg_modes[i, j] returns the tuple of mode ids available between the zones
+    of index i and j.
+    """
+
+    def __init__(self, leg_modes_mask: np.ndarray):
+        self.leg_modes_mask = leg_modes_mask
+        self.decoded_masks = {}
+
+    def __getitem__(self, od):
+        mask = int(self.leg_modes_mask[od])
+        modes = self.decoded_masks.get(mask)
+        if modes is None:
+            modes = tuple(m for m in range(mask.bit_length()) if mask >> m & 1)
+            self.decoded_masks[mask] = modes
+        return modes
@@ -30,6 +30,9 @@ class IntermodalTransportGraph(FileAsset):
     (representing a project for instance) can be provided.
     """
 
+    # The outputs are rewritten in place by update
+    is_shareable = False
+
     def __init__(
             self,
             transport_zones: TransportZones,
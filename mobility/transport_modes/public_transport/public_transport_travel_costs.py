@@ -28,6 +28,9 @@ class PublicTransportTravelCosts(FileAsset):
     (representing a project for instance) can be provided.
     """
 
+    # The outputs are rewritten in place by update
+    is_shareable = False
+
     def __init__(
             self,
             transport_zones: TransportZones,
@@ -1,22 +1,33 @@
 import os
 import pathlib
 import logging
-import shortuuid
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
 import pandas as pd
 import geopandas as gpd
 import numpy as np
+import polars as pl
+import pyarrow as pa
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from rich.progress import Progress
 from mobility.file_asset import FileAsset
 
 from mobility.safe_sample import safe_sample, filter_database
 from mobility.sample_travels import sample_travels
-from mobility.parsers.mobility_survey import MobilitySurvey, MobilitySurveyAggregator
+from mobility.parsers.mobility_survey import MobilitySurvey, MobilitySurveyAggregator, SurveyIndex
+from mobility.parsers.mobility_survey.mobility_survey import DAYS_TRIP_INDEX_KEYS
 from mobility.parsers.mobility_survey.france import EMPMobilitySurvey
 from mobility.transport_modes.default_gwp import DefaultGWP
 
 from typing import Callable, Dict
 
+# Number of bits of the trip ids used for the index of the trip among the
+# trips of an individual (see get_trip_ids)
+TRIP_INDEX_BITS = 24
+
 
 class Trips(FileAsset):
     """
@@ -26,13 +37,28 @@ class Trips(FileAsset):
         population (Asset): The population for which trips will be generated.
         source (str): The source of the mobility survey data (default is "EMP-2019").
         cache_path (pathlib.Path): Path to cache the generated trips data.
+        engine (str): "individual" to sample the trips of each individual one after the other (default),
+            or "grouped" to sample the trips of all the individuals with the same country, CSP, number 
+            of cars and urban unit category at once (much faster for large populations), or "sharded"
+            to run the grouped engine on one shard of individuals per transport zone, in n_workers
+            processes (the trips are then cached as a folder with one parquet file per shard).
+        seed (int): The random seed of the "grouped" and "sharded" engines.
+        n_workers (int): The number of processes of the "sharded" engine (half of the CPUs by default).
+        streaming (bool): If True, the trips are generated and written by chunks of chunk_size individuals,
+            to a folder with one parquet file per chunk (or per shard for the "sharded" engine), with 
+            integer trip ids, and get returns a polars LazyFrame scanning these files.
+        chunk_size (int): The number of individuals of each chunk in streaming mode.
 
     Methods:
-        get_cached_asset: Returns the cached trips data as a pandas DataFrame.
+        get_cached_asset: Returns the cached trips data as a pandas DataFrame (or a polars LazyFrame in streaming mode).
         create_and_get_asset: Generates trips for the population and caches the data.
+        write_population_trips_chunks: Generates and writes trips chunk by chunk (streaming mode).
         prepare_survey_data: Prepares the necessary mobility survey data for trip generation.
         get_population_trips: Generates trips for each individual in the population.
         get_individual_trips: Samples trips for an individual based on their profile.
+        get_population_trips_grouped: Generates trips for groups of individuals with the same profile.
+        get_population_trips_sharded: Generates trips by transport zone shards, in parallel.
+        get_group_trips: Samples trips for all individuals of a group at once.
     """
 
     def __init__(
@@ -40,8 +66,16 @@ class Trips(FileAsset):
         population: FileAsset,
         surveys: Dict[str, MobilitySurvey] = None,
         filter_population: Callable[[pd.DataFrame], pd.DataFrame] = None,
-        gwp: DefaultGWP = DefaultGWP()
+        gwp: DefaultGWP = DefaultGWP(),
+        engine: str = "individual",
+        seed: int = None,
+        n_workers: int = None,
+        streaming: bool = False,
+        chunk_size: int = 100000
     ):
+        
+        if engine not in ["individual", "grouped", "sharded"]:
+            raise ValueError("Unknown trips sampling engine : " + str(engine) + " (should be 'individual', 'grouped' or 'sharded').")
 
         if surveys is None:
             surveys = {"fr": EMPMobilitySurvey()}
@@ -54,32 +88,49 @@ class Trips(FileAsset):
             "gwp": gwp
         }
 
+        # The sampling options are only hashed when they are not the default
+        # ones, so that the trips cached before they existed stay valid
+        options = {"engine": engine, "seed": seed, "streaming": streaming, "chunk_size": chunk_size}
+        defaults = {"engine": "individual", "seed": None, "streaming": False, "chunk_size": 100000}
+        inputs.update({k: v for k, v in options.items() if v != defaults[k]})
+
         self.filter_population = filter_population
+        self.engine = engine
+        self.seed = seed
+        self.n_workers = max(1, int(os.cpu_count()/2)) if n_workers is None else n_workers
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.days_trip_indexes = {}
 
         file_name = "trips.parquet"
         cache_path = pathlib.Path(os.environ["MOBILITY_PROJECT_DATA_FOLDER"]) / file_name
 
         super().__init__(inputs, cache_path)
 
-    def get_cached_asset(self) -> pd.DataFrame:
+    def get_cached_asset(self) -> pd.DataFrame | pl.LazyFrame:
         """
         Fetches the cached trips data.
 
         Returns:
-            pd.DataFrame: The cached trips data as a pandas DataFrame.
+            pd.DataFrame: The cached trips data as a pandas DataFrame, or as a 
+                polars LazyFrame scanning the chunk files in streaming mode.
         """
 
         logging.info("Trips already prepared. Reusing the file : " + str(self.cache_path))
+
+        if self.streaming:
+            return pl.scan_parquet(self.cache_path / "*.parquet")
+
         trips = pd.read_parquet(self.cache_path)
 
         return trips
 
-    def create_and_get_asset(self) -> pd.DataFrame:
+    def create_and_get_asset(self) -> pd.DataFrame | pl.LazyFrame:
         """
         Generates trips for each individual in the population based on the mobility survey data, then caches the data.
 
         Returns:
-            pd.DataFrame: The generated trips for the population.
+            pd.DataFrame: The generated trips for the population (a polars LazyFrame in streaming mode).
         """
 
         logging.info("Generating trips for each individual in the population...")
@@ -91,16 +142,42 @@ class Trips(FileAsset):
         if self.filter_population is not None:
             population = self.filter_population(population)
 
-        mobility_survey = self.inputs["mobility_survey"].get()
+        # Only read the survey tables and trips columns used to sample trips
+        trip_columns = ["previous_motive", "motive", "mode_id", "distance", "n_other_passengers"]
+        
+        mobility_survey = self.inputs["mobility_survey"].get_tables({
+            "short_trips": ["daily_trip_index"] + trip_columns,
+            "days_trip": None,
+            "long_trips": ["n_nights_at_destination"] + trip_columns,
+            "travels": None,
+            "n_travels": None,
+            "p_immobility": None
+        })
+        
         self.short_trips_db = mobility_survey["short_trips"]
         self.days_trip_db = mobility_survey["days_trip"]
         self.long_trips_db = mobility_survey["long_trips"]
         self.travels_db = mobility_survey["travels"]
         self.n_travels_db = mobility_survey["n_travels"]
         self.p_immobility = mobility_survey["p_immobility"]
-        self.p_car = mobility_survey["p_car"]
 
-        trips = self.get_population_trips(population, transport_zones, study_area)
+        if self.engine != "individual":
+            self.days_trip_indexes = self.inputs["mobility_survey"].get_days_trip_index()
+
+        if self.engine == "sharded":
+            self.get_population_trips_sharded(population, transport_zones, study_area)
+            if self.streaming:
+                return pl.scan_parquet(self.cache_path / "*.parquet")
+            return pd.read_parquet(self.cache_path)
+
+        if self.streaming:
+            self.write_population_trips_chunks(population, transport_zones, study_area)
+            return pl.scan_parquet(self.cache_path / "*.parquet")
+
+        if self.engine == "grouped":
+            trips = self.get_population_trips_grouped(population, transport_zones, study_area)
+        else:
+            trips = self.get_population_trips(population, transport_zones, study_area)
 
         trips.to_parquet(self.cache_path)
 
@@ -175,7 +252,7 @@ class Trips(FileAsset):
         trips["gwp"] *= trips["distance"]
 
         # Replace trip_ids by unique values
-        trips["trip_id"] = [shortuuid.uuid() for _ in range(trips.shape[0])]
+        trips["trip_id"] = get_trip_ids(trips, get_individual_positions(population))
 
         return trips
 
@@ -528,3 +605,677 @@ class Trips(FileAsset):
         all_trips = pd.concat([all_trips, sampled_short_trips])
 
         return all_trips
+    
+    
+    def get_population_trips_grouped(
+        self,
+        population: pd.DataFrame,
+        transport_zones: gpd.GeoDataFrame,
+        study_area: gpd.GeoDataFrame,
+    ) -> pd.DataFrame:
+        """
+        Generates trips for the entire population, like get_population_trips,
+        but sampling the trips of all individuals with the same country, CSP,
+        number of cars and urban unit category at once : the survey tables are
+        filtered once per group, and the travels and days of all the individuals
+        of the group are drawn with vectorized calls.
+
+        Args:
+            population (pd.DataFrame): The population data for which trips are to be generated.
+            transport_zones (gpd.GeoDataFrame): Geographic data for transport zones.
+            study_area (gpd.GeoDataFrame): Local admin units of the study area.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing generated trips for the population, 
+                with the same columns as get_population_trips.
+        """
+
+        population = add_urban_unit_categories(population, transport_zones, study_area)
+
+        rng = np.random.default_rng(self.seed)
+
+        with Progress() as progress:
+
+            task = progress.add_task("[green]Generating trips...", total=population.shape[0])
+
+            trips = self.get_groups_trips(
+                population,
+                rng,
+                on_group_done=lambda n: progress.update(task, advance=n)
+            )
+
+        # Replace trip_ids by unique values
+        trips["trip_id"] = get_trip_ids(trips, get_individual_positions(population))
+
+        return trips
+    
+    
+    def write_population_trips_chunks(
+        self,
+        population: pd.DataFrame,
+        transport_zones: gpd.GeoDataFrame,
+        study_area: gpd.GeoDataFrame,
+    ) -> None:
+        """
+        Generates the trips of the population by chunks of chunk_size individuals,
+        and writes each chunk to its own parquet file in the cache_path folder, 
+        so only the trips of one chunk are in memory at any time. Trip ids are 
+        built from the position of the individuals in the whole population (see
+        get_trip_ids), so they are unique across all the chunks.
+
+        Args:
+            population (pd.DataFrame): The population data for which trips are to be generated.
+            transport_zones (gpd.GeoDataFrame): Geographic data for transport zones.
+            study_area (gpd.GeoDataFrame): Local admin units of the study area.
+        """
+
+        if self.cache_path.exists():
+            shutil.rmtree(self.cache_path)
+        self.cache_path.mkdir(parents=True)
+
+        n_chunks = max(1, -(-population.shape[0] // self.chunk_size))
+        chunks_rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(self.seed).spawn(n_chunks)]
+
+        if self.engine == "grouped":
+            population = add_urban_unit_categories(population, transport_zones, study_area)
+
+        for i, rng in enumerate(chunks_rngs):
+
+            logging.info("Generating trips for the chunk " + str(i + 1) + "/" + str(n_chunks) + " of the population...")
+
+            chunk = population.iloc[i*self.chunk_size:(i + 1)*self.chunk_size]
+
+            if self.engine == "grouped":
+                trips = self.get_groups_trips(chunk, rng)
+            else:
+                trips = self.get_population_trips(chunk, transport_zones, study_area)
+
+            trips["trip_id"] = get_trip_ids(trips, get_individual_positions(chunk, i*self.chunk_size))
+
+            trips.to_parquet(self.cache_path / f"part-{i:05d}.parquet")
+    
+    
+    def get_population_trips_sharded(
+        self,
+        population: pd.DataFrame,
+        transport_zones: gpd.GeoDataFrame,
+        study_area: gpd.GeoDataFrame,
+    ) -> None:
+        """
+        Generates trips for the entire population with the grouped engine, 
+        in parallel : the individuals are split in one shard per transport zone,
+        the shards are processed by a pool of n_workers processes, and each 
+        shard is written to its own parquet file in the cache_path folder. 
+        Only one shard per worker is in memory at any time.
+
+        The survey tables are written once to Arrow IPC files, that the workers
+        memory map : the columns of their tables are read only views of the 
+        shared file pages (only the indexes are rebuilt by each worker).
+
+        The random generator of each shard is seeded from the seed of the 
+        asset and the ids of the individuals of the shard, and the trip ids 
+        are built from the position of the individuals in the population (see
+        get_trip_ids), so each shard is written once with its final trip ids,
+        and the trips do not depend on the number of workers.
+
+        Args:
+            population (pd.DataFrame): The population data for which trips are to be generated.
+            transport_zones (gpd.GeoDataFrame): Geographic data for transport zones.
+            study_area (gpd.GeoDataFrame): Local admin units of the study area.
+        """
+
+        individual_positions = get_individual_positions(population)
+
+        population = add_urban_unit_categories(population, transport_zones, study_area)
+
+        seed = self.seed if self.seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+
+        if self.cache_path.exists():
+            shutil.rmtree(self.cache_path)
+        self.cache_path.mkdir(parents=True)
+
+        # Largest shards first, so that the workers finish at about the same time
+        shards = [
+            (transport_zone_id, shard)
+            for transport_zone_id, shard in population.groupby("transport_zone_id", sort=True)
+        ]
+        shards.sort(key=lambda s: s[1].shape[0], reverse=True)
+
+        with tempfile.TemporaryDirectory(dir=self.cache_path.parent) as survey_folder:
+
+            for attribute, table in self.get_survey_tables().items():
+                write_arrow_table(table, pathlib.Path(survey_folder) / (attribute + ".arrow"))
+
+            executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=trips_shard_worker_init,
+                initargs=(
+                    survey_folder,
+                    self.inputs["gwp"],
+                    {c: self.get_days_trip_index(c) for c in population["country"].unique()}
+                )
+            )
+
+            with executor, Progress() as progress:
+
+                task = progress.add_task("[green]Generating trips...", total=population.shape[0])
+
+                futures = {
+                    executor.submit(
+                        process_trips_shard,
+                        shard,
+                        individual_positions.loc[shard["individual_id"]],
+                        get_shard_seed(seed, shard["individual_id"]),
+                        self.cache_path / ("part-" + str(transport_zone_id) + ".parquet")
+                    ): shard.shape[0]
+                    for transport_zone_id, shard in shards
+                }
+
+                for future in as_completed(futures):
+                    future.result()
+                    progress.update(task, advance=futures[future])
+    
+    
+    def get_survey_tables(self) -> dict:
+        """
+        Survey tables used by the grouped engine, by attribute name.
+        """
+        return {
+            attribute: getattr(self, attribute)
+            for attribute in ["short_trips_db", "days_trip_db", "long_trips_db", "travels_db", "n_travels_db", "p_immobility"]
+        }
+    
+    
+    def get_groups_trips(self, population: pd.DataFrame, rng, on_group_done: Callable = None) -> pd.DataFrame:
+        """
+        Samples the trips of a population (with its urban unit categories) 
+        group by group, and computes their GWP.
+
+        Args:
+            population (pd.DataFrame): The individuals, with an urban_unit_category column.
+            rng (np.random.Generator): The random generator.
+            on_group_done (Callable, optional): Called with the number of individuals 
+                of each group once its trips are sampled.
+
+        Returns:
+            pd.DataFrame: The trips, with the same columns as get_population_trips 
+                (the trip_id column holds survey ids).
+        """
+
+        year = 2025
+        dates = pd.date_range(start=f'{year}-01-01', end=f'{year}-12-31', freq='D')
+        df_days = pd.DataFrame({'date': dates})
+        df_days['month'] = df_days['date'].dt.month
+        df_days['weekday'] = df_days['date'].dt.weekday
+        df_days['day_of_year'] = df_days['date'].dt.dayofyear
+        
+        all_trips = []
+        
+        groups = population.groupby(
+            ["country", "socio_pro_category", "n_cars", "urban_unit_category"],
+            dropna=False,
+            sort=True
+        )
+
+        for (country, csp, n_cars, urban_unit_category), group in groups:
+
+            all_trips.append(
+                self.get_group_trips(
+                    individual_ids=group["individual_id"].to_numpy(),
+                    csp=csp,
+                    n_cars=n_cars,
+                    urban_unit_category=urban_unit_category,
+                    country=country,
+                    df_days=df_days,
+                    rng=rng
+                )
+            )
+
+            if on_group_done is not None:
+                on_group_done(group.shape[0])
+
+        trips = pd.concat(all_trips)
+        
+        # Same columns as the trips of get_population_trips
+        trips = trips[
+            [
+                "trip_id", "previous_motive", "motive", "mode_id", "distance",
+                "n_other_passengers", "n_days_from_departure", "date", "trip_type",
+                "daily_trip_index", "individual_id"
+            ]
+        ]
+
+        # Compute default GWP values
+        trips = pd.merge(trips, self.inputs["gwp"].as_dataframe(), on="mode_id")
+        trips["gwp"] *= trips["distance"]
+
+        return trips
+    
+    
+    def get_group_trips(
+        self, individual_ids, csp, n_cars, urban_unit_category, country, df_days, rng
+    ) -> pd.DataFrame:
+        """
+        Samples long distance trips and short distance trips for all the 
+        individuals of a group with the same profile, following the same steps
+        as get_individual_trips (see its documentation for the details).
+
+        Args:
+            individual_ids (np.ndarray): Ids of the individuals of the group.
+            csp (str): The socio-professional category of the individuals.
+            n_cars (str): The number of cars of the households.
+            urban_unit_category (str): The urban unit category of the residence.
+            country (str): The country of residence.
+            df_days (pd.DataFrame): The days of the modelled year.
+            rng (np.random.Generator): The random generator.
+
+        Returns:
+            pd.DataFrame: a dataframe with one row per sampled trip, and an individual_id column.
+        """
+        
+        n_individuals = individual_ids.shape[0]
+        end_of_year = pd.Timestamp('2026-01-01')
+
+        filtered_p_immobility = (
+            self.p_immobility
+            .xs(country, level="country")
+            .xs(csp)
+        )
+
+        n_travel = int(np.squeeze(
+            self.n_travels_db
+            .xs(country, level="country")
+            .xs(csp)
+        ))
+
+        # === TRAVELS ===
+        # Sample n_travel travels for each individual, with independent 
+        # exact samples drawn in one sampler run
+        travels_db = filter_database(
+            self.travels_db.xs(country, level="country"),
+            csp=csp,
+            n_cars=n_cars,
+            city_category=urban_unit_category
+        )
+
+        travels_db = pd.merge(travels_db, df_days, on=["month", "weekday"])
+
+        travels_index = sample_travels(
+            travels_db,
+            start_col="day_of_year",
+            length_col="n_nights",
+            weight_col="pondki",
+            k=n_travel,
+            num_samples=n_individuals,
+            random_seed=int(rng.integers(2**31)),
+            method="exact"
+        )
+        
+        # The sampler returns a single empty sample when no travel can be sampled
+        if len(travels_index) < n_individuals:
+            travels_index = [[] for _ in range(n_individuals)]
+
+        n_sampled_travels = np.array([len(sample) for sample in travels_index], dtype=int)
+        travels_positions = np.concatenate([np.array(sample, dtype=int) for sample in travels_index] + [np.zeros(0, dtype=int)])
+
+        sampled_travels = travels_db.iloc[travels_positions].reset_index(drop=True)
+        sampled_travels["individual_id"] = np.repeat(individual_ids, n_sampled_travels)
+        sampled_travels["travel_index"] = np.arange(sampled_travels.shape[0])
+        sampled_travels["n_nights"] = sampled_travels["n_nights"].fillna(0)
+
+        # Long trips of the sampled travels
+        sampled_long_trips = pd.merge(
+            sampled_travels[["travel_index", "travel_id", "individual_id", "date"]],
+            self.long_trips_db.xs(country, level="country").reset_index(),
+            on="travel_id"
+        )
+
+        sampled_long_trips["n_nights_at_destination"] = sampled_long_trips["n_nights_at_destination"].fillna(0)
+        sampled_long_trips["n_days_from_departure"] = sampled_long_trips.groupby("travel_index")["n_nights_at_destination"].cumsum()
+        sampled_long_trips["n_days_from_departure"] = sampled_long_trips.groupby(
+            "travel_index")["n_days_from_departure"].shift(1, fill_value=0)
+
+        sampled_long_trips["date"] = sampled_long_trips["date"] + \
+            pd.to_timedelta(sampled_long_trips['n_days_from_departure'], unit='D')
+
+        sampled_long_trips = sampled_long_trips[sampled_long_trips["date"] < end_of_year]
+
+        sampled_long_trips = sampled_long_trips.loc[
+            :,
+            [
+                "travel_id",
+                "previous_motive",
+                "motive",
+                "mode_id",
+                "distance",
+                "n_other_passengers",
+                "n_days_from_departure",
+                "date",
+                "individual_id"
+            ],
+        ]
+
+        sampled_long_trips = sampled_long_trips.rename({"travel_id": "trip_id"}, axis=1)
+        sampled_long_trips["trip_type"] = "long"
+
+        # Days of short trips within the travels, sampled for all travels
+        # with the same motive type and destination urban unit category at once
+        n_days_in_travel = (sampled_travels["n_nights"] + 1).astype(int).to_numpy()
+        travel_of_day = np.repeat(np.arange(sampled_travels.shape[0]), n_days_in_travel)
+        day_in_travel = np.arange(travel_of_day.shape[0]) - np.repeat(np.cumsum(n_days_in_travel) - n_days_in_travel, n_days_in_travel)
+
+        days_in_travel = pd.DataFrame({
+            "individual_id": sampled_travels["individual_id"].to_numpy()[travel_of_day],
+            "date": sampled_travels["date"].to_numpy()[travel_of_day] + pd.to_timedelta(day_in_travel, unit="D").to_numpy(),
+            "weekday": sampled_travels["motive"].str[0:1].eq("9").to_numpy()[travel_of_day],
+            "city_category": sampled_travels["destination_city_category"].to_numpy()[travel_of_day]
+        })
+
+        day_ids = [
+            pd.Series(
+                self.sample_days(country, csp, n_cars, weekday, city_category, days.shape[0], rng),
+                index=days.index
+            )
+            for (weekday, city_category), days in days_in_travel.groupby(["weekday", "city_category"], dropna=False)
+        ]
+
+        days_in_travel["day_id"] = pd.concat(day_ids) if len(day_ids) > 0 else pd.Series(dtype=object)
+
+        days_in_travel = days_in_travel[days_in_travel["date"] < end_of_year]
+
+        sampled_short_trips_in_travel = self.get_days_short_trips(days_in_travel, country)
+
+        # === DAILY MOBILITY ===
+        # Number of days with travel trips, by individual
+        travel_days = pd.concat([
+            sampled_long_trips[["individual_id", "date"]],
+            sampled_short_trips_in_travel[["individual_id", "date"]]
+        ]).drop_duplicates()
+
+        travel_days_weekday = travel_days["date"].dt.weekday < 5
+
+        n_week_days_travel = (
+            travel_days[travel_days_weekday].groupby("individual_id").size()
+            .reindex(individual_ids, fill_value=0).to_numpy()
+        )
+        n_weekend_days_travel = (
+            travel_days[~travel_days_weekday].groupby("individual_id").size()
+            .reindex(individual_ids, fill_value=0).to_numpy()
+        )
+
+        n_immobility_week_day = np.round(
+            (52 * 5 - n_week_days_travel) * filtered_p_immobility["immobility_weekday"]
+        ).astype(int)
+        n_immobility_weekend = np.round(
+            (52 * 2 - n_weekend_days_travel) * filtered_p_immobility["immobility_weekend"]
+        ).astype(int)
+
+        n_mobile_week_day = np.maximum(0, 52 * 5 - n_week_days_travel - n_immobility_week_day)
+        n_mobile_weekend = np.maximum(0, 52 * 2 - n_weekend_days_travel - n_immobility_weekend)
+
+        # Sample the dates of the mobile days among the days without travel
+        individual_position = pd.Series(np.arange(n_individuals), index=individual_ids)
+
+        travel_day_positions = (
+            individual_position.loc[travel_days["individual_id"].to_numpy()].to_numpy(),
+            (travel_days["date"] - df_days["date"].iloc[0]).dt.days.to_numpy()
+        )
+        
+        is_weekday = (df_days["weekday"] < 5).to_numpy()
+
+        mobile_days = []
+
+        for weekday, n_mobile_days in [(True, n_mobile_week_day), (False, n_mobile_weekend)]:
+            
+            individual_index, day_of_year = sample_free_days(
+                n_individuals,
+                is_weekday == weekday,
+                travel_day_positions,
+                n_mobile_days,
+                rng
+            )
+            
+            days = pd.DataFrame({
+                "individual_id": individual_ids[individual_index],
+                "date": df_days["date"].to_numpy()[day_of_year]
+            })
+            
+            days["day_id"] = self.sample_days(
+                country, csp, n_cars, weekday, urban_unit_category, days.shape[0], rng
+            )
+            
+            mobile_days.append(days)
+
+        sampled_short_trips = self.get_days_short_trips(pd.concat(mobile_days), country)
+
+        return pd.concat([sampled_long_trips, sampled_short_trips_in_travel, sampled_short_trips])
+    
+    
+    def sample_days(self, country, csp, n_cars, weekday, city_category, n, rng) -> np.ndarray:
+        """
+        Samples n survey day ids, with replacement and weighted by pondki, among the 
+        days of the same profile (the filters are relaxed like in safe_sample), 
+        with the days sampling index of the country.
+        """
+        return self.get_days_trip_index(country).sample((csp, n_cars, weekday, city_category), n, rng)
+    
+    
+    def get_days_trip_index(self, country) -> SurveyIndex:
+        """
+        Gets the days sampling index of a country (see MobilitySurvey.get_days_trip_index),
+        or builds it from the days_trip table if the survey did not provide it.
+        """
+        
+        if country not in self.days_trip_indexes:
+            self.days_trip_indexes[country] = SurveyIndex.build(
+                self.days_trip_db.xs(country, level="country"),
+                keys=DAYS_TRIP_INDEX_KEYS,
+                id_col="day_id",
+                weight_col="pondki"
+            )
+            
+        return self.days_trip_indexes[country]
+    
+    
+    def get_days_short_trips(self, days: pd.DataFrame, country: str) -> pd.DataFrame:
+        """
+        Gets the short trips of sampled survey days.
+        """
+        
+        short_trips = pd.merge(
+            days[["individual_id", "date", "day_id"]],
+            self.short_trips_db.xs(country, level="country"),
+            on="day_id"
+        )
+
+        short_trips = short_trips.reset_index().loc[
+            :,
+            [
+                "day_id",
+                "daily_trip_index",
+                "previous_motive",
+                "motive",
+                "mode_id",
+                "distance",
+                "n_other_passengers",
+                "date",
+                "individual_id"
+            ],
+        ]
+        
+        short_trips = short_trips.rename({"day_id": "trip_id"}, axis=1)
+        short_trips["trip_type"] = "short"
+        
+        return short_trips
+
+
+def sample_free_days(n_individuals, candidate_days, taken_days, n_days, rng, chunk_size=10000):
+    """
+    Samples n_days[i] distinct days for each individual i, among the candidate 
+    days of the year that are not already taken by the individual.
+
+    Args:
+        n_individuals (int): Number of individuals.
+        candidate_days (np.ndarray): Boolean mask of the candidate days of the year.
+        taken_days (tuple): Arrays of (individual position, day of year) of the taken days.
+        n_days (np.ndarray): Number of days to sample for each individual (capped 
+            to the number of available days).
+        rng (np.random.Generator): The random generator.
+
+    Returns:
+        tuple: Arrays of (individual position, day of year) of the sampled days.
+    """
+    
+    n_year_days = candidate_days.shape[0]
+    
+    individual_index = []
+    day_of_year = []
+    
+    for start in range(0, n_individuals, chunk_size):
+        
+        end = min(start + chunk_size, n_individuals)
+        
+        available = np.repeat(candidate_days.reshape(1, -1), end - start, axis=0)
+        
+        in_chunk = (taken_days[0] >= start) & (taken_days[0] < end)
+        available[taken_days[0][in_chunk] - start, taken_days[1][in_chunk]] = False
+        
+        # Random order of the available days (the unavailable ones last)
+        keys = rng.random((end - start, n_year_days))
+        keys[~available] = np.inf
+        order = np.argsort(keys, axis=1)
+        
+        n = np.minimum(n_days[start:end], available.sum(axis=1))
+        rows, ranks = np.nonzero(np.arange(n_year_days).reshape(1, -1) < n.reshape(-1, 1))
+        
+        individual_index.append(rows + start)
+        day_of_year.append(order[rows, ranks])
+        
+    if len(individual_index) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        
+    return np.concatenate(individual_index), np.concatenate(day_of_year)
+
+
+def add_urban_unit_categories(
+    population: pd.DataFrame,
+    transport_zones: gpd.GeoDataFrame,
+    study_area: gpd.GeoDataFrame
+) -> pd.DataFrame:
+    """
+    Adds the urban unit category of the transport zone of each individual.
+    """
+
+    urban_unit_categories = pd.merge(
+        transport_zones[["transport_zone_id", "local_admin_unit_id"]],
+        study_area[["local_admin_unit_id", "urban_unit_category"]],
+        on="local_admin_unit_id"
+    )
+
+    return pd.merge(
+        population,
+        urban_unit_categories[["transport_zone_id", "urban_unit_category"]],
+        on="transport_zone_id",
+        how="left"
+    )
+
+
+def get_shard_seed(seed: int, individual_ids: pd.Series) -> int:
+    """
+    Derives the seed of a shard from the seed of the trips and the ids of 
+    the individuals of the shard (whatever their order).
+    """
+    h = hashlib.md5(str(seed).encode("utf-8"))
+    for individual_id in sorted(individual_ids.astype(str)):
+        h.update(individual_id.encode("utf-8"))
+    return int(h.hexdigest()[:16], 16)
+
+
+def get_individual_positions(population: pd.DataFrame, start: int = 0) -> pd.Series:
+    """
+    Positions of the individuals in the population (from start, for a chunk
+    of the population), by individual id.
+    """
+    return pd.Series(
+        np.arange(start, start + population.shape[0], dtype=np.int64),
+        index=population["individual_id"].to_numpy()
+    )
+
+
+def get_trip_ids(trips: pd.DataFrame, individual_positions: pd.Series) -> np.ndarray:
+    """
+    Builds integer trip ids from the position of the individual of each trip
+    in the population (high bits) and the index of the trip among the trips 
+    of the individual (low TRIP_INDEX_BITS bits), so the trips of chunks or 
+    shards of the population get unique ids without knowing the number of 
+    trips of the other chunks.
+
+    Args:
+        trips (pd.DataFrame): Trips, with an individual_id column.
+        individual_positions (pd.Series): Positions of the individuals, by 
+            individual id (see get_individual_positions).
+
+    Returns:
+        np.ndarray: The int64 trip ids.
+    """
+    positions = trips["individual_id"].map(individual_positions).to_numpy(dtype=np.int64)
+    trip_index = trips.groupby("individual_id", sort=False).cumcount().to_numpy(dtype=np.int64)
+    return (positions << TRIP_INDEX_BITS) + trip_index
+
+
+def write_arrow_table(table: pd.DataFrame | pd.Series, path: pathlib.Path) -> None:
+    if isinstance(table, pd.Series):
+        table = table.to_frame()
+    table = pa.Table.from_pandas(table)
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_arrow_table(path: pathlib.Path) -> pd.DataFrame:
+    """
+    Memory maps an Arrow IPC file as a DataFrame whose columns are views of
+    the file buffers (split_blocks avoids the copy that consolidating the 
+    columns in 2D blocks would make).
+    """
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+
+# Trips sampler of each worker process of get_population_trips_sharded
+shard_sampler = None
+
+
+def trips_shard_worker_init(survey_folder: str, gwp: DefaultGWP, days_trip_indexes: dict) -> None:
+    """
+    Memory maps the survey tables from the Arrow files of the main process,
+    and creates the sampler of the worker (a Trips object without asset 
+    inputs, that is only used for its grouped engine methods).
+    """
+
+    global shard_sampler
+
+    shard_sampler = Trips.__new__(Trips)
+    shard_sampler.inputs = {"gwp": gwp}
+    shard_sampler.days_trip_indexes = days_trip_indexes
+
+    for path in pathlib.Path(survey_folder).glob("*.arrow"):
+        setattr(shard_sampler, path.stem, read_arrow_table(path))
+
+
+def process_trips_shard(population: pd.DataFrame, individual_positions: pd.Series, seed: int, path: pathlib.Path) -> int:
+    """
+    Samples the trips of the individuals of a shard and writes them to a 
+    parquet file, with trip ids built from the positions of the individuals
+    in the population.
+
+    Returns:
+        int: The number of trips of the shard.
+    """
+
+    trips = shard_sampler.get_groups_trips(population, np.random.default_rng(seed))
+    trips["trip_id"] = get_trip_ids(trips, individual_positions)
+
+    trips.to_parquet(path)
+
+    return trips.shape[0]
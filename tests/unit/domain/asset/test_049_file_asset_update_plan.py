@@ -0,0 +1,60 @@
+from importlib import reload
+
+import mobility.file_asset
+
+
+def test_update_plan_resolves_each_asset_once(use_real_asset_init, tmp_path, monkeypatch):
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    # Reload to subclass the real Asset class (reloaded by the conftest)
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class CountingAsset(FileAsset):
+
+        def __init__(self, name, tmp_path, **upstream):
+            self.n_builds = 0
+            super().__init__({"name": name, **upstream}, tmp_path / (name + ".txt"))
+
+        def get_cached_asset(self):
+            return self.cache_path.read_text()
+
+        def create_and_get_asset(self):
+            self.n_builds += 1
+            self.cache_path.write_text(self.inputs["name"])
+            return self.inputs["name"]
+
+    a = CountingAsset("a", tmp_path)
+    b = CountingAsset("b", tmp_path, a=a)
+    c = CountingAsset("c", tmp_path, a=a, b=b)
+    d = CountingAsset("d", tmp_path, b=b, c=c)
+
+    n_checks = {"count": 0}
+    is_outdated = FileAsset.is_outdated
+
+    def counting_is_outdated(self):
+        n_checks["count"] += 1
+        return is_outdated(self)
+
+    monkeypatch.setattr(FileAsset, "is_outdated", counting_is_outdated)
+
+    # Nothing is cached : everything is rebuilt, upstream first
+    assert d.get_update_plan() == [a, b, c, d]
+
+    assert d.get() == "d"
+    assert [x.n_builds for x in [a, b, c, d]] == [1, 1, 1, 1]
+
+    # Warm cache : nothing to rebuild, and each asset is checked only once
+    n_checks["count"] = 0
+    assert d.get_update_plan() == []
+    assert n_checks["count"] == 4
+    assert d.get() == "d"
+    assert [x.n_builds for x in [a, b, c, d]] == [1, 1, 1, 1]
+
+    # An upstream output disappears : only its descendants are rebuilt
+    b.cache_path.unlink()
+    assert d.get_update_plan() == [b, c, d]
+    assert d.is_update_needed()
+    assert not a.is_update_needed()
+
+    d.get()
+    assert [x.n_builds for x in [a, b, c, d]] == [1, 2, 2, 2]
@@ -0,0 +1,48 @@
+import time
+from importlib import reload
+
+import mobility.file_asset
+from mobility.asset_scheduler import AssetScheduler
+
+
+def test_scheduler_builds_independent_assets_concurrently(use_real_asset_init, tmp_path, monkeypatch):
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    # Reload to subclass the real Asset class (reloaded by the conftest)
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class SleepingAsset(FileAsset):
+
+        def __init__(self, name, duration, tmp_path, **upstream):
+            self.duration = duration
+            super().__init__({"name": name, **upstream}, tmp_path / (name + ".txt"))
+
+        def get_cached_asset(self):
+            return self.cache_path.read_text()
+
+        def create_and_get_asset(self):
+            time.sleep(self.duration)
+            self.cache_path.write_text(self.inputs["name"])
+            return self.inputs["name"]
+
+    a = SleepingAsset("a", 0.05, tmp_path)
+    b = SleepingAsset("b", 0.3, tmp_path, a=a)
+    c = SleepingAsset("c", 0.1, tmp_path, a=a)
+    d = SleepingAsset("d", 0.05, tmp_path, b=b, c=c)
+
+    scheduler = AssetScheduler(n_workers=2, executor="thread")
+    scheduler.run(d.get_update_plan())
+
+    assert d.get_update_plan() == []
+
+    timings = {scheduler.labels[k]: t for k, t in scheduler.timings.items()}
+    t_a, t_b, t_c, t_d = [timings["SleepingAsset (" + x.hash_path.stem + ")"] for x in [a, b, c, d]]
+
+    # b and c only depend on a, so they run at the same time, and d waits for both
+    assert t_b[0] >= t_a[1] and t_c[0] >= t_a[1]
+    assert t_c[0] < t_b[1] and t_b[0] < t_c[1]
+    assert t_d[0] >= max(t_b[1], t_c[1])
+
+    critical_path = [label for label, _ in scheduler.get_critical_path()]
+    assert critical_path == ["SleepingAsset (" + x.hash_path.stem + ")" for x in [a, b, d]]
+    assert "Critical path" in scheduler.get_report()
@@ -0,0 +1,163 @@
+import os
+import time
+from importlib import reload
+
+import mobility.file_asset
+from mobility.shared_asset_store import SharedAssetStore
+
+
+def test_shared_store_materializes_outputs_across_projects(use_real_asset_init, tmp_path, monkeypatch):
+    store_folder = tmp_path / "store"
+    monkeypatch.setenv("MOBILITY_SHARED_ASSET_STORE_FOLDER", str(store_folder))
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    # Reload to subclass the real Asset class (reloaded by the conftest)
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class CountingAsset(FileAsset):
+
+        def __init__(self, name, project_folder):
+            self.n_builds = 0
+            super().__init__({"name": name}, project_folder / (name + ".txt"))
+
+        def get_cached_asset(self):
+            return self.cache_path.read_text()
+
+        def create_and_get_asset(self):
+            self.n_builds += 1
+            self.cache_path.write_text(self.inputs["name"] * 1000)
+            return self.cache_path.read_text()
+
+    # Built in the first project, then hard linked in the second one
+    osm_a = CountingAsset("osm", tmp_path / "project_a")
+    osm_a.get()
+
+    osm_b = CountingAsset("osm", tmp_path / "project_b")
+    assert osm_b.get() == "osm" * 1000
+    assert osm_b.n_builds == 0
+    assert os.stat(osm_a.cache_path).st_ino == os.stat(osm_b.cache_path).st_ino
+
+    graph = CountingAsset("graph", tmp_path / "project_b")
+    graph.get()
+
+    store = SharedAssetStore(store_folder)
+    assert len(store.get_entries()) == 2
+
+    # Orphaned entries are collected
+    removed = store.collect_garbage([tmp_path / "project_a"])
+    assert removed == [store.get_entry_path(graph)]
+
+    # The least recently used entries are evicted first
+    graph.share_outputs()
+    time.sleep(0.01)
+    store.materialize(osm_b)
+    removed = store.evict(max_size=4000/1e9)
+    assert removed == [store.get_entry_path(graph)]
+    assert graph.cache_path.exists()
+
+
+def test_assets_updated_in_place_are_not_shared(use_real_asset_init, tmp_path, monkeypatch):
+    store_folder = tmp_path / "store"
+    monkeypatch.setenv("MOBILITY_SHARED_ASSET_STORE_FOLDER", str(store_folder))
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class CongestedCosts(FileAsset):
+
+        is_shareable = False
+
+        def __init__(self, project_folder):
+            super().__init__({"name": "costs"}, project_folder / "costs.txt")
+
+        def get_cached_asset(self):
+            return self.cache_path.read_text()
+
+        def create_and_get_asset(self):
+            self.cache_path.write_text("free flow")
+            return self.cache_path.read_text()
+
+        def update(self):
+            self.cache_path.write_text("congested")
+
+    costs_a = CongestedCosts(tmp_path / "project_a")
+    costs_a.get()
+    costs_a.update()
+
+    costs_b = CongestedCosts(tmp_path / "project_b")
+    assert costs_b.get() == "free flow"
+    assert len(SharedAssetStore(store_folder).get_entries()) == 0
+
+
+def test_store_size_is_tracked_without_listing_the_entries(use_real_asset_init, tmp_path, monkeypatch):
+    store_folder = tmp_path / "store"
+    monkeypatch.setenv("MOBILITY_SHARED_ASSET_STORE_FOLDER", str(store_folder))
+    monkeypatch.setenv("MOBILITY_SHARED_ASSET_STORE_MAX_SIZE", str(2500/1e9))
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class TextAsset(FileAsset):
+
+        def __init__(self, name):
+            super().__init__({"name": name}, tmp_path / "project" / (name + ".txt"))
+
+        def get_cached_asset(self):
+            return self.cache_path.read_text()
+
+        def create_and_get_asset(self):
+            self.cache_path.write_text("x" * 1000)
+            return self.cache_path.read_text()
+
+    TextAsset("a").get()
+
+    # Under the size limit, publishing does not list the store entries
+    listed = []
+    get_entries = SharedAssetStore.get_entries
+    monkeypatch.setattr(SharedAssetStore, "get_entries", lambda self: listed.append(1) or get_entries(self))
+
+    TextAsset("b").get()
+    assert listed == []
+    assert SharedAssetStore(store_folder).get_size() == 2000
+
+    # Above the limit, the least recently used entry is evicted
+    TextAsset("c").get()
+    assert listed == [1]
+    assert SharedAssetStore(store_folder).get_size() == 2000
+    assert [e[0].name for e in get_entries(SharedAssetStore(store_folder))] == [TextAsset("b").inputs_hash, TextAsset("c").inputs_hash]
+
+
+def test_rebuilt_assets_do_not_write_through_the_store_links(use_real_asset_init, tmp_path, monkeypatch):
+    store_folder = tmp_path / "store"
+    monkeypatch.setenv("MOBILITY_SHARED_ASSET_STORE_FOLDER", str(store_folder))
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class TextAsset(FileAsset):
+
+        def __init__(self, project_folder, text):
+            self.text = text
+            super().__init__({"name": "text"}, project_folder / "text.txt")
+
+        def get_cached_asset(self):
+            return self.cache_path.read_text()
+
+        def create_and_get_asset(self):
+            with open(self.cache_path, "w") as f:
+                f.write(self.text)
+            return self.cache_path.read_text()
+
+    text_a = TextAsset(tmp_path / "project_a", "a")
+    text_a.get()
+
+    text_b = TextAsset(tmp_path / "project_b", "b")
+    assert text_b.get() == "a"
+
+    # Rebuilt with the same inputs hash (after an upstream change for example)
+    text_b.hash_path.unlink()
+    assert text_b.get() == "b"
+
+    assert text_a.cache_path.read_text() == "a"
+    assert (SharedAssetStore(store_folder).get_entry_path(text_a) / text_a.cache_path.name).read_text() == "a"
+    assert not SharedAssetStore(store_folder).lock_path.exists()
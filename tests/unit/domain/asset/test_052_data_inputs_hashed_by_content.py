@@ -0,0 +1,39 @@
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+
+def test_data_inputs_are_hashed_by_content(use_real_asset_init):
+    Asset = use_real_asset_init
+
+    class DummyAsset(Asset):
+        def get(self):
+            return None
+
+    sinks = pl.DataFrame({"to": [1, 2, 3], "sink_volume": [10.0, 20.0, 30.0]})
+    chunked_sinks = pl.concat([sinks[:1], sinks[1:]], rechunk=False)
+
+    a = DummyAsset({"sinks": sinks, "zones": np.arange(5), "pd_sinks": sinks.to_pandas()})
+    b = DummyAsset({"sinks": chunked_sinks, "zones": np.arange(5), "pd_sinks": sinks.to_pandas()})
+    c = DummyAsset({"sinks": sinks.with_columns(pl.col("sink_volume")*2), "zones": np.arange(5), "pd_sinks": sinks.to_pandas()})
+    d = DummyAsset({"sinks": sinks, "zones": np.arange(6), "pd_sinks": sinks.to_pandas()})
+    e = DummyAsset({"sinks": sinks, "zones": np.arange(5), "pd_sinks": pd.DataFrame({"to": [1, 2, 3]})})
+
+    assert a.inputs_hash == b.inputs_hash
+    assert len({a.inputs_hash, c.inputs_hash, d.inputs_hash, e.inputs_hash}) == 4
+
+
+def test_json_inputs_keep_the_same_hash(use_real_asset_init):
+    Asset = use_real_asset_init
+
+    class DummyAsset(Asset):
+        def get(self):
+            return None
+
+    inputs = {"b": [1, 2.5, None], "a": {"y": "é", "x": True}}
+    expected = hashlib.md5(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+    assert DummyAsset(inputs).inputs_hash == expected
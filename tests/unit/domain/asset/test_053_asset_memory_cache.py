@@ -0,0 +1,65 @@
+import os
+from importlib import reload
+
+import pandas as pd
+
+import mobility.file_asset
+from mobility.asset_memory_cache import get_asset_memory_cache
+
+
+def test_cached_files_are_read_once(use_real_asset_init, tmp_path, monkeypatch):
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+    monkeypatch.delenv("MOBILITY_ASSET_MEMORY_CACHE_SIZE", raising=False)
+
+    # Reload to subclass the real Asset class (reloaded by the conftest)
+    FileAsset = reload(mobility.file_asset).FileAsset
+
+    class CostsAsset(FileAsset):
+
+        def __init__(self, tmp_path):
+            self.n_reads = 0
+            super().__init__({"name": "costs"}, tmp_path / "costs.parquet")
+
+        def get_cached_asset(self, congestion=False):
+            self.n_reads += 1
+            return pd.read_parquet(self.cache_path)
+
+        def create_and_get_asset(self, congestion=False):
+            costs = pd.DataFrame({"cost": [1.0, 2.0]})
+            costs.to_parquet(self.cache_path)
+            return costs
+
+    # The cache is disabled by default
+    asset = CostsAsset(tmp_path)
+    asset.get()
+    asset.get()
+    asset.get()
+    assert asset.n_reads == 2
+
+    monkeypatch.setenv("MOBILITY_ASSET_MEMORY_CACHE_SIZE", "0.001")
+    cache = get_asset_memory_cache()
+    cache.clear()
+
+    asset = CostsAsset(tmp_path)
+    asset.get()
+
+    costs = asset.get()
+    costs["cost"] = 0.0
+    assert asset.get()["cost"].tolist() == [1.0, 2.0]
+    assert asset.n_reads == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Other arguments and rewritten files are read again
+    asset.get(congestion=True)
+    assert asset.n_reads == 2
+
+    pd.DataFrame({"cost": [3.0]}).to_parquet(asset.cache_path)
+    os.utime(asset.cache_path, ns=(0, 0))
+    assert asset.get()["cost"].tolist() == [3.0]
+    assert asset.n_reads == 3
+
+    # Values bigger than the cache are not kept
+    monkeypatch.setenv("MOBILITY_ASSET_MEMORY_CACHE_SIZE", "1e-9")
+    asset.get()
+    asset.get()
+    assert asset.n_reads == 5
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from mobility import carbon_computation as cc
+
+
+def test_carbon_computation_of_lazy_trips_matches_pandas(monkeypatch):
+    modes_dataframe = pd.DataFrame(
+        {
+            "mode_id": ["3.30", "5.50", "6.61"],
+            "ef_name": ["car_thermique", "bus_articule", "zero"],
+        },
+        dtype="object",
+    )
+
+    mapping_dataframe = pd.DataFrame(
+        {"ef_name": ["car_thermique", "bus_articule"], "ef_id": ["EF1", "EF2"]},
+        dtype="object",
+    )
+
+    ademe_factors_dataframe = pd.DataFrame(
+        {
+            "ef_id": ["EF1", "EF2"],
+            "ef": [0.200, 0.100],
+            "unit": ["kgCO2e/km", "kgCO2e/p.km"],
+            "database": ["ademe", "ademe"],
+        }
+    )
+
+    original_read_csv_function = pd.read_csv
+
+    def selective_read_csv(file_path, *args, **kwargs):
+        if str(file_path).endswith("mapping.csv"):
+            return mapping_dataframe.copy()
+        return original_read_csv_function(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(cc.pd, "read_excel", lambda *args, **kwargs: modes_dataframe.copy(), raising=True)
+    monkeypatch.setattr(cc.pd, "read_csv", selective_read_csv, raising=True)
+    monkeypatch.setattr(cc, "get_ademe_factors", lambda _path: ademe_factors_dataframe.copy(), raising=True)
+
+    trips_dataframe = pd.DataFrame(
+        {
+            "mode_id": ["3.30", "5.50", "6.61", "9.99"],
+            "distance": [10.0, 5.0, 300.0, 2.0],
+            "n_other_passengers": [1, 0, 0, 0],
+        }
+    )
+
+    expected = cc.carbon_computation(trips_dataframe)
+    result = cc.carbon_computation(pl.from_pandas(trips_dataframe).lazy())
+
+    assert isinstance(result, pl.LazyFrame)
+
+    result = result.collect().to_pandas()
+
+    np.testing.assert_allclose(
+        result["carbon_emissions"].to_numpy(),
+        expected["carbon_emissions"].to_numpy(),
+        equal_nan=True
+    )
+    np.testing.assert_allclose(result["k_ef"].to_numpy(), expected["k_ef"].to_numpy())
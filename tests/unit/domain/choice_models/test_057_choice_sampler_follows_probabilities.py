@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mobility.choice_models.choice_sampler import ChoiceSampler
+
+
+def make_mode_probs():
+    return pd.DataFrame({
+        "from": [2, 2, 1, 1, 1, 3, 3],
+        "to": [1, 1, 2, 2, 2, 3, 3],
+        "mode": ["car", "walk", "car", "bicycle", "walk", "car", "walk"],
+        "prob": [0.5, 0.5, 0.2, 0.3, 0.5, 1.0, 0.0],
+    })
+
+
+def test_sampler_follows_the_probabilities_of_each_group():
+    probs = make_mode_probs()
+    sampler = ChoiceSampler.build(probs, keys=["from", "to"], choice_col="mode")
+
+    samples = sampler.sample([(1, 2), (2, 1), (3, 3)], n=20000, seed=0)
+
+    assert samples.shape == (3, 20000)
+
+    for row, (origin, destination) in enumerate([(1, 2), (2, 1), (3, 3)]):
+        expected = probs[(probs["from"] == origin) & (probs["to"] == destination) & (probs["prob"] > 0)]
+        frequencies = pd.Series(samples[row]).value_counts(normalize=True)
+        np.testing.assert_allclose(
+            frequencies[expected["mode"]].to_numpy(),
+            expected["prob"].to_numpy(),
+            atol=0.02
+        )
+
+
+def test_sampler_is_reproducible_and_can_be_saved(tmp_path):
+    probs = make_mode_probs()
+    sampler = ChoiceSampler.build(probs[probs["to"] != 3], keys=["from"], choice_col="mode")
+
+    sampler.save(tmp_path / "sampler.parquet")
+    loaded_sampler = ChoiceSampler.load(tmp_path / "sampler.parquet")
+
+    origins = np.array([1, 2, 2, 1])
+
+    np.testing.assert_array_equal(sampler.sample(origins, 5, seed=1), sampler.sample(origins, 5, seed=1))
+    np.testing.assert_array_equal(sampler.sample(origins, 5, seed=1), loaded_sampler.sample(origins, 5, seed=1))
+    np.testing.assert_array_equal(
+        sampler.sample(pd.DataFrame({"from": origins}), 5, seed=1),
+        loaded_sampler.sample(origins, 5, seed=1)
+    )
+
+    with pytest.raises(ValueError):
+        sampler.sample([1, 4], 2, seed=1)
@@ -0,0 +1,74 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from mobility.radiation_model_selection import apply_radiation_model, apply_radiation_model_numpy
+
+
+def make_inputs(n_zones=80, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = 3*np.arange(n_zones) + 5
+
+    # Some empty sources and sinks, and some ODs without costs
+    sources = pl.DataFrame({"from": ids, "source_volume": np.where(rng.random(n_zones) < 0.1, 0.0, rng.uniform(10.0, 5000.0, n_zones))})
+    sinks = pl.DataFrame({"to": ids, "sink_volume": np.where(rng.random(n_zones) < 0.1, 0.0, rng.uniform(10.0, 5000.0, n_zones))})
+
+    od_from, od_to = np.meshgrid(ids, ids, indexing="ij")
+    keep = rng.random(od_from.size) < 0.8
+    costs = pl.DataFrame({
+        "from": od_from.ravel()[keep],
+        "to": od_to.ravel()[keep],
+        "cost": rng.uniform(0.0, 60.0, keep.sum())
+    })
+
+    utilities = pl.DataFrame({"to": ids, "utility": rng.uniform(100.0, 140.0, n_zones)})
+
+    return sources, sinks, costs, utilities
+
+
+@pytest.mark.parametrize("selection_lambda", [0.99986, 0.999])
+def test_numpy_engine_gives_the_polars_flows(selection_lambda):
+    sources, sinks, costs, utilities = make_inputs()
+
+    expected = apply_radiation_model(sources, sinks, costs, utilities, selection_lambda)
+    flows = apply_radiation_model(sources, sinks, costs, utilities, selection_lambda, engine="numpy")
+
+    assert flows.schema == expected.schema
+
+    flows = flows.join(expected, on=["from", "to"], how="full", coalesce=True, suffix="_expected")
+
+    assert flows.null_count().sum_horizontal().item() == 0
+    np.testing.assert_allclose(flows["flow_volume"], flows["flow_volume_expected"], rtol=1e-9)
+
+
+def test_numpy_engine_rounds_the_half_bins_as_polars():
+    sources, sinks, costs, utilities = make_inputs(seed=2)
+
+    # Net utilities exactly halfway between two bins
+    costs = costs.with_columns(pl.col("cost").round().truediv(4.0) + 0.25)
+    utilities = utilities.with_columns(pl.col("utility").round())
+
+    expected = apply_radiation_model(sources, sinks, costs, utilities, 0.999)
+    flows = apply_radiation_model(sources, sinks, costs, utilities, 0.999, engine="numpy")
+
+    flows = flows.join(expected, on=["from", "to"], how="full", coalesce=True, suffix="_expected")
+
+    assert flows.null_count().sum_horizontal().item() == 0
+    np.testing.assert_allclose(flows["flow_volume"], flows["flow_volume_expected"], rtol=1e-9)
+
+
+def test_numpy_engine_blocks_give_the_same_flows():
+    sources, sinks, costs, utilities = make_inputs(seed=1)
+
+    flows = apply_radiation_model_numpy(sources, sinks, costs, utilities, 0.9999).sort(["from", "to"])
+    block_flows = apply_radiation_model_numpy(sources, sinks, costs, utilities, 0.9999, max_block_cells=500).sort(["from", "to"])
+
+    assert flows.select(["from", "to"]).equals(block_flows.select(["from", "to"]))
+    np.testing.assert_allclose(flows["flow_volume"], block_flows["flow_volume"], rtol=1e-12)
+
+
+def test_unknown_engine_raises():
+    sources, sinks, costs, utilities = make_inputs(n_zones=5)
+
+    with pytest.raises(ValueError):
+        apply_radiation_model(sources, sinks, costs, utilities, 0.999, engine="dense")
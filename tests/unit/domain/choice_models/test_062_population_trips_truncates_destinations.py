@@ -0,0 +1,79 @@
+import logging
+import types
+
+import numpy as np
+import polars as pl
+
+from mobility.choice_models.population_trips import PopulationTrips
+
+
+MOTIVE_NAMES = ["work", "shopping"]
+
+
+def make_motive(name, radiation_lambda, utilities):
+    return types.SimpleNamespace(
+        name=name,
+        radiation_lambda=radiation_lambda,
+        get_utilities=lambda transport_zones: utilities
+    )
+
+
+def make_inputs(n_zones=30, seed=0):
+    rng = np.random.default_rng(seed)
+    zones = np.arange(1, n_zones + 1, dtype=np.int32)
+
+    od_from, od_to = np.meshgrid(zones, zones, indexing="ij")
+    costs = pl.DataFrame({
+        "from": od_from.ravel(),
+        "to": od_to.ravel(),
+        "cost": rng.uniform(0.0, 30.0, od_from.size)
+    })
+
+    sinks = pl.DataFrame({
+        "to": np.tile(zones, 2),
+        "motive": np.repeat(MOTIVE_NAMES, n_zones),
+        "sink_available": rng.uniform(10.0, 1000.0, 2*n_zones)
+    }).with_columns(motive=pl.col("motive").cast(pl.Enum(MOTIVE_NAMES)))
+
+    motives = [
+        make_motive("work", 0.9999, pl.DataFrame({"to": zones, "utility": rng.uniform(0.0, 5.0, n_zones)})),
+        make_motive("shopping", 0.999, None)
+    ]
+
+    return costs, sinks, motives
+
+
+def get_dest_prob(costs, sinks, motives, **kwargs):
+    trips = PopulationTrips.__new__(PopulationTrips)
+    utilities = trips.get_utilities(motives, None, sinks, costs, 1.0, **kwargs)
+    dest_prob = trips.get_destination_probability(utilities, motives, 0.99)
+    n_costs = utilities[1].select(pl.len()).collect().item()
+    return dest_prob.sort(["motive", "from", "to"]), n_costs
+
+
+def test_large_top_n_keeps_the_destination_probabilities():
+    costs, sinks, motives = make_inputs()
+
+    expected, n_costs = get_dest_prob(costs, sinks, motives)
+    dest_prob, n_truncated_costs = get_dest_prob(costs, sinks, motives, dest_top_n=1000, dest_cost_horizon=1e6)
+
+    assert n_truncated_costs == n_costs
+    assert dest_prob.select(["motive", "from", "to"]).equals(expected.select(["motive", "from", "to"]))
+    np.testing.assert_allclose(dest_prob["p_ij"], expected["p_ij"], rtol=1e-9)
+
+
+def test_top_n_and_horizon_bound_the_destinations(caplog):
+    costs, sinks, motives = make_inputs()
+
+    with caplog.at_level(logging.INFO):
+        dest_prob, n_costs = get_dest_prob(costs, sinks, motives, dest_top_n=5, dest_cost_horizon=20.0)
+
+    n_destinations = dest_prob.group_by(["motive", "from"]).agg(pl.len())["len"]
+    assert n_destinations.max() <= 5
+    assert n_costs <= 5*5*30*2
+
+    # The destinations beyond the horizon are dropped, except the most probable one
+    far = dest_prob.join(costs, on=["from", "to"]).filter(pl.col("cost") > 20.0)
+    assert far.group_by(["motive", "from"]).agg(pl.len())["len"].max() in [None, 1]
+
+    assert "dropped probability mass" in caplog.text
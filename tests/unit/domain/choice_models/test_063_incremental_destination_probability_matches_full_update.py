@@ -0,0 +1,95 @@
+import types
+
+import numpy as np
+import polars as pl
+
+from mobility.choice_models.population_trips import PopulationTrips
+from mobility.choice_models.incremental_destination_probability import IncrementalDestinationProbability
+
+
+MOTIVE_NAMES = ["work", "shopping"]
+
+
+def make_inputs(n_zones=40, seed=0):
+    rng = np.random.default_rng(seed)
+    zones = np.arange(1, n_zones + 1, dtype=np.int32)
+
+    # Each origin only reaches the zones close to it
+    od_from, od_to = np.meshgrid(zones, zones, indexing="ij")
+    close = np.abs(od_from - od_to) <= 4
+    costs = pl.DataFrame({
+        "from": od_from[close],
+        "to": od_to[close],
+        "cost": rng.uniform(0.0, 30.0, close.sum())
+    })
+
+    sinks = pl.DataFrame({
+        "to": np.tile(zones, 2),
+        "motive": np.repeat(MOTIVE_NAMES, n_zones),
+        "sink_available": rng.uniform(10.0, 1000.0, 2*n_zones)
+    }).with_columns(motive=pl.col("motive").cast(pl.Enum(MOTIVE_NAMES)))
+
+    work_utilities = pl.DataFrame({"to": zones, "utility": rng.uniform(0.0, 5.0, n_zones)})
+
+    motives = [
+        types.SimpleNamespace(name="work", radiation_lambda=0.9999, get_utilities=lambda transport_zones: work_utilities),
+        types.SimpleNamespace(name="shopping", radiation_lambda=0.999, get_utilities=lambda transport_zones: None)
+    ]
+
+    return costs, sinks, motives
+
+
+def full_update(trips, motives, sinks, costs):
+    utilities = trips.get_utilities(motives, None, sinks, costs, 1.0)
+    return trips.get_destination_probability(utilities, motives, 0.99)
+
+
+def assert_same_probabilities(dest_prob, expected):
+    dest_prob = dest_prob.sort(["motive", "from", "to"])
+    expected = expected.sort(["motive", "from", "to"])
+    assert dest_prob.select(["motive", "from", "to"]).equals(expected.select(["motive", "from", "to"]))
+    np.testing.assert_allclose(dest_prob["p_ij"], expected["p_ij"], rtol=1e-12)
+
+
+def test_incremental_updates_match_the_full_updates():
+    costs, sinks, motives = make_inputs()
+    trips = PopulationTrips.__new__(PopulationTrips)
+
+    incremental = IncrementalDestinationProbability(trips, motives, None, sinks, 1.0, 0.99)
+
+    # Count the origins and motives recomputed at each update
+    aggregate_cost_bins = trips.aggregate_cost_bins
+    n_groups = []
+
+    def spy(costs):
+        n_groups.append(costs.select(["from", "motive"]).unique().collect().height)
+        return aggregate_cost_bins(costs)
+
+    trips.aggregate_cost_bins = spy
+
+    assert_same_probabilities(incremental.get(sinks, costs), full_update(trips, motives, sinks, costs))
+
+    # Saturate a few destinations, remove one and bring it back
+    remaining_sinks = sinks.with_columns(
+        sink_available=pl.when(pl.col("to").is_in([3, 4])).then(pl.col("sink_available")*0.1).otherwise(pl.col("sink_available"))
+    )
+    assert_same_probabilities(incremental.get(remaining_sinks, costs), full_update(trips, motives, remaining_sinks, costs))
+
+    remaining_sinks = remaining_sinks.filter((pl.col("to") != 20) | (pl.col("motive") != "work"))
+    assert_same_probabilities(incremental.get(remaining_sinks, costs), full_update(trips, motives, remaining_sinks, costs))
+
+    assert_same_probabilities(incremental.get(sinks, costs), full_update(trips, motives, sinks, costs))
+
+    # Each update only recomputes the origins that reach a changed destination
+    n_incremental_groups = n_groups[::2]
+    assert n_incremental_groups[0] == 80
+    assert n_incremental_groups[1] == 2*8
+    assert n_incremental_groups[2] == 9
+    assert n_incremental_groups[3] == 2*8 + 9
+
+    # Unchanged sinks reuse the probabilities, new costs rebuild the cost bins
+    dest_prob = incremental.get(sinks, costs)
+    assert incremental.get(sinks, costs) is dest_prob
+
+    new_costs = costs.with_columns(cost=pl.col("cost")*1.5)
+    assert_same_probabilities(incremental.get(sinks, new_costs), full_update(trips, motives, sinks, new_costs))
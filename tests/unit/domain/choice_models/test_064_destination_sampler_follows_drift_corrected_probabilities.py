@@ -0,0 +1,122 @@
+import random
+
+import numpy as np
+import polars as pl
+
+from mobility.choice_models.population_trips import PopulationTrips
+from mobility.choice_models.destination_sampler import DestinationSampler
+
+
+MOTIVES = pl.Enum(["home", "work", "shopping"])
+
+
+def make_dest_prob():
+    return pl.DataFrame({
+        "motive": ["shopping"]*4 + ["work"]*2,
+        "from": [1, 1, 1, 1, 2, 2],
+        "to": [1, 2, 3, 4, 1, 3],
+        "p_ij": [0.4, 0.3, 0.2, 0.1, 0.5, 0.5]
+    }).with_columns(
+        motive=pl.col("motive").cast(MOTIVES),
+        **{c: pl.col(c).cast(pl.Int32) for c in ["from", "to"]}
+    )
+
+
+def make_costs():
+    # No cost from zone 4 to the anchor zone 2 : zone 4 cannot be drawn
+    return pl.DataFrame({
+        "from": [1, 2, 3, 1, 2],
+        "to": [2, 2, 2, 3, 3],
+        "cost": [10.0, 2.0, 30.0, 5.0, 5.0]
+    }).with_columns(**{c: pl.col(c).cast(pl.Int32) for c in ["from", "to"]})
+
+
+def make_steps(n):
+    return pl.DataFrame({
+        "demand_group_id": np.arange(n, dtype=np.uint32),
+        "home_zone_id": np.full(n, 1, dtype=np.int32),
+        "motive_seq_id": np.zeros(n, dtype=np.uint32),
+        "motive": ["shopping"]*n,
+        "is_anchor": [False]*n,
+        "anchor_to": np.full(n, 2, dtype=np.int32),
+        "from": np.full(n, 1, dtype=np.int32)
+    }).with_columns(motive=pl.col("motive").cast(MOTIVES))
+
+
+def test_sampler_draws_the_destinations_with_their_probabilities():
+    sampler = DestinationSampler(make_dest_prob())
+    steps = make_steps(20000).with_columns(motive=pl.Series(["shopping", "work"]*10000).cast(MOTIVES))
+    steps = steps.with_columns(**{"from": pl.when(pl.col("motive") == "work").then(2).otherwise(1).cast(pl.Int32)})
+
+    sampled = sampler.sample(steps, np.random.default_rng(0))
+
+    assert sampled.height == steps.height
+    assert sampled.select(["demand_group_id", "motive"]).equals(steps.select(["demand_group_id", "motive"]))
+
+    freq = sampled.group_by(["motive", "to"]).agg(pl.len()/10000).sort(["motive", "to"])
+    expected = make_dest_prob().sort(["motive", "to"])
+    np.testing.assert_allclose(freq["len"], expected["p_ij"], atol=0.02)
+
+    # Unknown origins are dropped
+    assert sampler.sample(make_steps(3).with_columns(**{"from": pl.lit(9, pl.Int32)}), np.random.default_rng(0)).height == 0
+
+
+def test_rejection_sampling_follows_the_drift_corrected_probabilities():
+    random.seed(0)
+    trips = PopulationTrips.__new__(PopulationTrips)
+    dest_prob, costs = make_dest_prob(), make_costs()
+    alpha = 0.05
+
+    n = 30000
+    steps = trips.sample_steps(make_steps(n), dest_prob, costs, alpha, DestinationSampler(dest_prob))
+
+    assert steps.height == n
+    assert steps["demand_group_id"].n_unique() == n
+
+    p = np.array([0.4*np.exp(-alpha*10.0), 0.3*np.exp(-alpha*2.0), 0.2*np.exp(-alpha*30.0)])
+    freq = steps.group_by("to").agg(pl.len()/n).sort("to")
+
+    assert freq["to"].to_list() == [1, 2, 3]
+    np.testing.assert_allclose(freq["len"], p/p.sum(), atol=0.015)
+
+
+def test_rejected_steps_fall_back_to_the_hash_noise_sampling():
+    random.seed(0)
+    trips = PopulationTrips.__new__(PopulationTrips)
+    dest_prob, costs = make_dest_prob(), make_costs()
+
+    steps = trips.sample_steps(make_steps(500), dest_prob, costs, 1.0, DestinationSampler(dest_prob), max_rounds=1)
+
+    assert steps.height == 500
+    assert set(steps["to"].to_list()) <= {1, 2, 3}
+
+
+def test_anchor_motives_are_spatialized_with_the_sampler():
+    random.seed(0)
+    trips = PopulationTrips.__new__(PopulationTrips)
+    dest_prob = make_dest_prob()
+
+    chains = pl.DataFrame({
+        "demand_group_id": np.repeat(np.arange(3, dtype=np.uint32), 3),
+        "home_zone_id": np.full(9, 2, dtype=np.int32),
+        "motive_seq_id": np.zeros(9, dtype=np.uint32),
+        "motive": ["shopping", "work", "home"]*3,
+        "is_anchor": [False, True, True]*3,
+        "seq_step_index": np.tile(np.arange(1, 4, dtype=np.uint32), 3)
+    }).with_columns(motive=pl.col("motive").cast(MOTIVES))
+
+    chains = trips.spatialize_anchor_motives(chains, dest_prob, DestinationSampler(dest_prob))
+
+    anchors = chains.filter(pl.col("motive") != "home")
+    assert anchors["anchor_to"].is_in([1, 3]).all()
+    assert (anchors.filter(pl.col("motive") == "shopping")["anchor_to"] == anchors.filter(pl.col("motive") == "work")["anchor_to"]).all()
+    assert (chains.filter(pl.col("motive") == "home")["anchor_to"] == 2).all()
+
+
+def test_the_sampler_engine_is_hashed(monkeypatch, tmp_path):
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+    monkeypatch.setattr("mobility.choice_models.population_trips.TravelCostsAggregator", lambda modes: None)
+    monkeypatch.setattr("mobility.file_asset.FileAsset.__init__", lambda self, inputs, cache_path: setattr(self, "inputs", inputs))
+
+    assert "spatialize_engine" not in PopulationTrips(population=None).inputs
+    assert PopulationTrips(population=None, spatialize_engine="sampler").inputs["spatialize_engine"] == "sampler"
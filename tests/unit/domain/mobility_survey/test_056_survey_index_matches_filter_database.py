@@ -0,0 +1,52 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from mobility.safe_sample import filter_database
+from mobility.parsers.mobility_survey import SurveyIndex
+
+
+KEYS = ["csp", "n_cars", "weekday", "city_category"]
+
+
+def make_days_trip(n=2000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "csp": rng.choice(["1", "2", "3", "no_csp"], n),
+            "n_cars": rng.choice(["0", "1", "2+"], n, p=[0.1, 0.6, 0.3]),
+            "weekday": rng.random(n) < 0.7,
+            "city_category": rng.choice(["C", "B", "R", "I"], n, p=[0.5, 0.3, 0.195, 0.005]),
+            "day_id": np.arange(n),
+            "pondki": rng.random(n),
+        }
+    ).set_index(KEYS)
+
+
+def sample_with_filter_database(days_trip, values, n, rng):
+    days = filter_database(days_trip.copy(), **dict(zip(KEYS, values)))
+    cum_weights = days["pondki"].cumsum().to_numpy()
+    index = np.searchsorted(cum_weights, rng.random(n)*cum_weights[-1], side="right")
+    return days["day_id"].to_numpy()[np.minimum(index, days.shape[0] - 1)]
+
+
+def test_survey_index_samples_the_rows_of_filter_database(tmp_path):
+    days_trip = make_days_trip()
+
+    index = SurveyIndex.build(days_trip, keys=KEYS, id_col="day_id", weight_col="pondki")
+
+    index.save(tmp_path / "days_trip_index.parquet")
+    loaded_index = SurveyIndex.load(tmp_path / "days_trip_index.parquet")
+
+    # Includes rare values (relaxed filters) and values that are not in the table
+    profiles = itertools.product(["1", "no_csp", "9"], ["0", "2+"], [True, False], ["C", "I", None])
+
+    for values in profiles:
+        expected = sample_with_filter_database(days_trip, values, 20, np.random.default_rng(1))
+        np.testing.assert_array_equal(index.sample(values, 20, np.random.default_rng(1)), expected)
+        np.testing.assert_array_equal(loaded_index.sample(values, 20, np.random.default_rng(1)), expected)
+
+    # Profiles with the same relaxed filters share their rows
+    assert index.segment_starts.shape[0] - 1 < index.lookup.shape[0]
+    assert index.sample(("1", "0", True, "C"), 0, np.random.default_rng(1)).shape == (0,)
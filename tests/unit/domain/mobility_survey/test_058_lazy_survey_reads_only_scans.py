@@ -0,0 +1,151 @@
+import types
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from mobility.parsers.mobility_survey import MobilitySurvey, MobilitySurveyAggregator
+
+
+def write_survey_files(folder):
+    rng = np.random.default_rng(0)
+    n_days = 40
+
+    days_trip = pd.DataFrame({
+        "csp": rng.choice(["1", "2"], n_days),
+        "n_cars": rng.choice(["0", "1"], n_days),
+        "weekday": rng.random(n_days) < 0.7,
+        "city_category": rng.choice(["C", "B"], n_days),
+        "day_id": ["d" + str(i) for i in range(n_days)],
+        "day_of_week": rng.integers(0, 7, n_days),
+        "pondki": rng.uniform(0.5, 2.0, n_days),
+    }).set_index(["csp", "n_cars", "weekday", "city_category"])
+
+    days = days_trip.reset_index()
+    short_trips = pd.DataFrame({
+        "day_id": np.repeat(days["day_id"].to_numpy(), 3),
+        "individual_id": np.repeat(["i" + str(i) for i in range(n_days)], 3),
+        "daily_trip_index": np.tile([1, 2, 3], n_days),
+        "departure_time": np.tile([8.0, 12.0, 17.0], n_days)*3600.0,
+        "arrival_time": np.tile([8.5, 12.5, 17.5], n_days)*3600.0,
+        "city_category": np.repeat(days["city_category"].to_numpy(), 3),
+        "csp": np.repeat(days["csp"].to_numpy(), 3),
+        "n_cars": np.repeat(days["n_cars"].to_numpy(), 3),
+        "previous_motive": np.tile(["1.1", "9.91", "2.20"], n_days),
+        "motive": np.tile(["9.91", "2.20", "1.1"], n_days),
+        "mode_id": "3.30",
+        "distance": rng.uniform(1.0, 10.0, 3*n_days),
+        "pondki": 1.0,
+    }).set_index("day_id")
+
+    cache_path = {}
+    for name, table in {"days_trip": days_trip, "short_trips": short_trips}.items():
+        cache_path[name] = folder / (name + ".parquet")
+        table.to_parquet(cache_path[name])
+
+    return cache_path
+
+
+class ParsedSurvey(MobilitySurvey):
+    def create_and_get_asset(self):
+        raise AssertionError("The survey files are already parsed")
+
+
+def make_survey(cache_path, country):
+    survey = ParsedSurvey.__new__(ParsedSurvey)
+    survey.inputs = {"country": country}
+    survey.cache_path = cache_path
+    survey.seq_prob_cutoff = 0.95
+    survey.lazy_asset = None
+    survey.is_update_needed = lambda: False
+
+    def fail():
+        raise AssertionError("The survey files should only be scanned")
+
+    survey.get = fail
+
+    return survey
+
+
+def test_chains_probability_is_computed_from_the_scans(tmp_path):
+    survey = make_survey(write_survey_files(tmp_path), "fr")
+
+    lazy_survey = survey.get_lazy()
+    assert survey.get_lazy() is lazy_survey
+    assert isinstance(lazy_survey["days_trip"], pl.LazyFrame)
+    assert "csp" in lazy_survey["days_trip"].collect_schema().names()
+
+    motive_mapping = {"home": ["1.1"], "work": ["9.91"], "other": ["9.99"]}
+
+    sequences = survey.compute_chains_probability(motive_mapping, 0.95)
+
+    assert isinstance(sequences, pl.DataFrame)
+    assert set(sequences["motive"].cast(pl.String)) == {"home", "work", "other"}
+    assert sequences.group_by(["is_weekday", "city_category", "csp", "n_cars", "motive_seq"]).agg(pl.col("p_seq").first())["p_seq"].min() > 0.0
+
+
+def test_aggregator_adds_the_country_to_the_scans(tmp_path):
+    (tmp_path / "fr").mkdir()
+    (tmp_path / "ch").mkdir()
+
+    individuals_path = tmp_path / "individuals.parquet"
+    pd.DataFrame({"individual_id": ["a", "b", "c"], "country": ["fr", "ch", "fr"]}).to_parquet(individuals_path)
+
+    population = types.SimpleNamespace(get=lambda: {"individuals": individuals_path})
+    surveys = {
+        "fr": make_survey(write_survey_files(tmp_path / "fr"), "fr"),
+        "ch": make_survey(write_survey_files(tmp_path / "ch"), "ch"),
+    }
+
+    aggregator = MobilitySurveyAggregator.__new__(MobilitySurveyAggregator)
+    aggregator.inputs = {"population": population, "surveys": surveys}
+    aggregator.countries = None
+
+    days = aggregator.get_lazy()["days_trip"].filter(pl.col("country") == "ch").select(["day_id", "country"]).collect()
+
+    assert aggregator.get_countries() == ["fr", "ch"]
+    assert days.height == 40
+    assert set(days["country"]) == {"ch"}
+
+
+def test_days_trip_index_is_cached_by_parameters(tmp_path):
+    cache_path = write_survey_files(tmp_path)
+    survey = make_survey(cache_path, "fr")
+
+    n_reads = []
+    survey.get = lambda: n_reads.append(1) or {"days_trip": pd.read_parquet(cache_path["days_trip"])}
+
+    index = survey.get_days_trip_index()
+    assert len(n_reads) == 1
+
+    # The survey files are not read when the index is cached
+    assert survey.get_days_trip_index().segment_starts.tolist() == index.segment_starts.tolist()
+    assert len(n_reads) == 1
+
+    # Other parameters use their own index
+    survey.get_days_trip_index(minimum_sample_size=1)
+    assert len(n_reads) == 2
+    assert len(list(tmp_path.glob("*-days_trip_index.parquet"))) == 2
+
+
+def test_aggregator_tables_keep_the_index_of_the_survey_tables(tmp_path):
+    cache_path = write_survey_files(tmp_path)
+
+    individuals_path = tmp_path / "individuals.parquet"
+    pd.DataFrame({"individual_id": ["a"], "country": ["fr"]}).to_parquet(individuals_path)
+
+    aggregator = MobilitySurveyAggregator.__new__(MobilitySurveyAggregator)
+    aggregator.inputs = {
+        "population": types.SimpleNamespace(get=lambda: {"individuals": individuals_path}),
+        "surveys": {"fr": make_survey(cache_path, "fr")}
+    }
+    aggregator.countries = None
+
+    tables = aggregator.get_tables({"short_trips": ["motive", "distance"], "days_trip": None})
+
+    assert set(tables.keys()) == {"short_trips", "days_trip"}
+    assert list(tables["short_trips"].columns) == ["motive", "distance"]
+
+    for k, table in tables.items():
+        expected = pd.read_parquet(cache_path[k]).assign(country="fr").set_index("country", append=True)
+        pd.testing.assert_frame_equal(table, expected[table.columns])
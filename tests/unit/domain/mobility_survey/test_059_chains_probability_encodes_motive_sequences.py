@@ -0,0 +1,75 @@
+import polars as pl
+
+from mobility.parsers.mobility_survey import ChainsProbability
+
+
+MOTIVE_NAMES = ["home", "work", "other"]
+
+
+class FakeSurvey:
+    """Returns fixed sequences with the layout of compute_chains_probability."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def compute_chains_probability(self, motive_mapping, seq_prob_cutoff):
+        self.calls += 1
+        motive_seqs = [["work", "home"], ["work", "other", "home"], ["other", "work", "home"]]
+        rows = [
+            {
+                "is_weekday": True, "city_category": "C", "csp": "1", "n_cars": "1",
+                "motive_seq": "-".join(seq), "motive": motive, "seq_step_index": step + 1,
+                "duration_morning": 1.0, "duration_midday": 0.0, "duration_evening": 0.0,
+                "distance": 5.0, "p_seq": 1.0/len(motive_seqs)
+            }
+            for seq in motive_seqs
+            for step, motive in enumerate(seq)
+        ]
+        return pl.DataFrame(rows).with_columns(pl.col("motive").cast(pl.Enum(list(motive_mapping.keys()))))
+
+
+def make_chains_probability(tmp_path, survey):
+    chains_probability = ChainsProbability.__new__(ChainsProbability)
+    chains_probability.inputs = {
+        "survey": survey,
+        "motive_mapping": {"home": ["1.1"], "work": ["9.91"], "other": ["9.99"]},
+        "seq_prob_cutoff": 0.95
+    }
+    chains_probability.cache_path = {
+        "chains": tmp_path / "chains_probability.parquet",
+        "motive_seqs": tmp_path / "chains_probability_motive_seqs.parquet"
+    }
+    return chains_probability
+
+
+def test_motive_sequences_are_stored_as_integers(tmp_path):
+    survey = FakeSurvey()
+    chains_probability = make_chains_probability(tmp_path, survey)
+
+    created = chains_probability.create_and_get_asset()
+    cached = chains_probability.get_cached_asset()
+
+    assert "motive_seq" not in cached["chains"].columns
+    assert cached["chains"].schema["motive_seq_id"] == pl.UInt64
+    assert cached["motive_seqs"].schema["motive"] == pl.Enum(MOTIVE_NAMES)
+
+    for k in ["chains", "motive_seqs"]:
+        assert created[k].sort(created[k].columns).equals(cached[k].sort(cached[k].columns))
+
+    # Each id is the base 4 number of the (motive code + 1) of the steps
+    sequences = (
+        cached["motive_seqs"]
+        .sort("seq_step_index")
+        .group_by("motive_seq_id")
+        .agg(pl.col("motive").cast(pl.String))
+    )
+    sequences = dict(zip(sequences["motive_seq_id"].to_list(), sequences["motive"].to_list()))
+
+    def encode(seq):
+        return sum((MOTIVE_NAMES.index(m) + 1)*4**i for i, m in enumerate(seq))
+
+    assert sequences == {
+        encode(seq): seq
+        for seq in [["work", "home"], ["work", "other", "home"], ["other", "work", "home"]]
+    }
+    assert survey.calls == 1
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mobility.parsers.mobility_survey.france.emp import EMPMobilitySurvey
+from mobility.parsers.mobility_survey.france.entd import ENTDMobilitySurvey
+from mobility.parsers.mobility_survey.survey_csv import read_survey_csv
+
+MONTHS = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
+DAYS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+MODES = ["1.1", "2.1", "2.3", "3.1", "5.1", "5.2", "6.2"]
+MOTIVES = ["1.1", "2.1", "4.1", "9.1"]
+
+
+def write_csv(table, path):
+    table.to_csv(path, sep=";", index=False, encoding="latin-1")
+
+
+def write_emp_files(folder, n_households=60):
+    """
+    Small raw EMP-2019 files, with the columns used by the parser (and some
+    unused ones), latin-1 encoded month names and missing values.
+    """
+    rng = np.random.default_rng(0)
+
+    households = np.arange(1, n_households + 1)
+    individuals = np.arange(1, 2*n_households + 1)
+    individual_households = np.repeat(households, 2)
+
+    write_csv(pd.DataFrame({
+        "ident_ind": individuals,
+        "ident_men": individual_households,
+        "CS24": rng.choice(["12", "23", "37", "48", "55", "66", "81", None], individuals.shape[0]),
+        "unused": "x",
+    }), folder / "tcm_ind_kish_public_V2.csv")
+
+    write_csv(pd.DataFrame({
+        "ident_men": households,
+        "NPERS": rng.integers(1, 6, n_households),
+        "CS24PR": rng.choice(["12", "23", "37", "48"], n_households),
+        "STATUTCOM_UU_RES": rng.choice(["C", "B", "I", "H"], n_households),
+    }), folder / "tcm_men_public_V2.csv")
+
+    write_csv(pd.DataFrame({
+        "IDENT_MEN": households,
+        "JNBVEH": rng.integers(0, 4, n_households),
+        "BLOGDIST": rng.choice(["1", "2", "3"], n_households),
+    }), folder / "q_menage_public_V2.csv")
+
+    write_csv(pd.DataFrame({
+        "IDENT_IND": individuals,
+        "pond_indC": rng.uniform(100.0, 1000.0, individuals.shape[0]),
+        **{"IMMODEP_" + x: rng.integers(0, 2, individuals.shape[0]) for x in "ABCDEFG"},
+        "MDATE_jour": rng.choice(DAYS, individuals.shape[0]),
+        "MDATE_delai": rng.integers(-7, 0, individuals.shape[0]),
+    }), folder / "k_individu_public_V2.csv")
+
+    n_trips = 8*individuals.shape[0]
+    trip_individuals = np.repeat(individuals, 8)
+    departure = rng.integers(6*60, 20*60, n_trips)
+
+    write_csv(pd.DataFrame({
+        "IDENT_DEP": [str(10**13 + 100*i + j) + "01" for i, j in zip(trip_individuals, np.tile(np.arange(8), individuals.shape[0]) // 4)],
+        "IDENT_IND": trip_individuals,
+        "POND_JOUR": rng.uniform(10.0, 100.0, n_trips),
+        "TYPEJOUR": rng.choice(["1", "2"], n_trips),
+        "mobloc": rng.choice(["1", "1", "1", "2"], n_trips),
+        "MMOTIFDES": rng.choice(MOTIVES, n_trips),
+        "MOTPREC": rng.choice(MOTIVES, n_trips),
+        "MDISTTOT_fin": np.where(rng.random(n_trips) < 0.05, np.nan, rng.uniform(0.1, 50.0, n_trips)),
+        "mtp": rng.choice(MODES, n_trips),
+        "MACCOMPM": np.where(rng.random(n_trips) < 0.2, np.nan, rng.integers(0, 3, n_trips)),
+        "MACCOMPHM": rng.integers(0, 2, n_trips),
+        "MDATE_jour": rng.choice(DAYS, n_trips),
+        "MDATE_mois": rng.choice(MONTHS, n_trips),
+        "MORIHDEP": [f"{m // 60:02d}:{m % 60:02d}:00" for m in departure],
+        "MDESHARR": [f"{m // 60:02d}:{m % 60:02d}:00" for m in departure + 20],
+    }), folder / "k_deploc_public_V2.csv")
+
+    n_travels = individuals.shape[0]
+    travel_ids = ["V" + str(i) for i in range(n_travels)]
+
+    write_csv(pd.DataFrame({
+        "IDENT_IND": rng.choice(individuals, n_travels),
+        "IDENT_VOY": travel_ids,
+        "OLDVMH": rng.integers(0, 8, n_travels),
+        "OLDMOT": rng.choice(MOTIVES, n_travels),
+        "OLDKM_fin": rng.uniform(100.0, 800.0, n_travels),
+        "mtp": rng.choice(MODES, n_travels),
+        "nbaccomp": rng.integers(0, 3, n_travels),
+        "STATUTCOM_UU_DES": rng.choice(["C", "B", "H", None], n_travels),
+        "poids_annuel": rng.uniform(10.0, 100.0, n_travels),
+        "NBJOURS_DEP": rng.integers(1, 8, n_travels),
+        "NUITEE_DEST_DEP": np.where(rng.random(n_travels) < 0.3, np.nan, rng.integers(0, 7, n_travels)),
+    }), folder / "k_voy_depdet_public_V2.csv")
+
+    write_csv(pd.DataFrame({
+        "IDENT_IND": rng.choice(individuals, n_travels),
+        "IDENT_VOY": travel_ids,
+        "OLDVMH": rng.integers(0, 8, n_travels),
+        "OLDMOT": rng.choice(MOTIVES, n_travels),
+        "mtp": rng.choice(MODES, n_travels),
+        "STATUTCOM_UU_VOY_DES": rng.choice(["C", "B", "H", None], n_travels),
+        "poids_annuel": rng.uniform(10.0, 100.0, n_travels),
+        "OLDDEBJ_mois": rng.choice(MONTHS, n_travels),
+        "OLDDEBJ_jour": rng.choice(DAYS, n_travels),
+    }), folder / "k_voyage_public_V2.csv")
+
+
+def parse(raw_folder, output_folder, parse_engine):
+    output_folder.mkdir()
+
+    survey = EMPMobilitySurvey.__new__(EMPMobilitySurvey)
+    survey.parse_engine = parse_engine
+    survey.cache_path = {
+        name: output_folder / (name + ".parquet")
+        for name in ["short_trips", "days_trip", "long_trips", "travels", "n_travels", "p_immobility", "p_car", "p_det_mode"]
+    }
+
+    survey.parse_survey_data(raw_folder / "emp-2019.zip")
+
+    return survey.cache_path
+
+
+def test_polars_and_pandas_engines_write_the_same_files(tmp_path):
+    raw_folder = tmp_path / "raw"
+    raw_folder.mkdir()
+    write_emp_files(raw_folder)
+
+    pandas_files = parse(raw_folder, tmp_path / "pandas", "pandas")
+    polars_files = parse(raw_folder, tmp_path / "polars", "polars")
+
+    for name in pandas_files.keys():
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(pandas_files[name]),
+            pd.read_parquet(polars_files[name])
+        )
+
+    assert pd.read_parquet(pandas_files["travels"])["month"].isin([2, 8, 12]).any()
+
+
+def test_read_survey_csv_matches_pandas_for_string_and_bool_columns(tmp_path):
+    path = tmp_path / "K_mobilite.csv"
+    write_csv(pd.DataFrame({
+        "V2_IMMODEP_A": ["True", "False", "True"],
+        "IDENT_IND": ["001", "002", None],
+        "PONDKI": ["1.5", "NA", "3"],
+        "CAT": ["ville isolée", "banlieue", ""],
+    }), path)
+
+    for dtype in [str, {"IDENT_IND": str, "V2_IMMODEP_A": bool}]:
+        usecols = ["IDENT_IND", "PONDKI", "V2_IMMODEP_A", "CAT"]
+        expected = pd.read_csv(path, encoding="latin-1", sep=";", dtype=dtype, usecols=usecols)
+        pd.testing.assert_frame_equal(read_survey_csv(path, usecols, dtype, engine="polars"), expected)
+
+    with pytest.raises(ValueError):
+        read_survey_csv(path, ["PONDKI"], engine="unknown")
+
+
+def test_entd_short_trips_are_the_same_with_both_engines(tmp_path):
+    rng = np.random.default_rng(0)
+    n_trips = 500
+    trip_individuals = rng.integers(1, 41, n_trips)
+
+    write_csv(pd.DataFrame({
+        "IDENT_IND": [f"{i:03d}" for i in trip_individuals],
+        "IDENT_JOUR": [f"{i:03d}{d}" for i, d in zip(trip_individuals, rng.integers(1, 3, n_trips))],
+        "PONDKI": rng.uniform(100.0, 1000.0, n_trips).round(6),
+        "V2_TYPJOUR": rng.choice(["1", "2"], n_trips),
+        "V2_DLOCAL": rng.choice(["1", "1", "1", "2"], n_trips),
+        "V2_MMOTIFDES": rng.choice(MOTIVES, n_trips),
+        "V2_MMOTIFORI": rng.choice(MOTIVES, n_trips),
+        "V2_MDISTTOT": np.where(rng.random(n_trips) < 0.05, np.nan, rng.uniform(0.1, 50.0, n_trips)),
+        "V2_MTP": rng.choice(MODES, n_trips),
+        "V2_MACCOMPM": rng.integers(0, 3, n_trips),
+        "V2_MACCOMPHM": rng.integers(0, 2, n_trips),
+    }), tmp_path / "K_deploc.csv")
+
+    indiv = pd.DataFrame({
+        "IDENT_MEN": [f"{i // 2:03d}" for i in range(1, 41)],
+        "IDENT_IND": [f"{i:03d}" for i in range(1, 41)],
+        "CS24": rng.choice(["12", "23", "37"], 40),
+    })
+    indiv["csp"] = indiv["CS24"].str.slice(0, 1)
+
+    hh = pd.DataFrame({
+        "IDENT_MEN": [f"{i:03d}" for i in range(0, 21)],
+        "city_category": rng.choice(["C", "B", "R"], 21),
+        "csp_household": rng.choice(["1", "2", "3"], 21),
+    })
+
+    cars = pd.DataFrame({"IDENT_MEN": hh["IDENT_MEN"], "n_cars": rng.choice(["0", "1", "2+"], 21)})
+
+    survey = ENTDMobilitySurvey.__new__(ENTDMobilitySurvey)
+
+    pandas_tables = survey.prepare_short_trips(tmp_path, indiv, hh, cars)
+    polars_tables = survey.prepare_short_trips_polars(tmp_path, indiv, hh, cars)
+
+    for pandas_table, polars_table in zip(pandas_tables, polars_tables):
+        pd.testing.assert_frame_equal(pandas_table, polars_table)
+
+
+def test_the_polars_parse_engine_is_hashed(tmp_path, monkeypatch):
+    monkeypatch.setenv("MOBILITY_PACKAGE_DATA_FOLDER", str(tmp_path))
+    monkeypatch.setenv("MOBILITY_PROJECT_DATA_FOLDER", str(tmp_path))
+
+    assert "parse_engine" not in EMPMobilitySurvey().inputs
+    assert EMPMobilitySurvey(parse_engine="polars").inputs["parse_engine"] == "polars"
+    assert ENTDMobilitySurvey(parse_engine="polars").inputs["parse_engine"] == "polars"
@@ -0,0 +1,74 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mobility.sample_travels import sample_travels
+
+
+def make_travels():
+    return pd.DataFrame(
+        {
+            "day_of_year": [1, 2, 4, 4, 6, 8, 9, 9],
+            "n_nights": [2, 1, 3, 0, 1, np.nan, 2, 0],
+            "pondki": [1.0, 2.0, 0.5, 1.5, 3.0, 1.0, 2.5, 0.7],
+        },
+        index=[10, 11, 12, 13, 14, 15, 16, 17],
+    )
+
+
+def get_exact_distribution(travels, k):
+    starts = travels["day_of_year"].to_numpy()
+    ends = starts + travels["n_nights"].fillna(0).to_numpy()
+    weights = travels["pondki"].to_numpy()
+
+    probabilities = {}
+    for subset in itertools.combinations(range(len(travels)), k):
+        compatible = all(
+            ends[a] <= starts[b] or starts[a] >= ends[b]
+            for a, b in itertools.combinations(subset, 2)
+        )
+        if compatible:
+            probabilities[frozenset(travels.index[list(subset)])] = np.prod(weights[list(subset)])
+
+    total = sum(probabilities.values())
+    return {s: w / total for s, w in probabilities.items()}
+
+
+def test_exact_sampler_follows_the_product_of_weights_distribution():
+    travels = make_travels()
+    expected = get_exact_distribution(travels, 3)
+
+    samples = sample_travels(
+        travels, "day_of_year", "n_nights", "pondki",
+        k=3, num_samples=50000, random_seed=0, method="exact"
+    )
+
+    counts = pd.Series([frozenset(s) for s in samples]).value_counts(normalize=True)
+
+    assert all(len(s) == 3 for s in samples)
+    assert set(counts.index) <= set(expected.keys())
+
+    total_variation = 0.5 * sum(abs(counts.get(s, 0.0) - p) for s, p in expected.items())
+    assert total_variation < 0.02
+
+
+def test_exact_sampler_caps_k_and_is_reproducible():
+    travels = make_travels()
+
+    samples = sample_travels(
+        travels, "day_of_year", "n_nights", "pondki",
+        k=20, num_samples=100, random_seed=1, method="exact"
+    )
+
+    max_k = max(k for k in range(1, len(travels) + 1) if len(get_exact_distribution(travels, k)) > 0)
+    assert all(len(s) == max_k for s in samples)
+
+    assert samples == sample_travels(
+        travels, "day_of_year", "n_nights", "pondki",
+        k=20, num_samples=100, random_seed=1, method="exact"
+    )
+
+    with pytest.raises(ValueError):
+        sample_travels(travels, "day_of_year", "n_nights", "pondki", k=2, method="unknown")
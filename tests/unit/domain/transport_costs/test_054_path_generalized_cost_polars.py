@@ -0,0 +1,75 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from mobility.cost_of_time_parameters import CostOfTimeParameters
+from mobility.generalized_cost_parameters import GeneralizedCostParameters
+from mobility.transport_costs.path_generalized_cost import PathGeneralizedCost
+
+
+@dataclass
+class FakeTravelCosts:
+    mode_name: str
+
+    def get(self, congestion=False):
+        self.n_reads += 1
+        return self.costs.copy()
+
+
+class FakeTransportZones:
+    inputs_hash = "tz"
+
+    def get(self):
+        return gpd.GeoDataFrame({
+            "transport_zone_id": [1, 2, 5],
+            "local_admin_unit_id": ["fr-74010", "ch-6621", "fr-01173"],
+            "geometry": [None, None, None]
+        })
+
+
+def test_polars_generalized_cost_matches_pandas_computation(tmp_path):
+    travel_costs = FakeTravelCosts("car")
+    travel_costs.n_reads = 0
+    travel_costs.cache_path = {"freeflow": tmp_path / "freeflow.parquet", "congested": tmp_path / "congested.parquet"}
+    travel_costs.transport_zones = FakeTransportZones()
+    travel_costs.costs = pd.DataFrame({
+        "from": [1, 1, 2, 5, 7],
+        "to": [2, 5, 1, 5, 1],
+        "distance": [12.0, 3.0, 12.0, 0.5, 4.0],
+        "time": [0.2, 0.1, 0.25, 0.05, 0.1]
+    })
+    travel_costs.costs.to_parquet(travel_costs.cache_path["freeflow"])
+
+    parameters = GeneralizedCostParameters(
+        cost_constant=1.0,
+        cost_of_distance=0.1,
+        cost_of_time=CostOfTimeParameters(intercept=10.0, breaks=[0.0, 5.0, 100.0], slopes=[1.0, 0.5], max_value=18.0, country_coeff_ch=1.5)
+    )
+
+    gc = PathGeneralizedCost(travel_costs, parameters, "car")
+    costs = gc.get(["cost", "distance"], detail_distances=True)
+
+    # Zone 7 is not a transport zone
+    expected = travel_costs.costs.iloc[:4]
+    country = np.array(["fr", "fr", "ch", "fr"])
+    expected_cost = 1.0 + 0.1*expected["distance"] + parameters.cost_of_time.compute(expected["distance"], country)*expected["time"]
+
+    assert costs.columns.tolist() == ["from", "to", "cost", "distance", "car_distance", "mode"]
+    assert costs["from"].tolist() == [1, 1, 2, 5]
+    np.testing.assert_allclose(costs["cost"].to_numpy(), expected_cost.to_numpy())
+    assert (costs["mode"] == "car").all()
+
+    # Memoized until the travel costs file changes
+    gc.get_pl(["cost", "distance"], detail_distances=True)
+    assert travel_costs.n_reads == 1
+
+    travel_costs.costs.to_parquet(travel_costs.cache_path["freeflow"])
+    os.utime(travel_costs.cache_path["freeflow"], ns=(0, 0))
+    gc.get_pl(["cost", "distance"], detail_distances=True)
+    assert travel_costs.n_reads == 2
+
+    # Only the last version of the costs is kept
+    assert len(gc.costs_by_args) == 1
@@ -0,0 +1,134 @@
+import numpy as np
+import polars as pl
+
+from scipy.sparse.csgraph import dijkstra
+
+from mobility.transport_graphs.traffic_assignment import (
+    FrankWolfeAssignment,
+    bpr_link_times,
+    tz_pairs_to_vertex_pairs
+)
+
+
+def make_two_routes_assignment(**kwargs):
+    # Direct link 0 -> 1, a slower parallel link, and a detour 0 -> 2 -> 1
+    return FrankWolfeAssignment(
+        link_from=np.array([0, 0, 0, 2]),
+        link_to=np.array([1, 1, 2, 1]),
+        free_flow_times=np.array([10.0, 100.0, 7.0, 5.0]),
+        capacity=np.array([100.0, 100.0, 50.0, np.nan]),
+        alpha=np.array([0.15, 0.15, np.nan, 0.15]),
+        beta=np.array([4.0, 4.0, np.nan, 4.0]),
+        n_vertices=3,
+        **kwargs
+    )
+
+
+def make_grid_assignment(k=8, seed=0, **kwargs):
+    rng = np.random.default_rng(seed)
+    index = np.arange(k*k).reshape(k, k)
+    link_from = np.concatenate([index[:-1, :].ravel(), index[1:, :].ravel(), index[:, :-1].ravel(), index[:, 1:].ravel()])
+    link_to = np.concatenate([index[1:, :].ravel(), index[:-1, :].ravel(), index[:, 1:].ravel(), index[:, :-1].ravel()])
+    n = link_from.shape[0]
+    assignment = FrankWolfeAssignment(
+        link_from, link_to, rng.uniform(1.0, 2.0, n),
+        np.full(n, 200.0), np.full(n, np.nan), np.full(n, np.nan),
+        k*k, **kwargs
+    )
+    od = pl.DataFrame({
+        "from": rng.integers(0, k*k, 200),
+        "to": rng.integers(0, k*k, 200),
+        "demand": rng.uniform(10.0, 50.0, 200)
+    })
+    return assignment, od
+
+
+def test_bpr_link_times_and_default_parameters():
+    times = bpr_link_times(np.array([10.0, 10.0]), np.array([0.0, 200.0]), np.array([100.0, 100.0]), np.array([0.15, 0.15]), np.array([4.0, 4.0]))
+    np.testing.assert_allclose(times, [10.0, 10.0*(1.0 + 0.15*16.0)])
+
+    assignment = make_two_routes_assignment()
+    np.testing.assert_allclose(assignment.capacity, [100.0, 100.0, 50.0, 1000.0])
+    np.testing.assert_allclose(assignment.alpha, 0.15)
+    np.testing.assert_allclose(assignment.beta, 4.0)
+
+
+def test_assignment_reaches_the_user_equilibrium():
+    assignment = make_two_routes_assignment(max_gap=1e-6, max_iterations=500)
+    od = pl.DataFrame({"from": [0, 0], "to": [1, 0], "demand": [200.0, 50.0]})
+
+    flows, times, n_iterations, gap = assignment.assign(od)
+
+    assert gap <= 1e-6
+    assert flows[1] == 0.0
+    assert flows[2] == flows[3]
+    np.testing.assert_allclose(flows[0] + flows[2], 200.0)
+    assert flows[0] > 0.0 and flows[2] > 0.0
+
+    # Both used routes have the same congested time
+    np.testing.assert_allclose(times[0], times[2] + times[3], rtol=1e-3)
+
+
+def test_warm_start_from_the_previous_flows_reduces_the_iterations():
+    assignment, od = make_grid_assignment(max_gap=0.005, max_iterations=200)
+    flows, _, n_iterations, _ = assignment.assign(od)
+
+    # Unchanged demand : the previous flows are already at the equilibrium
+    assert assignment.assign(od, flows, od)[2] == 0
+
+    new_od = od.with_columns(demand=pl.col("demand")*np.random.default_rng(1).uniform(0.9, 1.1, od.height))
+    new_flows, _, n_cold_iterations, _ = assignment.assign(new_od)
+    warm_flows, _, n_warm_iterations, warm_gap = assignment.assign(new_od, flows, od)
+
+    assert n_warm_iterations < n_cold_iterations
+    assert warm_gap <= 0.005
+    assert (warm_flows >= 0.0).all()
+    np.testing.assert_allclose(warm_flows.sum(), new_flows.sum(), rtol=0.05)
+
+
+def test_tz_pairs_are_disaggregated_into_vertex_pairs():
+    transport_zones = pl.DataFrame({"transport_zone_id": [1, 2], "x": [0.0, 2000.0], "y": [0.0, 0.0]})
+    buildings = pl.DataFrame({
+        "transport_zone_id": [1, 1, 1, 2, 2, 2],
+        "n_clusters": [1, 2, 2, 1, 2, 2],
+        "vertex_id": ["a", "b", "c", "d", "e", "b"],
+        "weight": [1.0, 0.25, 0.75, 1.0, 0.5, 0.5]
+    })
+    od_flows = pl.DataFrame({"from": [1, 1], "to": [2, 1]})
+
+    pairs = tz_pairs_to_vertex_pairs(od_flows, transport_zones, buildings).sort(["vertex_id_from", "vertex_id_to"])
+
+    # Zones 2 km apart use 2 clusters, the pairs of a same vertex are dropped
+    # and the intra zone pairs (5 clusters) have no buildings here
+    assert pairs.select(["from", "to", "vertex_id_from", "vertex_id_to"]).rows() == [
+        (1, 2, "b", "e"),
+        (1, 2, "c", "b"),
+        (1, 2, "c", "e")
+    ]
+    np.testing.assert_allclose(pairs["weight"], np.array([0.125, 0.375, 0.375])/0.875)
+
+
+def test_od_costs_follow_the_fastest_paths():
+    assignment = make_two_routes_assignment()
+    lengths = np.array([1000.0, 2000.0, 300.0, 400.0])
+
+    times, distances = assignment.get_od_costs(assignment.free_flow_times, lengths, [0, 0, 1, 2], [1, 0, 0, 1])
+    np.testing.assert_allclose(times, [10.0, 0.0, np.nan, 5.0])
+    np.testing.assert_allclose(distances, [1000.0, 0.0, np.nan, 400.0])
+
+    # The direct link is congested : the detour becomes the fastest path
+    times, distances = assignment.get_od_costs(np.array([10.0, 100.0, 4.0, 5.0]), lengths, [0], [1])
+    np.testing.assert_allclose(times, [9.0])
+    np.testing.assert_allclose(distances, [700.0])
+
+
+def test_od_costs_match_the_dijkstra_distances():
+    assignment, od = make_grid_assignment(max_block_cells=64*5)
+    times = assignment.get_link_times(assignment.all_or_nothing(assignment.free_flow_times, od))
+
+    od_times, od_lengths = assignment.get_od_costs(times, times, od["from"].to_numpy(), od["to"].to_numpy())
+
+    graph, _, _ = assignment.get_graph(times)
+    expected = dijkstra(graph, directed=True)[od["from"].to_numpy(), od["to"].to_numpy()]
+    np.testing.assert_allclose(od_times, expected)
+    np.testing.assert_allclose(od_lengths, expected)
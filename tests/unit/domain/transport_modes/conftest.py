@@ -0,0 +1,41 @@
+import pytest
+import polars as pl
+
+
+@pytest.fixture
+def modes_properties():
+    """
+    Mode properties as formatted by modes_list_to_dict : walk, car and a
+    multimodal car/public_transport mode with its return mode.
+    """
+    return {
+        "walk": {"vehicle": None, "multimodal": False, "is_return_mode": False, "return_mode": None},
+        "car": {"vehicle": "car", "multimodal": False, "is_return_mode": False, "return_mode": None},
+        "car/public_transport": {
+            "vehicle": "car", "multimodal": True, "is_return_mode": False, "return_mode": "public_transport/car"
+        },
+        "public_transport/car": {"vehicle": "car", "multimodal": True, "is_return_mode": True, "return_mode": None},
+    }
+
+
+@pytest.fixture
+def od_mode_costs(modes_properties):
+    """
+    Costs between three zones (10, 20, 30) for all modes, with distinct values
+    so that there are no ties between mode sequences.
+    """
+    mode_id = {n: i for i, n in enumerate(modes_properties)}
+    base_cost = {"walk": 0.3, "car": 0.1, "car/public_transport": 0.15, "public_transport/car": 0.16}
+
+    rows = []
+    for k, from_ in enumerate([10, 20, 30]):
+        for l, to in enumerate([10, 20, 30]):
+            for mode, cost in base_cost.items():
+                rows.append({
+                    "from": from_,
+                    "to": to,
+                    "mode_id": mode_id[mode],
+                    "cost": cost + 0.01*k + 0.001*l + 0.0001*mode_id[mode]
+                })
+
+    return pl.DataFrame(rows).with_columns(mode_id=pl.col("mode_id").cast(pl.UInt8()))
@@ -0,0 +1,80 @@
+import numpy as np
+import polars as pl
+
+from mobility.transport_modes.od_mode_costs_store import ODModeCostsStore
+from mobility.transport_modes import compute_subtour_mode_probs_parallel_utilities as utilities
+
+
+def test_costs_store_is_indexed_by_zone_index_and_mode(tmp_path, od_mode_costs):
+    is_return_mode = {0: False, 1: False, 2: False, 3: True}
+    store = ODModeCostsStore(tmp_path / "store").write(od_mode_costs.filter(pl.col("cost") < 0.31), 4, is_return_mode)
+
+    assert store.zone_ids.tolist() == [10, 20, 30]
+    assert store.zone_index(np.array([30, 10, 99])).tolist() == [2, 0, -1]
+
+    # Walk is only available from zone 10 to zones 10 and 20 (costs < 0.31)
+    assert store.costs[0, 1, 1] == od_mode_costs.filter(
+        (pl.col("from") == 10) & (pl.col("to") == 20) & (pl.col("mode_id") == 1)
+    )["cost"].item()
+    assert np.isnan(store.costs[2, 2, 0])
+    assert store.leg_modes[0, 1] == (0, 1, 2)
+    assert store.leg_modes[2, 2] == (1, 2)
+
+    # Workers attach the same files without copying them
+    attached = ODModeCostsStore(tmp_path / "store").attach()
+    np.testing.assert_array_equal(attached.costs, store.costs)
+
+
+def test_worker_finds_mode_sequences_with_integer_lookups(tmp_path, od_mode_costs, modes_properties):
+    is_return_mode = {0: False, 1: False, 2: False, 3: True}
+    ODModeCostsStore(tmp_path / "store").write(od_mode_costs, 4, is_return_mode)
+
+    utilities.worker_init(3, tmp_path / "store", modes_properties)
+
+    # Chain 10 -> 20 -> 30 -> 20 -> 10, as zone indices
+    results = pl.from_arrow(utilities.process_batch([(0, [0, 1, 2, 1, 0])]))
+    results = results.sort(["mode_seq_index", "seq_step_index"])
+    sequences = results.group_by("mode_seq_index", maintain_order=True).agg(pl.col("mode_index"))
+
+    # The car has to come back home, and the multimodal mode forces its 
+    # return mode on the last leg of the 20 -> 30 -> 20 subtour
+    assert sequences["mode_index"].to_list() == [[1, 1, 1, 1], [1, 2, 3, 1], [1, 0, 0, 1]]
+    assert results["location"].to_list()[:4] == [20, 30, 20, 10]
+
+
+def test_update_writes_the_changed_and_removed_costs(tmp_path, od_mode_costs):
+    is_return_mode = {0: False, 1: False, 2: False, 3: True}
+    store = ODModeCostsStore(tmp_path / "store").write(od_mode_costs, 4, is_return_mode)
+
+    # Same costs : nothing to write
+    assert store.update(od_mode_costs, 4, is_return_mode) == 0
+
+    # Two walk costs change and the car is not available from 30 to 10 anymore
+    new_costs = (
+        od_mode_costs
+        .with_columns(cost=pl.when((pl.col("mode_id") == 0) & (pl.col("from") == 20)).then(1.0).otherwise(pl.col("cost")))
+        .filter(~((pl.col("from") == 30) & (pl.col("to") == 10) & (pl.col("mode_id") == 1)))
+        .filter(~((pl.col("from") == 20) & (pl.col("mode_id") == 0) & (pl.col("to") == 30)))
+    )
+    assert store.update(new_costs, 4, is_return_mode) == 2 + 2
+
+    expected = ODModeCostsStore(tmp_path / "expected").write(new_costs, 4, is_return_mode)
+    np.testing.assert_array_equal(store.costs, expected.costs)
+    np.testing.assert_array_equal(store.leg_modes.leg_modes_mask, expected.leg_modes.leg_modes_mask)
+    assert store.leg_modes[2, 0] == (0, 2)
+
+
+def test_update_chains_the_costs_version(tmp_path, od_mode_costs):
+    is_return_mode = {0: False, 1: False, 2: False, 3: True}
+    store = ODModeCostsStore(tmp_path / "store").write(od_mode_costs, 4, is_return_mode)
+    initial_hash = store.costs_hash
+
+    store.update(od_mode_costs, 4, is_return_mode)
+    assert store.costs_hash == initial_hash
+
+    store.update(od_mode_costs.with_columns(cost=pl.col("cost")*2.0), 4, is_return_mode)
+    assert store.costs_hash != initial_hash
+
+    # Coming back to the initial costs is a new version of the costs
+    store.update(od_mode_costs, 4, is_return_mode)
+    assert store.costs_hash != initial_hash
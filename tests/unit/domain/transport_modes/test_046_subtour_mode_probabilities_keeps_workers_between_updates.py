@@ -0,0 +1,40 @@
+import polars as pl
+
+from mobility.transport_modes.compute_subtour_mode_probabilities import SubtourModeProbabilities
+
+
+def test_workers_see_cost_updates_without_restart(tmp_path, od_mode_costs, modes_properties):
+    id_to_mode = {i: n for i, n in enumerate(modes_properties)}
+    costs = od_mode_costs.with_columns(mode=pl.col("mode_id").replace_strict(id_to_mode)).drop("mode_id")
+
+    location_chains = pl.DataFrame(
+        {"dest_seq_id": [0, 1], "locations": [[10, 20, 30, 20], [10, 99]]},
+        schema={"dest_seq_id": pl.UInt32(), "locations": pl.List(pl.Int32())}
+    )
+
+    with SubtourModeProbabilities(3, modes_properties, tmp_path / "store", n_workers=1) as search:
+
+        search.update_costs(costs)
+        results = search.run(location_chains)
+        executor = search.executor
+
+        # Chains going through zones without costs have no mode sequence
+        assert results["dest_seq_id"].unique().to_list() == [0]
+        best = results.filter(pl.col("mode_seq_index") == 0).sort("seq_step_index")
+        assert best["mode_index"].to_list() == [1, 1, 1, 1]
+
+        # Make the car very expensive between 20 and 30 : only these costs
+        # are written to the shared store and the same workers are reused
+        costs = costs.with_columns(
+            cost=pl.when(
+                (pl.col("mode") == "car") & (pl.col("from").is_in([20, 30])) & (pl.col("to").is_in([20, 30]))
+            ).then(10.0).otherwise(pl.col("cost"))
+        )
+        search.update_costs(costs)
+        results = search.run(location_chains)
+
+        assert search.executor is executor
+        best = results.filter(pl.col("mode_seq_index") == 0).sort("seq_step_index")
+        assert best["mode_index"].to_list() == [1, 2, 3, 1]
+
+    assert search.executor is None
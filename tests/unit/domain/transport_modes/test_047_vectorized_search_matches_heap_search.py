@@ -0,0 +1,46 @@
+import numpy as np
+import polars as pl
+
+from mobility.transport_modes.od_mode_costs_store import ODModeCostsStore
+from mobility.transport_modes import compute_subtour_mode_probs_parallel_utilities as utilities
+from mobility.transport_modes import compute_subtour_mode_probs_vectorized as vectorized
+
+
+def test_vectorized_search_gives_the_same_results_as_heap_search(tmp_path, modes_properties):
+    modes = dict(modes_properties)
+    modes["bicycle"] = {"vehicle": "bicycle", "multimodal": False, "is_return_mode": False, "return_mode": None}
+    is_return_mode = {i: v["is_return_mode"] for i, v in enumerate(modes.values())}
+
+    rng = np.random.default_rng(0)
+    n_zones = 6
+
+    # Random costs, with some OD x mode pairs missing
+    rows = [
+        (i*10, j*10, m, float(rng.random()*2.0))
+        for i in range(n_zones) for j in range(n_zones) for m in range(len(modes))
+        if rng.random() < 0.85
+    ]
+    costs = pl.DataFrame(rows, schema=["from", "to", "mode_id", "cost"], orient="row")
+    ODModeCostsStore(tmp_path / "store").write(costs, len(modes), is_return_mode)
+
+    # Random location chains, that often come back to previous locations
+    chains = []
+    for dest_seq_id in range(500):
+        locations = [int(rng.integers(0, n_zones))]
+        for _ in range(int(rng.integers(1, 6))):
+            if rng.random() < 0.6:
+                locations.append(int(rng.integers(0, n_zones)))
+            else:
+                locations.append(locations[int(rng.integers(0, len(locations)))])
+        chains.append((dest_seq_id, locations + [locations[0]]))
+
+    for k in [1, 4]:
+
+        utilities.worker_init(k, tmp_path / "store", modes)
+        heap_results = pl.from_arrow(utilities.process_batch(chains))
+
+        vectorized.worker_init_vectorized(k, tmp_path / "store", modes)
+        vectorized_results = pl.from_arrow(vectorized.process_batch_vectorized(chains))
+
+        assert heap_results.height > 0
+        assert vectorized_results.equals(heap_results)
@@ -0,0 +1,78 @@
+import polars as pl
+
+from mobility.transport_modes.compute_subtour_mode_probabilities import SubtourModeProbabilities
+
+
+def test_only_new_location_chains_are_searched_until_costs_change(tmp_path, od_mode_costs, modes_properties, monkeypatch):
+    id_to_mode = {i: n for i, n in enumerate(modes_properties)}
+    costs = od_mode_costs.with_columns(mode=pl.col("mode_id").replace_strict(id_to_mode)).drop("mode_id")
+
+    search = SubtourModeProbabilities(3, modes_properties, tmp_path / "store")
+
+    searched_dest_seq_ids = []
+
+    def fake_search(location_chains):
+        searched_dest_seq_ids.append(sorted(location_chains["dest_seq_id"].to_list()))
+        return [
+            pl.DataFrame(
+                {
+                    "mode_seq_index": [0]*len(location_chains),
+                    "location": [10]*len(location_chains),
+                    "seq_step_index": [1]*len(location_chains),
+                    "mode_index": [1]*len(location_chains),
+                    "dest_seq_id": location_chains["dest_seq_id"].cast(pl.UInt64())
+                }
+            ).to_arrow()
+        ]
+
+    monkeypatch.setattr(search, "search", fake_search)
+
+    def location_chains(dest_seq_ids):
+        return pl.DataFrame(
+            {"dest_seq_id": dest_seq_ids, "locations": [[10, 20]]*len(dest_seq_ids)},
+            schema={"dest_seq_id": pl.UInt32(), "locations": pl.List(pl.Int32())}
+        )
+
+    search.update_costs(costs)
+    search.run(location_chains([0, 1]))
+
+    # Same costs : only the new chain is searched, all requested chains are returned
+    search.update_costs(costs)
+    results = search.run(location_chains([1, 2]))
+    assert sorted(results["dest_seq_id"].to_list()) == [1, 2]
+
+    # New costs : the cached results are dropped
+    search.update_costs(costs.with_columns(cost=pl.col("cost")*2.0))
+    search.run(location_chains([1, 2]))
+
+    assert searched_dest_seq_ids == [[0, 1], [2], [1, 2]]
+
+
+def test_cache_is_cleared_when_full(tmp_path, modes_properties, monkeypatch):
+    search = SubtourModeProbabilities(3, modes_properties, tmp_path / "store", max_cached_chains=3)
+
+    searched_dest_seq_ids = []
+
+    def fake_search(location_chains):
+        searched_dest_seq_ids.append(sorted(location_chains["dest_seq_id"].to_list()))
+        return [
+            pl.DataFrame(
+                {"mode_seq_index": 0, "location": 10, "seq_step_index": 1, "mode_index": 1, "dest_seq_id": location_chains["dest_seq_id"].cast(pl.UInt64())}
+            ).to_arrow()
+        ]
+
+    monkeypatch.setattr(search, "search", fake_search)
+
+    def location_chains(dest_seq_ids):
+        return pl.DataFrame(
+            {"dest_seq_id": dest_seq_ids, "locations": [[10, 20]]*len(dest_seq_ids)},
+            schema={"dest_seq_id": pl.UInt32(), "locations": pl.List(pl.Int32())}
+        )
+
+    search.run(location_chains([0, 1]))
+    search.run(location_chains([1, 2]))
+    results = search.run(location_chains([2, 3]))
+
+    assert searched_dest_seq_ids == [[0, 1], [2], [2, 3]]
+    assert sorted(results["dest_seq_id"].to_list()) == [2, 3]
+    assert search.cached_dest_seq_ids == {2, 3}
@@ -681,6 +681,8 @@ def patch_mobility_survey(monkeypatch):
                 "p_immobility": immobility_probability_dataframe,
                 "p_car": car_probability_dataframe,
             }
+        def get_tables(self, columns):
+            return {k: v for k, v in self.get().items() if k in columns}
 
     class StubEMPMobilitySurvey:
         """Lightweight stub so default surveys = {'fr': EMPMobilitySurvey()} does not error."""
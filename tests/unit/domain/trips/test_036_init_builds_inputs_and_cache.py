@@ -15,3 +15,11 @@ def test_init_builds_inputs_and_cache(project_dir, fake_population_asset, patch_
     expected_cache_path = project_dir / f"{fake_inputs_hash}-trips.parquet"
     assert trips_instance.cache_path == expected_cache_path
     assert trips_instance.hash_path == expected_cache_path
+
+    # Default sampling options are not hashed, so existing caches stay valid
+    assert set(trips_instance.inputs) == {"population", "mobility_survey", "gwp"}
+
+    sharded = Trips(population=fake_population_asset, gwp=DefaultGWP(), engine="sharded", seed=0)
+    assert sharded.inputs["engine"] == "sharded"
+    assert sharded.inputs["seed"] == 0
+    assert "streaming" not in sharded.inputs
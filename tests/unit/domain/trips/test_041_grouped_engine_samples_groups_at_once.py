@@ -0,0 +1,66 @@
+import pandas as pd
+from mobility.trips import Trips
+from mobility.transport_modes.default_gwp import DefaultGWP
+
+
+def test_grouped_engine_keeps_schema_and_is_reproducible(
+    fake_transport_zones,
+    patch_mobility_survey,
+    seed_trips_with_minimal_databases,
+    deterministic_shortuuid,
+):
+    population_dataframe = pd.DataFrame(
+        {
+            "individual_id": [10, 11, 12],
+            "transport_zone_id": [101, 101, 102],
+            "socio_pro_category": ["1", "1", "1"],
+            "ref_pers_socio_pro_category": ["1", "1", "1"],
+            "n_pers_household": ["2", "2", "2"],
+            "n_cars": ["1", "1", "1"],
+            "country": ["FR", "FR", "FR"],
+        }
+    )
+
+    class DummyPopulationAsset:
+        def __init__(self, transport_zones_asset):
+            self.inputs = {"transport_zones": transport_zones_asset}
+        def get(self):
+            return {"individuals": "unused.parquet"}
+
+    def get_trips(engine, seed):
+        trips_instance = Trips(
+            population=DummyPopulationAsset(fake_transport_zones["asset"]),
+            gwp=DefaultGWP(),
+            engine=engine,
+            seed=seed
+        )
+        seed_trips_with_minimal_databases(trips_instance)
+        get_population_trips = (
+            trips_instance.get_population_trips if engine == "individual"
+            else trips_instance.get_population_trips_grouped
+        )
+        return get_population_trips(
+            population=population_dataframe,
+            transport_zones=fake_transport_zones["transport_zones"],
+            study_area=fake_transport_zones["study_area"],
+        )
+
+    individual_trips = get_trips("individual", None)
+    grouped_trips = get_trips("grouped", 0)
+
+    assert list(grouped_trips.columns) == list(individual_trips.columns)
+    assert set(grouped_trips["individual_id"].unique()) == {10, 11, 12}
+
+    # Same number of mobile days for each individual as the individual engine
+    short_days = grouped_trips[grouped_trips["trip_type"] == "short"].groupby("individual_id")["date"].nunique()
+    expected_short_days = individual_trips[individual_trips["trip_type"] == "short"].groupby("individual_id")["date"].nunique()
+    assert short_days.loc[[10, 11]].tolist() == expected_short_days.loc[[10, 11]].tolist()
+
+    # Individuals with the same profile get different days, but the same seed gives the same trips
+    assert set(grouped_trips.loc[grouped_trips["individual_id"] == 10, "date"]) != set(grouped_trips.loc[grouped_trips["individual_id"] == 11, "date"])
+
+    columns = [c for c in grouped_trips.columns if c != "trip_id"]
+    pd.testing.assert_frame_equal(
+        grouped_trips[columns].reset_index(drop=True),
+        get_trips("grouped", 0)[columns].reset_index(drop=True)
+    )
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from mobility.trips import Trips
+from mobility.transport_modes.default_gwp import DefaultGWP
+
+
+def make_survey_tables():
+    """
+    Small survey tables with the layout of MobilitySurveyAggregator outputs
+    (the sharded engine workers use the real filter_database, not the stub).
+    """
+    rng = np.random.default_rng(0)
+
+    days = pd.DataFrame({
+        "csp": np.repeat(["1", "2"], 40),
+        "n_cars": np.tile(np.repeat(["0", "1"], 20), 2),
+        "weekday": np.tile(np.repeat([True, False], 10), 4),
+        "city_category": np.tile(["C", "B"], 40),
+        "country": "fr",
+        "day_id": ["d" + str(i) for i in range(80)],
+        "pondki": rng.uniform(0.5, 2.0, 80),
+    })
+    days_trip = days.set_index(["csp", "n_cars", "weekday", "city_category", "country"])
+
+    short_trips = pd.DataFrame({
+        "day_id": np.repeat(days["day_id"].to_numpy(), 2),
+        "country": "fr",
+        "daily_trip_index": np.tile([0, 1], 80),
+        "previous_motive": np.tile(["1.1", "9.91"], 80),
+        "motive": np.tile(["9.91", "1.1"], 80),
+        "mode_id": np.tile(["3.30", "1.10"], 80),
+        "distance": rng.uniform(1.0, 20.0, 160),
+        "n_other_passengers": 0,
+    }).set_index(["day_id", "country"])
+
+    travels = pd.DataFrame({
+        "csp": np.repeat(["1", "2"], 20),
+        "n_cars": "1",
+        "city_category": np.tile(["C", "B"], 20),
+        "country": "fr",
+        "travel_id": ["t" + str(i) for i in range(40)],
+        "month": np.tile(np.arange(1, 11), 4),
+        "weekday": np.tile(np.arange(7), 6)[:40],
+        "n_nights": np.tile([1, 2, 3, np.nan], 10),
+        "pondki": rng.uniform(0.5, 2.0, 40),
+        "motive": np.tile(["9.91", "7.71"], 20),
+        "destination_city_category": np.tile(["B", "C"], 20),
+    })
+
+    long_trips = pd.DataFrame({
+        "travel_id": np.repeat(travels["travel_id"].to_numpy(), 2),
+        "country": "fr",
+        "previous_motive": np.tile(["1.1", "9.91"], 40),
+        "motive": np.tile(["9.91", "1.1"], 40),
+        "mode_id": "6.61",
+        "distance": rng.uniform(100.0, 500.0, 80),
+        "n_other_passengers": 0,
+        "n_nights_at_destination": np.tile([2.0, np.nan], 40),
+    }).set_index(["travel_id", "country"])
+
+    csp_index = pd.MultiIndex.from_tuples([("1", "fr"), ("2", "fr")], names=["csp", "country"])
+
+    return {
+        "short_trips_db": short_trips,
+        "days_trip_db": days_trip,
+        "long_trips_db": long_trips,
+        "travels_db": travels.set_index(["csp", "n_cars", "city_category", "country"]),
+        "n_travels_db": pd.DataFrame({"n_travels": [2, 1]}, index=csp_index),
+        "p_immobility": pd.DataFrame(
+            {"immobility_weekday": [0.1, 0.2], "immobility_weekend": [0.3, 0.4]},
+            index=csp_index
+        ),
+    }
+
+
+def test_sharded_engine_gives_the_same_trips_whatever_the_number_of_workers(
+    tmp_path,
+    fake_transport_zones,
+):
+    population_dataframe = pd.DataFrame(
+        {
+            "individual_id": ["a", "b", "c", "d", "e"],
+            "transport_zone_id": [101, 101, 102, 102, 102],
+            "socio_pro_category": ["1", "2", "1", "1", "2"],
+            "ref_pers_socio_pro_category": ["1", "1", "1", "1", "1"],
+            "n_pers_household": ["2", "2", "2", "2", "2"],
+            "n_cars": ["1", "1", "0", "1", "1"],
+            "country": ["fr", "fr", "fr", "fr", "fr"],
+        }
+    )
+
+    def get_trips(n_workers):
+        trips_instance = Trips(
+            population=None,
+            gwp=DefaultGWP(),
+            engine="sharded",
+            seed=0,
+            n_workers=n_workers
+        )
+        trips_instance.cache_path = tmp_path / ("trips-" + str(n_workers) + ".parquet")
+        for attribute, table in make_survey_tables().items():
+            setattr(trips_instance, attribute, table)
+        trips_instance.get_population_trips_sharded(
+            population=population_dataframe,
+            transport_zones=fake_transport_zones["transport_zones"],
+            study_area=fake_transport_zones["study_area"],
+        )
+        return trips_instance.cache_path
+
+    one_worker_path = get_trips(1)
+    two_workers_path = get_trips(2)
+
+    # One parquet file per transport zone
+    assert sorted(p.name for p in one_worker_path.iterdir()) == ["part-101.parquet", "part-102.parquet"]
+
+    one_worker_trips = pd.read_parquet(one_worker_path)
+    two_workers_trips = pd.read_parquet(two_workers_path)
+
+    assert set(one_worker_trips["individual_id"]) == {"a", "b", "c", "d", "e"}
+    # Integer trip ids built from the positions of the individuals, as in
+    # the other engines
+    assert one_worker_trips["trip_id"].dtype == np.int64
+    assert one_worker_trips["trip_id"].is_unique
+    assert set(one_worker_trips["trip_id"] // 2**24) == {0, 1, 2, 3, 4}
+    assert set(one_worker_trips["trip_type"]) == {"long", "short"}
+
+    pd.testing.assert_frame_equal(one_worker_trips, two_workers_trips)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+from mobility.trips import Trips
+from mobility.transport_modes.default_gwp import DefaultGWP
+
+
+def test_streaming_mode_writes_one_file_per_chunk_and_scans_them(
+    tmp_path,
+    fake_transport_zones,
+    patch_mobility_survey,
+    seed_trips_with_minimal_databases,
+):
+    population_dataframe = pd.DataFrame(
+        {
+            "individual_id": [10, 11, 12, 13, 14],
+            "transport_zone_id": [101, 101, 102, 102, 101],
+            "socio_pro_category": ["1", "1", "1", "1", "1"],
+            "ref_pers_socio_pro_category": ["1", "1", "1", "1", "1"],
+            "n_pers_household": ["2", "2", "2", "2", "2"],
+            "n_cars": ["1", "1", "1", "1", "1"],
+            "country": ["FR", "FR", "FR", "FR", "FR"],
+        }
+    )
+
+    class DummyPopulationAsset:
+        def __init__(self, transport_zones_asset):
+            self.inputs = {"transport_zones": transport_zones_asset}
+        def get(self):
+            return {"individuals": "unused.parquet"}
+
+    trips_instance = Trips(
+        population=DummyPopulationAsset(fake_transport_zones["asset"]),
+        gwp=DefaultGWP(),
+        engine="grouped",
+        seed=0,
+        streaming=True,
+        chunk_size=2
+    )
+    trips_instance.cache_path = tmp_path / "trips.parquet"
+    seed_trips_with_minimal_databases(trips_instance)
+
+    trips_instance.write_population_trips_chunks(
+        population=population_dataframe,
+        transport_zones=fake_transport_zones["transport_zones"],
+        study_area=fake_transport_zones["study_area"],
+    )
+
+    assert sorted(p.name for p in trips_instance.cache_path.iterdir()) == [
+        "part-00000.parquet", "part-00001.parquet", "part-00002.parquet"
+    ]
+
+    # Each chunk file holds all the trips of its individuals
+    chunk_individuals = [
+        set(pd.read_parquet(p)["individual_id"]) for p in sorted(trips_instance.cache_path.iterdir())
+    ]
+    assert chunk_individuals == [{10, 11}, {12, 13}, {14}]
+
+    trips = trips_instance.get_cached_asset()
+    assert isinstance(trips, pl.LazyFrame)
+
+    trips = trips.collect()
+    assert trips["trip_id"].dtype == pl.Int64
+    assert trips["trip_id"].is_unique().all()
+
+    # The high bits of the trip ids are the positions of the individuals
+    positions = trips.select((pl.col("trip_id") // 2**24).alias("position"), "individual_id").unique()
+    assert sorted(positions.rows()) == [(0, 10), (1, 11), (2, 12), (3, 13), (4, 14)]
+    assert set(trips["individual_id"].to_list()) == {10, 11, 12, 13, 14}
@@ -0,0 +1,172 @@
+import types
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from mobility.localized_trips import LocalizedTrips
+from mobility.choice_models.choice_sampler import ChoiceSampler
+
+
+def make_choice_models(n_possible_destinations):
+    zones = [1, 2, 3, 4]
+
+    dest_probs = pd.DataFrame(
+        [(i, j, p) for i in zones for j, p in zip(zones, [0.1, 0.2, 0.3, 0.4])],
+        columns=["from", "to", "prob"]
+    )
+
+    mode_probs = pd.concat([
+        dest_probs[["from", "to"]].assign(mode="car", prob=0.7),
+        dest_probs[["from", "to"]].assign(mode="walk", prob=0.3),
+    ])
+
+    costs = types.SimpleNamespace(
+        get=lambda **kwargs: pl.DataFrame({
+            "from": np.repeat(zones, 4),
+            "to": np.tile(zones, 4),
+            "mode": "car",
+            "distance": np.arange(16, dtype=float),
+        })
+    )
+
+    dest_cm = types.SimpleNamespace(
+        inputs={"parameters": types.SimpleNamespace(motive_ids=["2.20"]), "costs": costs},
+        inputs_hash="work",
+        n_possible_destinations=n_possible_destinations,
+        get=lambda: dest_probs
+    )
+
+    mode_cm = types.SimpleNamespace(
+        inputs_hash="work-modes",
+        get=lambda: mode_probs,
+        get_sampler=lambda: ChoiceSampler.build(mode_probs, keys=["from", "to"], choice_col="mode")
+    )
+
+    return [dest_cm], [mode_cm]
+
+
+def make_trips(n_individuals):
+    population = pd.DataFrame({
+        "individual_id": ["i" + str(i) for i in range(n_individuals)],
+        "transport_zone_id": np.tile([1, 2], n_individuals)[:n_individuals],
+    })
+
+    trips = pd.DataFrame({
+        "individual_id": np.repeat(population["individual_id"].to_numpy(), 4),
+        "trip_id": np.arange(4*n_individuals),
+        "previous_motive": np.tile(["1.1", "2.20", "1.1", "9.91"], n_individuals),
+        "motive": np.tile(["2.20", "1.1", "2.20", "1.1"], n_individuals),
+        "mode_id": "walk",
+        "distance": 100.0,
+    })
+
+    return trips, population
+
+
+def localize(trips, population, engine, max_race_rows=10000000, keep_survey_cols=False):
+    dest_cm_list, mode_cm_list = make_choice_models(n_possible_destinations=2)
+    localized_trips = LocalizedTrips(
+        dest_cm_list, mode_cm_list, trips=None,
+        keep_survey_cols=keep_survey_cols, engine=engine, seed=0, max_race_rows=max_race_rows
+    )
+    return localized_trips.localize_trips(trips, population, dest_cm_list, mode_cm_list, keep_survey_cols)
+
+
+def test_polars_engine_gives_the_columns_of_the_pandas_engine():
+    trips, population = make_trips(20)
+
+    for keep_survey_cols in [False, True]:
+        polars_trips = localize(trips, population, "polars", keep_survey_cols=keep_survey_cols)
+        pandas_trips = localize(trips, population, "pandas", keep_survey_cols=keep_survey_cols)
+        assert list(polars_trips.columns) == list(pandas_trips.columns)
+        assert polars_trips["trip_id"].tolist() == trips["trip_id"].tolist()
+
+
+def test_polars_engine_samples_among_the_potential_destinations():
+    trips, population = make_trips(200)
+
+    localized = localize(trips, population, "polars")
+
+    # Trips from an unknown motive are not localized and keep their survey mode
+    unknown = localized[localized["previous_motive"] == "9.91"]
+    assert unknown["from_transport_zone_id"].isnull().all()
+    assert (unknown["mode_id"] == "walk").all()
+
+    localized = localized.dropna(subset=["from_transport_zone_id"]).merge(
+        population.rename({"transport_zone_id": "home"}, axis=1),
+        on="individual_id"
+    )
+
+    home_trips = localized[localized["motive"] == "1.1"]
+    assert (home_trips["to_transport_zone_id"] == home_trips["home"]).all()
+    car_trips = localized[localized["mode_id"] == "car"]
+    assert (car_trips["distance"] != 100.0).all()
+
+    work_trips = localized[localized["motive"] == "2.20"]
+    assert (work_trips["from_transport_zone_id"] == work_trips["home"]).all()
+    assert work_trips.groupby("individual_id")["to_transport_zone_id"].nunique().max() <= 2
+    assert set(localized["mode_id"]) == {"car", "walk"}
+
+
+def test_polars_engine_does_not_depend_on_the_blocks_of_individuals():
+    trips, population = make_trips(50)
+
+    one_block = localize(trips, population, "polars")
+    many_blocks = localize(trips, population, "polars", max_race_rows=10)
+
+    pd.testing.assert_frame_equal(one_block, many_blocks)
+
+
+def test_polars_engine_destinations_follow_the_probabilities():
+    trips, population = make_trips(5000)
+    dest_cm_list, mode_cm_list = make_choice_models(n_possible_destinations=1)
+
+    localized_trips = LocalizedTrips(dest_cm_list, mode_cm_list, trips=None, engine="polars", seed=1)
+    localized = localized_trips.localize_trips(trips, population, dest_cm_list, mode_cm_list, False)
+
+    first_work_trips = localized[localized["motive"] == "2.20"].drop_duplicates("individual_id")
+    frequencies = first_work_trips["to_transport_zone_id"].value_counts(normalize=True).sort_index()
+
+    np.testing.assert_allclose(frequencies.to_numpy(), [0.1, 0.2, 0.3, 0.4], atol=0.03)
+
+
+def test_default_options_are_not_hashed():
+    dest_cm_list, mode_cm_list = make_choice_models(n_possible_destinations=2)
+
+    default = LocalizedTrips(dest_cm_list, mode_cm_list, trips=None)
+    assert "streaming" not in default.inputs
+    assert "chunk_size" not in default.inputs
+    assert "engine" not in default.inputs
+    assert "seed" not in default.inputs
+
+    streaming = LocalizedTrips(dest_cm_list, mode_cm_list, trips=None, streaming=True)
+    assert streaming.inputs["streaming"] is True
+
+    polars = LocalizedTrips(dest_cm_list, mode_cm_list, trips=None, engine="polars", seed=0)
+    assert (polars.inputs["engine"], polars.inputs["seed"]) == ("polars", 0)
+
+
+def test_polars_engine_chunks_get_their_own_draws():
+    trips, population = make_trips(50)
+    dest_cm_list, mode_cm_list = make_choice_models(n_possible_destinations=2)
+    localized_trips = LocalizedTrips(dest_cm_list, mode_cm_list, trips=None, engine="polars", seed=0)
+
+    # Two chunks with the same layout of individuals and trips
+    chunks = [
+        localized_trips.localize_trips(trips, population, dest_cm_list, mode_cm_list, False, chunk_index=i)
+        for i in range(2)
+    ]
+
+    columns = ["from_transport_zone_id", "to_transport_zone_id", "mode_id"]
+    assert not chunks[0][columns].equals(chunks[1][columns])
+
+
+def test_pandas_engine_modes_follow_the_probabilities():
+    trips, population = make_trips(5000)
+
+    localized = localize(trips, population, "pandas").dropna(subset=["from_transport_zone_id"])
+
+    frequencies = localized["mode_id"].value_counts(normalize=True)
+
+    np.testing.assert_allclose(frequencies[["car", "walk"]].to_numpy(), [0.7, 0.3], atol=0.03)